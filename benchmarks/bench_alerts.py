@@ -0,0 +1,106 @@
+"""
+Measure alert evaluation as the number of subscriptions grows.
+
+Subscribes chats, five alerts each, to random thresholds on the host
+metrics, then times engine ticks while the metrics take a random walk. For
+comparison it also times a naive loop that checks every subscription on
+every tick. The engine reads each metric once per tick and only touches
+conditions whose state flipped, so its tick time should stay far below
+the naive loop's and grow much more slowly.
+
+Usage:
+    python benchmarks/bench_alerts.py [--max-subscriptions N] [--ticks N]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from alerts import AlertCondition, AlertEngine
+from host_metrics import HOST_METRICS
+
+
+class WalkingMetrics:
+    """Metric values that drift a little on every step."""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.values = {metric: 50.0 for metric in HOST_METRICS}
+        self.reads = 0
+
+    def step(self) -> None:
+        for metric, value in self.values.items():
+            self.values[metric] = min(100.0, max(0.0, value + self.rng.gauss(0, 3)))
+
+    def latest(self, metric: str) -> float:
+        self.reads += 1
+        return self.values[metric]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def measure(subscriptions: int, ticks: int) -> None:
+    rng = random.Random(subscriptions)
+    metrics = WalkingMetrics(rng)
+    clock = Clock()
+    engine = AlertEngine(metrics, interval=5.0, max_per_chat=5, clock=clock)
+    conditions = []
+    started = time.perf_counter()
+    for number in range(subscriptions):
+        condition = AlertCondition(
+            rng.choice(list(HOST_METRICS)), rng.choice([">", ">=", "<", "<="]),
+            float(rng.randrange(20, 81)), rng.choice([0.0, 30.0, 60.0, 300.0]),
+        )
+        conditions.append(condition)
+        try:
+            await engine.add(number // 5, condition)
+        except ValueError:
+            # The chat already has this exact alert
+            pass
+    build = time.perf_counter() - started
+
+    engine_seconds = naive_seconds = 0.0
+    for _ in range(ticks):
+        metrics.step()
+        clock.now += 5.0
+        started = time.perf_counter()
+        await engine.tick()
+        engine_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        values = {metric: metrics.latest(metric) for metric in HOST_METRICS}
+        breached = sum(1 for condition in conditions if condition.breached(values[condition.metric]))
+        naive_seconds += time.perf_counter() - started
+
+    stats = engine.stats()
+    print(f"{stats.subscriptions:>13} {stats.conditions:>10} {build * 1000:>9.1f} "
+          f"{engine_seconds / ticks * 1000:>11.3f} {naive_seconds / ticks * 1000:>10.3f} "
+          f"{stats.notifications / ticks:>13.1f} {breached:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-subscriptions", type=int, default=100000)
+    parser.add_argument("--ticks", type=int, default=200)
+    args = parser.parse_args()
+
+    sizes = [size for size in (1000, 10000, 50000, 100000) if size <= args.max_subscriptions] or [args.max_subscriptions]
+    print(f"{'subscriptions':>13} {'conditions':>10} {'build ms':>9} {'tick ms':>11} {'naive ms':>10} "
+          f"{'chats/tick':>13} {'breached':>9}")
+    for size in sizes:
+        asyncio.run(measure(size, args.ticks))
+
+
+if __name__ == "__main__":
+    main()
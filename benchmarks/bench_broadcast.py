@@ -0,0 +1,139 @@
+"""
+Measure a /broadcast to 100,000 chats against the fake Bot API.
+
+Remembers N chats, a share of which have blocked the bot, and broadcasts
+to them through the real outbound queue and a bot talking to the fake API
+with simulated latency. A few sends hit flood control. Halfway through,
+the engine is stopped and a new one resumes from the saved cursor, as
+after a restart. The benchmark reports throughput and the ETA shown while
+sending, then checks that every chat got the text and counts the sends
+repeated by the restart. A sequential send loop over a sample of the
+chats gives the naive baseline. The outbound rate limit is lifted to
+measure the engine itself. At Telegram's 30 messages per second, the
+broadcast would take N / 30 seconds instead.
+
+Usage:
+    python benchmarks/bench_broadcast.py [--recipients N] [--latency SECONDS] [--concurrency N]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from telegram import Bot
+
+from broadcast import BroadcastEngine, KNOWN_CHATS_KEY
+from outbound import OutboundQueue
+from state_store import StateStore
+from testing.fake_bot_api import FakeBotApi
+from transport import InstrumentedHTTPXRequest, PoolConfig
+
+TEXT = "Scheduled maintenance tonight at 22:00 UTC"
+
+
+async def report_until_done(engine: BroadcastEngine, stop_at: int = 0) -> None:
+    """Print progress every few seconds until the broadcast ends or reaches ``stop_at`` chats."""
+    next_report = time.perf_counter() + 5
+    while engine.running:
+        await asyncio.sleep(0.05)
+        progress = engine.progress()
+        if stop_at and progress.done >= stop_at:
+            return
+        if time.perf_counter() >= next_report:
+            next_report += 5
+            eta = progress.eta
+            print(f"  {progress.done:>7} of {progress.total}  {progress.rate:>7.0f} chats/s  "
+                  f"ETA {eta if eta is not None else float('nan'):>6.1f}s")
+
+
+async def run(recipients: int, latency: float, concurrency: int, blocked_share: float) -> None:
+    rng = random.Random(recipients)
+    chat_ids = rng.sample(range(10 ** 6, 10 ** 10), recipients)
+    fake_api = FakeBotApi(response_delay=latency)
+    fake_api.blocked_chats.update(rng.sample(chat_ids, int(recipients * blocked_share)))
+    await fake_api.start()
+    request = InstrumentedHTTPXRequest(PoolConfig(size=concurrency, pool_timeout=600.0))
+    bot = Bot(fake_api.token, base_url=fake_api.base_url, request=request)
+    directory = tempfile.TemporaryDirectory()
+    store = StateStore(os.path.join(directory.name, "state.db"), batch_size=10000)
+    outbound = OutboundQueue(bot, global_rate=1e6, chat_rate=1e6, group_rate=1e6)
+    try:
+        await bot.initialize()
+        await store.start()
+        await outbound.start()
+
+        sample = chat_ids[:min(1000, recipients)]
+        started = time.perf_counter()
+        for chat_id in sample:
+            try:
+                await bot.send_message(chat_id, TEXT)
+            except Exception:
+                pass
+        sequential_rate = len(sample) / (time.perf_counter() - started)
+        fake_api.sent_messages.clear()
+
+        started = time.perf_counter()
+        for chat_id in chat_ids:
+            await store.set(chat_id, KNOWN_CHATS_KEY, True)
+        await store.flush()
+        print(f"{recipients} recipients remembered in {time.perf_counter() - started:.1f}s, "
+              f"{len(fake_api.blocked_chats)} blocked the bot, {latency * 1000:.0f} ms API latency")
+        fake_api.inject_error("sendMessage", retry_after=1, times=3)
+        flood_waits = outbound.stats().retry_after
+
+        admin = chat_ids[0]
+        engine = BroadcastEngine(outbound, store, bot, concurrency=concurrency, save_interval=0.5)
+        started = time.perf_counter()
+        await engine.begin(admin, TEXT)
+        await report_until_done(engine, stop_at=recipients // 2)
+        await engine.stop()
+        print(f"  stopped at {engine.progress().done} chats, resuming")
+        engine = BroadcastEngine(outbound, store, bot, concurrency=concurrency, save_interval=0.5)
+        await engine.start()
+        await report_until_done(engine)
+        elapsed = time.perf_counter() - started
+        progress = engine.progress()
+        flood_waits = outbound.stats().retry_after - flood_waits
+    finally:
+        await outbound.stop()
+        await store.stop()
+        await bot.shutdown()
+        await fake_api.stop()
+        directory.cleanup()
+
+    received = Counter(message.chat_id for message in fake_api.sent_messages if message.text == TEXT)
+    reachable = set(chat_ids) - fake_api.blocked_chats
+    missing = len(reachable - set(received))
+    repeated = sum(count - 1 for count in received.values())
+    print()
+    print(f"{'':<22} {'chats/s':>9} {'time for all':>13}")
+    print(f"{'sequential sends':<22} {sequential_rate:>9.0f} {recipients / sequential_rate:>12.0f}s")
+    print(f"{f'broadcast, {concurrency} in flight':<22} {recipients / elapsed:>9.0f} {elapsed:>12.1f}s")
+    print(f"{'Telegram limit':<22} {30:>9} {recipients / 30:>12.0f}s")
+    print()
+    print(f"sent {progress.sent}, blocked {progress.blocked}, failed {progress.failed}, "
+          f"missing {missing}, repeated after the restart {repeated}, flood waits {flood_waits}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recipients", type=int, default=100000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--blocked", type=float, default=0.01, help="share of chats that blocked the bot")
+    args = parser.parse_args()
+    # Each send to a blocked chat is logged as dropped
+    logging.getLogger("outbound").setLevel(logging.CRITICAL)
+    asyncio.run(run(args.recipients, args.latency, args.concurrency, args.blocked))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Measure command resolution and suggestions as the number of commands grows.
+
+Times exact lookups (the dictionary alone), alias and unique-prefix
+lookups (the trie walk), "did you mean" suggestions for a typo, and the
+cost of adding and removing a command while the index is kept up to date.
+
+Usage:
+    python benchmarks/bench_command_index.py [--iterations N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from command_handlers_registry import CommandHandlersRegistry
+from commands.icommand_handler import ICommandHandler
+
+
+WORDS = ("ping", "status", "stats", "history", "reload", "logs", "alert", "deploy", "backup", "user")
+
+
+class _SyntheticCommandHandler(ICommandHandler):
+    def __init__(self, command_name: str, aliases=()):
+        self._command_name = command_name
+        self._aliases = aliases
+
+    async def handle(self, update, context):
+        pass
+
+    def name(self) -> str:
+        return self._command_name
+
+    def aliases(self):
+        return self._aliases
+
+
+def command_names(count: int):
+    rng = random.Random(count)
+    names = set()
+    while len(names) < count:
+        names.add("/" + "_".join(rng.sample(WORDS, 2)) + str(rng.randrange(1000)))
+    return sorted(names)
+
+
+def time_per_call(function, tokens, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for token in tokens:
+            function(token)
+    return (time.perf_counter() - started) / (iterations * len(tokens))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'commands':>8} {'exact us':>9} {'alias us':>9} {'prefix us':>10} "
+          f"{'suggest us':>11} {'add+remove us':>14} {'build ms':>9}")
+    for count in (10, 100, 1000, 5000):
+        names = command_names(count)
+        handlers = [_SyntheticCommandHandler(name, (f"/a{index}",)) for index, name in enumerate(names)]
+        registry = CommandHandlersRegistry()
+        started = time.perf_counter()
+        registry.replace_all(handlers)
+        build = time.perf_counter() - started
+
+        sample = names[::max(1, count // 20)]
+        aliases = [f"/a{index}" for index in range(0, count, max(1, count // 20))]
+        # The shortest prefix of each sampled name that resolves to it
+        prefixes = []
+        for name in sample:
+            for length in range(2, len(name) + 1):
+                if registry.resolve(name[:length]) is not None:
+                    prefixes.append(name[:length])
+                    break
+        typos = [name[:2] + name[3] + name[2] + name[4:] for name in sample]
+
+        exact = time_per_call(registry.resolve, sample, args.iterations)
+        alias = time_per_call(registry.resolve, aliases, args.iterations)
+        prefix = time_per_call(registry.resolve, prefixes, args.iterations)
+        suggest = time_per_call(registry.suggest, typos, max(1, args.iterations // 20))
+
+        extra = _SyntheticCommandHandler("/zz_extra", ("/zx",))
+        started = time.perf_counter()
+        for _ in range(args.iterations):
+            registry.add(extra)
+            registry.remove("/zz_extra")
+        churn = (time.perf_counter() - started) / args.iterations
+
+        print(f"{count:>8} {exact * 1e6:>9.2f} {alias * 1e6:>9.2f} {prefix * 1e6:>10.2f} "
+              f"{suggest * 1e6:>11.1f} {churn * 1e6:>14.1f} {build * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
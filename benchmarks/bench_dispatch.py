@@ -0,0 +1,101 @@
+"""
+Measure command dispatch cost as the number of registered commands grows.
+
+Compares the single CommandRouter against one telegram.ext.CommandHandler
+per command, which python-telegram-bot checks in registration order. The
+dispatched command is the last one registered, the worst case for the
+per-command handlers.
+
+Usage:
+    python benchmarks/bench_dispatch.py [--iterations N]
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from telegram import Chat, Message, MessageEntity, Update
+from telegram.ext import CommandHandler
+
+from command_handlers_registry import CommandHandlersRegistry
+from command_router import CommandRouter
+from commands.icommand_handler import ICommandHandler
+
+
+class _SyntheticCommandHandler(ICommandHandler):
+    def __init__(self, command_name: str):
+        self._command_name = command_name
+
+    async def handle(self, update, context):
+        pass
+
+    def name(self) -> str:
+        return self._command_name
+
+
+class _BenchBot:
+    username = "bench_bot"
+
+
+def _make_update(text: str) -> Update:
+    message = Message(
+        message_id=1,
+        date=datetime.datetime.now(datetime.timezone.utc),
+        chat=Chat(1, Chat.PRIVATE),
+        text=text,
+        entities=[MessageEntity(MessageEntity.BOT_COMMAND, 0, len(text.split()[0]))],
+    )
+    message.set_bot(_BenchBot())
+    return Update(1, message=message)
+
+
+def _time_per_call(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations
+
+
+def bench(command_count: int, iterations: int):
+    registry = CommandHandlersRegistry()
+    for index in range(command_count):
+        registry.add(_SyntheticCommandHandler(f"/cmd{index}"))
+    handlers = registry.get_all_handlers()
+    update = _make_update(f"/cmd{command_count - 1} arg")
+
+    router = CommandRouter(registry.get)
+
+    def dispatch_router():
+        assert router.check_update(update)
+
+    per_command = [CommandHandler(h.name().lstrip('/'), h.handle) for h in handlers]
+
+    def dispatch_per_command():
+        for handler in per_command:
+            if handler.check_update(update):
+                return
+        raise AssertionError("no handler matched")
+
+    router_time = _time_per_call(dispatch_router, iterations)
+    per_command_iterations = max(10, iterations // max(1, command_count // 10))
+    per_command_time = _time_per_call(dispatch_per_command, per_command_iterations)
+    return router_time, per_command_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'commands':>8} {'router (us)':>12} {'per-command (us)':>17}")
+    for command_count in (1, 100, 5000):
+        router_time, per_command_time = bench(command_count, args.iterations)
+        print(f"{command_count:>8} {router_time * 1e6:>12.2f} {per_command_time * 1e6:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
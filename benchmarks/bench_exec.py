@@ -0,0 +1,120 @@
+"""
+Measure /ping latency while /exec actions stream output.
+
+Runs the bot against the fake Bot API with N noisy actions, each a
+process writing about a megabyte of log lines per second, and times
+/ping round trips from the chat that started the actions and from
+another chat, first with nothing running and then while all actions run
+at once. The actions' output is read by the event loop, edited into
+their replies and cut at the output cap, so the difference between the
+two rows is what streaming them costs other commands. Running an action
+inside the handler instead would hold its chat's /ping for the whole
+run. The outbound rate limits are lifted so the replies are not throttled.
+
+Usage:
+    python benchmarks/bench_exec.py [--actions N] [--duration SECONDS] [--pings N]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import shlex
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config import BotConfig
+from main import build_bot
+from testing.fake_bot_api import FakeBotApi
+
+ADMIN_CHAT = 1
+OTHER_CHAT = 2
+
+NOISY_SCRIPT = (
+    "import sys, time\n"
+    "end = time.time() + {duration}\n"
+    "while time.time() < end:\n"
+    "    sys.stdout.write(('building target ' + 'x' * 63 + chr(10)) * 100)\n"
+    "    sys.stdout.flush()\n"
+    "    time.sleep(0.01)\n"
+)
+
+
+async def ping_latencies(fake_api: FakeBotApi, chat_id: int, pings: int):
+    latencies = []
+    for _ in range(pings):
+        replies = len(fake_api.sent_by_chat[chat_id]) + 1
+        started = time.perf_counter()
+        await fake_api.push_update(fake_api.make_command_update(chat_id, "/ping", user_id=ADMIN_CHAT))
+        await fake_api.wait_for_chat_messages(chat_id, replies)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.02)
+    return latencies
+
+
+def describe(label: str, latencies) -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<34} {statistics.median(latencies) * 1000:>8.1f} {p99 * 1000:>8.1f} {latencies[-1] * 1000:>8.1f}")
+
+
+async def run(actions: int, duration: float, pings: int) -> None:
+    command = shlex.join([sys.executable, "-c", NOISY_SCRIPT.format(duration=duration)])
+    fake_api = FakeBotApi()
+    await fake_api.start()
+    bot = build_bot(fake_api.token, BotConfig(
+        base_url=fake_api.base_url, admin_user_ids=frozenset({ADMIN_CHAT}),
+        outbound_global_rate=1e6, outbound_chat_rate=1e6, outbound_group_rate=1e6,
+        exec_actions=tuple((f"build{index}", command) for index in range(actions)),
+        exec_max_concurrency=actions, exec_timeout=duration * 4,
+    ))
+    runner = bot.services.actions
+    try:
+        await bot.start()
+        print(f"{'/ping round trip':<34} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for chat_id in (ADMIN_CHAT, OTHER_CHAT):
+            describe(f"idle, chat {chat_id}", await ping_latencies(fake_api, chat_id, pings))
+
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        for index in range(actions):
+            await fake_api.push_update(fake_api.make_command_update(ADMIN_CHAT, f"/exec build{index}"))
+        while runner.stats().running < actions:
+            await asyncio.sleep(0.01)
+        for chat_id in (ADMIN_CHAT, OTHER_CHAT):
+            describe(f"{actions} actions running, chat {chat_id}", await ping_latencies(fake_api, chat_id, pings))
+        running_at_end = runner.stats().running
+        while runner.stats().running:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+        # Let the last edits of the replies go out
+        await asyncio.sleep(2.5)
+    finally:
+        await bot.stop()
+        await fake_api.stop()
+
+    stats = runner.stats()
+    print()
+    print(f"{stats.started} actions ran in {elapsed:.1f}s, {running_at_end} still running after the pings, "
+          f"{stats.truncated} cut at the output cap, {stats.timeouts} timed out")
+    print(f"CPU of the bot and fake API while they ran: {cpu / elapsed * 100:.0f}% of a core, "
+          f"{len(fake_api.sent_by_chat[ADMIN_CHAT]) - 2 * pings} reply messages, "
+          f"{len(fake_api.edited_messages)} edits")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--actions", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--pings", type=int, default=50)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(run(args.actions, args.duration, args.pings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Compare update-to-reply latency and throughput of polling and webhook ingestion.
+
+Runs the bot against the offline fake Bot API. Each virtual chat sends
+``/ping`` and waits for the reply before sending the next one.
+
+Usage:
+    python benchmarks/bench_ingestion.py [--updates N] [--chats C]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bot import TelegramBot
+from command_handlers_manager import CommandHandlersManager
+from command_handlers_registry import CommandHandlersRegistry
+from config import BotConfig, POLLING_MODE, WEBHOOK_MODE
+from testing.fake_bot_api import FakeBotApi
+from webhook_server import WebhookConfig
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_mode(mode: str, updates: int, chats: int) -> dict:
+    """Drive ``updates`` pings over ``chats`` chats and collect timings."""
+    fake_api = FakeBotApi()
+    await fake_api.start()
+
+    webhook = None
+    if mode == WEBHOOK_MODE:
+        port = _free_port()
+        webhook = WebhookConfig(
+            url=f"http://127.0.0.1:{port}/telegram", listen="127.0.0.1", port=port, secret_token="bench"
+        )
+    manager = CommandHandlersManager(CommandHandlersRegistry())
+    manager.populate_bot_handlers()
+    config = BotConfig(
+        mode=mode,
+        base_url=fake_api.base_url,
+        webhook=webhook,
+        # Measure ingestion, not Telegram's send limits
+        outbound_global_rate=1e6,
+        outbound_chat_rate=1e6,
+    )
+    bot = TelegramBot(fake_api.token, manager, config)
+
+    latencies = []
+    per_chat = updates // chats
+
+    async def virtual_chat(chat_id: int):
+        for _ in range(per_chat):
+            replies = fake_api.sent_by_chat[chat_id]
+            expected = len(replies) + 1
+            pushed_at = await fake_api.push_update(fake_api.make_command_update(chat_id, "/ping"))
+            while True:
+                if len(replies) >= expected:
+                    latencies.append(replies[-1].received_at - pushed_at)
+                    break
+                await asyncio.sleep(0.0005)
+
+    await bot.start()
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_chat(chat_id) for chat_id in range(1, chats + 1)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await bot.stop()
+        await fake_api.stop()
+
+    return {
+        "mode": mode,
+        "updates": len(latencies),
+        "updates_per_sec": len(latencies) / elapsed,
+        "latency_p50_ms": _percentile(latencies, 0.50) * 1000,
+        "latency_p95_ms": _percentile(latencies, 0.95) * 1000,
+        "latency_mean_ms": statistics.mean(latencies) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--chats", type=int, default=10)
+    args = parser.parse_args()
+
+    for mode in (POLLING_MODE, WEBHOOK_MODE):
+        result = asyncio.run(run_mode(mode, args.updates, args.chats))
+        print(
+            f"{result['mode']:>8}: {result['updates']} updates, "
+            f"{result['updates_per_sec']:.0f} updates/s, "
+            f"p50 {result['latency_p50_ms']:.2f} ms, p95 {result['latency_p95_ms']:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Measure /logs lookups as the log file grows.
+
+Writes synthetic timestamped logs of increasing size and times building the
+sparse index, tailing, jumping to a random time, reading on from an offset,
+grepping the recent end, and catching up after an append. Apart from the
+build, which touches one page per checkpoint, the times should stay roughly
+flat as the file grows.
+
+Usage:
+    python benchmarks/bench_log_index.py [--max-mib N] [--iterations N]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from log_index import LogIndex
+
+
+BASE = time.mktime((2024, 5, 1, 0, 0, 0, 0, 0, -1))
+LINE = "{stamp} INFO worker-{worker} request {number} handled in {ms} ms\n"
+
+
+def write_log(path: str, size: int) -> int:
+    """Append lines to a log file until it reaches ``size`` bytes; returns the line count."""
+    rng = random.Random(size)
+    number = 0
+    with open(path, "w") as file:
+        written = 0
+        while written < size:
+            chunk = []
+            for _ in range(10000):
+                stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(BASE + number // 10))
+                chunk.append(LINE.format(stamp=stamp, worker=rng.randrange(8), number=number, ms=rng.randrange(500)))
+                number += 1
+            text = "".join(chunk)
+            file.write(text)
+            written += len(text)
+    return number
+
+
+def time_per_call(function, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-mib", type=int, default=512)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    sizes = [mib for mib in (16, 64, 256, 1024) if mib <= args.max_mib] or [args.max_mib]
+    print(f"{'file MiB':>8} {'build ms':>9} {'tail us':>8} {'seek us':>8} {'from us':>8} "
+          f"{'grep ms':>8} {'append us':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for mib in sizes:
+            path = os.path.join(directory, f"{mib}.log")
+            lines = write_log(path, mib << 20)
+            index = LogIndex(path)
+            started = time.perf_counter()
+            index.refresh()
+            build = time.perf_counter() - started
+
+            rng = random.Random(mib)
+            seek = time_per_call(lambda: index.seek_time(BASE + rng.randrange(lines // 10), 20), args.iterations)
+            tail = time_per_call(lambda: index.tail(20), args.iterations)
+            offset = index.seek_time(BASE + lines // 20, 1).end
+            read_from = time_per_call(lambda: index.read_from(offset, 20), args.iterations)
+            # Matches spread through the file, so the last 20 are near its end
+            pattern = re.compile(rb"in 499 ms")
+            grep = time_per_call(lambda: index.grep(pattern, 20, 64 << 20), max(1, args.iterations // 10))
+
+            with open(path, "a") as file:
+                started = time.perf_counter()
+                for _ in range(args.iterations):
+                    file.write(LINE.format(stamp="2030-01-01 00:00:00", worker=0, number=0, ms=0))
+                    file.flush()
+                    index.refresh()
+                append = (time.perf_counter() - started) / args.iterations
+            index.close()
+            os.remove(path)
+
+            print(f"{mib:>8} {build * 1000:>9.1f} {tail * 1e6:>8.1f} {seek * 1e6:>8.1f} {read_from * 1e6:>8.1f} "
+                  f"{grep * 1000:>8.2f} {append * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Measure the cost per update and the memory of the command rate limiter.
+
+Checks commands from a stream of distinct users against the per-user limit
+alone and together with a per-command limit, and compares the tables'
+fixed memory with a dictionary holding one state object per user. The
+router-level figure adds the limiter to ``CommandRouter.check_update`` plus
+the rate limit lookup done in ``handle_update``.
+
+Usage:
+    python benchmarks/bench_rate_limiter.py [--users N] [--capacity N]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from load_test import current_rss_mb
+from rate_limiter import RateLimit, RateLimiter
+
+
+class _UserState:
+    """What a naive limiter would keep per user."""
+
+    __slots__ = ("tat", "notified")
+
+    def __init__(self):
+        self.tat = 0.0
+        self.notified = False
+
+
+def time_checks(limiter: RateLimiter, users: int, command_limit) -> float:
+    check = limiter.check
+    started = time.perf_counter()
+    for user_id in range(users):
+        check(user_id * 7919 + 1, "/history", command_limit)
+    return (time.perf_counter() - started) / users
+
+
+def naive_memory_mb(users: int) -> float:
+    tracemalloc.start()
+    states = {user_id * 7919 + 1: _UserState() for user_id in range(users)}
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del states
+    return size / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--capacity", type=int, default=65536)
+    args = parser.parse_args()
+
+    user_limit = RateLimit(30, 60.0)
+    command_limit = RateLimit(10, 60.0)
+    print(f"{args.users} distinct users, {args.capacity} slots per table\n")
+    print(f"{'limits':<18} {'us/check':>9} {'table MB':>9} {'RSS MB':>7} {'evictions':>10}")
+    for label, limiter, limit in (
+        ("none", RateLimiter(capacity=args.capacity), None),
+        ("user", RateLimiter(user_limit, args.capacity), None),
+        ("user + command", RateLimiter(user_limit, args.capacity), command_limit),
+    ):
+        per_check = time_checks(limiter, args.users, limit)
+        stats = limiter.stats()
+        print(f"{label:<18} {per_check * 1e6:>9.2f} {stats.memory_bytes / 1024 / 1024:>9.1f} "
+              f"{current_rss_mb():>7.1f} {stats.evictions:>10}")
+
+    # Repeat offenders hit their own slot every time
+    limiter = RateLimiter(user_limit, args.capacity)
+    started = time.perf_counter()
+    for index in range(args.users):
+        limiter.check(index % 1000, "/ping")
+    print(f"\n1000 hot users: {(time.perf_counter() - started) / args.users * 1e6:.2f} us/check, "
+          f"{limiter.stats().rejected} of {args.users} rejected")
+    print(f"one object per user instead: {naive_memory_mb(args.users):.1f} MB for {args.users} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Measure write throughput and memory of the chat state store with one million keys.
+
+Writes N keys spread over many chats through ``StateStore`` (write-behind
+batches into SQLite in WAL mode), reporting sustained write throughput, the
+flush rate and resident memory as the key count grows, then times cold and
+cached reads.
+
+Usage:
+    python benchmarks/bench_state_store.py [--keys N] [--chats N] [--batch-size N]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from load_test import current_rss_mb
+from state_store import StateStore
+
+
+async def run(keys: int, chats: int, batch_size: int, cache_size: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "state.db")
+        store = StateStore(path, flush_interval=1.0, batch_size=batch_size, cache_size=cache_size)
+        await store.start()
+
+        rss_start = current_rss_mb()
+        checkpoints = {keys * step // 10 for step in range(1, 11)}
+        print(f"{'keys':>10} {'writes/s':>10} {'RSS (MB)':>9} {'pending':>8} {'cached':>7}")
+        started = time.perf_counter()
+        for index in range(1, keys + 1):
+            await store.set(index % chats, f"key{index}", {"value": index, "seen": True})
+            if index in checkpoints:
+                stats = store.stats()
+                print(f"{index:>10} {index / (time.perf_counter() - started):>10.0f} "
+                      f"{current_rss_mb():>9.1f} {stats.pending:>8} {stats.cached:>7}")
+        await store.flush()
+        elapsed = time.perf_counter() - started
+        stats = store.stats()
+        print(f"\n{keys} keys committed in {elapsed:.2f}s ({keys / elapsed:.0f} writes/s, "
+              f"{stats.flushes} transactions, last flush {stats.last_flush_seconds * 1000:.1f} ms)")
+        print(f"RSS grew by {current_rss_mb() - rss_start:.1f} MB, "
+              f"database is {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+        sample = random.Random(1).sample(range(1, keys + 1), 10000)
+        for label in ("cold reads", "cached reads"):
+            started = time.perf_counter()
+            for index in sample[:cache_size]:
+                await store.get(index % chats, f"key{index}")
+            elapsed = time.perf_counter() - started
+            print(f"{label}: {min(len(sample), cache_size) / elapsed:.0f} reads/s")
+        await store.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--chats", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--cache-size", type=int, default=10_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.keys, args.chats, args.batch_size, args.cache_size))
+
+
+if __name__ == "__main__":
+    main()
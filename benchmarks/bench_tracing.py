@@ -0,0 +1,158 @@
+"""
+Measure the per-update cost of tracing and of logging through the queue.
+
+Runs synthetic /ping updates through the CommandRouter, with a handler
+that logs one line and times a stand-in send as a span, and reports the
+microseconds per update with tracing off, at several sample rates, and
+with a slow threshold that times every update. Time on the event loop
+thread is what delays other updates; the CPU column adds the log writer
+and trace exporter threads. A second table compares the time a log call
+takes the caller when records are written directly to a stream and when
+they are queued for the writer thread, with a stream that takes a
+millisecond per write as a stalled pipe would.
+
+Usage:
+    python benchmarks/bench_tracing.py [--updates N] [--rounds N]
+"""
+
+import argparse
+import asyncio
+import datetime
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+from logging.handlers import QueueListener
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from telegram import Chat, Message, MessageEntity, Update
+
+from command_router import CommandRouter
+from commands.icommand_handler import ICommandHandler
+from structured_logging import JsonFormatter, configure_logging
+from tracing import LogSpanExporter, OtlpFileExporter, Tracer, span
+
+logger = logging.getLogger("bench")
+
+
+class _PingHandler(ICommandHandler):
+    async def handle(self, update, context):
+        logger.info("Handling /ping")
+        with span("send"):
+            pass
+
+    def name(self) -> str:
+        return "/ping"
+
+
+class _BenchBot:
+    username = "bench_bot"
+
+
+class _Context:
+    args = None
+
+
+class _SlowStream(io.StringIO):
+    def write(self, text):
+        time.sleep(0.001)
+        return len(text)
+
+
+def _make_update(update_id: int) -> Update:
+    message = Message(
+        message_id=update_id,
+        date=datetime.datetime.now(datetime.timezone.utc),
+        chat=Chat(1, Chat.PRIVATE),
+        text="/ping",
+        entities=[MessageEntity(MessageEntity.BOT_COMMAND, 0, 5)],
+    )
+    message.set_bot(_BenchBot())
+    return Update(update_id, message=message)
+
+
+async def _time_per_update(router: CommandRouter, updates):
+    context = _Context()
+    loop_started, cpu_started = time.thread_time(), time.process_time()
+    for update in updates:
+        await router.handle_update(update, None, router.check_update(update), context)
+    return (time.thread_time() - loop_started) / len(updates), (time.process_time() - cpu_started) / len(updates)
+
+
+def bench_tracing(updates: int, rounds: int, directory: str) -> None:
+    handler = _PingHandler()
+    batch = [_make_update(update_id) for update_id in range(updates)]
+    variants = [
+        ("tracing off", lambda: None),
+        ("sampled 1%, OTLP file", lambda: Tracer(OtlpFileExporter(os.path.join(directory, "1.jsonl")), 0.01)),
+        ("sampled 100%, OTLP file", lambda: Tracer(OtlpFileExporter(os.path.join(directory, "100.jsonl")), 1.0)),
+        ("sampled 100%, log line", lambda: Tracer(LogSpanExporter(), 1.0)),
+        ("slow over 1s, none slow", lambda: Tracer(LogSpanExporter(), 0.0, slow_threshold=1.0)),
+    ]
+    results = {label: [] for label, _ in variants}
+    # Interleaved rounds, keeping the fastest, so noise on a shared core affects each variant alike
+    for round_index in range(rounds):
+        for label, make_tracer in variants:
+            tracer = make_tracer()
+            router = CommandRouter({"/ping": handler}.get, tracer=tracer)
+            asyncio.run(_time_per_update(router, batch[:1000]))
+            seconds, cpu = asyncio.run(_time_per_update(router, batch))
+            if tracer is not None:
+                # Includes writing out the traces still queued
+                started = time.process_time()
+                tracer.close()
+                cpu += (time.process_time() - started) / len(batch)
+            results[label].append((seconds, cpu))
+
+    print(f"{'per update':<26} {'loop us':>8} {'overhead':>9} {'CPU us':>8}")
+    baseline = min(results[variants[0][0]])[0]
+    for label, _ in variants:
+        seconds, cpu = min(results[label])
+        print(f"{label:<26} {seconds * 1e6:>8.1f} {(seconds - baseline) * 1e6:>9.1f} {cpu * 1e6:>8.1f}")
+
+
+def bench_logging(lines: int) -> None:
+    print()
+    print(f"{'per log call':<26} {'us':>8}")
+    root = logging.getLogger()
+    for label, slow in (("direct, fast stream", False), ("queued, fast stream", False),
+                        ("direct, 1 ms per write", True), ("queued, 1 ms per write", True)):
+        stream = _SlowStream() if slow else open(os.devnull, "w")
+        count = lines // 20 if slow else lines
+        if label.startswith("direct"):
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            direct = logging.StreamHandler(stream)
+            direct.setFormatter(JsonFormatter())
+            root.addHandler(direct)
+            listener = None
+        else:
+            listener: QueueListener = configure_logging("INFO", stream=stream)
+        started = time.perf_counter()
+        for index in range(count):
+            logger.info("Handled update %d", index)
+        elapsed = (time.perf_counter() - started) / count
+        if listener is not None:
+            listener.stop()
+        print(f"{label:<26} {elapsed * 1e6:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Handler log lines go through the queue to /dev/null in every variant
+        listener = configure_logging("INFO", stream=open(os.devnull, "w"))
+        bench_tracing(args.updates, args.rounds, directory)
+        listener.stop()
+    bench_logging(args.updates)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Measure how the size of the send connection pool limits reply throughput.
+
+Starts the offline fake Bot API with a simulated network latency and sends
+N messages concurrently through a bot whose send pool has 1, 4, 16 and 64
+connections, reporting throughput and how long requests waited for a free
+connection in each case.
+
+Usage:
+    python benchmarks/bench_transport.py [--messages N] [--latency SECONDS] [--pool-sizes 1,4,16,64]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from telegram import Bot
+
+from testing.fake_bot_api import FakeBotApi
+from transport import InstrumentedHTTPXRequest, PoolConfig
+
+
+async def measure(fake_api: FakeBotApi, pool_size: int, messages: int) -> None:
+    # A generous pool timeout: the benchmark measures queueing, not rejections
+    request = InstrumentedHTTPXRequest(PoolConfig(size=pool_size, pool_timeout=600.0))
+    bot = Bot(fake_api.token, base_url=fake_api.base_url, request=request)
+    async with bot:
+        started = time.perf_counter()
+        await asyncio.gather(*(bot.send_message(index % 100 + 1, f"message {index}") for index in range(messages)))
+        elapsed = time.perf_counter() - started
+    stats = request.stats()
+    print(f"{pool_size:>5} {messages / elapsed:>10.0f} {stats.wait_time_avg * 1000:>14.1f} "
+          f"{request.wait_times.quantile(0.95) * 1000:>14.1f} {stats.waited:>7}")
+
+
+async def run(messages: int, latency: float, pool_sizes) -> None:
+    fake_api = FakeBotApi(response_delay=latency)
+    await fake_api.start()
+    try:
+        print(f"{messages} messages, {latency * 1000:.0f} ms simulated API latency\n")
+        print(f"{'pool':>5} {'messages/s':>10} {'avg wait (ms)':>14} {'p95 wait (ms)':>14} {'waited':>7}")
+        for pool_size in pool_sizes:
+            await measure(fake_api, pool_size, messages)
+    finally:
+        await fake_api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--pool-sizes", default="1,4,16,64")
+    args = parser.parse_args()
+    pool_sizes = [int(size) for size in args.pool_sizes.split(",")]
+    asyncio.run(run(args.messages, args.latency, pool_sizes))
+
+
+if __name__ == "__main__":
+    main()
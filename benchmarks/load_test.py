@@ -0,0 +1,235 @@
+"""
+End-to-end load test of the full bot wiring against the offline fake Bot API.
+
+Builds the bot exactly like ``main.py`` (TelegramBot, CommandHandlersManager
+and CommandHandlersRegistry), points it at a local fake Bot API and drives
+N concurrent virtual chats. Each chat sends a command, waits for the reply
+and sends the next one. Results are printed and saved as JSON; pass the
+JSON of an earlier run with ``--baseline`` to fail on regressions. With
+``--workers N`` the bot runs as a shard supervisor with N worker processes.
+
+Usage:
+    python benchmarks/load_test.py --chats 50 --updates-per-chat 20 \\
+        --output bench_results.json [--baseline previous.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config import BotConfig, POLLING_MODE, WEBHOOK_MODE
+from main import build_bot
+from sharding import ShardSupervisor
+from testing.fake_bot_api import FakeBotApi
+from webhook_server import WebhookConfig
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty sample list."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MiB."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_revision() -> Optional[str]:
+    """The checked-out commit, if this is a git work tree."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_load(
+    chats: int,
+    updates_per_chat: int,
+    mode: str = POLLING_MODE,
+    command: str = "/ping",
+    telegram_limits: bool = False,
+    reply_timeout: float = 30.0,
+    workers: int = 1,
+) -> Dict:
+    """
+    Run one load test and return its measurements.
+
+    Args:
+        chats (int): Number of concurrent virtual chats
+        updates_per_chat (int): Commands each chat sends
+        mode (str): Ingestion mode, ``polling`` or ``webhook``
+        command (str): Command text every chat sends
+        telegram_limits (bool): Keep Telegram's real outbound rate limits
+        reply_timeout (float): Seconds to wait for each reply
+        workers (int): Worker processes, 1 to run the bot in this process
+
+    Returns:
+        Dict: Latency percentiles, throughput and memory figures
+    """
+    fake_api = FakeBotApi()
+    await fake_api.start()
+
+    config = BotConfig(mode=mode, base_url=fake_api.base_url)
+    if mode == WEBHOOK_MODE:
+        port = _free_port()
+        config.webhook = WebhookConfig(
+            url=f"http://127.0.0.1:{port}/telegram", listen="127.0.0.1", port=port, secret_token="load-test"
+        )
+    if not telegram_limits:
+        config.outbound_global_rate = 1e6
+        config.outbound_chat_rate = 1e6
+        config.outbound_group_rate = 1e6
+
+    config.workers = workers
+    bot = ShardSupervisor(fake_api.token, config) if workers > 1 else build_bot(fake_api.token, config)
+    latencies: List[float] = []
+    timeouts = 0
+
+    async def virtual_chat(chat_id: int) -> None:
+        nonlocal timeouts
+        for sequence in range(1, updates_per_chat + 1):
+            pushed_at = await fake_api.push_update(fake_api.make_command_update(chat_id, command))
+            try:
+                replies = await fake_api.wait_for_chat_messages(chat_id, sequence, reply_timeout)
+            except asyncio.TimeoutError:
+                timeouts += 1
+                return
+            latencies.append(replies[sequence - 1].received_at - pushed_at)
+
+    rss_before = current_rss_mb()
+    await bot.start()
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_chat(chat_id) for chat_id in range(1, chats + 1)))
+        elapsed = time.perf_counter() - started
+        rss_after = current_rss_mb()
+    finally:
+        await bot.stop()
+        await fake_api.stop()
+
+    if not latencies:
+        raise RuntimeError("No replies received; is the command registered?")
+
+    return {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "mode": mode,
+        "command": command,
+        "workers": workers,
+        "chats": chats,
+        "updates_per_chat": updates_per_chat,
+        "updates": len(latencies),
+        "timeouts": timeouts,
+        "duration_s": elapsed,
+        "updates_per_sec": len(latencies) / elapsed,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50) * 1000,
+            "p95": percentile(latencies, 0.95) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+            "max": max(latencies) * 1000,
+        },
+        "rss_mb": {
+            "before": rss_before,
+            "after": rss_after,
+            "peak": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+    }
+
+
+def find_regressions(result: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Compare a run against a baseline run.
+
+    Args:
+        result (Dict): Measurements of the current run
+        baseline (Dict): Measurements of an earlier run
+        tolerance (float): Allowed relative degradation, e.g. 0.1 for 10%
+
+    Returns:
+        List[str]: Human-readable descriptions of every regression found
+    """
+    regressions = []
+    if result["updates_per_sec"] < baseline["updates_per_sec"] * (1 - tolerance):
+        regressions.append(
+            f"throughput {result['updates_per_sec']:.0f}/s < baseline {baseline['updates_per_sec']:.0f}/s"
+        )
+    for key in ("p50", "p95", "p99"):
+        current, previous = result["latency_ms"][key], baseline["latency_ms"][key]
+        if current > previous * (1 + tolerance):
+            regressions.append(f"latency {key} {current:.2f} ms > baseline {previous:.2f} ms")
+    if result["rss_mb"]["after"] > baseline["rss_mb"]["after"] * (1 + tolerance):
+        regressions.append(
+            f"RSS {result['rss_mb']['after']:.1f} MiB > baseline {baseline['rss_mb']['after']:.1f} MiB"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chats", type=int, default=50, help="concurrent virtual chats")
+    parser.add_argument("--updates-per-chat", type=int, default=20)
+    parser.add_argument("--mode", choices=(POLLING_MODE, WEBHOOK_MODE), default=POLLING_MODE)
+    parser.add_argument("--command", default="/ping")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="shard updates across this many worker processes")
+    parser.add_argument("--telegram-limits", action="store_true",
+                        help="keep Telegram's outbound rate limits instead of lifting them")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed relative degradation before a regression is reported")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load(
+        args.chats, args.updates_per_chat, args.mode, args.command, args.telegram_limits,
+        workers=args.workers
+    ))
+
+    latency = result["latency_ms"]
+    print(f"{result['updates']} updates over {result['chats']} chats in {result['duration_s']:.2f}s "
+          f"({result['updates_per_sec']:.0f} updates/s, {result['timeouts']} timeouts)")
+    print(f"latency p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms, "
+          f"p99 {latency['p99']:.2f} ms, max {latency['max']:.2f} ms")
+    print(f"RSS {result['rss_mb']['after']:.1f} MiB (peak {result['rss_mb']['peak']:.1f} MiB)")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = find_regressions(result, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,563 @@
+"""
+Threshold alerts on host metrics and service reachability.
+
+Chats subscribe to conditions such as ``cpu > 90 for 5m`` or
+``service web down``. Subscriptions with the same condition share one
+evaluation state. Conditions on the same metric and comparison are kept as
+one sorted threshold list. Each tick reads every subscribed metric once and
+probes every subscribed service once. A bisection between the previous and
+the new value then finds the conditions whose state flipped. The cost of a
+tick follows the number of metrics and flips, not the number of
+subscribers, so tens of thousands of subscriptions stay cheap.
+
+A condition fires once its breach has lasted for its duration. It resolves
+once it has been clear for as long. Both delays are timers on a
+``TimerWheel`` and are cancelled when the value turns back in time, so a
+value flapping around a threshold does not notify. The notifications of one
+tick are grouped into one message per chat. They are sent through the
+outbound queue, which keeps to Telegram's rate limits.
+"""
+
+import asyncio
+import bisect
+import logging
+import operator
+import re
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Mapping, Optional, Set, Tuple
+
+from host_metrics import HOST_METRICS, parse_window
+from sharding import shard_for
+from timer_wheel import Timer, TimerWheel
+
+if TYPE_CHECKING:
+    from host_metrics import HostMetricsSampler
+    from outbound import OutboundQueue
+    from state_store import StateStore
+
+
+logger = logging.getLogger(__name__)
+
+# State store key holding a chat's subscriptions
+ALERTS_KEY = "alerts"
+# Metric name prefix of service reachability, 1 while down and 0 while up
+SERVICE_PREFIX = "service:"
+MAX_ALERTS_PER_CHAT = 20
+
+_OPERATORS: Dict[str, Callable[[float, float], bool]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+_METRIC_RULE = re.compile(r"^\s*(\w+)\s*(>=|<=|>|<)\s*(-?[\d.]+)\s*%?\s*(?:for\s+(\S+))?\s*$", re.IGNORECASE)
+_SERVICE_RULE = re.compile(r"^\s*service\s+(\S+)\s+down(?:\s+for\s+(\S+))?\s*$", re.IGNORECASE)
+
+_FIRE = "fire"
+_RESOLVE = "resolve"
+
+
+@dataclass(frozen=True)
+class AlertCondition:
+    """
+    A threshold a metric is compared against.
+
+    Attributes:
+        metric (str): One of ``HOST_METRICS``, or ``service:<name>``
+        op (str): ``>``, ``>=``, ``<`` or ``<=``
+        threshold (float): Value compared against
+        duration (float): Seconds the breach, and later its end, must last
+            before it is notified
+    """
+
+    metric: str
+    op: str
+    threshold: float
+    duration: float = 0.0
+
+    def breached(self, value: float) -> bool:
+        """Check a metric value against the threshold."""
+        return _OPERATORS[self.op](value, self.threshold)
+
+    def describe(self) -> str:
+        """Render the condition the way it is written in ``/alert add``."""
+        if self.metric.startswith(SERVICE_PREFIX):
+            text = f"service {self.metric[len(SERVICE_PREFIX):]} down"
+        else:
+            text = f"{self.metric} {self.op} {self.threshold:g}{HOST_METRICS.get(self.metric, '')}"
+        return text + (f" for {_format_duration(self.duration)}" if self.duration else "")
+
+
+def _format_duration(seconds: float) -> str:
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size and seconds % size == 0:
+            return f"{seconds / size:g}{unit}"
+    return f"{seconds:g}s"
+
+
+def parse_condition(text: str) -> AlertCondition:
+    """
+    Parse a rule such as ``cpu > 90 for 5m`` or ``service web down for 1m``.
+
+    Args:
+        text (str): The rule; the duration is optional
+
+    Returns:
+        AlertCondition: The parsed condition
+
+    Raises:
+        ValueError: If the rule is malformed or names an unknown metric
+    """
+    match = _SERVICE_RULE.match(text)
+    if match is not None:
+        name, duration = match.groups()
+        return AlertCondition(SERVICE_PREFIX + name, ">", 0.5, parse_window(duration) if duration else 0.0)
+    match = _METRIC_RULE.match(text)
+    if match is None:
+        raise ValueError(f"Invalid rule '{text.strip()}'")
+    metric, op, threshold, duration = match.groups()
+    metric = metric.lower()
+    if metric not in HOST_METRICS:
+        raise ValueError(f"Unknown metric '{metric}'")
+    try:
+        value = float(threshold)
+    except ValueError:
+        raise ValueError(f"Invalid threshold '{threshold}'") from None
+    return AlertCondition(metric, op, value, parse_window(duration) if duration else 0.0)
+
+
+@dataclass(frozen=True)
+class Subscription:
+    """
+    One chat's alert.
+
+    Attributes:
+        chat_id (int): Chat notified
+        alert_id (int): Number of the alert within the chat
+        condition (AlertCondition): What is watched
+    """
+
+    chat_id: int
+    alert_id: int
+    condition: AlertCondition
+
+
+@dataclass
+class AlertStats:
+    """Point-in-time snapshot of alert engine counters."""
+
+    subscriptions: int
+    conditions: int
+    firing: int
+    pending_timers: int
+    ticks: int
+    evaluations: int
+    notifications: int
+    last_tick_seconds: float
+
+
+class _ConditionState:
+    """Evaluation state shared by every subscription to one condition."""
+
+    __slots__ = ("condition", "subscribers", "breached", "firing", "timer")
+
+    def __init__(self, condition: AlertCondition):
+        self.condition = condition
+        self.subscribers: Set[Tuple[int, int]] = set()
+        self.breached = False
+        self.firing = False
+        self.timer: Optional[Timer] = None
+
+
+class _ThresholdGroup:
+    """Conditions on one metric with one comparison, ordered by threshold."""
+
+    def __init__(self, metric: str, op: str):
+        self.metric = metric
+        self.op = op
+        self.thresholds: List[float] = []
+        self.conditions: Dict[float, List[_ConditionState]] = {}
+        self.value: Optional[float] = None
+
+    def boundary(self, value: Optional[float]) -> int:
+        """
+        Split the thresholds into breached and clear ones.
+
+        For ``>`` and ``>=`` the thresholds before the boundary are breached,
+        for ``<`` and ``<=`` the ones from it on. Without a value none are.
+        """
+        if value is None:
+            return 0 if self.op in (">", ">=") else len(self.thresholds)
+        if self.op in (">", "<="):
+            return bisect.bisect_left(self.thresholds, value)
+        return bisect.bisect_right(self.thresholds, value)
+
+    def add(self, state: _ConditionState) -> None:
+        threshold = state.condition.threshold
+        if threshold not in self.conditions:
+            bisect.insort(self.thresholds, threshold)
+            self.conditions[threshold] = []
+        self.conditions[threshold].append(state)
+
+    def remove(self, state: _ConditionState) -> None:
+        threshold = state.condition.threshold
+        states = self.conditions[threshold]
+        states.remove(state)
+        if not states:
+            del self.conditions[threshold]
+            del self.thresholds[bisect.bisect_left(self.thresholds, threshold)]
+
+    def flipped(self, value: float) -> List[_ConditionState]:
+        """Record a new value and get the conditions it may have flipped."""
+        old, new = self.boundary(self.value), self.boundary(value)
+        self.value = value
+        low, high = min(old, new), max(old, new)
+        return [state for threshold in self.thresholds[low:high] for state in self.conditions[threshold]]
+
+
+class AlertEngine:
+    """
+    Evaluates alert conditions on a fixed interval and notifies subscribed chats.
+    """
+
+    def __init__(
+        self,
+        metrics: "HostMetricsSampler",
+        store: Optional["StateStore"] = None,
+        outbound: Optional["OutboundQueue"] = None,
+        interval: float = 5.0,
+        services: Optional[Mapping[str, Tuple[str, int]]] = None,
+        max_per_chat: int = MAX_ALERTS_PER_CHAT,
+        probe_timeout: float = 3.0,
+        shard_index: int = 0,
+        shard_count: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the engine; subscriptions are loaded by ``start``.
+
+        Args:
+            metrics (HostMetricsSampler): Source of the latest metric values
+            store (Optional[StateStore]): Persistence of subscriptions, None to
+                keep them only while the bot runs
+            outbound (Optional[OutboundQueue]): Sender of notifications
+            interval (float): Seconds between evaluations
+            services (Optional[Mapping[str, Tuple[str, int]]]): Services that
+                can be watched, by name, as (host, port) probed over TCP
+            max_per_chat (int): Alerts one chat may have
+            probe_timeout (float): Seconds a service has to accept a connection
+            shard_index (int): Shard of this process; only chats it handles are loaded
+            shard_count (int): Number of shards chats are split across
+            clock (Callable[[], float]): Monotonic time source
+
+        Raises:
+            ValueError: If the interval or a limit is not positive
+        """
+        if interval <= 0 or max_per_chat < 1 or probe_timeout <= 0:
+            raise ValueError("Alert interval and limits must be positive")
+        self._metrics = metrics
+        self._store = store
+        self._outbound = outbound
+        self._interval = interval
+        self._services = dict(services or {})
+        self._max_per_chat = max_per_chat
+        self._probe_timeout = probe_timeout
+        self._shard_index = shard_index
+        self._shard_count = shard_count
+        self._clock = clock
+        # Timers resolve to the evaluation interval, nothing changes in between
+        self._wheel = TimerWheel(interval, now=clock())
+        self._chats: Dict[int, Dict[int, Subscription]] = {}
+        self._next_ids: Dict[int, int] = {}
+        self._conditions: Dict[AlertCondition, _ConditionState] = {}
+        self._groups: Dict[Tuple[str, str], _ThresholdGroup] = {}
+        # Notifications of the current tick by chat, firing and resolved
+        self._pending: Dict[int, Tuple[List[Tuple[int, str]], List[Tuple[int, str]]]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self._subscriptions = 0
+        self._firing = 0
+        self._ticks = 0
+        self._evaluations = 0
+        self._notifications = 0
+        self._last_tick_seconds = 0.0
+
+    @property
+    def services(self) -> List[str]:
+        """Names of the services that can be watched."""
+        return sorted(self._services)
+
+    async def start(self) -> None:
+        """Load the persisted subscriptions and start evaluating."""
+        if self._task is not None:
+            return
+        if self._store is not None:
+            for chat_id, saved in (await self._store.scan(ALERTS_KEY)).items():
+                if shard_for(chat_id, self._shard_count) == self._shard_index:
+                    self._restore(chat_id, saved)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop evaluating."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def add(self, chat_id: int, condition: AlertCondition) -> Subscription:
+        """
+        Subscribe a chat to a condition.
+
+        Args:
+            chat_id (int): Chat to notify
+            condition (AlertCondition): What to watch
+
+        Returns:
+            Subscription: The new alert
+
+        Raises:
+            ValueError: If the chat has too many alerts, already has this one,
+                or the service is unknown
+        """
+        alerts = self._chats.get(chat_id, {})
+        if len(alerts) >= self._max_per_chat:
+            raise ValueError(f"A chat can have at most {self._max_per_chat} alerts")
+        if any(subscription.condition == condition for subscription in alerts.values()):
+            raise ValueError("This alert already exists")
+        self._check_service(condition)
+        alert_id = self._next_ids.get(chat_id, 1)
+        subscription = Subscription(chat_id, alert_id, condition)
+        self._subscribe(subscription)
+        self._next_ids[chat_id] = alert_id + 1
+        await self._save(chat_id)
+        return subscription
+
+    async def remove(self, chat_id: int, alert_id: int) -> bool:
+        """
+        Unsubscribe a chat from one of its alerts.
+
+        Returns:
+            bool: False if the chat has no alert with that number
+        """
+        subscription = self._chats.get(chat_id, {}).get(alert_id)
+        if subscription is None:
+            return False
+        self._unsubscribe(subscription)
+        await self._save(chat_id)
+        return True
+
+    def alerts(self, chat_id: int) -> List[Tuple[Subscription, bool]]:
+        """
+        Get a chat's alerts.
+
+        Returns:
+            List[Tuple[Subscription, bool]]: Alerts by number, each with
+            whether it is firing
+        """
+        return [
+            (subscription, self._conditions[subscription.condition].firing)
+            for _, subscription in sorted(self._chats.get(chat_id, {}).items())
+        ]
+
+    def value(self, metric: str) -> Optional[float]:
+        """Get the value a metric had at the latest evaluation."""
+        for (name, _), group in self._groups.items():
+            if name == metric and group.value is not None:
+                return group.value
+        return None
+
+    async def tick(self) -> None:
+        """Evaluate every condition once and send the resulting notifications."""
+        started = time.perf_counter()
+        now = self._clock()
+        values: Dict[str, Optional[float]] = {}
+        for metric in {metric for metric, _ in self._groups}:
+            if metric.startswith(SERVICE_PREFIX):
+                continue
+            values[metric] = self._metrics.latest(metric)
+        services = sorted({metric for metric, _ in self._groups if metric.startswith(SERVICE_PREFIX)})
+        if services:
+            reachable = await asyncio.gather(*(self._probe(metric[len(SERVICE_PREFIX):]) for metric in services))
+            values.update((metric, 0.0 if up else 1.0) for metric, up in zip(services, reachable))
+
+        for (metric, _), group in list(self._groups.items()):
+            value = values.get(metric)
+            if value is None:
+                continue
+            self._evaluations += 1
+            for state in group.flipped(value):
+                self._update(state, state.condition.breached(value), now)
+        for kind, state in self._wheel.advance(now):
+            state.timer = None
+            self._transition(state, kind == _FIRE)
+
+        self._send_pending()
+        self._ticks += 1
+        self._last_tick_seconds = time.perf_counter() - started
+
+    def stats(self) -> AlertStats:
+        """Get a snapshot of the engine counters."""
+        return AlertStats(
+            subscriptions=self._subscriptions,
+            conditions=len(self._conditions),
+            firing=self._firing,
+            pending_timers=len(self._wheel),
+            ticks=self._ticks,
+            evaluations=self._evaluations,
+            notifications=self._notifications,
+            last_tick_seconds=self._last_tick_seconds,
+        )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("Evaluating alerts failed")
+            await asyncio.sleep(self._interval)
+
+    async def _probe(self, name: str) -> bool:
+        """Check that a service accepts TCP connections."""
+        host, port = self._services[name]
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self._probe_timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True
+
+    def _subscribe(self, subscription: Subscription) -> None:
+        condition = subscription.condition
+        state = self._conditions.get(condition)
+        if state is None:
+            state = self._conditions[condition] = _ConditionState(condition)
+            key = (condition.metric, condition.op)
+            group = self._groups.get(key)
+            if group is None:
+                # Start from what the metric's other comparisons last saw
+                value = self.value(condition.metric)
+                group = self._groups[key] = _ThresholdGroup(*key)
+                group.value = value
+            group.add(state)
+            if group.value is not None:
+                # Start timing a breach that already holds, nobody is notified yet
+                self._update(state, condition.breached(group.value), self._clock())
+        state.subscribers.add((subscription.chat_id, subscription.alert_id))
+        if state.firing:
+            self._firing += 1
+        self._chats.setdefault(subscription.chat_id, {})[subscription.alert_id] = subscription
+        self._subscriptions += 1
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        alerts = self._chats[subscription.chat_id]
+        del alerts[subscription.alert_id]
+        if not alerts:
+            del self._chats[subscription.chat_id]
+        self._subscriptions -= 1
+        state = self._conditions[subscription.condition]
+        state.subscribers.discard((subscription.chat_id, subscription.alert_id))
+        if state.firing:
+            self._firing -= 1
+        if not state.subscribers:
+            if state.timer is not None:
+                self._wheel.cancel(state.timer)
+            del self._conditions[state.condition]
+            key = (state.condition.metric, state.condition.op)
+            group = self._groups[key]
+            group.remove(state)
+            if not group.thresholds:
+                del self._groups[key]
+
+    def _update(self, state: _ConditionState, breached: bool, now: float) -> None:
+        """Start or cancel the delay before a condition's new state is notified."""
+        if breached == state.breached:
+            return
+        state.breached = breached
+        if state.timer is not None:
+            # The value turned back before the delay ran out
+            self._wheel.cancel(state.timer)
+            state.timer = None
+            return
+        if not state.condition.duration:
+            self._transition(state, breached)
+        else:
+            state.timer = self._wheel.schedule(now + state.condition.duration, (_FIRE if breached else _RESOLVE, state))
+
+    def _transition(self, state: _ConditionState, firing: bool) -> None:
+        state.firing = firing
+        self._firing += len(state.subscribers) if firing else -len(state.subscribers)
+        group = self._groups[(state.condition.metric, state.condition.op)]
+        for chat_id, alert_id in state.subscribers:
+            line = f"#{alert_id} {state.condition.describe()}"
+            if firing and group.value is not None and not state.condition.metric.startswith(SERVICE_PREFIX):
+                unit = HOST_METRICS.get(state.condition.metric, "")
+                line += f" (now {group.value:.1f}{unit})"
+            self._pending.setdefault(chat_id, ([], []))[0 if firing else 1].append((alert_id, line))
+
+    def _send_pending(self) -> None:
+        """Send each chat one message with all of its notifications."""
+        pending, self._pending = self._pending, {}
+        for chat_id, (firing, resolved) in pending.items():
+            parts = []
+            if firing:
+                parts.append("Alerts firing:\n" + "\n".join(line for _, line in sorted(firing)))
+            if resolved:
+                parts.append("Resolved:\n" + "\n".join(line for _, line in sorted(resolved)))
+            self._notifications += 1
+            if self._outbound is None:
+                continue
+            future = self._outbound.enqueue(chat_id, "\n\n".join(parts))
+            future.add_done_callback(lambda future, chat_id=chat_id: _log_failure(future, chat_id))
+
+    def _restore(self, chat_id: int, saved: Mapping) -> None:
+        for item in saved.get("alerts", []):
+            try:
+                condition = AlertCondition(item["metric"], item["op"], float(item["threshold"]),
+                                           float(item.get("duration", 0.0)))
+                if condition.op not in _OPERATORS:
+                    raise ValueError(f"Unknown comparison '{condition.op}'")
+                self._check_service(condition)
+                self._subscribe(Subscription(chat_id, int(item["id"]), condition))
+            except (KeyError, TypeError, ValueError) as error:
+                logger.warning("Skipping a saved alert of chat %s: %s", chat_id, error)
+        known = self._chats.get(chat_id, {})
+        self._next_ids[chat_id] = max([int(saved.get("next_id", 1)), *(alert_id + 1 for alert_id in known)])
+
+    def _check_service(self, condition: AlertCondition) -> None:
+        if not condition.metric.startswith(SERVICE_PREFIX):
+            return
+        name = condition.metric[len(SERVICE_PREFIX):]
+        if name not in self._services:
+            names = ", ".join(self.services) or "none are configured"
+            raise ValueError(f"Unknown service '{name}' ({names})")
+
+    async def _save(self, chat_id: int) -> None:
+        if self._store is None:
+            return
+        alerts = self._chats.get(chat_id)
+        if not alerts:
+            await self._store.delete(chat_id, ALERTS_KEY)
+            return
+        await self._store.set(chat_id, ALERTS_KEY, {
+            "next_id": self._next_ids[chat_id],
+            "alerts": [
+                {
+                    "id": subscription.alert_id,
+                    "metric": subscription.condition.metric,
+                    "op": subscription.condition.op,
+                    "threshold": subscription.condition.threshold,
+                    "duration": subscription.condition.duration,
+                }
+                for _, subscription in sorted(alerts.items())
+            ],
+        })
+
+
+def _log_failure(future: asyncio.Future, chat_id: int) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Sending alerts to chat %s failed: %s", chat_id, future.exception())
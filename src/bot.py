@@ -2,8 +2,46 @@
 Telegram bot implementation.
 """
 
-from telegram.ext import ApplicationBuilder, CommandHandler
-from icommand_handlers_manager import ICommandHandlersManager
+import asyncio
+import logging
+import signal
+from typing import Optional
+
+from telegram import Update
+from telegram.constants import ChatType
+from telegram.error import TelegramError
+from telegram.ext import ApplicationBuilder, CallbackContext, TypeHandler
+from icommand_handlers_manager import ICommandHandlersManager, ReloadReport
+from command_router import CommandRouter, UnknownCommandHandler
+from config import BotConfig, POLLING_MODE, WEBHOOK_MODE
+from webhook_server import WebhookServer
+from update_scheduler import ChatUpdateScheduler
+from outbound import OutboundQueue, send_reply
+from bot_services import BOT_SERVICES_KEY, BotServices
+from metrics import GAUGE_AVG, GAUGE_MAX, EventLoopLagMonitor, MetricsRegistry, MetricsServer
+from response_cache import ResponseCache
+from host_metrics import HostMetricsSampler
+from executor_offload import PROCESS_EXECUTION, THREAD_EXECUTION, HandlerExecutor
+from state_store import StateStore
+from transport import apply_transport
+from catch_up import catch_up_from_config
+from rate_limiter import RateLimiter
+from log_index import LogFiles
+from alerts import AlertEngine
+from broadcast import BroadcastEngine
+from exec_actions import ActionRunner, ExecAction
+from middleware import AdminOnlyMiddleware, ErrorReplyMiddleware, MiddlewarePipeline
+from tracing import LogSpanExporter, OtlpFileExporter, Tracer
+
+logger = logging.getLogger(__name__)
+
+# Handler group that records processed update ids, after the router's group 0
+OFFSET_TRACKING_GROUP = 1
+# Handler group that remembers chats as broadcast recipients
+CHAT_TRACKING_GROUP = 2
+# Commands whose state, such as subscriptions or a broadcast's progress, should survive restarts
+PERSISTENT_COMMANDS = ("/alert", "/broadcast")
+
 
 class TelegramBot:
     """Main Telegram bot class."""
@@ -11,16 +49,127 @@ class TelegramBot:
     def __init__(
         self,
         token: str,
-        command_handlers_manager: ICommandHandlersManager
+        command_handlers_manager: ICommandHandlersManager,
+        config: Optional[BotConfig] = None,
+        unknown_command_handler: Optional[UnknownCommandHandler] = None,
+        middleware: Optional[MiddlewarePipeline] = None
     ):
-        """Initialize the bot with a token and command handlers manager."""
+        """Initialize the bot with a token, command handlers manager, runtime config and middleware."""
         self.token = token
         self.command_handlers_manager = command_handlers_manager
+        self.config = config or BotConfig()
+        if unknown_command_handler is None and self.config.unknown_command_reply:
+            unknown_command_handler = self._reply_unknown_command
+        self.unknown_command_handler = unknown_command_handler
+        # A copy, so the caller's pipeline can be reused for another bot
+        self.middleware = middleware.copy() if middleware is not None else MiddlewarePipeline()
+        if self.config.error_reply:
+            self.middleware.use(ErrorReplyMiddleware())
+        # Commands whose handlers declare admin_only, looked up whenever chains are built
+        self.middleware.use(AdminOnlyMiddleware(self._is_admin_command))
+        self.scheduler = ChatUpdateScheduler(
+            self.config.max_concurrent_updates,
+            self.config.chat_queue_size
+        )
 
         applicationBuilder = ApplicationBuilder()
         applicationBuilder.token(token)
+        if self.config.base_url:
+            applicationBuilder.base_url(self.config.base_url)
+        # Replies and getUpdates long polls use separate connection pools
+        self.send_request, self.updates_request = apply_transport(applicationBuilder, self.config.transport)
+        if self.config.mode != POLLING_MODE:
+            # Updates are pushed to the embedded server or fed by a shard
+            # supervisor, no getUpdates loop
+            applicationBuilder.updater(None)
 
         self.application = applicationBuilder.build()
+
+        self.services = BotServices(
+            outbound=OutboundQueue(
+                self.application.bot,
+                global_rate=self.config.outbound_global_rate,
+                chat_rate=self.config.outbound_chat_rate,
+                group_rate=self.config.outbound_group_rate
+            ),
+            metrics=MetricsRegistry(),
+            scheduler=self.scheduler,
+            response_cache=ResponseCache(),
+            host_metrics=HostMetricsSampler(
+                self.config.host_metrics_interval,
+                self.config.host_metrics_retention
+            ),
+            executor=HandlerExecutor(
+                self.config.executor_thread_workers,
+                self.config.executor_process_workers
+            ),
+            state_store=StateStore(
+                self.config.state_db_path,
+                self.config.state_flush_interval,
+                self.config.state_batch_size
+            ),
+            rate_limiter=RateLimiter(
+                self.config.user_rate_limit,
+                self.config.rate_limit_capacity,
+                self.config.rate_limit_notice
+            ),
+            admin_user_ids=self.config.admin_user_ids,
+            reload_commands=self.reload_commands,
+            log_files=LogFiles(dict(self.config.log_files))
+        )
+        self.services.alerts = AlertEngine(
+            self.services.host_metrics,
+            self.services.state_store,
+            self.services.outbound,
+            interval=self.config.alert_interval,
+            services={name: (host, port) for name, host, port in self.config.alert_services},
+            max_per_chat=self.config.alert_max_per_chat,
+            shard_index=self.config.shard_index,
+            shard_count=self.config.shard_count
+        )
+        self.services.broadcasts = BroadcastEngine(
+            self.services.outbound,
+            self.services.state_store,
+            self.application.bot,
+            concurrency=self.config.broadcast_concurrency,
+            shard_index=self.config.shard_index,
+            shard_count=self.config.shard_count
+        )
+        self.services.actions = ActionRunner(
+            tuple(ExecAction.parse(name, command) for name, command in self.config.exec_actions),
+            max_concurrency=self.config.exec_max_concurrency,
+            action_concurrency=self.config.exec_action_concurrency,
+            timeout=self.config.exec_timeout,
+            output_limit=self.config.exec_output_limit
+        )
+        exporter = None
+        if self.config.trace_sample_rate > 0 or self.config.trace_slow_seconds is not None:
+            # Traces go to the OTLP file if one is set, else one log line each
+            exporter = OtlpFileExporter(self.config.trace_file) if self.config.trace_file else LogSpanExporter()
+        self.tracer = Tracer(exporter, self.config.trace_sample_rate, self.config.trace_slow_seconds)
+        self.command_reloads = 0
+        self.last_reload: Optional[ReloadReport] = None
+        self._publish_task: Optional[asyncio.Task] = None
+        self.application.bot_data[BOT_SERVICES_KEY] = self.services
+        self._register_gauges()
+
+        self.loop_lag_monitor = EventLoopLagMonitor(self.services.metrics)
+        self.metrics_server: Optional[MetricsServer] = None
+        if self.config.metrics_port is not None:
+            self.metrics_server = MetricsServer(
+                self.services.metrics,
+                self.config.metrics_listen,
+                self.config.metrics_port
+            )
+
+        # Startup handling of the backlog and the persisted update offset
+        self.catch_up, self.offset_store = catch_up_from_config(self.config)
+
+        self.webhook_server: Optional[WebhookServer] = None
+        if self.config.mode == WEBHOOK_MODE:
+            if self.config.webhook is None:
+                raise ValueError("Webhook mode requires a webhook configuration")
+            self.webhook_server = WebhookServer(self.application, self.config.webhook)
         
         # Register all command handlers
         self._register_command_handlers()
@@ -29,21 +178,338 @@ class TelegramBot:
         """
         Register all command handlers with the bot application.
         
-        This method goes through the list of registered handlers and registers
-        each command in the bot.
+        A single router handles every command: it parses the command token
+        once and resolves it through the command handlers manager, so the
+        dispatch cost does not grow with the number of registered commands.
+        The middleware chain of every command is built here, once.
+        """
+        self.command_router = CommandRouter(
+            self.command_handlers_manager.get_handler,
+            self.unknown_command_handler,
+            self.scheduler,
+            self.services.metrics,
+            self.services.response_cache,
+            self.services.executor,
+            self.services.rate_limiter,
+            self.tracer,
+            self.middleware
+        )
+        self.command_router.compile(self.command_handlers_manager.get_registered_handlers())
+        self.application.add_handler(self.command_router)
+        if self.offset_store is not None:
+            # A later group sees every update once the router has taken it
+            self.application.add_handler(
+                TypeHandler(Update, self._record_offset), group=OFFSET_TRACKING_GROUP
+            )
+        self.application.add_handler(TypeHandler(Update, self._remember_chat), group=CHAT_TRACKING_GROUP)
+    
+    async def _reply_unknown_command(self, update: Update, context: CallbackContext, command: str) -> None:
         """
-        handlers = self.get_registered_handlers()
-        for handler in handlers:
-            command_name = handler.name().lstrip('/')  # Remove leading slash for CommandHandler
-            command_handler = CommandHandler(command_name, handler.handle)
-            self.application.add_handler(command_handler)
+        Answer an unknown command, suggesting registered commands it may be a typo of.
+        
+        Outside private chats the bot only answers when it has a suggestion,
+        since the command may be meant for another bot.
+        """
+        suggestions = self.command_handlers_manager.suggest_commands(command)
+        chat = update.effective_chat
+        if not suggestions:
+            if chat is not None and chat.type != ChatType.PRIVATE:
+                return
+            text = f"Unknown command {command}."
+        elif len(suggestions) == 1:
+            text = f"Unknown command {command}. Did you mean {suggestions[0]}?"
+        else:
+            text = f"Unknown command {command}. Did you mean {', '.join(suggestions[:-1])} or {suggestions[-1]}?"
+        await send_reply(update, context, text)
+    
+    async def _publish_commands(self) -> None:
+        """Update Telegram's command menu, logging instead of failing."""
+        try:
+            count = await self.command_handlers_manager.publish_commands(self.application.bot)
+        except TelegramError:
+            logger.warning("Publishing the command menu failed", exc_info=True)
+            return
+        logger.info("Published %d commands to the command menu", count)
+    
+    def _warn_if_state_is_lost_on_restart(self) -> None:
+        """Log a warning when commands that keep state run without a state file."""
+        if self.config.state_db_path != ":memory:" or self.config.shard_index != 0:
+            return
+        commands = [
+            command for command in PERSISTENT_COMMANDS
+            if self.command_handlers_manager.get_handler(command) is not None
+        ]
+        if commands:
+            logger.warning(
+                "STATE_DB_PATH is not set, so the state of %s is kept in memory and lost on restart",
+                " and ".join(commands)
+            )
+    
+    def _is_admin_command(self, command: str) -> bool:
+        """Whether the handler registered for a command is restricted to admins."""
+        handler = self.command_handlers_manager.get_handler(command)
+        return handler is not None and handler.admin_only()
+    
+    async def _record_offset(self, update: Update, context) -> None:
+        """Remember the id of an update the router has taken over."""
+        self.offset_store.record(update.update_id)
+    
+    async def _remember_chat(self, update: Update, context) -> None:
+        """Record the chat of an update as a broadcast recipient."""
+        if update.effective_chat is not None:
+            await self.services.broadcasts.remember(update.effective_chat.id)
+    
+    def _backlog_may_run(self) -> bool:
+        """Whether no live update is waiting, so a low-priority backlog may proceed."""
+        return self.application.update_queue.empty() and self.scheduler.stats().queued == 0
+    
+    def _register_gauges(self):
+        """Expose scheduler and outbound queue depths as metrics gauges."""
+        metrics = self.services.metrics
+        outbound = self.services.outbound
+        metrics.register_gauge(
+            "scheduler_queued_updates", "Updates waiting for a handler.",
+            lambda: self.scheduler.stats().queued)
+        metrics.register_gauge(
+            "scheduler_running_handlers", "Handlers currently running.",
+            lambda: self.scheduler.stats().running)
+        metrics.register_gauge(
+            "scheduler_active_chats", "Chats with queued or running updates.",
+            lambda: self.scheduler.stats().active_chats)
+        metrics.register_gauge(
+            "scheduler_rejected_updates", "Updates dropped because a chat queue was full.",
+            lambda: self.scheduler.stats().rejected)
+        metrics.register_gauge(
+            "scheduler_wait_seconds_avg", "Average time updates waited for a handler.",
+            lambda: self.scheduler.stats().wait_time_avg, GAUGE_AVG)
+        metrics.register_gauge(
+            "outbound_queued_messages", "Outgoing texts waiting to be sent.",
+            outbound.queue_depth)
+        metrics.register_gauge(
+            "outbound_in_flight_requests", "Send requests currently in flight.",
+            lambda: outbound.stats().in_flight)
+        metrics.register_gauge(
+            "outbound_send_latency_seconds_avg", "Average time from enqueue to send.",
+            lambda: outbound.stats().latency_avg, GAUGE_AVG)
+        metrics.register_gauge(
+            "event_loop_lag_seconds_last", "Most recent event loop lag sample.",
+            lambda: metrics.loop_lag_last, GAUGE_MAX)
+        metrics.register_gauge(
+            "response_cache_entries", "Command replies held in the response cache.",
+            lambda: self.services.response_cache.stats().size)
+        metrics.register_gauge(
+            "executor_thread_running", "Blocking command handlers running in the thread pool.",
+            lambda: self.services.executor.running(THREAD_EXECUTION))
+        metrics.register_gauge(
+            "executor_process_running", "CPU-bound command handlers running in the process pool.",
+            lambda: self.services.executor.running(PROCESS_EXECUTION))
+        metrics.register_gauge(
+            "executor_timeouts", "Offloaded command handlers that timed out.",
+            lambda: self.services.executor.timeouts)
+        metrics.register_gauge(
+            "state_pending_writes", "Chat state writes waiting for the next flush.",
+            lambda: self.services.state_store.stats().pending)
+        metrics.register_gauge(
+            "state_flush_seconds_last", "Duration of the latest chat state flush.",
+            lambda: self.services.state_store.stats().last_flush_seconds, GAUGE_MAX)
+        metrics.register_gauge(
+            "alert_subscriptions", "Alerts chats are subscribed to.",
+            lambda: self.services.alerts.stats().subscriptions)
+        metrics.register_gauge(
+            "alert_conditions", "Distinct alert conditions evaluated each tick.",
+            lambda: self.services.alerts.stats().conditions)
+        metrics.register_gauge(
+            "alert_firing", "Alerts currently firing.",
+            lambda: self.services.alerts.stats().firing)
+        metrics.register_gauge(
+            "alert_tick_seconds_last", "Duration of the latest alert evaluation.",
+            lambda: self.services.alerts.stats().last_tick_seconds, GAUGE_MAX)
+        metrics.register_gauge(
+            "broadcast_chats_done", "Chats the running or last broadcast has handled.",
+            lambda: self._broadcast_progress("done"))
+        metrics.register_gauge(
+            "broadcast_chats_per_second", "Send rate of the running or last broadcast.",
+            lambda: self._broadcast_progress("rate"), GAUGE_MAX)
+        metrics.register_gauge(
+            "exec_running", "/exec actions running.",
+            lambda: self.services.actions.stats().running)
+        metrics.register_gauge(
+            "exec_waiting", "/exec actions waiting for a free slot.",
+            lambda: self.services.actions.stats().waiting)
+        metrics.register_gauge(
+            "exec_timeouts", "/exec actions killed at their timeout.",
+            lambda: self.services.actions.stats().timeouts)
+        metrics.register_gauge(
+            "traces_exported", "Update traces handed to the trace exporter.",
+            lambda: self.tracer.stats().exported)
+        metrics.register_gauge(
+            "traces_discarded", "Updates timed for the slow threshold but not exported.",
+            lambda: self.tracer.stats().discarded)
+        metrics.register_gauge(
+            "command_reloads", "Command handler reloads since startup.",
+            lambda: self.command_reloads)
+        metrics.register_gauge(
+            "command_reload_swap_seconds_last", "Duration of the latest command registry swap.",
+            lambda: self.last_reload.swap_seconds if self.last_reload is not None else 0.0, GAUGE_MAX)
+        metrics.register_gauge(
+            "rate_limiter_entries", "Rate limiter slots holding a user's state.",
+            lambda: self.services.rate_limiter.stats().entries)
+        metrics.register_gauge(
+            "rate_limiter_evictions", "Busy rate limiter entries evicted for lack of space.",
+            lambda: self.services.rate_limiter.stats().evictions)
+        for pool in (self.send_request, self.updates_request):
+            metrics.register_histogram(
+                f"http_{pool.name}_pool_wait_seconds",
+                f"Time {pool.name} requests waited for a free connection.",
+                pool.wait_times)
+            metrics.register_gauge(
+                f"http_{pool.name}_pool_in_use", f"Connections of the {pool.name} pool in use.",
+                lambda pool=pool: pool.stats().in_use)
+            metrics.register_gauge(
+                f"http_{pool.name}_pool_timeouts", f"Requests that found no free {pool.name} connection in time.",
+                lambda pool=pool: pool.stats().timeouts)
+    
+    def _broadcast_progress(self, field: str) -> float:
+        """Read one figure of the broadcast progress, 0 before the first broadcast."""
+        progress = self.services.broadcasts.progress()
+        return getattr(progress, field) if progress is not None else 0.0
     
     def run(self):
-        """Start the bot."""
+        """Start the bot and block until it is interrupted."""
         try:
-            self.application.run_polling()
+            asyncio.run(self._run_until_stopped())
         except KeyboardInterrupt:
-            print("Stopping GServerBot...")
+            logger.info("Stopping GServerBot...")
+    
+    async def start(self):
+        """
+        Start receiving and processing updates without blocking.
+        
+        Depending on the configured mode this either starts the getUpdates
+        long-poll loop or the embedded webhook server. Shard workers start
+        neither; their updates are put on ``application.update_queue``.
+        """
+        await self.application.initialize()
+        if self.config.publish_commands:
+            await self._publish_commands()
+        await self.services.state_store.start()
+        self._warn_if_state_is_lost_on_restart()
+        await self.services.outbound.start()
+        await self.loop_lag_monitor.start()
+        await self.services.host_metrics.start()
+        # Needs the stored subscriptions, the latest samples and the outbound queue
+        await self.services.alerts.start()
+        # Continues a broadcast the last shutdown interrupted
+        await self.services.broadcasts.start()
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
+        if self.offset_store is not None:
+            await self.offset_store.start()
+        if self.webhook_server is not None:
+            await self.webhook_server.start()
+        elif self.application.updater is not None:
+            if self.catch_up is not None:
+                # Queued before polling starts, so it is handled ahead of live updates
+                await self.catch_up.start(
+                    self.application.bot, self.application.update_queue, self._backlog_may_run
+                )
+            await self.application.updater.start_polling(
+                poll_interval=self.config.transport.poll_interval,
+                timeout=self.config.transport.poll_timeout
+            )
+        await self.application.start()
+    
+    async def stop(self):
+        """Stop receiving updates and shut the application down."""
+        if self.catch_up is not None:
+            await self.catch_up.stop()
+        if self._publish_task is not None:
+            await asyncio.gather(self._publish_task, return_exceptions=True)
+        if self.application.updater is not None and self.application.updater.running:
+            await self.application.updater.stop()
+        if self.webhook_server is not None:
+            await self.webhook_server.stop()
+        # Let in-flight handlers finish while the bot can still send replies
+        await self.scheduler.join()
+        await self.services.executor.stop()
+        await self.services.alerts.stop()
+        await self.services.broadcasts.stop()
+        # Kills actions still running, after their replies could have finished
+        await self.services.actions.stop()
+        # Handlers are done, commit their last state changes
+        await self.services.state_store.stop()
+        await self.services.outbound.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        await self.loop_lag_monitor.stop()
+        await self.services.host_metrics.stop()
+        self.services.log_files.close()
+        if self.application.running:
+            await self.application.stop()
+        if self.offset_store is not None:
+            await self.offset_store.stop()
+        await self.application.shutdown()
+        self.tracer.close()
+    
+    def reload_commands(self) -> ReloadReport:
+        """
+        Reload changed command handlers without restarting.
+        
+        Cached replies of reloaded and removed commands are dropped, so the
+        new versions answer from the first call. When publishing is enabled
+        and commands changed, the command menu is updated in the background.
+        
+        Returns:
+            ReloadReport: What was added, reloaded and removed, with timings
+            
+        Raises:
+            Exception: Whatever re-importing a handler raised; the old
+                handlers stay in place
+        """
+        report = self.command_handlers_manager.reload_bot_handlers()
+        self.command_router.compile(self.command_handlers_manager.get_registered_handlers())
+        for command in report.reloaded + report.removed:
+            self.services.response_cache.invalidate(command)
+        self.command_reloads += 1
+        self.last_reload = report
+        if self.config.publish_commands and (report.added or report.reloaded or report.removed):
+            self._publish_task = asyncio.get_running_loop().create_task(self._publish_commands())
+        logger.info(
+            "Reloaded commands: %d added, %d reloaded, %d removed, %d unchanged; "
+            "built in %.1f ms, swapped in %.1f us",
+            len(report.added), len(report.reloaded), len(report.removed), report.unchanged,
+            report.build_seconds * 1000, report.swap_seconds * 1e6
+        )
+        return report
+    
+    def _reload_on_signal(self):
+        """Reload commands on SIGHUP, keeping the old ones if that fails."""
+        try:
+            self.reload_commands()
+        except Exception:
+            logger.exception("Reloading commands failed, keeping the current handlers")
+    
+    async def _run_until_stopped(self):
+        """Run the bot until SIGINT or SIGTERM is received, reloading commands on SIGHUP."""
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Not supported on this platform, rely on KeyboardInterrupt
+        if hasattr(signal, "SIGHUP"):
+            try:
+                loop.add_signal_handler(signal.SIGHUP, self._reload_on_signal)
+            except (NotImplementedError, RuntimeError):
+                pass
+        
+        await self.start()
+        try:
+            await stop_event.wait()
+            logger.info("Stopping GServerBot...")
+        finally:
+            await self.stop()
     
     def get_registered_handlers(self):
         """
@@ -0,0 +1,102 @@
+"""
+Shared runtime services available to command handlers.
+
+``TelegramBot`` stores a ``BotServices`` instance in ``application.bot_data``
+so handlers can reach the bot-wide subsystems through their ``context``.
+"""
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, FrozenSet, Optional
+
+if TYPE_CHECKING:
+    from alerts import AlertEngine
+    from broadcast import BroadcastEngine
+    from exec_actions import ActionRunner
+    from executor_offload import HandlerExecutor
+    from icommand_handlers_manager import ReloadReport
+    from log_index import LogFiles
+    from host_metrics import HostMetricsSampler
+    from metrics import MetricsRegistry
+    from outbound import OutboundQueue
+    from rate_limiter import RateLimiter
+    from response_cache import ResponseCache
+    from state_store import StateStore
+    from update_scheduler import ChatUpdateScheduler
+
+
+BOT_SERVICES_KEY = "services"
+
+
+@dataclass
+class BotServices:
+    """
+    Bot-wide subsystems shared by all handlers.
+
+    Attributes:
+        outbound (Optional[OutboundQueue]): Rate-limited sender for outgoing messages
+        metrics (Optional[MetricsRegistry]): Bot-wide metrics
+        scheduler (Optional[ChatUpdateScheduler]): Per-chat handler scheduler
+        response_cache (Optional[ResponseCache]): Cache of command replies
+        host_metrics (Optional[HostMetricsSampler]): Background host metrics sampler
+        executor (Optional[HandlerExecutor]): Worker pools for blocking command handlers
+        state_store (Optional[StateStore]): Persistent per-chat key/value state
+        rate_limiter (Optional[RateLimiter]): Per-user and per-command command limits
+        admin_user_ids (FrozenSet[int]): Users allowed to run admin commands
+        reload_commands (Optional[Callable[[], ReloadReport]]): Reloads changed
+            command handlers, used by /reload
+        log_files (Optional[LogFiles]): Log files readable through /logs
+        alerts (Optional[AlertEngine]): Threshold alerts managed through /alert
+        broadcasts (Optional[BroadcastEngine]): Announcements sent to every
+            known chat through /broadcast
+        actions (Optional[ActionRunner]): Allow-listed commands run through /exec
+    """
+
+    outbound: Optional["OutboundQueue"] = None
+    metrics: Optional["MetricsRegistry"] = None
+    scheduler: Optional["ChatUpdateScheduler"] = None
+    response_cache: Optional["ResponseCache"] = None
+    host_metrics: Optional["HostMetricsSampler"] = None
+    executor: Optional["HandlerExecutor"] = None
+    state_store: Optional["StateStore"] = None
+    rate_limiter: Optional["RateLimiter"] = None
+    admin_user_ids: FrozenSet[int] = field(default_factory=frozenset)
+    reload_commands: Optional[Callable[[], "ReloadReport"]] = None
+    log_files: Optional["LogFiles"] = None
+    alerts: Optional["AlertEngine"] = None
+    broadcasts: Optional["BroadcastEngine"] = None
+    actions: Optional["ActionRunner"] = None
+
+
+def get_services(context: Any) -> Optional[BotServices]:
+    """
+    Get the shared services from a handler context.
+
+    Args:
+        context: The handler context, may be None or a stand-in without ``bot_data``
+
+    Returns:
+        Optional[BotServices]: The services, or None if the context carries none
+    """
+    bot_data = getattr(context, "bot_data", None)
+    if not isinstance(bot_data, dict):
+        return None
+    services = bot_data.get(BOT_SERVICES_KEY)
+    return services if isinstance(services, BotServices) else None
+
+
+def is_admin(update: Any, context: Any) -> bool:
+    """
+    Check whether the user behind an update may run admin commands.
+
+    Args:
+        update: The update being handled
+        context: The handler context
+
+    Returns:
+        bool: True if the sender is listed in ``BotServices.admin_user_ids``
+    """
+    services = get_services(context)
+    user = getattr(update, "effective_user", None)
+    if services is None or user is None:
+        return False
+    return user.id in services.admin_user_ids
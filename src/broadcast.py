@@ -0,0 +1,404 @@
+"""
+Announcements fanned out to every chat the bot knows.
+
+Chats are remembered in the chat state the first time the bot sees an
+update from them. A broadcast snapshots the known chats in chat id order
+and keeps a fixed number of sends in flight through the outbound queue.
+The queue paces them at the configured global rate and pauses on
+``RetryAfter``. The small window keeps regular replies from queueing
+behind the whole broadcast. Chats that blocked the bot are forgotten.
+
+Progress is saved as a cursor, the highest chat id up to which every
+chat is done, plus the chats past the cursor that finished early. A
+broadcast interrupted by a restart continues after the cursor and skips
+those. Delivery is at least once, so the few sends that were in flight
+when the bot stopped are repeated. The chat that started the broadcast
+sees a progress message with throughput and ETA, edited as it goes.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set
+
+from telegram.error import BadRequest, Forbidden, TelegramError
+
+from sharding import shard_for
+
+if TYPE_CHECKING:
+    from outbound import OutboundQueue
+    from state_store import StateStore
+
+
+logger = logging.getLogger(__name__)
+
+# State store keys: set for every chat the bot has seen, and the running
+# broadcast, stored with the chat that started it
+KNOWN_CHATS_KEY = "known"
+BROADCAST_KEY = "broadcast"
+
+
+def format_seconds(seconds: float) -> str:
+    """Format a duration as e.g. ``1h 02m``, ``3m 05s`` or ``12s``."""
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+@dataclass
+class BroadcastProgress:
+    """
+    Point-in-time progress of a broadcast.
+
+    Attributes:
+        chat_id (int): Chat that started the broadcast
+        total (int): Recipients
+        sent (int): Chats the announcement was delivered to
+        blocked (int): Chats that blocked the bot or no longer exist
+        failed (int): Chats whose send failed otherwise
+        rate (float): Chats handled per second since the broadcast (re)started
+        elapsed (float): Seconds spent sending, across restarts
+        running (bool): Whether sends are still going out
+        resumed (bool): Whether the broadcast continued after a restart
+        cancelled (bool): Whether an admin stopped the broadcast
+    """
+
+    chat_id: int
+    total: int
+    sent: int
+    blocked: int
+    failed: int
+    rate: float
+    elapsed: float
+    running: bool
+    resumed: bool = False
+    cancelled: bool = False
+
+    @property
+    def done(self) -> int:
+        """Chats handled, whatever the outcome."""
+        return self.sent + self.blocked + self.failed
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds left at the current rate, None before the first send."""
+        if self.rate <= 0:
+            return None
+        return (self.total - self.done) / self.rate
+
+    def describe(self) -> str:
+        """Render the progress for the chat that started the broadcast."""
+        counts = f"{self.sent:,} sent, {self.blocked:,} blocked, {self.failed:,} failed"
+        if self.cancelled:
+            return f"Broadcast cancelled after {self.done:,} of {self.total:,} chats, {counts}."
+        if not self.running:
+            return (f"Broadcast finished: {self.done:,} of {self.total:,} chats, {counts}, "
+                    f"in {format_seconds(self.elapsed)}.")
+        eta = self.eta
+        lines = [
+            f"Broadcast{' (resumed)' if self.resumed else ''}: {self.done:,} of {self.total:,} chats",
+            counts,
+            f"{self.rate:.1f} chats/s, ETA {format_seconds(eta) if eta is not None else 'unknown'}",
+        ]
+        return "\n".join(lines)
+
+
+class _Job:
+    """A running broadcast and its saved state."""
+
+    def __init__(self, chat_id: int, text: str, recipients: List[int]):
+        self.chat_id = chat_id
+        self.text = text
+        self.recipients = recipients
+        self.message_id: Optional[int] = None
+        self.cursor: Optional[int] = None
+        # Chats past the cursor that are done already
+        self.ahead: Set[int] = set()
+        self.sent = 0
+        self.blocked = 0
+        self.failed = 0
+        # Chats handled and seconds spent before this run, i.e. before a restart
+        self.done_before = 0
+        self.elapsed_before = 0.0
+        self.started = 0.0
+        self.resumed = False
+        self.running = True
+        self.cancelled = False
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.blocked + self.failed
+
+    def to_json(self, elapsed: float) -> Dict[str, Any]:
+        return {
+            "text": self.text,
+            "message_id": self.message_id,
+            "cursor": self.cursor,
+            "ahead": sorted(self.ahead),
+            "sent": self.sent,
+            "blocked": self.blocked,
+            "failed": self.failed,
+            "elapsed": elapsed,
+        }
+
+
+class BroadcastEngine:
+    """
+    Sends one text to every known chat, resumably and within the rate limits.
+    """
+
+    def __init__(
+        self,
+        outbound: "OutboundQueue",
+        store: "StateStore",
+        bot=None,
+        concurrency: int = 16,
+        progress_interval: float = 10.0,
+        save_interval: float = 1.0,
+        shard_index: int = 0,
+        shard_count: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the engine; an interrupted broadcast is resumed by ``start``.
+
+        Args:
+            outbound (OutboundQueue): Paced sender of the announcements
+            store (StateStore): Known chats and the saved broadcast
+            bot (Optional[telegram.Bot]): Bot editing the progress message,
+                None to not edit it
+            concurrency (int): Sends kept in flight
+            progress_interval (float): Seconds between progress message edits
+            save_interval (float): Seconds between cursor saves
+            shard_index (int): Shard of this process; a saved broadcast is
+                resumed by the shard of the chat that started it
+            shard_count (int): Number of shards chats are split across
+            clock (Callable[[], float]): Monotonic time source
+
+        Raises:
+            ValueError: If a limit is not positive
+        """
+        if concurrency < 1 or progress_interval <= 0 or save_interval <= 0:
+            raise ValueError("Broadcast concurrency and intervals must be positive")
+        self._outbound = outbound
+        self._store = store
+        self._bot = bot
+        self._concurrency = concurrency
+        self._progress_interval = progress_interval
+        self._save_interval = save_interval
+        self._shard_index = shard_index
+        self._shard_count = shard_count
+        self._clock = clock
+        self._known: Set[int] = set()
+        self._job: Optional[_Job] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether a broadcast is being sent."""
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """Resume a broadcast that a restart interrupted."""
+        for chat_id, saved in (await self._store.scan(BROADCAST_KEY)).items():
+            if shard_for(chat_id, self._shard_count) != self._shard_index or self.running:
+                continue
+            try:
+                job = await self._restore(chat_id, saved)
+            except (KeyError, TypeError, ValueError) as error:
+                logger.warning("Dropping the saved broadcast of chat %s: %s", chat_id, error)
+                await self._store.delete(chat_id, BROADCAST_KEY)
+                continue
+            logger.info("Resuming the broadcast of chat %s, %d chats left", chat_id, len(job.recipients))
+            self._run_job(job)
+
+    async def stop(self) -> None:
+        """Stop sending, saving the cursor so the broadcast can resume."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def remember(self, chat_id: int) -> None:
+        """Record a chat as a broadcast recipient."""
+        if chat_id in self._known:
+            return
+        self._known.add(chat_id)
+        await self._store.set(chat_id, KNOWN_CHATS_KEY, True)
+
+    async def forget(self, chat_id: int) -> None:
+        """Stop sending broadcasts to a chat."""
+        self._known.discard(chat_id)
+        await self._store.delete(chat_id, KNOWN_CHATS_KEY)
+
+    async def begin(self, chat_id: int, text: str) -> int:
+        """
+        Start sending a text to every known chat.
+
+        Args:
+            chat_id (int): Chat that gets the progress message
+            text (str): The announcement
+
+        Returns:
+            int: Number of recipients
+
+        Raises:
+            ValueError: If a broadcast is running or no chat is known
+        """
+        if self.running:
+            raise ValueError("A broadcast is already running, see /broadcast status")
+        recipients = sorted(await self._store.scan(KNOWN_CHATS_KEY))
+        if not recipients:
+            raise ValueError("No chats are known yet")
+        self._run_job(_Job(chat_id, text, recipients))
+        return len(recipients)
+
+    async def cancel(self) -> bool:
+        """
+        Stop the running broadcast for good.
+
+        Returns:
+            bool: False if none was running
+        """
+        if not self.running:
+            return False
+        job = self._job
+        await self.stop()
+        job.running = False
+        job.cancelled = True
+        await self._store.delete(job.chat_id, BROADCAST_KEY)
+        await self._show_progress(job)
+        return True
+
+    def progress(self) -> Optional[BroadcastProgress]:
+        """Get the progress of the running or the last broadcast, None if there was none."""
+        job = self._job
+        if job is None:
+            return None
+        run_seconds = self._clock() - job.started
+        done_now = job.done - job.done_before
+        return BroadcastProgress(
+            chat_id=job.chat_id,
+            total=job.done_before + len(job.recipients),
+            sent=job.sent,
+            blocked=job.blocked,
+            failed=job.failed,
+            rate=done_now / run_seconds if run_seconds > 0 and done_now else 0.0,
+            elapsed=job.elapsed_before + run_seconds,
+            running=job.running,
+            resumed=job.resumed,
+            cancelled=job.cancelled,
+        )
+
+    def _run_job(self, job: _Job) -> None:
+        job.started = self._clock()
+        self._job = job
+        self._task = asyncio.create_task(self._run(job))
+
+    async def _restore(self, chat_id: int, saved: Dict[str, Any]) -> _Job:
+        cursor = saved["cursor"]
+        known = await self._store.scan(KNOWN_CHATS_KEY)
+        ahead = {int(chat) for chat in saved.get("ahead", ())}
+        recipients = sorted(chat for chat in known if (cursor is None or chat > cursor) and chat not in ahead)
+        job = _Job(chat_id, str(saved["text"]), recipients)
+        job.message_id = saved.get("message_id")
+        job.cursor = cursor
+        job.ahead = ahead
+        job.sent, job.blocked, job.failed = int(saved["sent"]), int(saved["blocked"]), int(saved["failed"])
+        job.done_before = job.done
+        job.elapsed_before = float(saved.get("elapsed", 0.0))
+        job.resumed = True
+        return job
+
+    async def _run(self, job: _Job) -> None:
+        recipients = job.recipients
+        next_index = 0
+        # Indexes of sends in flight; every recipient before the lowest is done
+        in_flight: Set[int] = set()
+
+        async def send() -> None:
+            nonlocal next_index
+            while next_index < len(recipients):
+                index = next_index
+                next_index += 1
+                in_flight.add(index)
+                await self._deliver(job, recipients[index])
+                in_flight.discard(index)
+                job.ahead.add(recipients[index])
+
+        def advance_cursor() -> None:
+            first_open = min(in_flight) if in_flight else next_index
+            if first_open > 0:
+                job.cursor = recipients[first_open - 1]
+                job.ahead = {chat for chat in job.ahead if chat > job.cursor}
+
+        await self._show_progress(job)
+        senders = [asyncio.create_task(send()) for _ in range(self._concurrency)]
+        finished = False
+        try:
+            next_progress = self._clock() + self._progress_interval
+            pending = set(senders)
+            while pending:
+                _, pending = await asyncio.wait(pending, timeout=self._save_interval)
+                advance_cursor()
+                await self._save(job)
+                if pending and self._clock() >= next_progress:
+                    next_progress = self._clock() + self._progress_interval
+                    await self._show_progress(job)
+            finished = True
+        finally:
+            for sender in senders:
+                sender.cancel()
+            await asyncio.gather(*senders, return_exceptions=True)
+            if finished:
+                job.running = False
+                await self._store.delete(job.chat_id, BROADCAST_KEY)
+                await self._show_progress(job)
+                logger.info("Broadcast of chat %s finished: %d sent, %d blocked, %d failed",
+                            job.chat_id, job.sent, job.blocked, job.failed)
+            else:
+                advance_cursor()
+                await self._save(job)
+
+    async def _deliver(self, job: _Job, chat_id: int) -> None:
+        """Send the announcement to one chat and count the outcome."""
+        try:
+            await self._outbound.send_text(chat_id, job.text, coalesce=False)
+        except Forbidden:
+            job.blocked += 1
+            await self.forget(chat_id)
+        except BadRequest as error:
+            if "chat not found" in str(error).lower():
+                job.blocked += 1
+                await self.forget(chat_id)
+            else:
+                job.failed += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            # The outbound queue already retried network errors and flood waits
+            job.failed += 1
+            logger.debug("Broadcast to chat %s failed: %s", chat_id, error)
+        else:
+            job.sent += 1
+
+    async def _save(self, job: _Job) -> None:
+        elapsed = job.elapsed_before + self._clock() - job.started
+        await self._store.set(job.chat_id, BROADCAST_KEY, job.to_json(elapsed))
+
+    async def _show_progress(self, job: _Job) -> None:
+        """Send the progress message the first time and edit it afterwards."""
+        text = self.progress().describe()
+        try:
+            if job.message_id is None:
+                message = await self._outbound.send_text(job.chat_id, text, coalesce=False)
+                job.message_id = message.message_id
+            elif self._bot is not None:
+                await self._bot.edit_message_text(text, chat_id=job.chat_id, message_id=job.message_id)
+        except TelegramError as error:
+            # Progress is best effort, the next update tries again
+            logger.debug("Updating broadcast progress failed: %s", error)
@@ -0,0 +1,322 @@
+"""
+Startup catch-up of the update backlog accumulated while the bot was down.
+
+After a restart Telegram hands over every unconfirmed update at once, and
+answering hundreds of outdated ``/ping`` calls one by one delays fresh
+traffic. Before polling starts, ``BacklogCatchUp`` drains the backlog with
+``getUpdates`` and applies the configured policies: drop updates older
+than a maximum age, keep only the newest of a chat's identical pending
+commands, and feed what remains only while no live update is waiting.
+
+``OffsetStore`` persists the id of the last processed update, so updates
+already handled before a restart are confirmed and skipped rather than
+handled again.
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from telegram import Bot, Update
+
+from config import BotConfig, POLLING_MODE
+
+
+logger = logging.getLogger(__name__)
+
+# Largest batch getUpdates returns
+_GET_UPDATES_LIMIT = 100
+
+
+class OffsetStore:
+    """
+    Id of the last processed update, saved to a small file.
+
+    Recording is a comparison in memory. The file is rewritten atomically
+    (temporary file, fsync, rename) at most once per save interval and on
+    stop, so a crash never leaves a torn offset behind.
+    """
+
+    def __init__(self, path: str, save_interval: float = 1.0):
+        """
+        Initialize the store and load a previously saved offset.
+
+        Args:
+            path (str): File holding the offset
+            save_interval (float): Seconds between saves while updates are processed
+
+        Raises:
+            ValueError: If the save interval is not positive
+        """
+        if save_interval <= 0:
+            raise ValueError("Offset save interval must be positive")
+        self._path = path
+        self._save_interval = save_interval
+        self._last_update_id = self._load()
+        self._saved_update_id = self._last_update_id
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def last_update_id(self) -> Optional[int]:
+        """Id of the newest processed update, None if none was ever recorded."""
+        return self._last_update_id
+
+    def record(self, update_id: int) -> None:
+        """Remember that an update was processed."""
+        if self._last_update_id is None or update_id > self._last_update_id:
+            self._last_update_id = update_id
+
+    def save(self) -> None:
+        """Write the offset to disk if it changed since the last save."""
+        if self._last_update_id == self._saved_update_id:
+            return
+        directory = os.path.dirname(os.path.abspath(self._path))
+        descriptor, temporary = tempfile.mkstemp(dir=directory, prefix=".offset-")
+        try:
+            with os.fdopen(descriptor, "w") as file:
+                file.write(str(self._last_update_id))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, self._path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self._saved_update_id = self._last_update_id
+
+    async def start(self) -> None:
+        """Start saving the offset periodically."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._save_periodically())
+
+    async def stop(self) -> None:
+        """Stop saving periodically and save the final offset."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.save()
+
+    def _load(self) -> Optional[int]:
+        try:
+            with open(self._path) as file:
+                return int(file.read().strip())
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logger.warning("Ignoring malformed update offset file %s", self._path)
+            return None
+
+    async def _save_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._save_interval)
+            try:
+                self.save()
+            except OSError:
+                logger.exception("Saving the update offset failed, will retry")
+
+
+@dataclass
+class CatchUpStats:
+    """Outcome of the startup catch-up."""
+
+    fetched: int
+    skipped: int
+    stale: int
+    coalesced: int
+    queued: int
+
+
+class BacklogCatchUp:
+    """
+    Drains and filters pending updates before the bot starts polling.
+    """
+
+    def __init__(
+        self,
+        max_age: Optional[float] = None,
+        coalesce: bool = False,
+        low_priority: bool = False,
+        offset_store: Optional[OffsetStore] = None,
+        clock: Callable[[], float] = time.time,
+        idle_check_interval: float = 0.05,
+    ):
+        """
+        Initialize the catch-up.
+
+        Args:
+            max_age (Optional[float]): Seconds after which a pending update is
+                dropped, None to keep updates of any age
+            coalesce (bool): Answer a chat's identical pending commands only once
+            low_priority (bool): Feed the backlog only while no live update waits
+            offset_store (Optional[OffsetStore]): Skips updates processed before the restart
+            clock (Callable[[], float]): Wall clock compared to message dates
+            idle_check_interval (float): Seconds between checks for a free queue
+                when feeding with low priority
+
+        Raises:
+            ValueError: If the maximum age is not positive
+        """
+        if max_age is not None and max_age <= 0:
+            raise ValueError("Catch-up maximum age must be positive")
+        self._max_age = max_age
+        self._coalesce = coalesce
+        self._low_priority = low_priority
+        self._offset_store = offset_store
+        self._clock = clock
+        self._idle_check_interval = idle_check_interval
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Optional[CatchUpStats] = None
+
+    async def drain(self, bot: Bot) -> Tuple[List[Update], int]:
+        """
+        Fetch and confirm every pending update.
+
+        Args:
+            bot (telegram.Bot): Initialized bot to call ``getUpdates`` with
+
+        Returns:
+            Tuple[List[telegram.Update], int]: Pending updates not processed
+            before, oldest first, and the number of already processed ones
+            that were skipped
+        """
+        last_update_id = self._offset_store.last_update_id if self._offset_store is not None else None
+        offset = last_update_id + 1 if last_update_id is not None else 0
+        pending: List[Update] = []
+        skipped = 0
+        while True:
+            # An offset above an update id confirms that update with Telegram
+            updates = await bot.get_updates(offset=offset, limit=_GET_UPDATES_LIMIT, timeout=0)
+            if not updates:
+                return pending, skipped
+            for update in updates:
+                if last_update_id is not None and update.update_id <= last_update_id:
+                    skipped += 1
+                else:
+                    pending.append(update)
+            offset = updates[-1].update_id + 1
+
+    def select(self, updates: List[Update]) -> Tuple[List[Update], int, int]:
+        """
+        Apply the age and coalescing policies to a backlog.
+
+        Args:
+            updates (List[telegram.Update]): Backlog, oldest first
+
+        Returns:
+            Tuple[List[telegram.Update], int, int]: Updates to process in
+            their original order, and the number dropped as stale and as
+            duplicates
+        """
+        stale = 0
+        if self._max_age is not None:
+            oldest = self._clock() - self._max_age
+            fresh = []
+            for update in updates:
+                message = update.effective_message
+                if message is not None and message.date is not None and message.date.timestamp() < oldest:
+                    stale += 1
+                else:
+                    fresh.append(update)
+            updates = fresh
+
+        coalesced = 0
+        if self._coalesce:
+            # Walk newest first so the latest of identical commands is the one kept
+            seen: Dict[Tuple[int, str], None] = {}
+            kept = []
+            for update in reversed(updates):
+                message = update.effective_message
+                chat = update.effective_chat
+                text = message.text if message is not None else None
+                if chat is not None and text and text.startswith("/"):
+                    key = (chat.id, " ".join(text.split()))
+                    if key in seen:
+                        coalesced += 1
+                        continue
+                    seen[key] = None
+                kept.append(update)
+            kept.reverse()
+            updates = kept
+        return updates, stale, coalesced
+
+    async def start(self, bot: Bot, update_queue: asyncio.Queue, is_idle: Callable[[], bool]) -> CatchUpStats:
+        """
+        Drain the backlog and queue what survives the policies.
+
+        Call this before polling starts, so a queued backlog is handled
+        ahead of live updates. With low priority the backlog is fed one
+        update at a time whenever ``is_idle`` reports nothing live waiting.
+
+        Args:
+            bot (telegram.Bot): Initialized bot to call ``getUpdates`` with
+            update_queue (asyncio.Queue): Queue the application processes
+            is_idle (Callable[[], bool]): Whether no live update is waiting
+
+        Returns:
+            CatchUpStats: What was fetched, dropped and queued
+        """
+        pending, skipped = await self.drain(bot)
+        backlog, stale, coalesced = self.select(pending)
+        self.stats = CatchUpStats(
+            fetched=len(pending), skipped=skipped, stale=stale, coalesced=coalesced, queued=len(backlog)
+        )
+        if pending:
+            logger.info(
+                "Catching up on %d pending updates: %d stale, %d duplicate, %d queued",
+                len(pending), stale, coalesced, len(backlog)
+            )
+        if self._low_priority:
+            self._task = asyncio.create_task(self._feed(backlog, update_queue, is_idle))
+        else:
+            for update in backlog:
+                update_queue.put_nowait(update)
+        return self.stats
+
+    async def stop(self) -> None:
+        """Stop feeding a low-priority backlog; what was not fed is dropped."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _feed(self, backlog: List[Update], update_queue: asyncio.Queue, is_idle: Callable[[], bool]) -> None:
+        for update in backlog:
+            while not is_idle():
+                await asyncio.sleep(self._idle_check_interval)
+            update_queue.put_nowait(update)
+            # Let the application pick the update up before checking again
+            await asyncio.sleep(0)
+
+
+def catch_up_from_config(config: BotConfig) -> Tuple[Optional[BacklogCatchUp], Optional[OffsetStore]]:
+    """
+    Create the catch-up stage and offset store a configuration asks for.
+
+    Args:
+        config (BotConfig): Runtime configuration
+
+    Returns:
+        Tuple[Optional[BacklogCatchUp], Optional[OffsetStore]]: The catch-up,
+        None unless polling with a policy or an offset file, and the offset
+        store, None without an offset file
+    """
+    offset_store = OffsetStore(config.offset_file) if config.offset_file else None
+    enabled = (
+        config.catch_up_max_age is not None
+        or config.catch_up_coalesce
+        or config.catch_up_low_priority
+        or offset_store is not None
+    )
+    if config.mode != POLLING_MODE or not enabled:
+        return None, offset_store
+    catch_up = BacklogCatchUp(
+        max_age=config.catch_up_max_age,
+        coalesce=config.catch_up_coalesce,
+        low_priority=config.catch_up_low_priority,
+        offset_store=offset_store,
+    )
+    return catch_up, offset_store
@@ -1,34 +1,124 @@
-from icommand_handlers_manager import ICommandHandlersManager
+import logging
+import os
+import re
+import time
+from telegram import Bot, BotCommand
+from icommand_handlers_manager import ICommandHandlersManager, ReloadReport
 from icommand_handlers_registry import ICommandHandlersRegistry
-from commands.ping import PingCommandHandler
-from typing import List
+from command_plugins import CommandSpec, LazyCommandHandler, discover_entry_points, load_manifest
+from typing import Iterable, List, Optional
 from commands.icommand_handler import ICommandHandler
 
 
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.dirname(__file__), 'commands', 'manifest.json')
+
+# Telegram's rules for the command menu set by setMyCommands
+MAX_BOT_COMMANDS = 100
+MAX_BOT_COMMAND_DESCRIPTION = 256
+_BOT_COMMAND_PATTERN = re.compile(r'[a-z0-9_]{1,32}')
+
+logger = logging.getLogger(__name__)
+
+
 class CommandHandlersManager(ICommandHandlersManager):
     """
     Concrete implementation of command handlers manager.
     
     This class manages the population and registration of command handlers
-    in the bot system.
+    in the bot system. Commands are discovered from a manifest file and
+    from installed entry points, and registered as lazy proxies so handler
+    modules are only imported when a command is first used.
     """
     
-    def __init__(self, registry: ICommandHandlersRegistry):
+    def __init__(
+        self,
+        registry: ICommandHandlersRegistry,
+        manifest_path: Optional[str] = DEFAULT_MANIFEST_PATH,
+        prewarm: Iterable[str] = (),
+        use_entry_points: bool = True
+    ):
         """
         Initialize the command handlers manager with a registry instance.
         
         Args:
             registry (ICommandHandlersRegistry): The command handlers registry to use
+            manifest_path (Optional[str]): JSON manifest declaring commands, None to skip
+            prewarm (Iterable[str]): Commands to import eagerly during population
+            use_entry_points (bool): Also discover commands from installed entry points
         """
         self._registry = registry
+        self._manifest_path = manifest_path
+        self._prewarm = tuple(prewarm)
+        self._use_entry_points = use_entry_points
     
     def populate_bot_handlers(self) -> None:
         """
         Populate all command handlers in CommandHandlersRegistry.
         
-        This method adds concrete command handlers to the handlers registry.
+        This method adds a lazy proxy for every discovered command to the
+        handlers registry and loads the commands chosen for pre-warming.
+        
+        Raises:
+            KeyError: If a command to pre-warm was not discovered
+        """
+        specs = self._discover_specs()
+        
+        proxies = {}
+        for spec in specs:
+            proxy = LazyCommandHandler(spec)
+            self._registry.add(proxy)
+            proxies[spec.name] = proxy
+        
+        for command in self._prewarm:
+            if command not in proxies:
+                raise KeyError(f"Cannot pre-warm unknown command '{command}'")
+            proxies[command].load()
+    
+    def reload_bot_handlers(self) -> ReloadReport:
+        """
+        Rediscover command handlers and swap the changed ones in.
+        
+        The manifest and entry points are read again. Handlers whose
+        declaration is unchanged and whose module did not change on disk are
+        kept. Changed handlers that had been loaded are re-imported now, so
+        import errors abort the reload before anything is swapped. The new
+        set then replaces the old one in a single registry swap; calls that
+        already resolved a handler finish on the old version.
+        
+        Returns:
+            ReloadReport: What was added, reloaded and removed, with timings
+            
+        Raises:
+            Exception: Whatever discovering or re-importing a handler raised;
+                the registry is left unchanged
         """
-        self._registry.add(PingCommandHandler())
+        started = time.perf_counter()
+        current = {handler.name(): handler for handler in self._registry.get_all_handlers()}
+        report = ReloadReport()
+        reimported = set()
+        snapshot = []
+        for spec in self._discover_specs():
+            old = current.get(spec.name)
+            if isinstance(old, LazyCommandHandler) and old.spec == spec and not old.is_stale:
+                snapshot.append(old)
+                report.unchanged += 1
+                continue
+            proxy = LazyCommandHandler(spec)
+            if old is None:
+                report.added.append(spec.name)
+            else:
+                report.reloaded.append(spec.name)
+                if not isinstance(old, LazyCommandHandler) or old.is_loaded:
+                    proxy.load(reimported)
+            snapshot.append(proxy)
+        declared = {handler.name() for handler in snapshot}
+        report.removed = sorted(name for name in current if name not in declared)
+        
+        swap_started = time.perf_counter()
+        self._registry.replace_all(snapshot)
+        report.swap_seconds = time.perf_counter() - swap_started
+        report.build_seconds = swap_started - started
+        return report
     
     def get_registered_handlers(self) -> List[ICommandHandler]:
         """
@@ -38,3 +128,72 @@ class CommandHandlersManager(ICommandHandlersManager):
             List[ICommandHandler]: A list of all registered handlers
         """
         return self._registry.get_all_handlers()
+    
+    def get_handler(self, command: str) -> Optional[ICommandHandler]:
+        """
+        Get the handler registered for a command.
+        
+        Aliases and unique prefixes of a command name resolve to its handler.
+        
+        Args:
+            command (str): The command name to look up (e.g., '/ping')
+            
+        Returns:
+            Optional[ICommandHandler]: The command handler if found, None otherwise
+        """
+        return self._registry.resolve(command)
+    
+    def suggest_commands(self, command: str) -> List[str]:
+        """
+        Suggest registered commands for an unknown one.
+        
+        Args:
+            command (str): The unknown command (e.g., '/pnig')
+            
+        Returns:
+            List[str]: Command names, closest first
+        """
+        return self._registry.suggest(command)
+    
+    def bot_commands(self) -> List[BotCommand]:
+        """
+        Build the command menu Telegram shows to users.
+        
+        Aliases are left out. Commands whose name Telegram does not accept
+        are skipped with a warning, and the list is cut at Telegram's limit.
+        
+        Returns:
+            List[telegram.BotCommand]: Commands in registration order
+        """
+        commands = []
+        for handler in self._registry.get_all_handlers():
+            command = handler.name().lstrip('/')
+            if not _BOT_COMMAND_PATTERN.fullmatch(command):
+                logger.warning("Command '%s' cannot be shown in Telegram's command menu", handler.name())
+                continue
+            description = handler.description() or handler.name()
+            commands.append(BotCommand(command, description[:MAX_BOT_COMMAND_DESCRIPTION]))
+        if len(commands) > MAX_BOT_COMMANDS:
+            logger.warning("Only the first %d of %d commands fit Telegram's command menu", MAX_BOT_COMMANDS, len(commands))
+        return commands[:MAX_BOT_COMMANDS]
+    
+    async def publish_commands(self, bot: Bot) -> int:
+        """
+        Replace the bot's command menu with the registered commands in one ``setMyCommands`` call.
+        
+        Args:
+            bot (telegram.Bot): Initialized bot to call the Bot API with
+            
+        Returns:
+            int: Number of commands published
+        """
+        commands = self.bot_commands()
+        await bot.set_my_commands(commands)
+        return len(commands)
+    
+    def _discover_specs(self) -> List[CommandSpec]:
+        """Read command declarations from the manifest and entry points."""
+        specs = load_manifest(self._manifest_path) if self._manifest_path else []
+        if self._use_entry_points:
+            specs.extend(discover_entry_points())
+        return specs
@@ -1,4 +1,5 @@
 from typing import Optional, List
+from command_index import CommandIndex
 from commands.icommand_handler import ICommandHandler
 
 
@@ -8,11 +9,16 @@ class CommandHandlersRegistry:
     
     This class provides a dictionary-based storage for command handlers,
     allowing efficient addition, removal, and retrieval of handlers by command name.
+    ``replace_all`` builds a new dictionary and swaps it in with a single
+    assignment, so lookups see either the old or the new set, never a mix.
+    A ``CommandIndex`` kept next to the dictionary resolves aliases and
+    unique prefixes and suggests close matches for unknown commands.
     """
     
     def __init__(self):
         """Initialize an empty command handlers registry."""
         self._handlers: dict[str, ICommandHandler] = {}
+        self._index = CommandIndex()
     
     def add(self, handler: ICommandHandler) -> None:
         """
@@ -22,12 +28,14 @@ class CommandHandlersRegistry:
             handler (ICommandHandler): The command handler to add to the registry
             
         Raises:
-            ValueError: If a handler with the same command name already exists
+            ValueError: If a handler with the same command name already
+                exists, or an alias is taken
         """
         command_name = handler.name()
         if command_name in self._handlers:
             raise ValueError(f"Handler for command '{command_name}' already exists")
         
+        self._index.add(command_name, handler.aliases())
         self._handlers[command_name] = handler
     
     def remove(self, command: str) -> None:
@@ -44,6 +52,29 @@ class CommandHandlersRegistry:
             raise KeyError(f"No handler found for command '{command}'")
         
         del self._handlers[command]
+        self._index.remove(command)
+    
+    def replace_all(self, handlers: List[ICommandHandler]) -> None:
+        """
+        Replace every registered handler with a new set in one step.
+        
+        Handlers looked up before the swap keep running unchanged.
+        
+        Args:
+            handlers (List[ICommandHandler]): The complete new set of handlers
+            
+        Raises:
+            ValueError: If two handlers have the same command name or
+                alias; the registry is left unchanged
+        """
+        snapshot: dict[str, ICommandHandler] = {}
+        for handler in handlers:
+            command_name = handler.name()
+            if command_name in snapshot:
+                raise ValueError(f"Handler for command '{command_name}' already exists")
+            snapshot[command_name] = handler
+        index = CommandIndex.build((handler.name(), handler.aliases()) for handler in handlers)
+        self._handlers, self._index = snapshot, index
     
     def get(self, command: str) -> Optional[ICommandHandler]:
         """
@@ -57,6 +88,39 @@ class CommandHandlersRegistry:
         """
         return self._handlers.get(command)
     
+    def resolve(self, command: str) -> Optional[ICommandHandler]:
+        """
+        Get the handler a command name, alias or unique prefix stands for.
+        
+        Exact names are looked up in the dictionary first, so only other
+        tokens pay for the walk through the index.
+        
+        Args:
+            command (str): What the user typed (e.g., '/ping', '/p' or '/pi')
+            
+        Returns:
+            Optional[ICommandHandler]: The command handler if found, None if
+            the command is unknown or the prefix is ambiguous
+        """
+        handler = self._handlers.get(command)
+        if handler is not None:
+            return handler
+        command_name = self._index.resolve(command)
+        return self._handlers.get(command_name) if command_name is not None else None
+    
+    def suggest(self, command: str, limit: int = 3) -> List[str]:
+        """
+        Suggest registered commands for an unknown one.
+        
+        Args:
+            command (str): The unknown command (e.g., '/pnig')
+            limit (int): Maximum number of suggestions
+            
+        Returns:
+            List[str]: Command names, closest first
+        """
+        return self._index.suggest(command, limit=limit)
+    
     def get_all_handlers(self) -> List[ICommandHandler]:
         """
         Get all registered command handlers.
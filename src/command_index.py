@@ -0,0 +1,234 @@
+"""
+Trie index of command names and their aliases.
+
+The registry's dictionary answers exact lookups. This index sits next to
+it and answers the inexact ones: aliases, unique prefixes (``/pi`` is
+``/ping`` while no other command starts with ``/pi``) and "did you mean"
+suggestions within a small edit distance. Every trie node counts the
+commands below it, and the counts are updated as commands are added and
+removed. Resolving a prefix is then one walk over its characters, however
+many commands there are.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class _Node:
+    """One trie node: the key ending here and the commands reachable below."""
+
+    __slots__ = ("children", "commands", "command")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # Command name -> number of its keys (name and aliases) at or below this node
+        self.commands: Dict[str, int] = {}
+        # Command a key ending exactly here resolves to
+        self.command: Optional[str] = None
+
+
+class CommandIndex:
+    """
+    Resolves command names, aliases and unique prefixes, and suggests close matches.
+
+    Keys are lower-cased, like the commands ``parse_command`` produces.
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self._root = _Node()
+        self._keys: Dict[str, Tuple[str, ...]] = {}
+
+    @classmethod
+    def build(cls, entries: Iterable[Tuple[str, Iterable[str]]]) -> "CommandIndex":
+        """
+        Create an index holding the given commands.
+
+        Args:
+            entries (Iterable[Tuple[str, Iterable[str]]]): Command names with their aliases
+
+        Returns:
+            CommandIndex: The filled index
+
+        Raises:
+            ValueError: If a name or alias is taken twice
+        """
+        index = cls()
+        for command, aliases in entries:
+            index.add(command, aliases)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, command: str) -> bool:
+        return command.lower() in self._keys
+
+    def add(self, command: str, aliases: Iterable[str] = ()) -> None:
+        """
+        Add a command and its aliases.
+
+        Args:
+            command (str): Command name (e.g., '/ping')
+            aliases (Iterable[str]): Other names of the command (e.g., '/p')
+
+        Raises:
+            ValueError: If the name or an alias is already taken
+        """
+        command = command.lower()
+        keys = tuple(dict.fromkeys([command, *(alias.lower() for alias in aliases)]))
+        for key in keys:
+            node = self._find(key)
+            if node is not None and node.command is not None:
+                raise ValueError(f"Command name '{key}' is already taken by '{node.command}'")
+        for key in keys:
+            node = self._root
+            node.commands[command] = node.commands.get(command, 0) + 1
+            for char in key:
+                child = node.children.get(char)
+                if child is None:
+                    child = node.children[char] = _Node()
+                node = child
+                node.commands[command] = node.commands.get(command, 0) + 1
+            node.command = command
+        self._keys[command] = keys
+
+    def remove(self, command: str) -> None:
+        """
+        Remove a command and its aliases.
+
+        Args:
+            command (str): Command name
+
+        Raises:
+            KeyError: If the command is not in the index
+        """
+        command = command.lower()
+        keys = self._keys.pop(command)
+        for key in keys:
+            path = [self._root]
+            for char in key:
+                path.append(path[-1].children[char])
+            path[-1].command = None
+            for depth, node in enumerate(path):
+                remaining = node.commands[command] - 1
+                if remaining:
+                    node.commands[command] = remaining
+                else:
+                    del node.commands[command]
+                if depth and not node.commands:
+                    # Nothing is left below, drop the whole branch
+                    del path[depth - 1].children[key[depth - 1]]
+                    break
+
+    def resolve(self, token: str) -> Optional[str]:
+        """
+        Find the command a name, alias or unique prefix stands for.
+
+        An exact name or alias wins over a longer command it is a prefix of.
+
+        Args:
+            token (str): What the user typed (e.g., '/pi')
+
+        Returns:
+            Optional[str]: The command name, None if unknown or ambiguous
+        """
+        node = self._find(token.lower())
+        if node is None:
+            return None
+        if node.command is not None:
+            return node.command
+        if len(node.commands) == 1:
+            return next(iter(node.commands))
+        return None
+
+    def completions(self, prefix: str) -> List[str]:
+        """
+        Get every command with a name or alias starting with a prefix.
+
+        Returns:
+            List[str]: Command names in alphabetical order
+        """
+        node = self._find(prefix.lower())
+        return sorted(node.commands) if node is not None else []
+
+    def suggest(self, token: str, max_distance: Optional[int] = None, limit: int = 3) -> List[str]:
+        """
+        Suggest commands for a token that resolves to none.
+
+        Commands the token is an ambiguous prefix of come first, then
+        commands whose name or alias is within ``max_distance`` edits
+        (insertions, deletions, substitutions and swaps of adjacent
+        characters), closest first.
+
+        Args:
+            token (str): What the user typed (e.g., '/pnig')
+            max_distance (Optional[int]): Largest edit distance to suggest,
+                by default 1 for tokens of up to 4 characters and 2 otherwise
+            limit (int): Maximum number of suggestions
+
+        Returns:
+            List[str]: Suggested command names
+        """
+        token = token.lower()
+        if max_distance is None:
+            max_distance = 1 if len(token) <= 4 else 2
+        suggestions = dict.fromkeys(self.completions(token)) if len(token) > 1 else {}
+
+        distances: Dict[str, int] = {}
+        first_row = [min(column, max_distance + 1) for column in range(len(token) + 1)]
+        for char, child in self._root.children.items():
+            self._search(child, 1, char, "", first_row, None, token, max_distance, distances)
+        for command in sorted(distances, key=lambda command: (distances[command], command)):
+            suggestions.setdefault(command)
+        return list(suggestions)[:limit]
+
+    def _find(self, key: str) -> Optional[_Node]:
+        node = self._root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def _search(
+        self,
+        node: _Node,
+        depth: int,
+        char: str,
+        previous_char: str,
+        row: List[int],
+        previous_row: Optional[List[int]],
+        token: str,
+        max_distance: int,
+        distances: Dict[str, int],
+    ) -> None:
+        """
+        Extend the edit distance table by one trie character and descend.
+
+        ``row`` holds the distances between the key so far and every prefix
+        of the token, capped at ``max_distance + 1``. Only the band of cells
+        within ``max_distance`` of the diagonal can stay under the cap, so
+        only those are computed. Branches are pruned once no cell of the new
+        row is within ``max_distance``, since distances never shrink further
+        down.
+        """
+        too_far = max_distance + 1
+        current = [too_far] * (len(token) + 1)
+        if depth <= max_distance:
+            current[0] = depth
+        for column in range(max(1, depth - max_distance), min(len(token), depth + max_distance) + 1):
+            cost = 0 if token[column - 1] == char else 1
+            value = min(current[column - 1] + 1, row[column] + 1, row[column - 1] + cost, too_far)
+            if (
+                previous_row is not None and column > 1
+                and token[column - 1] == previous_char and token[column - 2] == char
+            ):
+                value = min(value, previous_row[column - 2] + 1)
+            current[column] = value
+
+        if node.command is not None and current[-1] <= max_distance:
+            if current[-1] < distances.get(node.command, max_distance + 1):
+                distances[node.command] = current[-1]
+        if min(current) <= max_distance:
+            for next_char, child in node.children.items():
+                self._search(child, depth + 1, next_char, char, current, row, token, max_distance, distances)
@@ -0,0 +1,275 @@
+"""
+Lazy, manifest-driven command plugin discovery.
+
+Commands are declared in a JSON manifest or through the
+``gserverbot.commands`` entry point group. Each one is registered as a
+``LazyCommandHandler`` proxy that knows its command name right away but
+imports the implementing module only when the command is first used.
+Proxies remember the modification time of the module they loaded, so a
+reload can tell which handlers changed on disk.
+"""
+
+import importlib
+import json
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from importlib import metadata
+from typing import AsyncIterator, List, Optional, Set, Tuple
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from commands.icommand_handler import ICommandHandler
+from executor_offload import CommandRequest, ExecutionPolicy
+from response_cache import CachePolicy
+from rate_limiter import RateLimit
+from streaming import StreamPolicy
+
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "gserverbot.commands"
+
+
+@dataclass(frozen=True)
+class CommandSpec:
+    """
+    Declaration of a command plugin.
+
+    Attributes:
+        name (str): Command name (e.g., '/ping')
+        module (str): Import path of the module implementing the handler
+        class_name (str): Name of the ICommandHandler class in that module
+        description (str): Short help text for the command
+        aliases (Tuple[str, ...]): Other names the command answers to
+        admin_only (bool): Whether only bot admins may run the command
+    """
+
+    name: str
+    module: str
+    class_name: str
+    description: str = ""
+    aliases: Tuple[str, ...] = ()
+    admin_only: bool = False
+
+
+def load_manifest(path: str) -> List[CommandSpec]:
+    """
+    Read command declarations from a JSON manifest.
+
+    The manifest holds a ``commands`` list of objects with ``name``,
+    ``module``, ``class`` and optional ``description``, ``aliases`` and
+    ``admin_only``.
+
+    Args:
+        path (str): Path to the manifest file
+
+    Returns:
+        List[CommandSpec]: The declared commands in manifest order
+
+    Raises:
+        ValueError: If an entry is missing a required field
+    """
+    with open(path, encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+
+    specs = []
+    for entry in manifest.get("commands", []):
+        try:
+            specs.append(CommandSpec(
+                name=entry["name"],
+                module=entry["module"],
+                class_name=entry["class"],
+                description=entry.get("description", ""),
+                aliases=tuple(entry.get("aliases", ())),
+                admin_only=bool(entry.get("admin_only", False)),
+            ))
+        except KeyError as e:
+            raise ValueError(f"Command manifest entry {entry!r} is missing {e}") from None
+    return specs
+
+
+def discover_entry_points(group: str = ENTRY_POINT_GROUP) -> List[CommandSpec]:
+    """
+    Find commands published by installed packages.
+
+    An entry point ``ping = package.module:PingCommandHandler`` declares the
+    ``/ping`` command, ``stats = package.module:StatsCommandHandler [admin_only]``
+    an admin-only one. Only entry point metadata is read; nothing is imported.
+
+    Args:
+        group (str): Entry point group to scan
+
+    Returns:
+        List[CommandSpec]: The declared commands
+    """
+    specs = []
+    for entry_point in metadata.entry_points(group=group):
+        module, _, class_name = entry_point.value.partition(":")
+        class_name, _, extras = class_name.partition("[")
+        specs.append(CommandSpec(
+            name="/" + entry_point.name.lstrip("/"),
+            module=module.strip(),
+            class_name=class_name.strip(),
+            admin_only="admin_only" in extras.rstrip("]").replace(",", " ").split(),
+        ))
+    return specs
+
+
+def module_mtime(module_name: str) -> Optional[int]:
+    """
+    Get the modification time of an imported module's source file.
+
+    Returns:
+        Optional[int]: Nanoseconds since the epoch, None if the module is
+        not imported or has no file
+    """
+    module = sys.modules.get(module_name)
+    path = getattr(module, "__file__", None)
+    if path is None:
+        return None
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class LazyCommandHandler(ICommandHandler):
+    """
+    Proxy that defers importing a command handler until it is needed.
+    """
+
+    def __init__(self, spec: CommandSpec):
+        """
+        Initialize the proxy.
+
+        Args:
+            spec (CommandSpec): Declaration of the command to load on demand
+        """
+        self._spec = spec
+        self._target: Optional[ICommandHandler] = None
+        self._module_mtime: Optional[int] = None
+
+    @property
+    def spec(self) -> CommandSpec:
+        """The declaration this proxy was created from."""
+        return self._spec
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the real handler has been imported and created."""
+        return self._target is not None
+
+    @property
+    def is_stale(self) -> bool:
+        """Whether the loaded handler's module changed on disk since it was loaded."""
+        return self._target is not None and module_mtime(self._spec.module) != self._module_mtime
+
+    def load(self, reimported: Optional[Set[str]] = None) -> ICommandHandler:
+        """
+        Import the handler module and create the handler, once.
+
+        Args:
+            reimported (Optional[Set[str]]): When given, an already imported
+                module is re-executed unless its name is in the set, and the
+                name is added; used by reloads so that each changed module is
+                re-imported exactly once
+
+        Returns:
+            ICommandHandler: The real handler
+
+        Raises:
+            ImportError: If the module or class cannot be found
+            TypeError: If the class does not implement ICommandHandler
+            ValueError: If the handler's name differs from the declared one, or
+                it is admin-only without being declared so
+        """
+        if self._target is not None:
+            return self._target
+
+        if reimported is not None and self._spec.module in sys.modules and self._spec.module not in reimported:
+            module = importlib.reload(sys.modules[self._spec.module])
+            reimported.add(self._spec.module)
+        else:
+            module = importlib.import_module(self._spec.module)
+        try:
+            handler_class = getattr(module, self._spec.class_name)
+        except AttributeError:
+            raise ImportError(
+                f"Module '{self._spec.module}' has no class '{self._spec.class_name}'"
+            ) from None
+        handler = handler_class()
+        if not isinstance(handler, ICommandHandler):
+            raise TypeError(f"{self._spec.module}.{self._spec.class_name} is not an ICommandHandler")
+        if handler.name() != self._spec.name:
+            raise ValueError(
+                f"Handler {self._spec.module}.{self._spec.class_name} is named "
+                f"'{handler.name()}', expected '{self._spec.name}'"
+            )
+        if handler.admin_only() and not self._spec.admin_only:
+            # The chain built from the declaration would let everyone run it
+            raise ValueError(
+                f"Handler {self._spec.module}.{self._spec.class_name} is admin-only, "
+                f"declare '{self._spec.name}' with \"admin_only\": true"
+            )
+
+        logger.debug("Loaded command handler %s from %s", self._spec.name, self._spec.module)
+        self._module_mtime = module_mtime(self._spec.module)
+        self._target = handler
+        return handler
+
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        Load the real handler if needed and delegate to it.
+
+        Args:
+            update: The Telegram update object containing the command
+            context: The Telegram bot context object
+        """
+        await self.load().handle(update, context)
+
+    def cache_policy(self) -> Optional[CachePolicy]:
+        """Get the real handler's cache policy, loading it if needed."""
+        return self.load().cache_policy()
+
+    async def render(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> str:
+        """Load the real handler if needed and let it compute the reply."""
+        return await self.load().render(update, context)
+
+    def execution_policy(self) -> Optional[ExecutionPolicy]:
+        """Get the real handler's execution policy, loading it if needed."""
+        return self.load().execution_policy()
+
+    def run_blocking(self, request: CommandRequest) -> str:
+        """Load the real handler if needed and let it do its blocking work."""
+        return self.load().run_blocking(request)
+
+    def rate_limit(self) -> Optional[RateLimit]:
+        """Get the real handler's rate limit, loading it if needed."""
+        return self.load().rate_limit()
+
+    def stream_policy(self) -> Optional[StreamPolicy]:
+        """Get the real handler's stream policy, loading it if needed."""
+        return self.load().stream_policy()
+
+    def stream(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> AsyncIterator[str]:
+        """Load the real handler if needed and let it stream its output."""
+        return self.load().stream(update, context)
+
+    def name(self) -> str:
+        """Get the declared command name without loading the handler."""
+        return self._spec.name
+
+    def admin_only(self) -> bool:
+        """Get whether the command is declared admin-only, without loading the handler."""
+        return self._spec.admin_only
+
+    def aliases(self) -> Tuple[str, ...]:
+        """Get the declared aliases without loading the handler."""
+        return self._spec.aliases
+
+    def description(self) -> str:
+        """Get the declared description without loading the handler."""
+        return self._spec.description
@@ -0,0 +1,397 @@
+"""
+Single-handler command dispatch.
+
+Instead of one ``telegram.ext.CommandHandler`` per registered command,
+which python-telegram-bot checks one after another for every update, the
+``CommandRouter`` parses the command token once and resolves it with a
+single registry lookup.
+"""
+
+import asyncio
+import functools
+import math
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from telegram import Message, MessageEntity, Update
+from telegram.ext import Application, BaseHandler, CallbackContext
+
+from commands.icommand_handler import ICommandHandler
+from update_scheduler import ChatUpdateScheduler, Job
+from metrics import MetricsRegistry
+from middleware import MiddlewarePipeline, Next
+from outbound import send_reply
+from output_delivery import send_output
+from response_cache import ResponseCache
+from executor_offload import ASYNC_EXECUTION, CommandRequest, HandlerExecutor
+from rate_limiter import RateLimiter
+from streaming import stream_reply
+from tracing import Span, Tracer, activate, deactivate
+
+
+# Called for commands that have no registered handler: (update, context, command)
+UnknownCommandHandler = Callable[[Update, CallbackContext, str], Awaitable[None]]
+
+# Resolves a command name such as '/ping' to its handler
+CommandLookup = Callable[[str], Optional[ICommandHandler]]
+
+# What check_update found: the command, its arguments, its handler (None for
+# an unknown command) and the handler's middleware chain (None without middleware)
+CheckResult = Tuple[str, List[str], Optional[ICommandHandler], Optional[Next]]
+
+# Rate limit and metrics name shared by all commands without a handler, so
+# typos neither get a limit each nor a metrics series each
+UNKNOWN_COMMAND = "unknown"
+
+
+def parse_command(
+    message: Message, bot_username: Optional[str] = None
+) -> Optional[Tuple[str, List[str]]]:
+    """
+    Extract the command and its arguments from a message.
+
+    Only messages that start with a ``bot_command`` entity are commands,
+    matching the rules of ``telegram.ext.CommandHandler``. A ``@botname``
+    suffix is accepted only when it names this bot.
+
+    Args:
+        message (telegram.Message): The incoming message
+        bot_username (Optional[str]): This bot's username; when omitted it is
+            read from the bot the message is bound to, but only if the
+            command actually carries a suffix
+
+    Returns:
+        Optional[Tuple[str, List[str]]]: The lower-cased command with its
+        leading slash (e.g. ``'/ping'``) and the whitespace-separated
+        arguments, or None if the message is not a command for this bot
+    """
+    text = message.text
+    entities = message.entities
+    if not text or not entities:
+        return None
+    entity = entities[0]
+    if entity.offset != 0 or entity.type != MessageEntity.BOT_COMMAND:
+        return None
+
+    command, _, target = text[1:entity.length].partition('@')
+    if target:
+        if bot_username is None:
+            bot_username = message.get_bot().username
+        if target.lower() != (bot_username or '').lower():
+            return None
+
+    return '/' + command.lower(), text[entity.length:].split()
+
+
+class CommandRouter(BaseHandler[Update, CallbackContext]):
+    """
+    A single python-telegram-bot handler for every registered command.
+
+    The check is O(1) in the number of commands: the command token is parsed
+    once and resolved through one dictionary lookup; only aliases and
+    prefixes go on to walk the command index. When a scheduler is given,
+    handlers run on it instead of inline, so a slow command only delays
+    later updates of its own chat. With a metrics registry every
+    handler call is counted and timed. With a response cache, handlers that
+    declare a cache policy have their replies served from it. Handlers that
+    declare a stream policy have their output edited into place. With an
+    executor, handlers that declare a blocking execution policy run in its
+    thread or process pool. With a rate limiter, commands over the sender's
+    limits are rejected before they are scheduled. With a tracer, sampled
+    updates are traced from parsing to the end of their handler. With a
+    middleware pipeline, each handler runs at the end of its command's chain,
+    built by ``compile`` when commands are registered.
+    """
+
+    def __init__(
+        self,
+        lookup: CommandLookup,
+        unknown_command_handler: Optional[UnknownCommandHandler] = None,
+        scheduler: Optional[ChatUpdateScheduler] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        response_cache: Optional[ResponseCache] = None,
+        executor: Optional[HandlerExecutor] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        tracer: Optional[Tracer] = None,
+        middleware: Optional[MiddlewarePipeline] = None
+    ):
+        """
+        Initialize the router.
+
+        Args:
+            lookup (CommandLookup): Resolves a command name to its handler,
+                typically ``ICommandHandlersManager.get_handler``
+            unknown_command_handler (Optional[UnknownCommandHandler]): Called for
+                commands without a handler; unknown commands are ignored if None
+            scheduler (Optional[ChatUpdateScheduler]): Runs handlers per chat in
+                order; handlers are awaited inline if None
+            metrics (Optional[MetricsRegistry]): Records calls, errors and
+                latency per command
+            response_cache (Optional[ResponseCache]): Cache for replies of
+                commands that declare a cache policy
+            executor (Optional[HandlerExecutor]): Pools for handlers that
+                declare a blocking execution policy
+            rate_limiter (Optional[RateLimiter]): Per-user and per-command limits
+                checked before a handler is scheduled
+            tracer (Optional[Tracer]): Samples updates and times their parse,
+                dispatch, handler and send stages
+            middleware (Optional[MiddlewarePipeline]): Layers run around
+                command handlers, in the scheduled job
+        """
+        super().__init__(self._unused_callback)
+        self._lookup = lookup
+        self._unknown_command_handler = unknown_command_handler
+        self._scheduler = scheduler
+        self._metrics = metrics
+        self._response_cache = response_cache
+        self._executor = executor
+        self._rate_limiter = rate_limiter
+        self._tracer = tracer if tracer is not None and tracer.enabled else None
+        # Root spans of traced updates between check_update and handle_update, by id(update)
+        self._traces: Dict[int, Span] = {}
+        self._middleware = middleware
+        # Middleware chain of each handler, ending with _run_handler
+        self._chains: Dict[ICommandHandler, Next] = {}
+
+    def compile(self, handlers: Iterable[ICommandHandler]) -> None:
+        """
+        Build the middleware chain of every handler ahead of its first update.
+
+        Replaces the chains built before, so handlers that were reloaded
+        or removed are dropped. Building does not import lazily loaded
+        handlers. A handler without a chain, e.g. one added later, gets it
+        built when its first update is resolved. ``check_update`` returns
+        the chain with the handler, so handling an update only calls it.
+
+        Args:
+            handlers (Iterable[ICommandHandler]): The registered handlers
+        """
+        if self._middleware is None:
+            return
+        self._chains = {handler: self._build_chain(handler) for handler in handlers}
+
+    def _build_chain(self, handler: ICommandHandler) -> Next:
+        command = handler.name()
+        return self._middleware.build(command, functools.partial(self._run_handler, command, handler))
+
+    def check_update(self, update: object) -> Optional[CheckResult]:
+        """
+        Decide whether the update is a command this router handles.
+
+        Returns:
+            The command (the handler's own name when an alias or prefix was
+            typed), its arguments, the resolved handler (None for an
+            unknown command with a fallback) and its middleware chain (None
+            without middleware), or None to let other handlers look at the
+            update
+        """
+        if self._tracer is None:
+            return self._resolve(update)
+        started = self._tracer.clock()
+        result = self._resolve(update)
+        if result is not None:
+            root = self._tracer.begin("update", started, update_id=update.update_id, command=result[0])
+            if root is not None:
+                root.child("parse", started, self._tracer.clock())
+                self._traces[id(update)] = root
+        return result
+
+    def _resolve(self, update: object) -> Optional[CheckResult]:
+        """Parse the command of an update and look up its handler and chain."""
+        if not isinstance(update, Update):
+            return None
+        message = update.message or update.edited_message
+        if message is None:
+            return None
+
+        parsed = parse_command(message)
+        if parsed is None:
+            return None
+        command, args = parsed
+
+        handler = self._lookup(command)
+        if handler is None:
+            if self._unknown_command_handler is None:
+                return None
+            return command, args, None, None
+        # Aliases and prefixes are counted, cached and limited as the command itself
+        command = handler.name()
+        if self._middleware is None:
+            return command, args, handler, None
+        chain = self._chains.get(handler)
+        if chain is None:
+            chain = self._chains[handler] = self._build_chain(handler)
+        return command, args, handler, chain
+
+    def collect_additional_context(
+        self,
+        context: CallbackContext,
+        update: Update,
+        application: Application,
+        check_result: CheckResult,
+    ) -> None:
+        """Expose the command arguments as ``context.args``."""
+        context.args = check_result[1]
+
+    async def handle_update(
+        self,
+        update: Update,
+        application: Application,
+        check_result: CheckResult,
+        context: CallbackContext,
+    ) -> None:
+        """Invoke the resolved command handler or the unknown-command fallback."""
+        self.collect_additional_context(context, update, application, check_result)
+        command, _, handler, chain = check_result
+        root = self._traces.pop(id(update), None) if self._traces else None
+        # Rate limits and the wait for the chat's turn
+        dispatch = root.child("dispatch") if root is not None else None
+        if self._rate_limiter is not None and self._reject(update, context, command, handler):
+            if root is not None:
+                dispatch.end = self._tracer.clock()
+                root.attributes["rate_limited"] = True
+                self._tracer.end(root)
+            return
+        if handler is None:
+            job = lambda: self._unknown_command_handler(update, context, command)
+        elif chain is None:
+            job = lambda: self._run_handler(command, handler, update, context)
+        else:
+            job = lambda: chain(update, context)
+        if root is not None:
+            job = self._traced(root, dispatch, job)
+
+        if self._scheduler is None:
+            await job()
+            return
+        chat = update.effective_chat
+        self._scheduler.submit(chat.id if chat is not None else None, job)
+
+    def _reject(
+        self,
+        update: Update,
+        context: CallbackContext,
+        command: str,
+        handler: Optional[ICommandHandler],
+    ) -> bool:
+        """
+        Check the sender's rate limits, scheduling a cooldown notice if one is due.
+
+        Returns:
+            bool: True if the command must not run
+        """
+        user = update.effective_user
+        if user is None:
+            return False
+        if handler is None:
+            command = UNKNOWN_COMMAND
+        rejection = self._rate_limiter.check(
+            user.id, command, handler.rate_limit() if handler is not None else None
+        )
+        if rejection is None:
+            return False
+        if self._metrics is not None:
+            self._metrics.record_rate_limited(command)
+        if rejection.notify:
+            text = f"Too many requests, please wait {math.ceil(rejection.retry_after)}s before trying again."
+            notice = lambda: send_reply(update, context, text)
+            chat = update.effective_chat
+            if self._scheduler is None:
+                asyncio.get_running_loop().create_task(notice())
+            else:
+                self._scheduler.submit(chat.id if chat is not None else None, notice)
+        return True
+
+    def _traced(self, root: Span, dispatch: Span, job: Job) -> Job:
+        """
+        Wrap a job to end the ``dispatch`` span when it starts and time its run as ``handler``.
+
+        The handler span is current while the job runs, so sends and log
+        records inside the handler are attributed to it.
+        """
+        tracer = self._tracer
+
+        async def run() -> None:
+            dispatch.end = tracer.clock()
+            handler_span = root.child("handler")
+            token = activate(handler_span)
+            try:
+                await job()
+            except BaseException:
+                handler_span.failed = root.failed = True
+                raise
+            finally:
+                deactivate(token)
+                handler_span.end = tracer.clock()
+                tracer.end(root)
+        return run
+
+    async def _run_handler(
+        self,
+        command: str,
+        handler: ICommandHandler,
+        update: Update,
+        context: CallbackContext,
+    ) -> None:
+        """Run a command handler, recording its metrics if enabled."""
+        if self._metrics is None:
+            await self._invoke(command, handler, update, context)
+            return
+        started = time.perf_counter()
+        failed = True
+        try:
+            cache_hit = await self._invoke(command, handler, update, context)
+            failed = False
+        finally:
+            self._metrics.record_command(command, time.perf_counter() - started, failed)
+        if cache_hit is not None:
+            self._metrics.record_cache(command, cache_hit)
+
+    async def _invoke(
+        self,
+        command: str,
+        handler: ICommandHandler,
+        update: Update,
+        context: CallbackContext,
+    ) -> Optional[bool]:
+        """
+        Run a command handler, streaming, offloading or caching it as it declares.
+
+        Returns:
+            Optional[bool]: Whether the reply came from the cache, None if the
+            command is not cached
+        """
+        stream_policy = handler.stream_policy()
+        if stream_policy is not None:
+            await stream_reply(update, context, handler.stream(update, context), stream_policy)
+            return None
+        cache_policy = handler.cache_policy() if self._response_cache is not None else None
+        execution_policy = handler.execution_policy() if self._executor is not None else None
+        if execution_policy is not None and execution_policy.mode == ASYNC_EXECUTION:
+            execution_policy = None
+        if cache_policy is None and execution_policy is None:
+            await handler.handle(update, context)
+            return None
+
+        if execution_policy is None:
+            render = lambda: handler.render(update, context)
+        else:
+            request = CommandRequest.from_update(command, update, context.args)
+            render = lambda: self._executor.run(command, handler.run_blocking, request, execution_policy)
+
+        try:
+            if cache_policy is None:
+                text, hit = await render(), None
+            else:
+                text, hit = await self._response_cache.get_or_compute(
+                    command, cache_policy.key(update, context.args), cache_policy, render
+                )
+        except asyncio.TimeoutError:
+            await send_reply(update, context, f"{command} took too long, please try again later.")
+            raise
+        await send_output(update, context, text)
+        return hit
+
+    @staticmethod
+    async def _unused_callback(update: Update, context: CallbackContext) -> None:
+        """Placeholder for ``BaseHandler.callback``; dispatch happens in ``handle_update``."""
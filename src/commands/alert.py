@@ -0,0 +1,91 @@
+from typing import Optional
+from .icommand_handler import ICommandHandler
+from .status import format_value
+from telegram import Update
+from telegram.ext import ContextTypes
+from alerts import AlertEngine, parse_condition
+from bot_services import get_services
+from host_metrics import HOST_METRICS
+from outbound import send_reply
+from rate_limiter import RateLimit
+
+# Adding and removing alerts writes the chat's state
+RATE_LIMIT = RateLimit(20, 60.0)
+
+USAGE = "\n".join([
+    "Usage:",
+    "/alert add <metric> <op> <threshold> [for <duration>] - e.g. /alert add cpu > 90 for 5m",
+    "/alert add service <name> down [for <duration>]",
+    "/alert list - this chat's alerts",
+    "/alert remove <number>",
+    "Metrics: " + ", ".join(HOST_METRICS) + "; comparisons: >, >=, <, <=",
+])
+
+
+class AlertCommandHandler(ICommandHandler):
+    """Command handler for the /alert command."""
+    
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        Handle the /alert command by managing the chat's threshold alerts.
+
+        Args:
+            update (telegram.Update): The Telegram update object containing the command.
+            context (telegram.ext.ContextTypes.DEFAULT_TYPE): The Telegram bot context object.
+        """
+        services = get_services(context)
+        engine = services.alerts if services is not None else None
+        chat = getattr(update, "effective_chat", None)
+        if engine is None or chat is None:
+            await send_reply(update, context, "Alerts are not available.")
+            return
+
+        args = list(getattr(context, "args", None) or [])
+        action = args[0].lower() if args else "list"
+        if action == "add" and len(args) > 1:
+            reply = await self._add(engine, chat.id, " ".join(args[1:]))
+        elif action == "list" and len(args) <= 1:
+            reply = self._list(engine, chat.id)
+        elif action == "remove" and len(args) == 2 and args[1].lstrip("#").isdigit():
+            alert_id = int(args[1].lstrip("#"))
+            if await engine.remove(chat.id, alert_id):
+                reply = f"Removed alert #{alert_id}."
+            else:
+                reply = f"There is no alert #{alert_id}, see /alert list."
+        else:
+            reply = USAGE
+        await send_reply(update, context, reply)
+    
+    async def _add(self, engine: AlertEngine, chat_id: int, rule: str) -> str:
+        """Subscribe the chat to a rule and describe the result."""
+        try:
+            subscription = await engine.add(chat_id, parse_condition(rule))
+        except ValueError as error:
+            return f"{error}\n{USAGE}"
+        reply = f"Added alert #{subscription.alert_id}: {subscription.condition.describe()}."
+        if any(firing for added, firing in engine.alerts(chat_id) if added == subscription):
+            reply += " It is firing now."
+        return reply
+    
+    def _list(self, engine: AlertEngine, chat_id: int) -> str:
+        """Describe the chat's alerts with their state and the latest values."""
+        alerts = engine.alerts(chat_id)
+        if not alerts:
+            return "This chat has no alerts. Add one with /alert add, e.g. /alert add cpu > 90 for 5m"
+        lines = ["Alerts of this chat:"]
+        for subscription, firing in alerts:
+            line = f"#{subscription.alert_id} {subscription.condition.describe()}"
+            line += " - FIRING" if firing else " - ok"
+            value = engine.value(subscription.condition.metric)
+            if value is not None and subscription.condition.metric in HOST_METRICS:
+                line += f" (now {format_value(value, HOST_METRICS[subscription.condition.metric])})"
+            lines.append(line)
+        return "\n".join(lines)
+    
+    def rate_limit(self) -> Optional[RateLimit]:
+        """Users get 20 alert commands per minute."""
+        return RATE_LIMIT
+    
+    def name(self) -> str:
+        """Get the command name for this handler."""
+        return '/alert'
@@ -0,0 +1,59 @@
+from .icommand_handler import ICommandHandler
+from telegram import Update
+from telegram.ext import ContextTypes
+from bot_services import get_services
+from outbound import send_reply
+
+USAGE = "\n".join([
+    "Usage:",
+    "/broadcast <text> - send the text to every chat the bot knows",
+    "/broadcast status - progress, throughput and ETA",
+    "/broadcast cancel - stop the running broadcast",
+])
+
+
+class BroadcastCommandHandler(ICommandHandler):
+    """Command handler for the admin-only /broadcast command."""
+    
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        Handle the /broadcast command by starting, reporting on or cancelling an announcement.
+
+        Args:
+            update (telegram.Update): The Telegram update object containing the command.
+            context (telegram.ext.ContextTypes.DEFAULT_TYPE): The Telegram bot context object.
+        """
+        services = get_services(context)
+        engine = services.broadcasts if services is not None else None
+        if engine is None:
+            await send_reply(update, context, "Broadcasting is not available.")
+            return
+
+        # The raw text keeps the line breaks that the parsed arguments lose
+        parts = (update.effective_message.text or "").split(None, 1)
+        text = parts[1].strip() if len(parts) > 1 else ""
+        if not text:
+            await send_reply(update, context, USAGE)
+        elif text.lower() == "status":
+            progress = engine.progress()
+            await send_reply(update, context, progress.describe() if progress is not None else "No broadcast yet.")
+        elif text.lower() == "cancel":
+            if await engine.cancel():
+                # The progress message already shows the final counts
+                await send_reply(update, context, "Broadcast cancelled.")
+            else:
+                await send_reply(update, context, "No broadcast is running.")
+        else:
+            try:
+                # The progress message follows from the engine
+                await engine.begin(update.effective_chat.id, text)
+            except ValueError as error:
+                await send_reply(update, context, str(error))
+    
+    def admin_only(self) -> bool:
+        """Only bot admins may broadcast."""
+        return True
+    
+    def name(self) -> str:
+        """Get the command name for this handler."""
+        return '/broadcast'
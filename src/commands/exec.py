@@ -0,0 +1,58 @@
+from typing import Optional
+from .icommand_handler import ICommandHandler
+from telegram import Update
+from telegram.ext import ContextTypes
+from bot_services import get_services
+from outbound import send_reply
+from rate_limiter import RateLimit
+from streaming import StreamPolicy, stream_reply
+
+# Output of a noisy action is merged into an edit every two seconds
+STREAM_POLICY = StreamPolicy(min_interval=2.0, group_interval=4.0)
+RATE_LIMIT = RateLimit(10, 60.0)
+
+
+class ExecCommandHandler(ICommandHandler):
+    """Command handler for the admin-only /exec command."""
+    
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        Handle the /exec command by listing the allowed actions or running one.
+
+        The action's output is streamed into a reply that is edited as it
+        grows. It runs outside the chat's update queue, so the chat's other
+        commands are answered while it runs.
+
+        Args:
+            update (telegram.Update): The Telegram update object containing the command.
+            context (telegram.ext.ContextTypes.DEFAULT_TYPE): The Telegram bot context object.
+        """
+        services = get_services(context)
+        runner = services.actions if services is not None else None
+        if runner is None or not runner.names():
+            await send_reply(update, context, "No actions are configured.")
+            return
+
+        if not context.args:
+            lines = ["Actions:"] + [f"{name} - {runner.get(name).command}" for name in runner.names()]
+            lines.append("Run one with /exec <name>")
+            await send_reply(update, context, "\n".join(lines))
+            return
+
+        name = context.args[0]
+        if runner.get(name) is None:
+            await send_reply(update, context, f"Unknown action '{name}'. Send /exec to list the actions.")
+            return
+        runner.run_in_background(stream_reply(update, context, runner.run(name), STREAM_POLICY))
+    
+    def rate_limit(self) -> Optional[RateLimit]:
+        """Admins may start 10 actions per minute."""
+        return RATE_LIMIT
+    
+    def admin_only(self) -> bool:
+        """Only bot admins may run actions."""
+        return True
+    
+    def name(self) -> str:
+        """Get the command name for this handler."""
+        return '/exec'
@@ -0,0 +1,76 @@
+from typing import Optional
+from .icommand_handler import ICommandHandler
+from .status import format_value
+from telegram import Update
+from telegram.ext import ContextTypes
+from bot_services import get_services
+from host_metrics import HOST_METRICS, parse_window
+from output_delivery import send_output
+from rate_limiter import RateLimit
+from response_cache import ARGS_SCOPE, CachePolicy
+
+# Summaries come from precomputed aggregates; the limit keeps one user from flooding a chat with them
+RATE_LIMIT = RateLimit(10, 60.0)
+
+USAGE = "Usage: /history <metric> <window>, e.g. /history cpu 15m\nMetrics: " + ", ".join(HOST_METRICS)
+
+
+class HistoryCommandHandler(ICommandHandler):
+    """Command handler for the /history command."""
+    
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        Handle the /history command by sending aggregates of one host metric.
+
+        Args:
+            update (telegram.Update): The Telegram update object containing the command.
+            context (telegram.ext.ContextTypes.DEFAULT_TYPE): The Telegram bot context object.
+        """
+        await send_output(update, context, await self.render(update, context))
+    
+    async def render(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> str:
+        """
+        Summarize a metric over a window, e.g. ``/history cpu 15m``.
+
+        Returns:
+            str: Min, average, max and percentiles, or a usage message
+        """
+        args = getattr(context, "args", None) or []
+        if len(args) != 2 or args[0].lower() not in HOST_METRICS:
+            return USAGE
+        metric = args[0].lower()
+        try:
+            window = parse_window(args[1])
+        except ValueError as error:
+            return f"{error}\n{USAGE}"
+
+        services = get_services(context)
+        sampler = services.host_metrics if services is not None else None
+        if sampler is None:
+            return "Host metrics are not being collected."
+        summary = sampler.summary(metric, window)
+        if summary is None:
+            return f"No {metric} samples in the last {args[1]}."
+
+        unit = HOST_METRICS[metric]
+        note = ""
+        if window > sampler.retention:
+            note = f" (history is kept for {sampler.retention:.0f}s)"
+        return "\n".join([
+            f"{metric} over the last {args[1]}{note}, {summary.samples} samples:",
+            f"min {format_value(summary.minimum, unit)}, avg {format_value(summary.average, unit)}, "
+            f"max {format_value(summary.maximum, unit)}",
+            f"p50 {format_value(summary.p50, unit)}, p95 {format_value(summary.p95, unit)}",
+        ])
+    
+    def cache_policy(self) -> Optional[CachePolicy]:
+        """Answers depend only on the arguments and change with each sample."""
+        return CachePolicy(ttl=2.0, scope=ARGS_SCOPE)
+    
+    def rate_limit(self) -> Optional[RateLimit]:
+        """Users get 10 summaries per minute."""
+        return RATE_LIMIT
+    
+    def name(self) -> str:
+        """Get the command name for this handler."""
+        return '/history'
@@ -1,7 +1,14 @@
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, AsyncIterator, Optional, Tuple
 from telegram import Update
 from telegram.ext import ContextTypes
 
+if TYPE_CHECKING:
+    from executor_offload import CommandRequest, ExecutionPolicy
+    from rate_limiter import RateLimit
+    from response_cache import CachePolicy
+    from streaming import StreamPolicy
+
 
 class ICommandHandler(ABC):
     """
@@ -30,3 +37,127 @@ class ICommandHandler(ABC):
             The command name as a string (e.g., '/start', '/help')
         """
         pass 
+    
+    def cache_policy(self) -> Optional["CachePolicy"]:
+        """
+        Get how replies of this command may be cached.
+        
+        Handlers returning a policy must implement ``render``; the router then
+        serves repeated calls from the response cache instead of ``handle``.
+        
+        Returns:
+            The cache policy, or None if replies must not be cached
+        """
+        return None
+    
+    async def render(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> str:
+        """
+        Compute the reply text without sending it.
+        
+        Args:
+            update: The Telegram update object containing the command
+            context: The Telegram bot context object
+        
+        Returns:
+            The reply text
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not render cacheable replies")
+    
+    def execution_policy(self) -> Optional["ExecutionPolicy"]:
+        """
+        Get where this command's work runs.
+        
+        Handlers that block or burn CPU return a thread or process policy and
+        implement ``run_blocking``; the router then runs that in a worker pool
+        instead of awaiting ``handle`` on the event loop.
+        
+        Returns:
+            The execution policy, or None to run ``handle`` on the event loop
+        """
+        return None
+    
+    def run_blocking(self, request: "CommandRequest") -> str:
+        """
+        Do the command's blocking work in a worker thread or process.
+        
+        Runs without access to the bot, the update or the context; everything
+        needed must come from the request. Handlers using a process policy
+        must be picklable.
+        
+        Args:
+            request: Picklable summary of the command call
+        
+        Returns:
+            The reply text
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not run in a worker pool")
+    
+    def rate_limit(self) -> Optional["RateLimit"]:
+        """
+        Get how often one user may run this command.
+        
+        The router checks it, together with the bot-wide per-user limit,
+        before the handler runs; rejected calls never reach ``handle``.
+        
+        Returns:
+            The per-user limit of this command, or None for no command limit
+        """
+        return None
+    
+    def stream_policy(self) -> Optional["StreamPolicy"]:
+        """
+        Get how this command's output is streamed.
+        
+        Handlers returning a policy must implement ``stream``; the router then
+        shows its output as a message edited in place instead of calling
+        ``handle``.
+        
+        Returns:
+            The stream policy, or None if the command does not stream
+        """
+        return None
+    
+    def stream(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> AsyncIterator[str]:
+        """
+        Produce the command's output piece by piece, usually as an async generator.
+        
+        Args:
+            update: The Telegram update object containing the command
+            context: The Telegram bot context object
+        
+        Returns:
+            Pieces of output, appended to or replacing the output so far as
+            the stream policy says
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not stream its output")
+    
+    def admin_only(self) -> bool:
+        """
+        Get whether only bot admins may run this command.
+        
+        The bot refuses the command to everyone else before it reaches the
+        handler. Commands declared in a manifest must also be marked
+        ``"admin_only": true`` there.
+        
+        Returns:
+            True to restrict the command to ``ADMIN_USER_IDS``, False by default
+        """
+        return False
+    
+    def aliases(self) -> Tuple[str, ...]:
+        """
+        Get other names this command answers to.
+        
+        Returns:
+            Alternative command names (e.g., ('/p',)), empty by default
+        """
+        return ()
+    
+    def description(self) -> str:
+        """
+        Get the short help text shown in Telegram's command menu.
+        
+        Returns:
+            The description, empty to show the command name instead
+        """
+        return ""
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import re
+import time
+from typing import Callable, List, Optional, Tuple
+from .icommand_handler import ICommandHandler
+from telegram import Update
+from telegram.ext import ContextTypes
+from bot_services import get_services
+from executor_offload import THREAD_EXECUTION, CommandRequest, ExecutionPolicy
+from host_metrics import parse_window
+from log_index import LogFiles, LogIndex, LogPage, parse_line_time
+from outbound import send_reply
+from output_delivery import send_output
+from rate_limiter import RateLimit
+
+DEFAULT_LINES = 20
+MAX_LINES = 100
+# Longer lines are cut so a page of lines stays a few messages long
+MAX_LINE_LENGTH = 400
+# Bytes one grep examines, counted back from the end of the file
+GREP_MAX_BYTES = 256 << 20
+
+# Cold pages of a huge file are read from disk, keep that off the event loop
+EXECUTION_POLICY = ExecutionPolicy(THREAD_EXECUTION, max_concurrency=2, timeout=30.0)
+RATE_LIMIT = RateLimit(20, 60.0)
+
+USAGE = "\n".join([
+    "Usage:",
+    "/logs - list the log files",
+    "/logs <name> [lines] - last lines",
+    "/logs <name> grep <pattern> [lines] - last lines matching a regular expression",
+    "/logs <name> at <time> [lines] - lines from a time, e.g. 15m ago or 2024-05-01T12:00:00",
+    "/logs <name> from <offset> [lines] - lines from a byte offset, continuing an earlier page",
+])
+
+
+def parse_time(text: str, now: Optional[float] = None) -> float:
+    """
+    Parse a point in time given as a timestamp or as a window before now.
+
+    Args:
+        text (str): ``2024-05-01T12:00:00``, ``2024-05-01`` or a window such
+            as ``15m``, optionally followed by ``ago``
+        now (Optional[float]): Current time, defaults to ``time.time()``
+
+    Returns:
+        float: Seconds since the epoch
+
+    Raises:
+        ValueError: If the text is neither
+    """
+    ago = re.fullmatch(r"(\S+)\s+ago", text.strip(), re.IGNORECASE)
+    if ago is not None:
+        # Only a window can be counted back from now
+        text = ago.group(1)
+    else:
+        timestamp = parse_line_time(text.encode())
+        if timestamp is None and re.fullmatch(r"\d{4}-\d{2}-\d{2}", text):
+            timestamp = parse_line_time(f"{text} 00:00:00".encode())
+        if timestamp is not None:
+            return timestamp
+    try:
+        return (time.time() if now is None else now) - parse_window(text)
+    except ValueError:
+        raise ValueError(f"Invalid time '{text}', expected e.g. 15m or 2024-05-01T12:00:00") from None
+
+
+def format_page(name: str, page: LogPage, header: str) -> str:
+    """
+    Render lines read from a log file with a header and a continuation hint.
+
+    Args:
+        name (str): Configured name of the file
+        page (LogPage): The lines
+        header (str): What was asked for (e.g., 'last 20 lines')
+
+    Returns:
+        str: The reply text, possibly longer than one message
+    """
+    lines = [f"{name}, {header} ({len(page.lines)} lines, file is {page.size} bytes):"]
+    for line in page.lines:
+        lines.append(line if len(line) <= MAX_LINE_LENGTH else line[:MAX_LINE_LENGTH - 1] + "…")
+    if not page.lines:
+        lines.append("(nothing)")
+    if page.truncated:
+        lines.append(f"Searched only the last {GREP_MAX_BYTES >> 20} MiB.")
+    lines.append(f"Continue: /logs {name} from {page.end}")
+    return "\n".join(lines)
+
+
+class LogsCommandHandler(ICommandHandler):
+    """Command handler for the admin-only /logs command."""
+    
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        Handle the /logs command by paging through a configured log file.
+
+        Args:
+            update (telegram.Update): The Telegram update object containing the command.
+            context (telegram.ext.ContextTypes.DEFAULT_TYPE): The Telegram bot context object.
+        """
+        services = get_services(context)
+        log_files = services.log_files if services is not None else None
+        if log_files is None or not log_files.names():
+            await send_reply(update, context, "No log files are configured.")
+            return
+
+        args = list(getattr(context, "args", None) or [])
+        if not args:
+            await send_reply(update, context, self._list(log_files))
+            return
+        index = log_files.get(args[0])
+        if index is None:
+            await send_reply(update, context, f"Unknown log '{args[0]}', available: {', '.join(log_files.names())}")
+            return
+
+        try:
+            query, header = self._parse_query(index, args[1:])
+        except ValueError as error:
+            await send_reply(update, context, f"{error}\n{USAGE}")
+            return
+
+        request = CommandRequest.from_update(self.name(), update, args)
+        try:
+            if services.executor is not None:
+                page = await services.executor.run(self.name(), lambda _: query(), request, EXECUTION_POLICY)
+            else:
+                page = query()
+        except asyncio.TimeoutError:
+            await send_reply(update, context, f"{self.name()} took too long, please try again later.")
+            raise
+        except OSError as error:
+            await send_reply(update, context, f"Cannot read {args[0]}: {error.strerror or error}")
+            return
+
+        await send_output(update, context, format_page(args[0], page, header), filename=f"{args[0]}.log")
+    
+    def rate_limit(self) -> Optional[RateLimit]:
+        """Admins get 20 log queries per minute."""
+        return RATE_LIMIT
+    
+    def admin_only(self) -> bool:
+        """Only bot admins may read server logs."""
+        return True
+    
+    def name(self) -> str:
+        """Get the command name for this handler."""
+        return '/logs'
+    
+    @staticmethod
+    def _list(log_files: LogFiles) -> str:
+        lines = ["Log files:"]
+        for name in log_files.names():
+            path = log_files.path(name)
+            try:
+                size = f"{os.stat(path).st_size} bytes"
+            except OSError:
+                size = "missing"
+            lines.append(f"{name}: {path} ({size})")
+        return "\n".join(lines)
+    
+    @staticmethod
+    def _parse_query(index: LogIndex, args: List[str]) -> Tuple[Callable[[], LogPage], str]:
+        """
+        Turn the arguments after the file name into a query to run in a worker.
+
+        Returns:
+            Tuple[Callable[[], LogPage], str]: The query and a header describing it
+
+        Raises:
+            ValueError: If the arguments are malformed
+        """
+        count = DEFAULT_LINES
+        if args and args[-1].isdigit() and (len(args) != 2 or args[0].lower() not in ("at", "from", "grep")):
+            count = int(args.pop())
+        if not 1 <= count <= MAX_LINES:
+            raise ValueError(f"Line count must be between 1 and {MAX_LINES}")
+
+        if not args:
+            return (lambda: index.tail(count)), f"last {count} lines"
+        mode = args[0].lower()
+        if mode == "grep" and len(args) >= 2:
+            text = " ".join(args[1:])
+            try:
+                pattern = re.compile(text.encode(), re.MULTILINE)
+            except re.error as error:
+                raise ValueError(f"Invalid pattern: {error}") from None
+            return (lambda: index.grep(pattern, count, GREP_MAX_BYTES)), f"last {count} lines matching {text}"
+        if mode == "at" and (len(args) == 2 or len(args) == 3 and args[2].lower() == "ago"):
+            timestamp = parse_time(" ".join(args[1:]))
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+            return (lambda: index.seek_time(timestamp, count)), f"{count} lines from {when}"
+        if mode == "from" and len(args) == 2 and args[1].isdigit():
+            offset = int(args[1])
+            return (lambda: index.read_from(offset, count)), f"{count} lines from offset {offset}"
+        raise ValueError("Invalid arguments")
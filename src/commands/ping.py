@@ -1,6 +1,7 @@
 from .icommand_handler import ICommandHandler
 from telegram import Update
 from telegram.ext import ContextTypes
+from outbound import send_reply
 
 
 class PingCommandHandler(ICommandHandler):
@@ -14,7 +15,7 @@ class PingCommandHandler(ICommandHandler):
             update (telegram.Update): The Telegram update object containing the command.
             context (telegram.ext.ContextTypes.DEFAULT_TYPE): The Telegram bot context object.
         """
-        await update.message.reply_text("I'm alive.")
+        await send_reply(update, context, "I'm alive.")
     
     def name(self) -> str:
         """Get the command name for this handler."""
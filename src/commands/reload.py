@@ -0,0 +1,47 @@
+from .icommand_handler import ICommandHandler
+from telegram import Update
+from telegram.ext import ContextTypes
+from bot_services import get_services
+from outbound import send_reply
+from output_delivery import send_output
+
+
+class ReloadCommandHandler(ICommandHandler):
+    """Command handler for the admin-only /reload command."""
+    
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        Handle the /reload command by reloading changed command handlers.
+
+        Args:
+            update (telegram.Update): The Telegram update object containing the command.
+            context (telegram.ext.ContextTypes.DEFAULT_TYPE): The Telegram bot context object.
+        """
+        services = get_services(context)
+        reload_commands = services.reload_commands if services is not None else None
+        if reload_commands is None:
+            await send_reply(update, context, "Reloading is not available.")
+            return
+
+        try:
+            report = reload_commands()
+        except Exception as error:
+            await send_reply(update, context, f"Reload failed, the current commands stay active: {error!r}")
+            raise
+
+        lines = [
+            f"Reloaded in {report.build_seconds * 1000:.1f} ms, swapped in {report.swap_seconds * 1e6:.1f} us.",
+            f"Added: {', '.join(report.added) or 'none'}",
+            f"Reloaded: {', '.join(report.reloaded) or 'none'}",
+            f"Removed: {', '.join(report.removed) or 'none'}",
+            f"Unchanged: {report.unchanged}",
+        ]
+        await send_output(update, context, "\n".join(lines), filename="reload.txt")
+    
+    def admin_only(self) -> bool:
+        """Only bot admins may reload command handlers."""
+        return True
+    
+    def name(self) -> str:
+        """Get the command name for this handler."""
+        return '/reload'
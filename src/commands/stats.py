@@ -0,0 +1,54 @@
+from .icommand_handler import ICommandHandler
+from telegram import Update
+from telegram.ext import ContextTypes
+from bot_services import get_services
+from outbound import send_reply
+from output_delivery import send_output
+
+
+class StatsCommandHandler(ICommandHandler):
+    """Command handler for the admin-only /stats command."""
+    
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        Handle the /stats command by sending per-command latency and queue figures.
+
+        Args:
+            update (telegram.Update): The Telegram update object containing the command.
+            context (telegram.ext.ContextTypes.DEFAULT_TYPE): The Telegram bot context object.
+        """
+        services = get_services(context)
+        metrics = services.metrics if services is not None else None
+        if metrics is None:
+            await send_reply(update, context, "Metrics are disabled.")
+            return
+
+        lines = ["Commands (calls / errors / p50 / p95):"]
+        for command, command_metrics in sorted(metrics.commands().items()):
+            latency = command_metrics.latency
+            lines.append(
+                f"{command}: {command_metrics.calls} / {command_metrics.errors} / "
+                f"{latency.quantile(0.5) * 1000:.1f} ms / {latency.quantile(0.95) * 1000:.1f} ms"
+            )
+            if command_metrics.cache_hits or command_metrics.cache_misses:
+                lines[-1] += f" (cache {command_metrics.cache_hits} hits / {command_metrics.cache_misses} misses)"
+            if command_metrics.rate_limited:
+                lines[-1] += f" ({command_metrics.rate_limited} rate limited)"
+        if len(lines) == 1:
+            lines.append("no commands handled yet")
+
+        lines.append(
+            f"Event loop lag: last {metrics.loop_lag_last * 1000:.1f} ms, "
+            f"p95 {metrics.loop_lag.quantile(0.95) * 1000:.1f} ms"
+        )
+        for name, value in sorted(metrics.gauges().items()):
+            lines.append(f"{name}: {value:g}")
+        await send_output(update, context, "\n".join(lines), filename="stats.txt")
+    
+    def admin_only(self) -> bool:
+        """Only bot admins may see the metrics."""
+        return True
+    
+    def name(self) -> str:
+        """Get the command name for this handler."""
+        return '/stats'
@@ -0,0 +1,66 @@
+from typing import Optional
+from .icommand_handler import ICommandHandler
+from telegram import Update
+from telegram.ext import ContextTypes
+from bot_services import get_services
+from host_metrics import HOST_METRICS
+from output_delivery import send_output
+from response_cache import CachePolicy
+
+# Window the averages in the /status reply are taken over
+STATUS_WINDOW = 300.0
+
+
+def format_value(value: float, unit: str) -> str:
+    """Format a metric value with its unit."""
+    if unit == "B/s":
+        for prefix in ("", "K", "M", "G"):
+            if abs(value) < 1024 or prefix == "G":
+                return f"{value:.1f} {prefix}B/s"
+            value /= 1024
+    return f"{value:.1f}{unit}" if unit else f"{value:.2f}"
+
+
+class StatusCommandHandler(ICommandHandler):
+    """Command handler for the /status command."""
+    
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        Handle the /status command by sending the latest host metrics.
+
+        Args:
+            update (telegram.Update): The Telegram update object containing the command.
+            context (telegram.ext.ContextTypes.DEFAULT_TYPE): The Telegram bot context object.
+        """
+        await send_output(update, context, await self.render(update, context))
+    
+    async def render(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> str:
+        """
+        Build the status text from the background sampler's buffers.
+
+        Returns:
+            str: Latest value and 5-minute average of every host metric
+        """
+        services = get_services(context)
+        sampler = services.host_metrics if services is not None else None
+        if sampler is None:
+            return "Host metrics are not being collected."
+
+        lines = ["Server status (now / 5m avg):"]
+        for metric, unit in HOST_METRICS.items():
+            summary = sampler.summary(metric, STATUS_WINDOW)
+            if summary is None:
+                lines.append(f"{metric}: n/a")
+            else:
+                lines.append(
+                    f"{metric}: {format_value(summary.latest, unit)} / {format_value(summary.average, unit)}"
+                )
+        return "\n".join(lines)
+    
+    def cache_policy(self) -> Optional[CachePolicy]:
+        """Everyone shares the same status for a couple of seconds."""
+        return CachePolicy(ttl=2.0)
+    
+    def name(self) -> str:
+        """Get the command name for this handler."""
+        return '/status'
@@ -0,0 +1,289 @@
+"""
+Runtime configuration loaded from environment variables.
+"""
+
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import FrozenSet, Mapping, Optional, Tuple
+
+from rate_limiter import RateLimit
+from structured_logging import JSON_FORMAT, LOG_FORMATS
+from transport import TransportConfig
+from webhook_server import WebhookConfig
+
+
+POLLING_MODE = "polling"
+WEBHOOK_MODE = "webhook"
+# Internal: a shard worker whose updates are fed by the supervisor process
+WORKER_MODE = "worker"
+
+
+def _env_bool(value: Optional[str], default: bool = False) -> bool:
+    """Interpret an environment variable as a boolean flag."""
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _parse_named(
+    value: str, variable: str = "LOG_FILES", expected: str = "name=path", delimiter: str = ",",
+) -> Tuple[Tuple[str, str], ...]:
+    """
+    Parse ``name=value`` pairs separated by commas, e.g. ``app=/var/log/app.log``.
+
+    Raises:
+        ValueError: If a pair has no name or no value
+    """
+    pairs = []
+    for item in value.split(delimiter):
+        if not item.strip():
+            continue
+        name, separator, target = item.partition("=")
+        if not separator or not name.strip() or not target.strip():
+            raise ValueError(f"Invalid {variable} entry '{item.strip()}', expected {expected}")
+        pairs.append((name.strip(), target.strip()))
+    return tuple(pairs)
+
+
+def _parse_alert_services(value: str) -> Tuple[Tuple[str, str, int], ...]:
+    """
+    Parse ``name=host:port`` pairs separated by commas, e.g. ``web=127.0.0.1:80``.
+
+    Raises:
+        ValueError: If a pair is malformed or its port is not a number
+    """
+    services = []
+    for name, address in _parse_named(value, "ALERT_SERVICES", "name=host:port"):
+        host, separator, port = address.rpartition(":")
+        if not separator or not host or not port.isdigit():
+            raise ValueError(f"Invalid ALERT_SERVICES address '{address}', expected host:port")
+        services.append((name, host.strip("[]"), int(port)))
+    return tuple(services)
+
+
+@dataclass
+class BotConfig:
+    """
+    Bot runtime configuration.
+
+    Attributes:
+        mode (str): Update ingestion mode, ``polling`` or ``webhook``
+        base_url (Optional[str]): Bot API base URL override, e.g. a local
+            Bot API server or the offline fake used in tests
+        webhook (Optional[WebhookConfig]): Webhook settings, required in webhook mode
+        max_concurrent_updates (int): Handlers running at once across all chats
+        chat_queue_size (int): Pending updates kept per chat before new ones are dropped
+        outbound_global_rate (float): Outgoing messages per second across all chats
+        outbound_chat_rate (float): Outgoing messages per second to one private chat
+        outbound_group_rate (float): Outgoing messages per second to one group chat
+        commands_manifest (Optional[str]): Command manifest path, None for the bundled one
+        prewarm_commands (Tuple[str, ...]): Commands whose modules are imported at startup
+        admin_user_ids (FrozenSet[int]): Users allowed to run admin commands such as /stats
+        metrics_listen (str): Interface the Prometheus endpoint binds to
+        metrics_port (Optional[int]): Port of the Prometheus endpoint, None to disable it
+        host_metrics_interval (float): Seconds between host metric samples
+        host_metrics_retention (float): Seconds of host metric history kept for /history
+        executor_thread_workers (int): Threads running blocking command handlers
+        executor_process_workers (int): Processes running CPU-bound command handlers
+        workers (int): Worker processes updates are sharded across by chat, 1 to
+            handle everything in this process
+        state_db_path (str): SQLite file holding per-chat state, ``:memory:`` to
+            keep it only while the bot runs
+        state_flush_interval (float): Maximum seconds a state write stays buffered
+        state_batch_size (int): Buffered state writes that trigger an early flush
+        transport (TransportConfig): Connection pools and long-poll settings of
+            Bot API requests
+        catch_up_max_age (Optional[float]): Seconds after which updates pending
+            at startup are dropped, None to keep them all
+        catch_up_coalesce (bool): Answer a chat's identical commands pending at
+            startup only once
+        catch_up_low_priority (bool): Handle updates pending at startup only
+            while no live update is waiting
+        offset_file (Optional[str]): File recording the last processed update,
+            None to not persist it
+        user_rate_limit (Optional[RateLimit]): Commands one user may send across
+            all commands, None for no bot-wide limit
+        rate_limit_capacity (int): Users each rate limit tracks at once
+        rate_limit_notice (bool): Answer a user's first rejected command with a
+            cooldown notice
+        unknown_command_reply (bool): Answer unknown commands, suggesting
+            close matches
+        publish_commands (bool): Replace Telegram's command menu with the
+            registered commands at startup and after reloads
+        error_reply (bool): Tell users when their command failed
+        log_files (Tuple[Tuple[str, str], ...]): Log files /logs may read, as
+            (name, path) pairs
+        alert_interval (float): Seconds between evaluations of /alert conditions
+        alert_services (Tuple[Tuple[str, str, int], ...]): Services /alert can
+            watch, as (name, host, port) probed over TCP
+        alert_max_per_chat (int): Alerts one chat may have
+        broadcast_concurrency (int): Announcements /broadcast keeps in flight
+        exec_actions (Tuple[Tuple[str, str], ...]): Commands /exec may run, as
+            (name, command line) pairs
+        exec_max_concurrency (int): /exec actions running at once
+        exec_action_concurrency (int): Runs of one /exec action at once
+        exec_timeout (float): Seconds an /exec action may run before it is killed
+        exec_output_limit (int): Bytes of output /exec shows per run
+        log_level (str): Root log level name, e.g. ``INFO``
+        log_format (str): ``json`` for one JSON object per line, or ``text``
+        trace_sample_rate (float): Share of updates whose stages are traced,
+            from 0 to 1
+        trace_slow_seconds (Optional[float]): Updates slower than this are
+            traced even if not sampled, None to trace sampled updates only
+        trace_file (Optional[str]): File traces are appended to as OTLP JSON,
+            None to log a line per trace instead
+        shard_index (int): Internal: shard of this worker, set by the supervisor
+        shard_count (int): Internal: number of shards chats are split across
+    """
+
+    mode: str = POLLING_MODE
+    base_url: Optional[str] = None
+    webhook: Optional[WebhookConfig] = None
+    max_concurrent_updates: int = 64
+    chat_queue_size: int = 100
+    outbound_global_rate: float = 30.0
+    outbound_chat_rate: float = 1.0
+    outbound_group_rate: float = 20 / 60
+    commands_manifest: Optional[str] = None
+    prewarm_commands: Tuple[str, ...] = ()
+    admin_user_ids: FrozenSet[int] = frozenset()
+    metrics_listen: str = "127.0.0.1"
+    metrics_port: Optional[int] = None
+    host_metrics_interval: float = 5.0
+    host_metrics_retention: float = 3600.0
+    executor_thread_workers: int = 8
+    executor_process_workers: int = 2
+    workers: int = 1
+    state_db_path: str = ":memory:"
+    state_flush_interval: float = 1.0
+    state_batch_size: int = 1000
+    transport: TransportConfig = field(default_factory=TransportConfig)
+    catch_up_max_age: Optional[float] = None
+    catch_up_coalesce: bool = False
+    catch_up_low_priority: bool = False
+    offset_file: Optional[str] = None
+    user_rate_limit: Optional[RateLimit] = None
+    rate_limit_capacity: int = 65536
+    rate_limit_notice: bool = True
+    unknown_command_reply: bool = True
+    publish_commands: bool = False
+    error_reply: bool = False
+    log_files: Tuple[Tuple[str, str], ...] = ()
+    alert_interval: float = 5.0
+    alert_services: Tuple[Tuple[str, str, int], ...] = ()
+    alert_max_per_chat: int = 20
+    broadcast_concurrency: int = 16
+    exec_actions: Tuple[Tuple[str, str], ...] = ()
+    exec_max_concurrency: int = 8
+    exec_action_concurrency: int = 1
+    exec_timeout: float = 60.0
+    exec_output_limit: int = 64 << 10
+    log_level: str = "INFO"
+    log_format: str = JSON_FORMAT
+    trace_sample_rate: float = 0.0
+    trace_slow_seconds: Optional[float] = None
+    trace_file: Optional[str] = None
+    shard_index: int = 0
+    shard_count: int = 1
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "BotConfig":
+        """
+        Build the configuration from environment variables.
+
+        Args:
+            environ (Optional[Mapping[str, str]]): Variables to read, defaults to ``os.environ``
+
+        Returns:
+            BotConfig: The loaded configuration
+
+        Raises:
+            ValueError: If the mode, log level or format is unknown, webhook settings are
+                incomplete or the trace sample rate is out of range
+        """
+        env = os.environ if environ is None else environ
+
+        mode = env.get("BOT_MODE", POLLING_MODE).strip().lower()
+        if mode not in (POLLING_MODE, WEBHOOK_MODE):
+            raise ValueError(f"Unknown BOT_MODE '{mode}', expected 'polling' or 'webhook'")
+
+        log_format = env.get("LOG_FORMAT", JSON_FORMAT).strip().lower()
+        if log_format not in LOG_FORMATS:
+            raise ValueError(f"Unknown LOG_FORMAT '{log_format}', expected 'json' or 'text'")
+        log_level = env.get("LOG_LEVEL", "INFO").strip().upper()
+        if not isinstance(logging.getLevelName(log_level), int):
+            raise ValueError(f"Unknown LOG_LEVEL '{log_level}'")
+        trace_sample_rate = float(env.get("TRACE_SAMPLE_RATE", "0"))
+        if not 0.0 <= trace_sample_rate <= 1.0:
+            raise ValueError("TRACE_SAMPLE_RATE must be between 0 and 1")
+
+        webhook = None
+        if mode == WEBHOOK_MODE:
+            url = env.get("WEBHOOK_URL")
+            if not url:
+                raise ValueError("WEBHOOK_URL must be set in webhook mode")
+            webhook = WebhookConfig(
+                url=url,
+                listen=env.get("WEBHOOK_LISTEN", "0.0.0.0"),
+                port=int(env.get("WEBHOOK_PORT", "8443")),
+                path=env.get("WEBHOOK_PATH", "/telegram"),
+                secret_token=env.get("WEBHOOK_SECRET_TOKEN") or None,
+                max_connections=int(env.get("WEBHOOK_MAX_CONNECTIONS", "40")),
+                drop_pending_updates=_env_bool(env.get("WEBHOOK_DROP_PENDING_UPDATES")),
+            )
+
+        return cls(
+            mode=mode,
+            base_url=env.get("TELEGRAM_API_BASE_URL") or None,
+            webhook=webhook,
+            max_concurrent_updates=int(env.get("MAX_CONCURRENT_UPDATES", "64")),
+            chat_queue_size=int(env.get("CHAT_QUEUE_SIZE", "100")),
+            outbound_global_rate=float(env.get("OUTBOUND_GLOBAL_RATE", "30")),
+            outbound_chat_rate=float(env.get("OUTBOUND_CHAT_RATE", "1")),
+            outbound_group_rate=float(env.get("OUTBOUND_GROUP_RATE", str(20 / 60))),
+            commands_manifest=env.get("COMMANDS_MANIFEST") or None,
+            prewarm_commands=tuple(
+                command.strip() for command in env.get("PREWARM_COMMANDS", "").split(",") if command.strip()
+            ),
+            admin_user_ids=frozenset(
+                int(user_id) for user_id in env.get("ADMIN_USER_IDS", "").split(",") if user_id.strip()
+            ),
+            metrics_listen=env.get("METRICS_LISTEN", "127.0.0.1"),
+            metrics_port=int(env["METRICS_PORT"]) if env.get("METRICS_PORT") else None,
+            host_metrics_interval=float(env.get("HOST_METRICS_INTERVAL", "5")),
+            host_metrics_retention=float(env.get("HOST_METRICS_RETENTION", "3600")),
+            executor_thread_workers=int(env.get("EXECUTOR_THREAD_WORKERS", "8")),
+            executor_process_workers=int(env.get("EXECUTOR_PROCESS_WORKERS", "2")),
+            workers=int(env.get("WORKERS", "1")),
+            state_db_path=env.get("STATE_DB_PATH") or ":memory:",
+            state_flush_interval=float(env.get("STATE_FLUSH_INTERVAL", "1")),
+            state_batch_size=int(env.get("STATE_BATCH_SIZE", "1000")),
+            transport=TransportConfig.from_env(env),
+            catch_up_max_age=float(env["CATCH_UP_MAX_AGE"]) if env.get("CATCH_UP_MAX_AGE") else None,
+            catch_up_coalesce=_env_bool(env.get("CATCH_UP_COALESCE")),
+            catch_up_low_priority=_env_bool(env.get("CATCH_UP_LOW_PRIORITY")),
+            offset_file=env.get("UPDATE_OFFSET_FILE") or None,
+            user_rate_limit=RateLimit.parse(env["RATE_LIMIT_PER_USER"]) if env.get("RATE_LIMIT_PER_USER") else None,
+            rate_limit_capacity=int(env.get("RATE_LIMIT_CAPACITY", "65536")),
+            rate_limit_notice=_env_bool(env.get("RATE_LIMIT_NOTICE"), default=True),
+            unknown_command_reply=_env_bool(env.get("UNKNOWN_COMMAND_REPLY"), default=True),
+            publish_commands=_env_bool(env.get("PUBLISH_COMMANDS")),
+            error_reply=_env_bool(env.get("ERROR_REPLY")),
+            log_files=_parse_named(env.get("LOG_FILES", "")),
+            alert_interval=float(env.get("ALERT_INTERVAL", "5")),
+            alert_services=_parse_alert_services(env.get("ALERT_SERVICES", "")),
+            alert_max_per_chat=int(env.get("ALERT_MAX_PER_CHAT", "20")),
+            broadcast_concurrency=int(env.get("BROADCAST_CONCURRENCY", "16")),
+            # Semicolons, as command lines may contain commas
+            exec_actions=_parse_named(env.get("EXEC_ACTIONS", ""), "EXEC_ACTIONS", "name=command", ";"),
+            exec_max_concurrency=int(env.get("EXEC_MAX_CONCURRENCY", "8")),
+            exec_action_concurrency=int(env.get("EXEC_ACTION_CONCURRENCY", "1")),
+            exec_timeout=float(env.get("EXEC_TIMEOUT", "60")),
+            exec_output_limit=int(env.get("EXEC_OUTPUT_LIMIT", str(64 << 10))),
+            log_level=log_level,
+            log_format=log_format,
+            trace_sample_rate=trace_sample_rate,
+            trace_slow_seconds=float(env["TRACE_SLOW_SECONDS"]) if env.get("TRACE_SLOW_SECONDS") else None,
+            trace_file=env.get("TRACE_FILE") or None,
+        )
@@ -0,0 +1,301 @@
+"""
+Allow-listed maintenance actions run as asyncio subprocesses.
+
+Admins run actions configured by name, such as restarting a service or a
+health check script, never arbitrary command lines. Each action's command
+is split like a shell would split it but runs without a shell, in a new
+session, so its process group holds everything it starts. Output of
+stdout and stderr is read as it arrives without blocking the event loop
+and yielded piece by piece, for ``stream_reply`` to show as an edited
+message.
+
+A global and a per-action semaphore bound how many actions run at once;
+an action over either limit waits for a slot. An action still running at
+its timeout, or whose reply is cancelled, has its whole process group
+terminated, then killed if it ignores that. Output beyond the size cap is
+read and discarded so the action is not stalled on a full pipe.
+"""
+
+import asyncio
+import codecs
+import contextvars
+import logging
+import os
+import shlex
+import signal
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Dict, List, Optional, Set, Tuple
+
+from tracing import activate
+
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class ExecAction:
+    """
+    A command admins may run by name.
+
+    Attributes:
+        name (str): Name used with /exec
+        argv (Tuple[str, ...]): Program and arguments
+    """
+
+    name: str
+    argv: Tuple[str, ...]
+
+    @classmethod
+    def parse(cls, name: str, command: str) -> "ExecAction":
+        """
+        Build an action from a command line, split with shell quoting rules.
+
+        Raises:
+            ValueError: If the command line is empty or its quotes are unbalanced
+        """
+        argv = tuple(shlex.split(command))
+        if not argv:
+            raise ValueError(f"Action '{name}' has no command")
+        return cls(name, argv)
+
+    @property
+    def command(self) -> str:
+        """The command line, quoted for display."""
+        return shlex.join(self.argv)
+
+
+@dataclass
+class ExecStats:
+    """Point-in-time snapshot of action counters."""
+
+    running: int
+    waiting: int
+    started: int
+    failed: int
+    timeouts: int
+    truncated: int
+
+
+class ActionRunner:
+    """
+    Runs allow-listed actions with concurrency limits, timeouts and output caps.
+    """
+
+    def __init__(
+        self,
+        actions: Tuple[ExecAction, ...] = (),
+        max_concurrency: int = 8,
+        action_concurrency: int = 1,
+        timeout: float = 60.0,
+        output_limit: int = 64 << 10,
+        kill_grace: float = 2.0,
+    ):
+        """
+        Initialize the runner.
+
+        Args:
+            actions (Tuple[ExecAction, ...]): The allow-list
+            max_concurrency (int): Actions running at once across all names
+            action_concurrency (int): Runs of one action at once
+            timeout (float): Seconds an action may run before it is killed
+            output_limit (int): Bytes of output shown per run
+            kill_grace (float): Seconds between SIGTERM and SIGKILL
+
+        Raises:
+            ValueError: If a limit is not positive or a name is listed twice
+        """
+        if max_concurrency < 1 or action_concurrency < 1 or timeout <= 0 or output_limit < 1:
+            raise ValueError("Exec limits must be positive")
+        self._actions: Dict[str, ExecAction] = {}
+        for action in actions:
+            if action.name in self._actions:
+                raise ValueError(f"Action '{action.name}' is configured twice")
+            self._actions[action.name] = action
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._action_slots = {name: asyncio.Semaphore(action_concurrency) for name in self._actions}
+        self._timeout = timeout
+        self._output_limit = output_limit
+        self._kill_grace = kill_grace
+        self._tasks: Set[asyncio.Task] = set()
+        self._running = 0
+        self._waiting = 0
+        self._started = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._truncated = 0
+
+    def names(self) -> List[str]:
+        """Get the names of the allowed actions."""
+        return sorted(self._actions)
+
+    def get(self, name: str) -> Optional[ExecAction]:
+        """Get an allowed action, None if no action has that name."""
+        return self._actions.get(name)
+
+    async def run(self, name: str) -> AsyncIterator[str]:
+        """
+        Run an action, yielding its output as it arrives and a status line at the end.
+
+        Closing the iterator early kills the action's process group.
+
+        Args:
+            name (str): Name of an allowed action
+
+        Raises:
+            KeyError: If no action has that name
+        """
+        action = self._actions[name]
+        action_slot = self._action_slots[name]
+        if action_slot.locked() or self._slots.locked():
+            yield "Waiting for a free slot...\n"
+        self._waiting += 1
+        try:
+            await action_slot.acquire()
+            try:
+                await self._slots.acquire()
+            except BaseException:
+                action_slot.release()
+                raise
+        finally:
+            self._waiting -= 1
+        self._running += 1
+        self._started += 1
+        output = self._execute(action)
+        try:
+            yield f"$ {action.command}\n"
+            async for chunk in output:
+                yield chunk
+        finally:
+            # Kills the process now if the caller stopped reading early
+            await output.aclose()
+            self._running -= 1
+            self._slots.release()
+            action_slot.release()
+
+    def run_in_background(self, job: Awaitable[None]) -> asyncio.Task:
+        """
+        Run a coroutine, typically a streamed reply of ``run``, outside the chat's queue.
+
+        The chat can send other commands while the action runs; ``stop``
+        cancels whatever is still running.
+
+        Returns:
+            asyncio.Task: The running job
+        """
+        # Outlives the update's trace, so its sends must not add spans to it
+        context = contextvars.copy_context()
+        context.run(activate, None)
+        task = context.run(asyncio.ensure_future, job)
+        self._tasks.add(task)
+        task.add_done_callback(self._job_done)
+        return task
+
+    async def stop(self) -> None:
+        """Cancel running actions, killing their processes."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> ExecStats:
+        """Get a snapshot of the action counters."""
+        return ExecStats(
+            running=self._running,
+            waiting=self._waiting,
+            started=self._started,
+            failed=self._failed,
+            timeouts=self._timeouts,
+            truncated=self._truncated,
+        )
+
+    def _job_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Exec action failed", exc_info=task.exception())
+
+    async def _execute(self, action: ExecAction) -> AsyncIterator[str]:
+        started = time.monotonic()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *action.argv,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                # Its own process group, so a timeout kills what it started too
+                start_new_session=True,
+            )
+        except OSError as error:
+            self._failed += 1
+            yield f"Cannot start {action.name}: {error.strerror or error}\n"
+            return
+        logger.info("Exec action %s started (pid %d)", action.name, process.pid)
+
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        deadline = started + self._timeout
+        shown = 0
+        timed_out = False
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    data = await asyncio.wait_for(process.stdout.read(READ_SIZE), remaining)
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    break
+                if not data:
+                    break
+                if shown < self._output_limit:
+                    data = data[:self._output_limit - shown]
+                    shown += len(data)
+                    text = decoder.decode(data)
+                    if shown >= self._output_limit:
+                        self._truncated += 1
+                        text += decoder.decode(b"", final=True) + f"\n[output cut at {self._output_limit} bytes]\n"
+                    if text:
+                        yield text
+            if not timed_out:
+                # An action can close its output and keep running
+                try:
+                    await asyncio.wait_for(process.wait(), max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    timed_out = True
+            if timed_out:
+                self._timeouts += 1
+                await self._kill(process)
+        finally:
+            if process.returncode is None:
+                # Cancelled, or the reader stopped early
+                await self._kill(process)
+        if shown < self._output_limit:
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+        elapsed = time.monotonic() - started
+        if timed_out:
+            self._failed += 1
+            yield f"\n[killed after the {self._timeout:g}s timeout]"
+        elif process.returncode != 0:
+            self._failed += 1
+            yield f"\n[exit code {process.returncode} after {elapsed:.1f}s]"
+        else:
+            yield f"\n[done in {elapsed:.1f}s]"
+        logger.info("Exec action %s exited with %s after %.1fs", action.name, process.returncode, elapsed)
+
+    async def _kill(self, process: asyncio.subprocess.Process) -> None:
+        """Terminate the action's process group, killing it if it outlives the grace period."""
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                os.killpg(process.pid, sig)
+            except ProcessLookupError:
+                pass
+            try:
+                await asyncio.wait_for(asyncio.shield(process.wait()), self._kill_grace)
+                return
+            except asyncio.TimeoutError:
+                continue
+        await process.wait()
@@ -0,0 +1,214 @@
+"""
+Running blocking or CPU-heavy command handlers off the event loop.
+
+Handlers that block (synchronous I/O, heavy computation) declare an
+``ExecutionPolicy``. The router then calls their synchronous
+``run_blocking`` in a shared thread pool or process pool instead of
+awaiting ``handle`` on the loop, so other chats keep being served. Each
+command can cap how many of its calls run at once and how long the router
+waits for one.
+
+Workers only receive a ``CommandRequest``, a small picklable summary of
+the update, because Telegram objects and the bot context cannot cross a
+process boundary. The reply text is sent back on the loop.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+ASYNC_EXECUTION = "async"
+THREAD_EXECUTION = "thread"
+PROCESS_EXECUTION = "process"
+
+EXECUTION_MODES = (ASYNC_EXECUTION, THREAD_EXECUTION, PROCESS_EXECUTION)
+
+
+@dataclass(frozen=True)
+class ExecutionPolicy:
+    """
+    Where and how a command handler runs.
+
+    Attributes:
+        mode (str): ``async`` (on the event loop), ``thread`` for blocking
+            I/O or ``process`` for CPU-bound work
+        max_concurrency (Optional[int]): Calls of the command running at once, None for no cap
+        timeout (Optional[float]): Seconds to wait for a result, None to wait forever
+    """
+
+    mode: str = ASYNC_EXECUTION
+    max_concurrency: Optional[int] = None
+    timeout: Optional[float] = None
+
+    def __post_init__(self):
+        if self.mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode '{self.mode}', expected one of {EXECUTION_MODES}")
+        if self.max_concurrency is not None and self.max_concurrency < 1:
+            raise ValueError("Execution concurrency must be positive")
+        if self.timeout is not None and self.timeout <= 0:
+            raise ValueError("Execution timeout must be positive")
+
+
+@dataclass(frozen=True)
+class CommandRequest:
+    """
+    Picklable description of a command call handed to worker threads and processes.
+
+    Attributes:
+        command (str): Command name (e.g., '/report')
+        args (Tuple[str, ...]): Command arguments
+        chat_id (Optional[int]): Chat the command was sent in
+        user_id (Optional[int]): User who sent the command
+        text (str): Full message text
+    """
+
+    command: str
+    args: Tuple[str, ...] = ()
+    chat_id: Optional[int] = None
+    user_id: Optional[int] = None
+    text: str = ""
+
+    @classmethod
+    def from_update(cls, command: str, update: Any, args: Optional[List[str]]) -> "CommandRequest":
+        """
+        Summarize an update for a worker.
+
+        Args:
+            command (str): Parsed command name
+            update: The update being handled
+            args (Optional[List[str]]): Parsed command arguments
+
+        Returns:
+            CommandRequest: The picklable request
+        """
+        chat = getattr(update, "effective_chat", None)
+        user = getattr(update, "effective_user", None)
+        message = getattr(update, "effective_message", None)
+        return cls(
+            command=command,
+            args=tuple(args or ()),
+            chat_id=chat.id if chat is not None else None,
+            user_id=user.id if user is not None else None,
+            text=(message.text or "") if message is not None else "",
+        )
+
+
+class HandlerExecutor:
+    """
+    Shared thread and process pools with per-command concurrency caps.
+
+    Pools are created on first use, so bots without blocking commands never
+    start worker threads or processes.
+    """
+
+    def __init__(self, thread_workers: int = 8, process_workers: int = 2):
+        """
+        Initialize the executor.
+
+        Args:
+            thread_workers (int): Size of the thread pool
+            process_workers (int): Size of the process pool
+
+        Raises:
+            ValueError: If a pool size is not positive
+        """
+        if thread_workers < 1 or process_workers < 1:
+            raise ValueError("Executor pool sizes must be positive")
+        self._thread_workers = thread_workers
+        self._process_workers = process_workers
+        self._pools: Dict[str, Executor] = {}
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self._running = {THREAD_EXECUTION: 0, PROCESS_EXECUTION: 0}
+        self._timeouts = 0
+
+    def running(self, mode: str) -> int:
+        """Get the number of calls currently running in a pool."""
+        return self._running[mode]
+
+    @property
+    def timeouts(self) -> int:
+        """Number of calls the router stopped waiting for."""
+        return self._timeouts
+
+    async def run(
+        self,
+        command: str,
+        function: Callable[[CommandRequest], str],
+        request: CommandRequest,
+        policy: ExecutionPolicy,
+    ) -> str:
+        """
+        Run a handler's blocking function in the pool chosen by its policy.
+
+        A call that times out keeps its concurrency slot until the worker
+        actually finishes, because running threads and processes cannot be
+        interrupted.
+
+        Args:
+            command (str): Command name, used for the concurrency cap
+            function (Callable[[CommandRequest], str]): Picklable function
+                returning the reply text, usually ``handler.run_blocking``
+            request (CommandRequest): Argument passed to ``function``
+            policy (ExecutionPolicy): Pool, concurrency cap and timeout
+
+        Returns:
+            str: The value returned by ``function``
+
+        Raises:
+            ValueError: If the policy is not a thread or process policy
+            asyncio.TimeoutError: If the call does not finish within the timeout
+            Exception: Whatever ``function`` raised
+        """
+        if policy.mode not in self._running:
+            raise ValueError(f"Execution mode '{policy.mode}' does not run in a pool")
+
+        limit = None
+        if policy.max_concurrency is not None:
+            limit = self._limits.get(command)
+            if limit is None:
+                limit = self._limits[command] = asyncio.Semaphore(policy.max_concurrency)
+            await limit.acquire()
+
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._pool(policy.mode), function, request)
+        except BaseException:
+            if limit is not None:
+                limit.release()
+            raise
+        self._running[policy.mode] += 1
+
+        def release(_):
+            self._running[policy.mode] -= 1
+            if limit is not None:
+                limit.release()
+
+        future.add_done_callback(release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), policy.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            # Nobody will read the result of the abandoned call
+            future.add_done_callback(lambda done: done.cancelled() or done.exception())
+            raise
+
+    async def stop(self) -> None:
+        """Shut the pools down, dropping calls that have not started."""
+        pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _pool(self, mode: str) -> Executor:
+        pool = self._pools.get(mode)
+        if pool is None:
+            if mode == THREAD_EXECUTION:
+                pool = ThreadPoolExecutor(self._thread_workers, thread_name_prefix="command")
+            else:
+                pool = ProcessPoolExecutor(self._process_workers)
+            self._pools[mode] = pool
+            logger.debug("Started %s pool for blocking command handlers", mode)
+        return pool
@@ -0,0 +1,494 @@
+"""
+Background sampling of host metrics into fixed-size ring buffers.
+
+A single task reads CPU, memory, disk, network and load figures from
+``/proc`` at a fixed interval and appends them to preallocated
+``array``-backed ring buffers, so memory use does not grow with uptime and
+commands such as ``/status`` and ``/history`` answer from already collected
+samples instead of touching the system themselves.
+
+Aggregates are precomputed as samples arrive. Each buffer is split into
+blocks of about the square root of its capacity, and every block keeps its
+count, sum, minimum, maximum and a quantile sketch, updated on append. A
+summary over any window combines the blocks it covers and reads raw
+samples only from the one block straddling the window start, so it costs
+O(sqrt(capacity)) blocks instead of copying and sorting the window.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Sampled metrics and their units, in display order
+HOST_METRICS = {
+    "cpu": "%",
+    "memory": "%",
+    "disk": "%",
+    "load": "",
+    "net_rx": "B/s",
+    "net_tx": "B/s",
+}
+
+_WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Percentiles from sketches are within this fraction of a true sample value
+SKETCH_ACCURACY = 0.01
+_SKETCH_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_SKETCH_LOG_GAMMA = math.log(_SKETCH_GAMMA)
+# Values at or below this share one bin and are reported as the minimum
+_SKETCH_MIN_VALUE = 1e-9
+
+
+def parse_window(text: str) -> float:
+    """
+    Parse a time window such as ``30s``, ``5m``, ``1h`` or ``2d``.
+
+    Args:
+        text (str): Window with a unit suffix; a bare number means seconds
+
+    Returns:
+        float: The window in seconds
+
+    Raises:
+        ValueError: If the window is malformed or not positive
+    """
+    text = text.strip().lower()
+    multiplier = _WINDOW_UNITS.get(text[-1:], None)
+    number = text[:-1] if multiplier is not None else text
+    try:
+        seconds = float(number) * (multiplier or 1)
+    except ValueError:
+        raise ValueError(f"Invalid window '{text}', expected e.g. 30s, 5m or 1h") from None
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise ValueError(f"Invalid window '{text}', it must be positive")
+    return seconds
+
+
+class QuantileSketch:
+    """
+    Counts of values in logarithmic bins, mergeable and of bounded size.
+
+    Bin ``k`` holds values in ``(gamma ** (k - 1), gamma ** k]``, so any
+    quantile is known to within ``SKETCH_ACCURACY`` of a true value, and the
+    number of bins grows with the logarithm of the value range, not with
+    the number of values.
+    """
+
+    __slots__ = ("bins", "count")
+
+    def __init__(self):
+        """Initialize an empty sketch."""
+        self.bins: Dict[int, int] = {}
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        """Count one value."""
+        key = math.ceil(math.log(value) / _SKETCH_LOG_GAMMA) if value > _SKETCH_MIN_VALUE else None
+        self.bins[key] = self.bins.get(key, 0) + 1
+        self.count += 1
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Add another sketch's counts to this one."""
+        bins = self.bins
+        for key, count in other.bins.items():
+            bins[key] = bins.get(key, 0) + count
+        self.count += other.count
+
+    def quantile(self, fraction: float, minimum: float, maximum: float) -> float:
+        """
+        Estimate the value at a rank, the nearest-rank way ``summarize`` does.
+
+        Args:
+            fraction (float): Rank as a fraction, e.g. 0.95
+            minimum (float): Smallest counted value, returned for the lowest bin
+            maximum (float): Largest counted value, no estimate exceeds it
+
+        Returns:
+            float: The estimate, 0.0 for an empty sketch
+        """
+        if not self.count:
+            return 0.0
+        rank = min(self.count, max(1, math.ceil(fraction * self.count)))
+        seen = self.bins.get(None, 0)
+        if seen >= rank:
+            return minimum
+        for key in sorted(key for key in self.bins if key is not None):
+            seen += self.bins[key]
+            if seen >= rank:
+                estimate = 2 * _SKETCH_GAMMA ** key / (_SKETCH_GAMMA + 1)
+                return min(maximum, max(minimum, estimate))
+        return maximum
+
+
+class _Block:
+    """Aggregates of the samples appended to one block of a ring buffer."""
+
+    __slots__ = ("count", "total", "minimum", "maximum", "sketch")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.sketch = QuantileSketch()
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+        self.sketch.add(value)
+
+
+class RingBuffer:
+    """
+    Fixed-capacity buffer of timestamped samples backed by two ``array('d')``.
+
+    Once full, every append overwrites the oldest sample. Timestamps must
+    not decrease. Block aggregates are updated on every append, so
+    ``summary_since`` does not need to visit every sample in the window.
+    """
+
+    __slots__ = ("_times", "_values", "_capacity", "_next", "_size", "_appended", "_block_size", "_blocks")
+
+    def __init__(self, capacity: int):
+        """
+        Allocate the buffer.
+
+        Args:
+            capacity (int): Maximum number of samples kept
+
+        Raises:
+            ValueError: If the capacity is not positive
+        """
+        if capacity < 1:
+            raise ValueError("Ring buffer capacity must be positive")
+        self._times = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._capacity = capacity
+        self._next = 0
+        self._size = 0
+        # Samples appended so far; sample n sits at index n % capacity, in block n // block size
+        self._appended = 0
+        self._block_size = max(1, math.isqrt(capacity))
+        # Retained samples touch at most this many blocks, the oldest partly overwritten
+        self._blocks = [_Block() for _ in range(-(-capacity // self._block_size) + 1)]
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of samples kept."""
+        return self._capacity
+
+    def append(self, timestamp: float, value: float) -> None:
+        """Store a sample, overwriting the oldest one when full, and update its block's aggregates."""
+        self._times[self._next] = timestamp
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self._capacity
+        if self._size < self._capacity:
+            self._size += 1
+        block_number, position = divmod(self._appended, self._block_size)
+        block = self._blocks[block_number % len(self._blocks)]
+        if position == 0:
+            block.reset()
+        block.add(value)
+        self._appended += 1
+
+    def latest(self) -> Optional[Tuple[float, float]]:
+        """Get the newest ``(timestamp, value)`` pair, if any."""
+        if not self._size:
+            return None
+        index = (self._next - 1) % self._capacity
+        return self._times[index], self._values[index]
+
+    def values_since(self, since: float) -> List[float]:
+        """
+        Get the values sampled at or after a point in time, oldest first.
+
+        Args:
+            since (float): Earliest timestamp to include
+
+        Returns:
+            List[float]: Matching values
+        """
+        values = []
+        index = (self._next - 1) % self._capacity
+        for _ in range(self._size):
+            if self._times[index] < since:
+                break
+            values.append(self._values[index])
+            index = (index - 1) % self._capacity
+        values.reverse()
+        return values
+
+    def summary_since(self, since: float) -> Optional["MetricSummary"]:
+        """
+        Aggregate the samples taken at or after a point in time.
+
+        Minimum, average and maximum are exact; percentiles come from the
+        block sketches and are within ``SKETCH_ACCURACY`` of a sample value.
+
+        Args:
+            since (float): Earliest timestamp to include
+
+        Returns:
+            Optional[MetricSummary]: The aggregates, None if no sample is that recent
+        """
+        if not self._size:
+            return None
+        capacity, block_size = self._capacity, self._block_size
+        oldest = self._appended - self._size
+        newest = self._appended - 1
+        window = _Block()
+        block_number = newest // block_size
+        while block_number >= 0:
+            first = block_number * block_size
+            if first >= oldest and self._times[first % capacity] >= since:
+                # Wholly inside the window and not overwritten
+                block = self._blocks[block_number % len(self._blocks)]
+                window.count += block.count
+                window.total += block.total
+                window.minimum = min(window.minimum, block.minimum)
+                window.maximum = max(window.maximum, block.maximum)
+                window.sketch.merge(block.sketch)
+                block_number -= 1
+                continue
+            # The block the window starts in, or whose oldest samples are gone
+            number = min(first + block_size, self._appended) - 1
+            while number >= max(first, oldest) and self._times[number % capacity] >= since:
+                window.add(self._values[number % capacity])
+                number -= 1
+            break
+        if not window.count:
+            return None
+        return MetricSummary(
+            samples=window.count,
+            latest=self._values[newest % capacity],
+            minimum=window.minimum,
+            average=window.total / window.count,
+            maximum=window.maximum,
+            p50=window.sketch.quantile(0.50, window.minimum, window.maximum),
+            p95=window.sketch.quantile(0.95, window.minimum, window.maximum),
+        )
+
+
+@dataclass
+class MetricSummary:
+    """Aggregates of one metric over a window."""
+
+    samples: int
+    latest: float
+    minimum: float
+    average: float
+    maximum: float
+    p50: float
+    p95: float
+
+
+def summarize(values: List[float]) -> Optional[MetricSummary]:
+    """
+    Aggregate a list of samples, oldest first.
+
+    Returns:
+        Optional[MetricSummary]: The aggregates, None for an empty list
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def percentile(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+    return MetricSummary(
+        samples=len(values),
+        latest=values[-1],
+        minimum=ordered[0],
+        average=sum(values) / len(values),
+        maximum=ordered[-1],
+        p50=percentile(0.50),
+        p95=percentile(0.95),
+    )
+
+
+class HostMetricsSampler:
+    """
+    Periodically samples host metrics into per-metric ring buffers.
+    """
+
+    def __init__(
+        self,
+        interval: float = 5.0,
+        retention: float = 3600.0,
+        proc_root: str = "/proc",
+        disk_path: str = "/",
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the sampler.
+
+        Args:
+            interval (float): Seconds between samples
+            retention (float): Seconds of history to keep; fixes buffer sizes
+            proc_root (str): Location of the proc filesystem
+            disk_path (str): Mount point whose usage is reported as ``disk``
+            clock (Callable[[], float]): Monotonic time source
+
+        Raises:
+            ValueError: If the interval or retention is not positive
+        """
+        if interval <= 0 or retention <= 0:
+            raise ValueError("Sampling interval and retention must be positive")
+        self._interval = interval
+        self._proc_root = proc_root
+        self._disk_path = disk_path
+        self._clock = clock
+        capacity = max(1, math.ceil(retention / interval))
+        self._buffers: Dict[str, RingBuffer] = {name: RingBuffer(capacity) for name in HOST_METRICS}
+        self._previous_cpu: Optional[Tuple[int, int]] = None
+        self._previous_net: Optional[Tuple[float, int, int]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._warned: Set[str] = set()
+
+    @property
+    def interval(self) -> float:
+        """Seconds between samples."""
+        return self._interval
+
+    @property
+    def retention(self) -> float:
+        """Seconds of history kept."""
+        return next(iter(self._buffers.values())).capacity * self._interval
+
+    async def start(self) -> None:
+        """Take a first sample and start sampling in the background."""
+        if self._task is None:
+            self.sample()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop sampling."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                self.sample()
+            except Exception:
+                logger.exception("Host metrics sampling failed")
+
+    def sample(self) -> None:
+        """Read every metric once and append it to its buffer."""
+        now = self._clock()
+        readers = (
+            ("cpu", self._read_cpu),
+            ("memory", self._read_memory),
+            ("disk", self._read_disk),
+            ("load", self._read_load),
+        )
+        for name, read in readers:
+            value = self._read_safely(name, read)
+            if value is not None:
+                self._buffers[name].append(now, value)
+
+        rates = self._read_safely("net", lambda: self._read_network(now))
+        if rates is not None:
+            self._buffers["net_rx"].append(now, rates[0])
+            self._buffers["net_tx"].append(now, rates[1])
+
+    def latest(self, metric: str) -> Optional[float]:
+        """
+        Get the newest sample of a metric.
+
+        Raises:
+            KeyError: If the metric is unknown
+        """
+        latest = self._buffers[metric].latest()
+        return latest[1] if latest is not None else None
+
+    def summary(self, metric: str, window: float) -> Optional[MetricSummary]:
+        """
+        Aggregate a metric over the most recent window from precomputed block aggregates.
+
+        Args:
+            metric (str): One of ``HOST_METRICS``
+            window (float): Window length in seconds
+
+        Returns:
+            Optional[MetricSummary]: The aggregates, None if there are no samples
+
+        Raises:
+            KeyError: If the metric is unknown
+        """
+        return self._buffers[metric].summary_since(self._clock() - window)
+
+    def _read_safely(self, name: str, read: Callable[[], Any]) -> Any:
+        """Run a reader, warning once per metric if the host does not provide it."""
+        try:
+            return read()
+        except (OSError, ValueError, IndexError) as error:
+            if name not in self._warned:
+                self._warned.add(name)
+                logger.warning("Cannot sample host metric %s: %s", name, error)
+            return None
+
+    def _read_cpu(self) -> Optional[float]:
+        with open(os.path.join(self._proc_root, "stat")) as stat:
+            fields = [int(field) for field in stat.readline().split()[1:]]
+        total = sum(fields[:8])
+        idle = fields[3] + fields[4]
+        previous, self._previous_cpu = self._previous_cpu, (total, idle)
+        if previous is None or total <= previous[0]:
+            return None
+        return 100.0 * (1 - (idle - previous[1]) / (total - previous[0]))
+
+    def _read_memory(self) -> float:
+        info = {}
+        with open(os.path.join(self._proc_root, "meminfo")) as meminfo:
+            for line in meminfo:
+                key, _, rest = line.partition(":")
+                info[key] = int(rest.split()[0])
+        return 100.0 * (1 - info["MemAvailable"] / info["MemTotal"])
+
+    def _read_disk(self) -> float:
+        usage = os.statvfs(self._disk_path)
+        total = usage.f_blocks * usage.f_frsize
+        return 100.0 * (1 - usage.f_bavail * usage.f_frsize / total) if total else 0.0
+
+    def _read_load(self) -> float:
+        with open(os.path.join(self._proc_root, "loadavg")) as loadavg:
+            return float(loadavg.read().split()[0])
+
+    def _read_network(self, now: float) -> Optional[Tuple[float, float]]:
+        received = sent = 0
+        with open(os.path.join(self._proc_root, "net", "dev")) as dev:
+            for line in dev.readlines()[2:]:
+                interface, _, counters = line.partition(":")
+                if interface.strip() == "lo":
+                    continue
+                fields = counters.split()
+                received += int(fields[0])
+                sent += int(fields[8])
+        previous, self._previous_net = self._previous_net, (now, received, sent)
+        if previous is None or now <= previous[0]:
+            return None
+        elapsed = now - previous[0]
+        return max(0, received - previous[1]) / elapsed, max(0, sent - previous[2]) / elapsed
@@ -0,0 +1,277 @@
+"""
+Minimal asyncio HTTP/1.1 server.
+
+Only the subset needed by the bot's embedded endpoints is implemented:
+request line, headers, ``Content-Length`` and chunked request bodies,
+and keep-alive connections.
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+
+logger = logging.getLogger(__name__)
+
+
+_REASONS = {
+    200: "OK",
+    204: "No Content",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+@dataclass
+class HttpRequest:
+    """A parsed HTTP request. Header names are lower-cased."""
+
+    method: str
+    path: str
+    query: Dict[str, List[str]]
+    headers: Dict[str, str]
+    body: bytes
+
+    def json(self) -> Any:
+        """
+        Decode the request body as JSON.
+
+        Raises:
+            ValueError: If the body is not valid JSON
+        """
+        return json.loads(self.body.decode("utf-8"))
+
+
+@dataclass
+class HttpResponse:
+    """An HTTP response to be written back to the client."""
+
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "text/plain; charset=utf-8"
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def json(cls, payload: Any, status: int = 200) -> "HttpResponse":
+        """Build a JSON response from a serializable payload."""
+        return cls(
+            status=status,
+            body=json.dumps(payload).encode("utf-8"),
+            content_type="application/json",
+        )
+
+    @classmethod
+    def text(cls, text: str, status: int = 200) -> "HttpResponse":
+        """Build a plain text response."""
+        return cls(status=status, body=text.encode("utf-8"))
+
+
+RequestHandler = Callable[[HttpRequest], Awaitable[HttpResponse]]
+
+
+class HttpServer:
+    """
+    Embedded HTTP server that passes every request to a single coroutine.
+
+    The handler is responsible for routing; the server only deals with the
+    wire format and connection lifetime.
+    """
+
+    def __init__(
+        self,
+        handler: RequestHandler,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        max_body_size: int = 16 * 1024 * 1024,
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            handler (RequestHandler): Coroutine called for every request
+            host (str): Interface to listen on
+            port (int): Port to listen on, 0 picks a free port
+            max_body_size (int): Largest accepted request body in bytes
+        """
+        self._handler = handler
+        self._host = host
+        self._port = port
+        self._max_body_size = max_body_size
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+
+    @property
+    def port(self) -> int:
+        """The port the server is bound to (resolved after start)."""
+        if self._server is not None and self._server.sockets:
+            return self._server.sockets[0].getsockname()[1]
+        return self._port
+
+    @property
+    def running(self) -> bool:
+        """Whether the server is accepting connections."""
+        return self._server is not None
+
+    async def start(self) -> None:
+        """Start listening for connections."""
+        if self._server is not None:
+            return
+        self._server = await asyncio.start_server(
+            self._serve_connection, self._host, self._port, limit=64 * 1024
+        )
+
+    async def stop(self) -> None:
+        """Stop listening and close all open connections."""
+        if self._server is None:
+            return
+        self._server.close()
+        tasks = list(self._connections.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _serve_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve requests on one connection until it is closed."""
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except _BadRequest as e:
+                    await self._write_response(writer, HttpResponse.text(str(e), e.status), False)
+                    return
+                if request is None:
+                    return
+
+                try:
+                    response = await self._handler(request)
+                except Exception:  # keep the connection usable
+                    logger.exception("Error handling %s %s", request.method, request.path)
+                    response = HttpResponse.text("Internal server error", 500)
+
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                await self._write_response(writer, response, keep_alive)
+                if not keep_alive:
+                    return
+        except asyncio.CancelledError:
+            pass  # server shutdown
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[HttpRequest]:
+        """Read and parse one request, or return None on a clean EOF."""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None
+            raise
+        except asyncio.LimitOverrunError:
+            raise _BadRequest("Header section too large", 400)
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise _BadRequest("Malformed request line", 400)
+
+        headers: Dict[str, str] = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await self._read_chunked(reader)
+        else:
+            value = headers.get("content-length", "") or "0"
+            if not (value.isascii() and value.isdigit()):
+                raise _BadRequest("Invalid Content-Length", 400)
+            length = int(value)
+            if length > self._max_body_size:
+                raise _BadRequest("Request body too large", 413)
+            body = await reader.readexactly(length) if length else b""
+
+        url = urlsplit(target)
+        return HttpRequest(
+            method=method.upper(),
+            path=url.path,
+            query=parse_qs(url.query),
+            headers=headers,
+            body=body,
+        )
+
+    async def _read_chunked(self, reader: asyncio.StreamReader) -> bytes:
+        """Read a chunked transfer-encoded body."""
+        chunks = []
+        total = 0
+        while True:
+            size_line = await self._read_line(reader)
+            try:
+                size = int(size_line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise _BadRequest("Invalid chunk size", 400)
+            if size < 0:
+                raise _BadRequest("Invalid chunk size", 400)
+            if size == 0:
+                # Skip optional trailers up to the terminating blank line
+                while (await self._read_line(reader)) != b"\r\n":
+                    pass
+                return b"".join(chunks)
+            total += size
+            if total > self._max_body_size:
+                raise _BadRequest("Request body too large", 413)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    @staticmethod
+    async def _read_line(reader: asyncio.StreamReader) -> bytes:
+        """Read one CRLF-terminated line of a chunked body."""
+        try:
+            return await reader.readuntil(b"\r\n")
+        except asyncio.LimitOverrunError:
+            raise _BadRequest("Chunk line too long", 400)
+
+    @staticmethod
+    async def _write_response(
+        writer: asyncio.StreamWriter, response: HttpResponse, keep_alive: bool
+    ) -> None:
+        """Serialize a response onto the connection."""
+        reason = _REASONS.get(response.status, "Unknown")
+        head = [
+            f"HTTP/1.1 {response.status} {reason}",
+            f"Content-Type: {response.content_type}",
+            f"Content-Length: {len(response.body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        head.extend(f"{name}: {value}" for name, value in response.headers.items())
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response.body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+class _BadRequest(Exception):
+    """Raised while parsing a request that cannot be served."""
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
@@ -1,8 +1,32 @@
 from abc import ABC, abstractmethod
-from typing import List
+from dataclasses import dataclass, field
+from typing import List, Optional
+from telegram import Bot
 from commands.icommand_handler import ICommandHandler
 
 
+@dataclass
+class ReloadReport:
+    """
+    Outcome of a command handlers reload.
+    
+    Attributes:
+        added (List[str]): Commands that did not exist before
+        reloaded (List[str]): Commands whose declaration or module changed
+        removed (List[str]): Commands that no longer exist
+        unchanged (int): Commands kept as they were
+        build_seconds (float): Time spent discovering and re-importing handlers
+        swap_seconds (float): Time the registry swap itself took
+    """
+    
+    added: List[str] = field(default_factory=list)
+    reloaded: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    build_seconds: float = 0.0
+    swap_seconds: float = 0.0
+
+
 class ICommandHandlersManager(ABC):
     """
     Abstract interface for command handlers manager.
@@ -26,3 +50,52 @@ class ICommandHandlersManager(ABC):
             List[ICommandHandler]: A list of all registered handlers
         """
         pass
+    
+    @abstractmethod
+    def reload_bot_handlers(self) -> ReloadReport:
+        """
+        Rediscover command handlers and swap the changed ones in.
+        
+        Returns:
+            ReloadReport: What was added, reloaded and removed
+        """
+        pass
+    
+    @abstractmethod
+    def get_handler(self, command: str) -> Optional[ICommandHandler]:
+        """
+        Get the handler registered for a command.
+        
+        Args:
+            command (str): The command name to look up (e.g., '/ping')
+            
+        Returns:
+            Optional[ICommandHandler]: The command handler if found, None otherwise
+        """
+        pass
+    
+    @abstractmethod
+    def suggest_commands(self, command: str) -> List[str]:
+        """
+        Suggest registered commands for an unknown one.
+        
+        Args:
+            command (str): The unknown command (e.g., '/pnig')
+            
+        Returns:
+            List[str]: Command names, closest first
+        """
+        pass
+    
+    @abstractmethod
+    async def publish_commands(self, bot: Bot) -> int:
+        """
+        Replace the bot's command menu with the registered commands.
+        
+        Args:
+            bot (telegram.Bot): Initialized bot to call the Bot API with
+            
+        Returns:
+            int: Number of commands published
+        """
+        pass
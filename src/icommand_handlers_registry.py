@@ -30,6 +30,16 @@ class ICommandHandlersRegistry(ABC):
         """
         pass
     
+    @abstractmethod
+    def replace_all(self, handlers: List[ICommandHandler]) -> None:
+        """
+        Replace every registered handler with a new set in one step.
+        
+        Args:
+            handlers (List[ICommandHandler]): The complete new set of handlers
+        """
+        pass
+    
     @abstractmethod
     def get(self, command: str) -> Optional[ICommandHandler]:
         """
@@ -43,6 +53,33 @@ class ICommandHandlersRegistry(ABC):
         """
         pass
     
+    @abstractmethod
+    def resolve(self, command: str) -> Optional[ICommandHandler]:
+        """
+        Get the handler a command name, alias or unique prefix stands for.
+        
+        Args:
+            command (str): What the user typed (e.g., '/ping', '/p' or '/pi')
+            
+        Returns:
+            Optional[ICommandHandler]: The command handler if found, None otherwise
+        """
+        pass
+    
+    @abstractmethod
+    def suggest(self, command: str, limit: int = 3) -> List[str]:
+        """
+        Suggest registered commands for an unknown one.
+        
+        Args:
+            command (str): The unknown command (e.g., '/pnig')
+            limit (int): Maximum number of suggestions
+            
+        Returns:
+            List[str]: Command names, closest first
+        """
+        pass
+    
     @abstractmethod
     def get_all_handlers(self) -> List[ICommandHandler]:
         """
@@ -0,0 +1,405 @@
+"""
+Memory-mapped access to large, growing log files.
+
+``LogIndex`` maps a log file instead of reading it. It keeps a sparse
+index of checkpoints: the offset and timestamp of the first timestamped
+line after every ``checkpoint_bytes`` boundary. Building the index only
+touches the pages around those boundaries, not the whole file. When the
+file grows, only the new boundaries are indexed. When it is rotated
+(replaced or truncated), the index starts over.
+
+Tailing reads backwards from the end, and jumping to a time binary
+searches the checkpoints and then the bytes between two of them.
+Both cost the same whatever the size of the file. Grep scans backwards
+from the end and stops at a byte budget.
+"""
+
+import bisect
+import mmap
+import os
+import re
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Tuple
+
+
+# ISO-like timestamps at the start of a line, optionally in brackets:
+# 2024-05-01 12:00:00, [2024-05-01T12:00:00.123Z] ...
+_TIMESTAMP = re.compile(rb"\[?(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})")
+# Lines without a timestamp inspected after a checkpoint boundary
+_CHECKPOINT_SEARCH_LINES = 16
+# Interval below which seeking a time scans lines instead of bisecting bytes
+_SEEK_LINEAR_BYTES = 4096
+# Bytes grep examines per step while scanning backwards
+_GREP_BLOCK = 1 << 20
+
+
+def parse_line_time(line: bytes) -> Optional[float]:
+    """
+    Read the timestamp at the start of a log line.
+
+    Log timestamps are taken as local time; zone suffixes are ignored.
+
+    Returns:
+        Optional[float]: Seconds since the epoch, None if the line has no timestamp
+    """
+    match = _TIMESTAMP.match(line)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second = (int(group) for group in match.groups())
+    try:
+        return time.mktime((year, month, day, hour, minute, second, 0, 0, -1))
+    except (OverflowError, ValueError):
+        return None
+
+
+@dataclass
+class LogPage:
+    """
+    Lines read from a log file.
+
+    Attributes:
+        lines (List[str]): The lines, oldest first
+        start (int): Offset of the first line
+        end (int): Offset just past the last line, where reading can continue
+        size (int): File size when the lines were read
+        truncated (bool): Whether a scan stopped at its budget before finding enough lines
+    """
+
+    lines: List[str]
+    start: int
+    end: int
+    size: int
+    truncated: bool = False
+
+
+class LogIndex:
+    """
+    Sparse checkpoint index over one memory-mapped log file.
+
+    Methods are thread-safe and meant to be called from worker threads,
+    since the first access to a page of a cold file waits on the disk.
+    """
+
+    def __init__(self, path: str, checkpoint_bytes: int = 1 << 20):
+        """
+        Initialize the index; nothing is read until the first refresh.
+
+        Args:
+            path (str): Log file
+            checkpoint_bytes (int): Distance between checkpoints, which
+                bounds the scan after a binary search
+
+        Raises:
+            ValueError: If the checkpoint distance is not positive
+        """
+        if checkpoint_bytes < 1:
+            raise ValueError("Checkpoint distance must be positive")
+        self.path = path
+        self._checkpoint_bytes = checkpoint_bytes
+        self._lock = threading.Lock()
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._identity: Optional[Tuple[int, int]] = None
+        self._size = 0
+        self._next_boundary = 0
+        self._offsets = array("q")
+        self._times = array("d")
+        self.rotations = 0
+
+    @property
+    def size(self) -> int:
+        """File size as of the last refresh."""
+        return self._size
+
+    @property
+    def checkpoints(self) -> int:
+        """Number of checkpoints in the index."""
+        return len(self._offsets)
+
+    def refresh(self) -> int:
+        """
+        Catch up with the file: remap it if it grew, start over if it was rotated.
+
+        Returns:
+            int: Current file size
+
+        Raises:
+            OSError: If the file cannot be opened
+        """
+        with self._lock:
+            return self._refresh()
+
+    def close(self) -> None:
+        """Unmap and close the file."""
+        with self._lock:
+            self._reset()
+
+    def tail(self, count: int) -> LogPage:
+        """
+        Get the last lines of the file.
+
+        Args:
+            count (int): Number of lines
+
+        Returns:
+            LogPage: Up to ``count`` lines
+        """
+        with self._lock:
+            size = self._refresh()
+            if not size or count < 1:
+                return LogPage([], size, size, size)
+            data = self._map
+            end = size - 1 if data[size - 1:size] == b"\n" else size
+            # Walk back one line break per line, the end counting as one
+            boundary = end
+            for _ in range(count):
+                boundary = data.rfind(b"\n", 0, boundary)
+                if boundary < 0:
+                    break
+            start = boundary + 1
+            return LogPage(data[start:end].decode("utf-8", "replace").split("\n"), start, size, size)
+
+    def read_from(self, offset: int, count: int) -> LogPage:
+        """
+        Get lines starting at an offset, e.g. where an earlier page ended.
+
+        An offset inside a line moves on to the next line.
+
+        Args:
+            offset (int): Byte offset
+            count (int): Maximum number of lines
+
+        Returns:
+            LogPage: Up to ``count`` complete lines
+        """
+        with self._lock:
+            size = self._refresh()
+            return self._read_lines(self._line_start(offset, size), count, size)
+
+    def seek_time(self, timestamp: float, count: int) -> LogPage:
+        """
+        Get the lines starting at the first one logged at or after a time.
+
+        Assumes timestamps only grow through the file, as in an append-only
+        log. Lines without a timestamp belong to the line before them.
+
+        Args:
+            timestamp (float): Seconds since the epoch
+            count (int): Maximum number of lines
+
+        Returns:
+            LogPage: Up to ``count`` lines, empty if nothing was logged since
+        """
+        with self._lock:
+            size = self._refresh()
+            index = bisect.bisect_left(self._times, timestamp)
+            low = self._offsets[index - 1] if index > 0 else 0
+            high = self._offsets[index] if index < len(self._offsets) else size
+            data = self._map
+            # Narrow the interval by bytes: the first line at or after the
+            # time lies after ``low`` and no later than ``high``
+            while high - low > _SEEK_LINEAR_BYTES:
+                probe = data.find(b"\n", (low + high) // 2, high) + 1
+                if probe <= 0 or probe >= high:
+                    break
+                probe_time = parse_line_time(data[probe:probe + 40])
+                if probe_time is None:
+                    break  # Continuation lines, leave the rest to the scan
+                if probe_time < timestamp:
+                    low = probe
+                else:
+                    high = probe
+            position = low
+            while position < size:
+                end = data.find(b"\n", position, size)
+                if end < 0:
+                    end = size
+                line_time = parse_line_time(data[position:position + 40])
+                if line_time is not None and line_time >= timestamp:
+                    break
+                position = end + 1
+            return self._read_lines(min(position, size), count, size)
+
+    def grep(self, pattern: "re.Pattern[bytes]", count: int, max_bytes: int) -> LogPage:
+        """
+        Get the last lines matching a pattern, scanning backwards from the end.
+
+        Args:
+            pattern (re.Pattern[bytes]): Compiled bytes pattern, searched per line
+            count (int): Maximum number of lines
+            max_bytes (int): Bytes to examine at most before giving up
+
+        Returns:
+            LogPage: Up to ``count`` matching lines, oldest first, with
+            ``truncated`` set when the budget ran out first
+        """
+        with self._lock:
+            size = self._refresh()
+            data = self._map
+            floor = max(0, size - max_bytes)
+            matches: List[Tuple[int, int]] = []
+            end = size
+            while end > floor and len(matches) < count:
+                start = max(floor, end - _GREP_BLOCK)
+                if start > floor:
+                    # Start at a line boundary so no line is searched in halves
+                    start = data.rfind(b"\n", floor, start) + 1 or floor
+                block: List[Tuple[int, int]] = []
+                last_line = -1
+                for match in pattern.finditer(data, start, end):
+                    line_start = data.rfind(b"\n", start, match.start()) + 1 or start
+                    if line_start == last_line:
+                        continue
+                    line_end = data.find(b"\n", match.end(), end)
+                    block.append((line_start, line_end if line_end >= 0 else end))
+                    last_line = line_start
+                matches[:0] = block
+                end = start
+            matches = matches[-count:] if count else []
+            lines = [data[line_start:line_end].decode("utf-8", "replace") for line_start, line_end in matches]
+            return LogPage(
+                lines,
+                matches[0][0] if matches else end,
+                size,
+                size,
+                truncated=end <= floor and floor > 0 and len(matches) < count,
+            )
+
+    def _refresh(self) -> int:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            # Between a rotation's rename and the new file's creation
+            if self._map is None:
+                raise
+            return self._size
+        identity = (stat.st_dev, stat.st_ino)
+        if self._identity is not None and (identity != self._identity or stat.st_size < self._size):
+            self._reset()
+            self.rotations += 1
+        if self._file is None:
+            self._file = open(self.path, "rb")
+            stat = os.fstat(self._file.fileno())
+            self._identity = (stat.st_dev, stat.st_ino)
+        else:
+            stat = os.fstat(self._file.fileno())
+        size = stat.st_size
+        if size != self._size or (self._map is None and size):
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+            self._size = size
+            self._index_new_boundaries()
+        return self._size
+
+    def _reset(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._map = None
+        self._identity = None
+        self._size = 0
+        self._next_boundary = 0
+        self._offsets = array("q")
+        self._times = array("d")
+
+    def _index_new_boundaries(self) -> None:
+        """Add a checkpoint for every boundary the file has grown past."""
+        data = self._map
+        size = self._size
+        while self._next_boundary < size:
+            boundary = self._next_boundary
+            position = 0 if boundary == 0 else data.find(b"\n", boundary - 1, size) + 1
+            if position == 0 and boundary:
+                return  # The line across the boundary is not complete yet
+            for _ in range(_CHECKPOINT_SEARCH_LINES):
+                end = data.find(b"\n", position, size)
+                if end < 0:
+                    return  # Wait for the line to be complete
+                line_time = parse_line_time(data[position:position + 40])
+                if line_time is not None:
+                    if not self._times or line_time >= self._times[-1]:
+                        self._offsets.append(position)
+                        self._times.append(line_time)
+                    break
+                position = end + 1
+            self._next_boundary = boundary + self._checkpoint_bytes
+
+    def _line_start(self, offset: int, size: int) -> int:
+        if offset <= 0:
+            return 0
+        if offset >= size:
+            return size
+        if self._map[offset - 1:offset] == b"\n":
+            return offset
+        end = self._map.find(b"\n", offset, size)
+        return size if end < 0 else end + 1
+
+    def _read_lines(self, start: int, count: int, size: int) -> LogPage:
+        data = self._map
+        position = start
+        lines = []
+        while len(lines) < count and position < size:
+            end = data.find(b"\n", position, size)
+            if end < 0:
+                break  # A line still being written is left for the next page
+            lines.append(data[position:end].decode("utf-8", "replace"))
+            position = end + 1
+        return LogPage(lines, start, position, size)
+
+
+class LogFiles:
+    """
+    The log files the bot may read, by name, each with its index built on first use.
+    """
+
+    def __init__(self, paths: Mapping[str, str], checkpoint_bytes: int = 1 << 20):
+        """
+        Initialize the set of log files.
+
+        Args:
+            paths (Mapping[str, str]): File path by name (e.g., ``{'app': '/var/log/app.log'}``)
+            checkpoint_bytes (int): Distance between checkpoints of each index
+        """
+        self._paths = dict(paths)
+        self._checkpoint_bytes = checkpoint_bytes
+        self._indexes: Dict[str, LogIndex] = {}
+        self._lock = threading.Lock()
+
+    def names(self) -> List[str]:
+        """Get the names of the configured files."""
+        return sorted(self._paths)
+
+    def path(self, name: str) -> Optional[str]:
+        """Get the path of a configured file, None if no file has that name."""
+        return self._paths.get(name)
+
+    def get(self, name: str) -> Optional[LogIndex]:
+        """
+        Get the index of a log file.
+
+        Args:
+            name (str): Configured name of the file
+
+        Returns:
+            Optional[LogIndex]: The index, None if no file has that name
+        """
+        if name not in self._paths:
+            return None
+        with self._lock:
+            index = self._indexes.get(name)
+            if index is None:
+                index = self._indexes[name] = LogIndex(self._paths[name], self._checkpoint_bytes)
+            return index
+
+    def close(self) -> None:
+        """Unmap every opened file."""
+        with self._lock:
+            for index in self._indexes.values():
+                index.close()
+            self._indexes.clear()
@@ -2,42 +2,85 @@
 Main entry point for the Telegram bot.
 """
 
-import asyncio
+import logging
 import os
-import sys
+from typing import Optional
 from dotenv import load_dotenv
 from bot import TelegramBot
+from config import BotConfig
 from command_handlers_registry import CommandHandlersRegistry
-from command_handlers_manager import CommandHandlersManager
+from command_handlers_manager import CommandHandlersManager, DEFAULT_MANIFEST_PATH
+from middleware import MiddlewarePipeline
+from sharding import ShardSupervisor
+from structured_logging import configure_logging
 
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+def build_bot(bot_token: str, config: BotConfig, middleware: Optional[MiddlewarePipeline] = None) -> TelegramBot:
+    """
+    Wire the registry, manager and bot together.
+    
+    Args:
+        bot_token (str): Telegram bot token
+        config (BotConfig): Runtime configuration
+        middleware (Optional[MiddlewarePipeline]): Layers run around every
+            command handler, or the commands they are added for
+        
+    Returns:
+        TelegramBot: The bot, ready to run
+    """
+    # Create command handlers registry
+    command_handlers_registry = CommandHandlersRegistry()
+    
+    # Create command handlers manager using the registry
+    command_handlers_manager = CommandHandlersManager(
+        command_handlers_registry,
+        manifest_path=config.commands_manifest or DEFAULT_MANIFEST_PATH,
+        prewarm=config.prewarm_commands
+    )
+    command_handlers_manager.populate_bot_handlers()
+    
+    # Create bot instance with dependency injection
+    return TelegramBot(bot_token, command_handlers_manager, config, middleware=middleware)
+
 
 def main():
     """Main function to run the Telegram bot."""
-    # Get bot token from environment variable
-    bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
-    
-    if not bot_token:
-        print("Error: TELEGRAM_BOT_TOKEN environment variable is not set.")
-        return
+    try:
+        config = BotConfig.from_env()
+        config_error = None
+    except ValueError as e:
+        # Log the error in the default format
+        config, config_error = BotConfig(), e
+    log_writer = configure_logging(config.log_level, config.log_format)
     
     try:
-        # Create command handlers registry
-        command_handlers_registry = CommandHandlersRegistry()
+        if config_error is not None:
+            logger.error("Invalid configuration: %s", config_error)
+            return
         
-        # Create command handlers manager using the registry
-        command_handlers_manager = CommandHandlersManager(command_handlers_registry)
-        command_handlers_manager.populate_bot_handlers()
+        # Get bot token from environment variable
+        bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
+        if not bot_token:
+            logger.error("TELEGRAM_BOT_TOKEN environment variable is not set.")
+            return
         
-        # Create bot instance with dependency injection
-        bot = TelegramBot(bot_token, command_handlers_manager)
-        bot.run()
+        if config.workers > 1:
+            ShardSupervisor(bot_token, config).run()
+        else:
+            bot = build_bot(bot_token, config)
+            bot.run()
     except KeyboardInterrupt:
-        print("\nThe bot stopped by the user.")
-    except Exception as e:
-        print(f"Error running the bot: {e}")
+        logger.info("The bot stopped by the user.")
+    except Exception:
+        logger.exception("Error running the bot")
+    finally:
+        # Write out the records still queued
+        log_writer.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,441 @@
+"""
+In-process metrics: per-command counters and latency histograms, gauges
+and event-loop lag, exposed in the Prometheus text format.
+
+Metrics are recorded from the event loop thread only, so recording is a
+few plain integer and float updates with no locking. Histograms use fixed
+bucket bounds chosen up front, so recording is a bisect plus an increment.
+"""
+
+import asyncio
+import bisect
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from http_server import HttpRequest, HttpResponse, HttpServer
+
+
+# Upper bounds in seconds, from sub-millisecond handlers to slow ones
+DEFAULT_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+METRIC_PREFIX = "gserverbot"
+
+# How a gauge sampled by several shard workers is combined
+GAUGE_SUM = "sum"
+GAUGE_MAX = "max"
+GAUGE_AVG = "avg"
+
+_GAUGE_MERGES: Dict[str, Callable[[List[float]], float]] = {
+    GAUGE_SUM: sum,
+    GAUGE_MAX: max,
+    GAUGE_AVG: lambda values: sum(values) / len(values),
+}
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram.
+
+    ``counts[i]`` holds observations in ``(bounds[i-1], bounds[i]]``; the
+    last slot holds everything above the largest bound.
+    """
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            bounds (Sequence[float]): Increasing bucket upper bounds
+        """
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: "Histogram") -> None:
+        """
+        Add another histogram's observations to this one.
+
+        Raises:
+            ValueError: If the bucket bounds differ
+        """
+        if other.bounds != self.bounds:
+            raise ValueError("Cannot merge histograms with different buckets")
+        for index, value in enumerate(other.counts):
+            self.counts[index] += value
+        self.sum += other.sum
+        self.count += other.count
+
+    def merge_counts(self, counts: Sequence[int], total: float) -> None:
+        """
+        Add bucket counts exported by a histogram with the same bounds.
+
+        Args:
+            counts (Sequence[int]): Per-bucket counts, as in ``counts``
+            total (float): Sum of the exported observations
+
+        Raises:
+            ValueError: If the number of buckets differs
+        """
+        if len(counts) != len(self.counts):
+            raise ValueError("Cannot merge histograms with different buckets")
+        for index, value in enumerate(counts):
+            self.counts[index] += value
+        self.sum += total
+        self.count += sum(counts)
+
+    def quantile(self, fraction: float) -> float:
+        """
+        Estimate a quantile by linear interpolation inside its bucket.
+
+        Returns:
+            float: The estimate, 0.0 for an empty histogram
+        """
+        if self.count == 0:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if index == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.bounds[-1]
+
+
+class CommandMetrics:
+    """Calls, errors, response cache use, rate limiting and handler latency of one command."""
+
+    __slots__ = ("calls", "errors", "cache_hits", "cache_misses", "rate_limited", "latency")
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.rate_limited = 0
+        self.latency = Histogram(bounds)
+
+
+class MetricsRegistry:
+    """
+    Container of all bot metrics.
+    """
+
+    def __init__(self, latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        """
+        Initialize an empty registry.
+
+        Args:
+            latency_buckets (Sequence[float]): Bucket bounds for latency histograms
+        """
+        self._latency_buckets = tuple(latency_buckets)
+        self._commands: Dict[str, CommandMetrics] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], float], str]] = {}
+        self._merged_gauges: Dict[str, List[float]] = {}
+        self._histograms: Dict[str, Tuple[str, Histogram]] = {}
+        self.loop_lag = Histogram(latency_buckets)
+        self.loop_lag_last = 0.0
+
+    def command(self, name: str) -> CommandMetrics:
+        """Get the metrics of a command, creating them on first use."""
+        metrics = self._commands.get(name)
+        if metrics is None:
+            metrics = self._commands[name] = CommandMetrics(self._latency_buckets)
+        return metrics
+
+    def commands(self) -> Dict[str, CommandMetrics]:
+        """Get the metrics of every command seen so far."""
+        return dict(self._commands)
+
+    def record_command(self, name: str, duration: float, failed: bool) -> None:
+        """
+        Record one finished command call.
+
+        Args:
+            name (str): Command name (e.g., '/ping')
+            duration (float): Handler run time in seconds
+            failed (bool): Whether the handler raised
+        """
+        metrics = self.command(name)
+        metrics.calls += 1
+        if failed:
+            metrics.errors += 1
+        metrics.latency.observe(duration)
+
+    def record_cache(self, name: str, hit: bool) -> None:
+        """
+        Record whether a cached command was served from the response cache.
+
+        Args:
+            name (str): Command name (e.g., '/status')
+            hit (bool): Whether the handler was skipped
+        """
+        metrics = self.command(name)
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+    def record_rate_limited(self, name: str) -> None:
+        """
+        Record a command call rejected by the rate limiter.
+
+        Args:
+            name (str): Command name (e.g., '/history')
+        """
+        self.command(name).rate_limited += 1
+
+    def register_gauge(
+        self, name: str, help_text: str, read: Callable[[], float], merge: str = GAUGE_SUM
+    ) -> None:
+        """
+        Register a value sampled when metrics are exported.
+
+        Args:
+            name (str): Metric name without the common prefix (e.g., 'scheduler_queued')
+            help_text (str): Description for the ``# HELP`` line
+            read (Callable[[], float]): Returns the current value
+            merge (str): How ``merge_snapshot`` combines the values of several
+                registries: ``GAUGE_SUM`` for counts, ``GAUGE_MAX`` for latest
+                samples and ``GAUGE_AVG`` for averages and rates
+
+        Raises:
+            ValueError: If the merge mode is unknown
+        """
+        if merge not in _GAUGE_MERGES:
+            raise ValueError(f"Unknown gauge merge mode '{merge}'")
+        self._gauges[name] = (help_text, read, merge)
+
+    def register_histogram(self, name: str, help_text: str, histogram: Histogram) -> None:
+        """
+        Register a histogram recorded by another component.
+
+        Args:
+            name (str): Metric name without the common prefix (e.g., 'http_pool_wait_seconds')
+            help_text (str): Description for the ``# HELP`` line
+            histogram (Histogram): Histogram the component observes into
+        """
+        self._histograms[name] = (help_text, histogram)
+
+    def histograms(self) -> Dict[str, Histogram]:
+        """Get every registered histogram."""
+        return {name: histogram for name, (_, histogram) in self._histograms.items()}
+
+    def gauges(self) -> Dict[str, float]:
+        """Sample every registered gauge."""
+        return {name: float(read()) for name, (_, read, _) in self._gauges.items()}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Export every metric as plain, picklable data.
+
+        Shard workers send snapshots to the supervisor, which combines them
+        with ``merge_snapshot``.
+
+        Returns:
+            Dict[str, Any]: Counters, histogram buckets and sampled gauges
+        """
+        return {
+            "bounds": self._latency_buckets,
+            "commands": {
+                name: (
+                    m.calls, m.errors, m.cache_hits, m.cache_misses, m.rate_limited,
+                    list(m.latency.counts), m.latency.sum,
+                )
+                for name, m in self._commands.items()
+            },
+            "loop_lag": (list(self.loop_lag.counts), self.loop_lag.sum),
+            "loop_lag_last": self.loop_lag_last,
+            "gauges": {
+                name: (help_text, float(read()), merge) for name, (help_text, read, merge) in self._gauges.items()
+            },
+            "histograms": {
+                name: (help_text, histogram.bounds, list(histogram.counts), histogram.sum)
+                for name, (help_text, histogram) in self._histograms.items()
+            },
+        }
+
+    def merge_snapshot(self, snapshot: Dict[str, Any]) -> None:
+        """
+        Add a snapshot exported by another registry to this one.
+
+        Counters and histograms are added up, gauges are combined by their
+        merge mode and the last loop lag sample becomes the worst one seen.
+
+        Args:
+            snapshot (Dict[str, Any]): Result of ``snapshot``
+
+        Raises:
+            ValueError: If the snapshot uses different latency buckets
+        """
+        if tuple(snapshot["bounds"]) != self._latency_buckets:
+            raise ValueError("Cannot merge metrics with different latency buckets")
+        for name, (calls, errors, hits, misses, limited, counts, total) in snapshot["commands"].items():
+            metrics = self.command(name)
+            metrics.calls += calls
+            metrics.errors += errors
+            metrics.cache_hits += hits
+            metrics.cache_misses += misses
+            metrics.rate_limited += limited
+            metrics.latency.merge_counts(counts, total)
+        self.loop_lag.merge_counts(*snapshot["loop_lag"])
+        self.loop_lag_last = max(self.loop_lag_last, snapshot["loop_lag_last"])
+        for name, (help_text, value, merge) in snapshot["gauges"].items():
+            values = self._merged_gauges.get(name)
+            if values is None:
+                previous = self._gauges.get(name)
+                values = self._merged_gauges[name] = [float(previous[1]())] if previous is not None else []
+            values.append(value)
+            merged = _GAUGE_MERGES[merge](values)
+            self.register_gauge(name, help_text, lambda merged=merged: merged, merge)
+        for name, (help_text, bounds, counts, total) in snapshot.get("histograms", {}).items():
+            registered = self._histograms.get(name)
+            if registered is None or registered[1].bounds != tuple(bounds):
+                self.register_histogram(name, help_text, Histogram(bounds))
+            self._histograms[name][1].merge_counts(counts, total)
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        commands = sorted(self._commands.items())
+
+        def header(name: str, kind: str, help_text: str) -> str:
+            full_name = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            return full_name
+
+        name = header("command_calls_total", "counter", "Command handler invocations.")
+        for command, metrics in commands:
+            lines.append(f'{name}{{command="{command}"}} {metrics.calls}')
+        name = header("command_errors_total", "counter", "Command handler invocations that raised.")
+        for command, metrics in commands:
+            lines.append(f'{name}{{command="{command}"}} {metrics.errors}')
+        name = header("command_cache_hits_total", "counter", "Command replies served from the response cache.")
+        for command, metrics in commands:
+            lines.append(f'{name}{{command="{command}"}} {metrics.cache_hits}')
+        name = header("command_cache_misses_total", "counter", "Cached command replies that had to be computed.")
+        for command, metrics in commands:
+            lines.append(f'{name}{{command="{command}"}} {metrics.cache_misses}')
+        name = header("command_rate_limited_total", "counter", "Command calls rejected by the rate limiter.")
+        for command, metrics in commands:
+            lines.append(f'{name}{{command="{command}"}} {metrics.rate_limited}')
+        name = header("command_latency_seconds", "histogram", "Command handler run time.")
+        for command, metrics in commands:
+            _render_histogram(lines, name, metrics.latency, f'command="{command}",')
+
+        name = header("event_loop_lag_seconds", "histogram", "Delay of event loop wake-ups.")
+        _render_histogram(lines, name, self.loop_lag, "")
+        for histogram_name, (help_text, histogram) in sorted(self._histograms.items()):
+            name = header(histogram_name, "histogram", help_text)
+            _render_histogram(lines, name, histogram, "")
+
+        for gauge_name, (help_text, read, _) in sorted(self._gauges.items()):
+            name = header(gauge_name, "gauge", help_text)
+            lines.append(f"{name} {float(read())}")
+        return "\n".join(lines) + "\n"
+
+
+def _render_histogram(lines: List[str], name: str, histogram: Histogram, labels: str) -> None:
+    """Append the cumulative bucket, sum and count lines of a histogram."""
+    cumulative = 0
+    for bound, bucket_count in zip(histogram.bounds, histogram.counts):
+        cumulative += bucket_count
+        lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {histogram.count}')
+    label_block = f"{{{labels.rstrip(',')}}}" if labels else ""
+    lines.append(f"{name}_sum{label_block} {histogram.sum}")
+    lines.append(f"{name}_count{label_block} {histogram.count}")
+
+
+class EventLoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a periodic sleeper.
+
+    A consistently high lag means something is blocking the loop.
+    """
+
+    def __init__(self, registry: MetricsRegistry, interval: float = 0.5):
+        """
+        Initialize the monitor.
+
+        Args:
+            registry (MetricsRegistry): Registry receiving the lag samples
+            interval (float): Seconds between samples
+        """
+        self._registry = registry
+        self._interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Start sampling."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop sampling."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.monotonic() + self._interval
+            await asyncio.sleep(self._interval)
+            lag = max(0.0, time.monotonic() - expected)
+            self._registry.loop_lag.observe(lag)
+            self._registry.loop_lag_last = lag
+
+
+class MetricsServer:
+    """HTTP endpoint serving ``/metrics`` in the Prometheus format."""
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9100):
+        """
+        Initialize the endpoint.
+
+        Args:
+            registry (MetricsRegistry): Registry to export
+            host (str): Interface to listen on
+            port (int): Port to listen on
+        """
+        self._registry = registry
+        self._http = HttpServer(self._handle_request, host, port)
+
+    @property
+    def port(self) -> int:
+        """The port the endpoint is bound to."""
+        return self._http.port
+
+    async def start(self) -> None:
+        """Start serving."""
+        await self._http.start()
+
+    async def stop(self) -> None:
+        """Stop serving."""
+        await self._http.stop()
+
+    async def _handle_request(self, request: HttpRequest) -> HttpResponse:
+        if request.path != "/metrics":
+            return HttpResponse.text("Not found", 404)
+        if request.method != "GET":
+            return HttpResponse.text("Method not allowed", 405)
+        return HttpResponse(
+            body=self._registry.render_prometheus().encode("utf-8"),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
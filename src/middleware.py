@@ -0,0 +1,166 @@
+"""
+Middleware run around command handlers.
+
+A middleware is a layer that gets an update before the command handler,
+can act before and after it, or answer itself and not call the handler at
+all. Layers are added to a ``MiddlewarePipeline`` in order, the first one
+outermost, either for every command or for chosen commands only.
+
+The pipeline is not walked per update. When commands are registered, the
+router has it build one chain per command: each layer wraps the next one
+once, so the chain is a fixed series of direct calls and a layer that does
+not apply to a command is simply not in its chain.
+"""
+
+import asyncio
+import functools
+import logging
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, FrozenSet, Iterable, List, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from bot_services import is_admin
+from outbound import send_reply
+
+
+logger = logging.getLogger(__name__)
+
+# The rest of a command's chain, ending with its handler
+Next = Callable[[Update, CallbackContext], Awaitable[None]]
+
+ERROR_REPLY = "Sorry, something went wrong. Please try again later."
+
+
+class Middleware(ABC):
+    """
+    A layer run around command handlers.
+    """
+
+    @abstractmethod
+    async def process(self, call_next: Next, update: Update, context: CallbackContext) -> None:
+        """
+        Handle an update, passing it on with ``await call_next(update, context)``.
+
+        Not calling ``call_next`` ends the update here; the handler and the
+        layers after this one do not run.
+
+        Args:
+            call_next (Next): The rest of the chain
+            update (telegram.Update): The update being handled
+            context (telegram.ext.CallbackContext): The handler context
+        """
+
+    def wrap(self, command: str, call_next: Next) -> Next:
+        """
+        Build this layer of one command's chain.
+
+        Called once per command when the chain is built. Override it to
+        prepare per-command state ahead of time, or return ``call_next``
+        unchanged to leave the command out.
+
+        Args:
+            command (str): The command the chain is for, e.g. ``'/ping'``
+            call_next (Next): The rest of the chain
+
+        Returns:
+            Next: This layer, calling ``call_next``
+        """
+        return functools.partial(self.process, call_next)
+
+
+class MiddlewarePipeline:
+    """
+    Ordered middleware, built into a fixed chain per command.
+    """
+
+    def __init__(self):
+        """Initialize an empty pipeline."""
+        self._layers: List[Tuple[Middleware, Optional[FrozenSet[str]]]] = []
+
+    def __len__(self) -> int:
+        return len(self._layers)
+
+    def copy(self) -> "MiddlewarePipeline":
+        """Get a pipeline with the same layers, to which more can be added without changing this one."""
+        pipeline = MiddlewarePipeline()
+        pipeline._layers = list(self._layers)
+        return pipeline
+
+    def use(self, middleware: Middleware, commands: Optional[Iterable[str]] = None) -> None:
+        """
+        Add a layer inside the ones added before it.
+
+        Chains built earlier are not changed; the router builds them again
+        when commands are registered or reloaded.
+
+        Args:
+            middleware (Middleware): The layer
+            commands (Optional[Iterable[str]]): Command names it runs for,
+                e.g. ``['/exec']``, every command if None
+        """
+        self._layers.append((middleware, frozenset(commands) if commands is not None else None))
+
+    def build(self, command: str, endpoint: Next) -> Next:
+        """
+        Build the chain of one command.
+
+        Args:
+            command (str): The command name
+            endpoint (Next): Innermost call, running the command's handler
+
+        Returns:
+            Next: The outermost layer, or ``endpoint`` if no layer applies
+        """
+        chain = endpoint
+        for middleware, commands in reversed(self._layers):
+            if commands is None or command in commands:
+                chain = middleware.wrap(command, chain)
+        return chain
+
+
+class AdminOnlyMiddleware(Middleware):
+    """Lets only bot admins through; everyone else gets a refusal."""
+
+    def __init__(self, restricted: Optional[Callable[[str], bool]] = None):
+        """
+        Initialize the layer.
+
+        Args:
+            restricted (Optional[Callable[[str], bool]]): Decides when a chain
+                is built whether the command is restricted; every command the
+                layer is used for if None
+        """
+        self._restricted = restricted
+
+    def wrap(self, command: str, call_next: Next) -> Next:
+        """Build the check into the chain of a restricted command, leave others out."""
+        if self._restricted is not None and not self._restricted(command):
+            return call_next
+        return super().wrap(command, call_next)
+
+    async def process(self, call_next: Next, update: Update, context: CallbackContext) -> None:
+        """Refuse the command unless the sender is listed in ``admin_user_ids``."""
+        if not is_admin(update, context):
+            await send_reply(update, context, "This command is only available to bot admins.")
+            return
+        await call_next(update, context)
+
+
+class ErrorReplyMiddleware(Middleware):
+    """Tells the user when their command failed instead of leaving them without an answer."""
+
+    async def process(self, call_next: Next, update: Update, context: CallbackContext) -> None:
+        """Reply with an apology if the rest of the chain raises, then let the error through."""
+        try:
+            await call_next(update, context)
+        except asyncio.TimeoutError:
+            # The router has already said the command took too long
+            raise
+        except Exception:
+            try:
+                await send_reply(update, context, ERROR_REPLY)
+            except Exception:
+                logger.warning("Could not tell the user that their command failed", exc_info=True)
+            raise
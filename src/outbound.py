@@ -0,0 +1,483 @@
+"""
+Rate-limit-aware outbound message queue.
+
+Handlers send through ``OutboundQueue`` instead of calling the Bot API
+directly. Sends are paced with token buckets for Telegram's global and
+per-chat limits, ``RetryAfter`` pauses sending for the requested time, and
+texts waiting for the same chat can be merged into a single message.
+Documents are queued and paced like texts but never merged.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from telegram import Chat, InputFile, Message, Update
+from telegram.error import BadRequest, ChatMigrated, Forbidden, NetworkError, RetryAfter
+from telegram.ext import CallbackContext
+
+from bot_services import get_services
+from tracing import span
+
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+
+
+class TokenBucket:
+    """
+    Classic token bucket: ``rate`` tokens per second, at most ``capacity`` stored.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum number of stored tokens (burst size)
+            now (float): Current ``time.monotonic()`` value
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Get the seconds until a token is available (0 if one is available now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        """Consume one token; call only after ``delay`` returned 0."""
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        """Check whether the bucket has refilled completely."""
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+@dataclass
+class OutboundStats:
+    """Point-in-time snapshot of outbound queue counters."""
+
+    queued: int
+    in_flight: int
+    sent: int
+    failed: int
+    coalesced: int
+    retry_after: int
+    retries: int
+    latency_avg: float
+    latency_max: float
+
+
+@dataclass
+class _OutgoingText:
+    """One text, or a document with its caption, waiting to be sent."""
+
+    text: str
+    kwargs: Dict[str, Any]
+    coalesce: bool
+    future: asyncio.Future
+    enqueued_at: float
+    attempts: int = 0
+    document: Optional[InputFile] = None
+
+
+class _ChatState:
+    """Pending texts and pacing state of one chat."""
+
+    __slots__ = ("pending", "bucket", "busy", "scheduled")
+
+    def __init__(self, bucket: TokenBucket):
+        self.pending: Deque[_OutgoingText] = deque()
+        self.bucket = bucket
+        self.busy = False
+        self.scheduled = False
+
+
+class OutboundQueue:
+    """
+    Paced, retrying sender for outgoing text messages.
+
+    At most one request per chat is in flight, which keeps per-chat order;
+    requests for different chats run concurrently within the global rate.
+    """
+
+    def __init__(
+        self,
+        bot,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        group_rate: float = 20 / 60,
+        chat_burst: float = 3.0,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        coalesce_separator: str = "\n",
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            bot (telegram.Bot): Bot used to send messages
+            global_rate (float): Messages per second across all chats
+            chat_rate (float): Messages per second to one private chat
+            group_rate (float): Messages per second to one group chat
+            chat_burst (float): Messages a chat may receive back to back
+            max_retries (int): Attempts after a network error before giving up
+            backoff_base (float): First network-error backoff in seconds, doubled per attempt
+            backoff_max (float): Upper bound for the network-error backoff
+            coalesce_separator (str): Inserted between merged texts
+        """
+        self._bot = bot
+        self._chat_rate = chat_rate
+        self._group_rate = group_rate
+        self._chat_burst = chat_burst
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._separator = coalesce_separator
+
+        self._global_bucket = TokenBucket(global_rate, max(1.0, global_rate), time.monotonic())
+        self._chats: Dict[int, _ChatState] = {}
+        self._ready: Deque[int] = deque()
+        self._delayed: List[Tuple[float, int, int]] = []
+        self._delay_seq = itertools.count()
+        self._paused_until = 0.0
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._tasks: set = set()
+        self._last_sweep = time.monotonic()
+
+        self._queued = 0
+        self._sent = 0
+        self._failed = 0
+        self._coalesced = 0
+        self._retry_after = 0
+        self._retries = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    async def start(self) -> None:
+        """Start the dispatcher task."""
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """
+        Stop the dispatcher, giving queued texts up to ``timeout`` seconds to go out.
+
+        Texts that could not be sent in time fail with ``asyncio.CancelledError``.
+        """
+        if self._dispatcher is None:
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Outbound queue stopped with %d texts unsent", self._queued)
+        self._dispatcher.cancel()
+        await asyncio.gather(self._dispatcher, *self._tasks, return_exceptions=True)
+        self._dispatcher = None
+        for state in self._chats.values():
+            for item in state.pending:
+                if not item.future.done():
+                    item.future.cancel()
+        self._chats.clear()
+
+    def enqueue(self, chat_id: int, text: str, coalesce: bool = True, **kwargs: Any) -> asyncio.Future:
+        """
+        Queue a text for sending.
+
+        Args:
+            chat_id (int): Target chat
+            text (str): Message text
+            coalesce (bool): Allow merging with other pending texts for the chat
+                that have the same keyword arguments
+            **kwargs: Extra ``Bot.send_message`` arguments
+
+        Returns:
+            asyncio.Future: Resolves to the sent ``telegram.Message``
+        """
+        return self._enqueue(chat_id, _OutgoingText(text, kwargs, coalesce, None, time.monotonic()))
+
+    async def send_text(self, chat_id: int, text: str, coalesce: bool = True, **kwargs: Any) -> Message:
+        """Queue a text and wait until it has been sent, timed as a ``send`` span if traced."""
+        with span("send", chat_id=chat_id):
+            return await self.enqueue(chat_id, text, coalesce, **kwargs)
+
+    async def send_document(self, chat_id: int, document: InputFile, caption: str = "", **kwargs: Any) -> Message:
+        """
+        Queue a document and wait until it has been sent.
+
+        Args:
+            chat_id (int): Target chat
+            document (telegram.InputFile): File to upload, kept in memory for retries
+            caption (str): Caption shown under the document
+            **kwargs: Extra ``Bot.send_document`` arguments
+
+        Returns:
+            telegram.Message: The sent message
+        """
+        with span("send", chat_id=chat_id, document=True):
+            return await self._enqueue(
+                chat_id, _OutgoingText(caption, kwargs, False, None, time.monotonic(), document=document)
+            )
+
+    def _enqueue(self, chat_id: int, item: _OutgoingText) -> asyncio.Future:
+        future = item.future = asyncio.get_running_loop().create_future()
+        state = self._chats.get(chat_id)
+        if state is None:
+            now = time.monotonic()
+            rate = self._group_rate if chat_id < 0 else self._chat_rate
+            state = self._chats[chat_id] = _ChatState(TokenBucket(rate, self._chat_burst, now))
+        state.pending.append(item)
+        self._queued += 1
+        self._idle.clear()
+        if not state.scheduled and not state.busy:
+            state.scheduled = True
+            self._ready.append(chat_id)
+            self._wakeup.set()
+        return future
+
+    def queue_depth(self) -> int:
+        """Get the number of texts waiting to be sent."""
+        return self._queued
+
+    def stats(self) -> OutboundStats:
+        """Get a snapshot of the queue counters."""
+        return OutboundStats(
+            queued=self._queued,
+            in_flight=len(self._tasks),
+            sent=self._sent,
+            failed=self._failed,
+            coalesced=self._coalesced,
+            retry_after=self._retry_after,
+            retries=self._retries,
+            latency_avg=self._latency_total / self._sent if self._sent else 0.0,
+            latency_max=self._latency_max,
+        )
+
+    async def _dispatch(self) -> None:
+        """Pick the next sendable chat whenever both rate limits allow it."""
+        while True:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                self._ready.append(heapq.heappop(self._delayed)[2])
+
+            if not self._ready:
+                self._sweep_idle_chats(now)
+                self._wakeup.clear()
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            chat_id = self._ready[0]
+            state = self._chats[chat_id]
+            chat_delay = state.bucket.delay(now)
+            if chat_delay > 0:
+                self._ready.popleft()
+                heapq.heappush(self._delayed, (now + chat_delay, next(self._delay_seq), chat_id))
+                continue
+
+            global_delay = self._global_bucket.delay(now)
+            if global_delay > 0:
+                await asyncio.sleep(global_delay)
+                continue
+
+            self._ready.popleft()
+            state.bucket.take(now)
+            self._global_bucket.take(now)
+            state.scheduled = False
+            state.busy = True
+            batch = self._take_batch(state)
+            task = asyncio.create_task(self._send(chat_id, state, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _take_batch(self, state: _ChatState) -> List[_OutgoingText]:
+        """Pop the next text plus any following texts it can be merged with."""
+        first = state.pending.popleft()
+        batch = [first]
+        if not first.coalesce:
+            return batch
+        length = len(first.text)
+        while state.pending:
+            candidate = state.pending[0]
+            merged_length = length + len(self._separator) + len(candidate.text)
+            if (not candidate.coalesce or candidate.kwargs != first.kwargs
+                    or merged_length > MAX_MESSAGE_LENGTH):
+                break
+            batch.append(state.pending.popleft())
+            length = merged_length
+        return batch
+
+    async def _send(self, chat_id: int, state: _ChatState, batch: List[_OutgoingText]) -> None:
+        """Send one (possibly merged) message or a document and settle the futures of its texts."""
+        text = self._separator.join(item.text for item in batch)
+        retry_at = None
+        try:
+            if batch[0].document is not None:
+                message = await self._bot.send_document(
+                    chat_id=chat_id, document=batch[0].document, caption=text or None, **batch[0].kwargs
+                )
+            else:
+                message = await self._bot.send_message(chat_id=chat_id, text=text, **batch[0].kwargs)
+        except RetryAfter as e:
+            self._retry_after += 1
+            retry_at = time.monotonic() + float(e.retry_after)
+            self._paused_until = max(self._paused_until, retry_at)
+            logger.warning("Flood control hit for chat %s, pausing sends for %ss", chat_id, e.retry_after)
+        except (BadRequest, Forbidden, ChatMigrated) as e:
+            self._settle(batch, error=e)
+        except NetworkError as e:
+            attempts = max(item.attempts for item in batch) + 1
+            if attempts > self._max_retries:
+                self._settle(batch, error=e)
+            else:
+                for item in batch:
+                    item.attempts = attempts
+                self._retries += 1
+                backoff = min(self._backoff_max, self._backoff_base * 2 ** (attempts - 1))
+                retry_at = time.monotonic() + backoff * random.uniform(0.8, 1.2)
+        except Exception as e:
+            self._settle(batch, error=e)
+        else:
+            if len(batch) > 1:
+                self._coalesced += len(batch) - 1
+            self._settle(batch, message=message)
+        finally:
+            state.busy = False
+
+        if retry_at is not None:
+            # Put the batch back in front; it is merged again on the next attempt
+            state.pending.extendleft(reversed(batch))
+            state.scheduled = True
+            heapq.heappush(self._delayed, (retry_at, next(self._delay_seq), chat_id))
+        elif state.pending:
+            state.scheduled = True
+            self._ready.append(chat_id)
+        self._wakeup.set()
+
+    def _settle(self, batch: List[_OutgoingText], message: Optional[Message] = None,
+                error: Optional[BaseException] = None) -> None:
+        """Resolve the futures of a finished batch and update counters."""
+        now = time.monotonic()
+        for item in batch:
+            self._queued -= 1
+            if error is not None:
+                self._failed += 1
+                if not item.future.done():
+                    item.future.set_exception(error)
+                continue
+            self._sent += 1
+            latency = now - item.enqueued_at
+            self._latency_total += latency
+            if latency > self._latency_max:
+                self._latency_max = latency
+            if not item.future.done():
+                item.future.set_result(message)
+        if error is not None:
+            logger.error("Dropping %d outgoing text(s): %s", len(batch), error)
+        if self._queued == 0:
+            self._idle.set()
+
+    def _sweep_idle_chats(self, now: float, interval: float = 60.0) -> None:
+        """Forget chats with nothing pending whose rate limit has fully recovered."""
+        if now - self._last_sweep < interval:
+            return
+        self._last_sweep = now
+        idle = [
+            chat_id for chat_id, state in self._chats.items()
+            if not state.pending and not state.busy and not state.scheduled and state.bucket.is_full(now)
+        ]
+        for chat_id in idle:
+            del self._chats[chat_id]
+
+
+async def send_reply(
+    update: Update, context: CallbackContext, text: str, coalesce: bool = True, **kwargs: Any
+) -> Message:
+    """
+    Reply to the message that triggered a command.
+
+    Goes through the bot's ``OutboundQueue`` when one is configured and falls
+    back to ``Message.reply_text`` otherwise. Like ``reply_text``, the reply
+    quotes the original message outside private chats.
+
+    Args:
+        update (telegram.Update): The update being handled
+        context (telegram.ext.CallbackContext): The handler context
+        text (str): Reply text
+        coalesce (bool): Allow merging with other pending texts for the chat,
+            False for a message that is edited later
+        **kwargs: Extra ``Bot.send_message`` arguments
+
+    Returns:
+        telegram.Message: The sent message
+    """
+    services = get_services(context)
+    if services is None or services.outbound is None:
+        return await update.message.reply_text(text, **kwargs)
+
+    message = update.effective_message
+    if message.chat.type != Chat.PRIVATE and "reply_to_message_id" not in kwargs:
+        kwargs["reply_to_message_id"] = message.message_id
+    return await services.outbound.send_text(message.chat_id, text, coalesce=coalesce, **kwargs)
+
+
+async def send_document_reply(
+    update: Update, context: CallbackContext, document: InputFile, caption: str = "", **kwargs: Any
+) -> Message:
+    """
+    Reply to the message that triggered a command with a document.
+
+    Like ``send_reply``, goes through the bot's ``OutboundQueue`` when one is
+    configured and falls back to ``Message.reply_document`` otherwise.
+
+    Args:
+        update (telegram.Update): The update being handled
+        context (telegram.ext.CallbackContext): The handler context
+        document (telegram.InputFile): File to upload
+        caption (str): Caption shown under the document
+        **kwargs: Extra ``Bot.send_document`` arguments
+
+    Returns:
+        telegram.Message: The sent message
+    """
+    services = get_services(context)
+    if services is None or services.outbound is None:
+        return await update.message.reply_document(document, caption=caption or None, **kwargs)
+
+    message = update.effective_message
+    if message.chat.type != Chat.PRIVATE and "reply_to_message_id" not in kwargs:
+        kwargs["reply_to_message_id"] = message.message_id
+    return await services.outbound.send_document(message.chat_id, document, caption, **kwargs)
@@ -0,0 +1,253 @@
+"""
+Size-aware delivery of command output.
+
+A reply over Telegram's 4096-character limit fails when sent as one
+message. ``send_output`` picks a way to deliver output by its size. Short
+output is sent as one message. Output that fits in a few messages is split
+at line breaks. Anything longer is uploaded as a gzip-compressed document.
+
+Output can be a string or an (async) iterable of strings, such as a
+generator reading a query result. Only the first few messages' worth is
+held in memory while deciding. The rest goes straight into a compressed
+temporary file, written in a worker thread so compression does not stall
+the event loop.
+"""
+
+import asyncio
+import gzip
+import logging
+import tempfile
+from dataclasses import dataclass
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional, Tuple, Union
+
+from telegram import InputFile, Update
+from telegram.ext import CallbackContext
+
+from outbound import MAX_MESSAGE_LENGTH, send_document_reply, send_reply
+from streaming import split_pages
+
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_DELIVERY = "message"
+SPLIT_DELIVERY = "split"
+DOCUMENT_DELIVERY = "document"
+
+# Largest file a bot may upload through the Bot API
+MAX_DOCUMENT_BYTES = 50 * 1024 * 1024
+# Characters compressed per call into the gzip writer, at most 64 KiB encoded,
+# so one call cannot overshoot the size check by more than the margin
+_SPOOL_SLICE = 16 << 10
+# Characters of async output collected before compressing them in a worker thread
+_SPOOL_BATCH = 1 << 20
+
+Output = Union[str, Iterable[str], AsyncIterable[str]]
+
+
+@dataclass(frozen=True)
+class DeliveryPolicy:
+    """
+    When output stops being sent as messages and how documents are made.
+
+    Attributes:
+        max_messages (int): Messages output may be split into before it is
+            sent as a document instead
+        compress_level (int): gzip level of documents, 1 (fastest) to 9 (smallest)
+        max_document_bytes (int): Compressed size at which the rest of the
+            output is dropped
+    """
+
+    max_messages: int = 4
+    compress_level: int = 6
+    max_document_bytes: int = MAX_DOCUMENT_BYTES
+
+    def __post_init__(self):
+        if self.max_messages < 1:
+            raise ValueError("Delivery must allow at least one message")
+        if not 1 <= self.compress_level <= 9:
+            raise ValueError("Compression level must be between 1 and 9")
+        if self.max_document_bytes < 1 << 20:
+            raise ValueError("Documents must be allowed at least 1 MiB")
+
+
+@dataclass
+class DeliveryReport:
+    """
+    How a piece of output was delivered.
+
+    Attributes:
+        strategy (str): ``message``, ``split`` or ``document``
+        messages (int): Messages sent, including the document
+        characters (int): Characters of output delivered
+        document_bytes (int): Compressed size of the document, 0 without one
+        truncated (bool): Whether output was dropped to stay within the document limit
+    """
+
+    strategy: str
+    messages: int
+    characters: int
+    document_bytes: int = 0
+    truncated: bool = False
+
+
+class _GzipSpool:
+    """Compresses text into an anonymous temporary file."""
+
+    def __init__(self, filename: str, policy: DeliveryPolicy):
+        self.file = tempfile.TemporaryFile()
+        self._gzip = gzip.GzipFile(filename=filename, mode="wb", compresslevel=policy.compress_level,
+                                   fileobj=self.file, mtime=0)
+        # Room for one slice, which even incompressible costs little over its
+        # encoded size, the output deflate holds back, and the note
+        self._limit = policy.max_document_bytes - (256 << 10)
+        self.characters = 0
+        self.lines = 0
+        self.truncated = False
+
+    def write(self, chunks: Iterable[str]) -> bool:
+        """
+        Compress text until it ends or the document is full.
+
+        Returns:
+            bool: False once the document is full and the rest must be dropped
+        """
+        for chunk in chunks:
+            for start in range(0, len(chunk), _SPOOL_SLICE):
+                piece = chunk[start:start + _SPOOL_SLICE]
+                self._gzip.write(piece.encode("utf-8"))
+                self.characters += len(piece)
+                self.lines += piece.count("\n")
+                if self.file.tell() >= self._limit:
+                    self.truncated = True
+                    return False
+        return True
+
+    def finish(self) -> int:
+        """
+        Close the compressed stream and rewind the file for uploading.
+
+        Returns:
+            int: Compressed size in bytes
+        """
+        if self.truncated:
+            self._gzip.write(f"\n[output truncated after {self.characters} characters]\n".encode())
+        self._gzip.close()
+        size = self.file.tell()
+        self.file.seek(0)
+        return size
+
+
+def _take_head(chunks: Iterator[str], limit: int) -> Tuple[List[str], bool]:
+    """Read chunks until more than ``limit`` characters arrived; tells whether the output ended."""
+    head: List[str] = []
+    length = 0
+    for chunk in chunks:
+        head.append(chunk)
+        length += len(chunk)
+        if length > limit:
+            return head, False
+    return head, True
+
+
+async def _take_head_async(chunks: AsyncIterator[str], limit: int) -> Tuple[List[str], bool]:
+    head: List[str] = []
+    length = 0
+    async for chunk in chunks:
+        head.append(chunk)
+        length += len(chunk)
+        if length > limit:
+            return head, False
+    return head, True
+
+
+def _spool(spool: _GzipSpool, head: List[str], rest: Iterator[str]) -> None:
+    """Compress output in a worker thread, closing a generator cut off by the limit."""
+    if spool.write(head) and spool.write(rest):
+        return
+    close = getattr(rest, "close", None)
+    if close is not None:
+        close()
+
+
+async def _spool_async(spool: _GzipSpool, head: List[str], rest: AsyncIterator[str]) -> None:
+    """Compress async output in batches, each written in a worker thread."""
+    batch, length = head, sum(len(chunk) for chunk in head)
+    try:
+        async for chunk in rest:
+            batch.append(chunk)
+            length += len(chunk)
+            if length >= _SPOOL_BATCH:
+                if not await asyncio.to_thread(spool.write, batch):
+                    return
+                batch, length = [], 0
+        await asyncio.to_thread(spool.write, batch)
+    finally:
+        close = getattr(rest, "aclose", None)
+        if close is not None:
+            await close()
+
+
+async def send_output(
+    update: Update,
+    context: CallbackContext,
+    output: Output,
+    filename: str = "output.txt",
+    policy: Optional[DeliveryPolicy] = None,
+) -> DeliveryReport:
+    """
+    Reply with command output of any size.
+
+    Args:
+        update (telegram.Update): The update being handled
+        context (telegram.ext.CallbackContext): The handler context
+        output (Union[str, Iterable[str], AsyncIterable[str]]): The output,
+            whole or in pieces
+        filename (str): Name of the document, ``.gz`` is appended
+        policy (Optional[DeliveryPolicy]): Size thresholds, the defaults if None
+
+    Returns:
+        DeliveryReport: How the output was delivered
+    """
+    policy = policy or DeliveryPolicy()
+    limit = policy.max_messages * MAX_MESSAGE_LENGTH
+    rest: Union[Iterator[str], AsyncIterator[str], None] = None
+    is_async = hasattr(output, "__aiter__")
+    if isinstance(output, str):
+        head, ended = [output], len(output) <= limit
+    elif is_async:
+        rest = output.__aiter__()
+        head, ended = await _take_head_async(rest, limit)
+    else:
+        rest = iter(output)
+        # Producing the output may block as well
+        head, ended = await asyncio.to_thread(_take_head, rest, limit)
+
+    if ended:
+        text = "".join(head)
+        pages = [page for page in split_pages(text) if page.strip()] or [text]
+        if len(pages) <= policy.max_messages:
+            for page in pages:
+                await send_reply(update, context, page)
+            strategy = MESSAGE_DELIVERY if len(pages) == 1 else SPLIT_DELIVERY
+            return DeliveryReport(strategy, len(pages), len(text))
+        head, rest = [text], None
+
+    spool = _GzipSpool(filename, policy)
+    try:
+        if rest is None:
+            await asyncio.to_thread(spool.write, head)
+        elif is_async:
+            await _spool_async(spool, head, rest)
+        else:
+            await asyncio.to_thread(_spool, spool, head, rest)
+        size = await asyncio.to_thread(spool.finish)
+        caption = f"{spool.lines} lines, {spool.characters} characters, {size} bytes compressed"
+        if spool.truncated:
+            caption += ", truncated at the upload limit"
+            logger.warning("Output for %s truncated at %d characters", filename, spool.characters)
+        # python-telegram-bot reads the file into memory; only the compressed size counts
+        document = await asyncio.to_thread(InputFile, spool.file, filename + ".gz")
+    finally:
+        spool.file.close()
+    await send_document_reply(update, context, document, caption)
+    return DeliveryReport(DOCUMENT_DELIVERY, 1, spool.characters, size, spool.truncated)
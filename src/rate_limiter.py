@@ -0,0 +1,321 @@
+"""
+Per-user and per-command rate limiting before command handlers run.
+
+Limits use the generic cell rate algorithm (GCRA): the whole state of a
+user is one float, the theoretical arrival time (TAT) of their next
+request. States live in fixed-size open-addressing tables made of flat
+``array`` columns instead of one Python object per user, so a table of
+``capacity`` slots costs 17 bytes per slot however many users show up.
+
+A slot whose TAT lies in the past belongs to an idle user with a full
+allowance, which is the same as no state at all, so such slots are reused
+by new users as they are probed. Probing is bounded; when every probed
+slot is busy the one closest to expiring is evicted, which can only make
+the limiter more lenient for that user, never stricter.
+"""
+
+import math
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Callable, Dict, NamedTuple, Optional
+
+
+# Marks a slot that never held a key; user ids are never this small
+_EMPTY = -(2 ** 63)
+# Fibonacci hashing multiplier, spreads sequential user ids over the table
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_HASH_MASK = (1 << 64) - 1
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    Allowance of ``count`` requests per ``period`` seconds.
+
+    Attributes:
+        count (int): Requests allowed per period, evenly spaced once the burst is used
+        period (float): Period length in seconds
+        burst (Optional[int]): Requests allowed back to back, defaults to ``count``
+    """
+
+    count: int
+    period: float = 60.0
+    burst: Optional[int] = None
+
+    def __post_init__(self):
+        if self.count < 1 or self.period <= 0:
+            raise ValueError("Rate limit count and period must be positive")
+        if self.burst is not None and self.burst < 1:
+            raise ValueError("Rate limit burst must be positive")
+
+    @property
+    def interval(self) -> float:
+        """Seconds between evenly spaced requests."""
+        return self.period / self.count
+
+    @property
+    def tolerance(self) -> float:
+        """How far ahead of now the TAT may run before requests are rejected."""
+        return self.interval * ((self.burst or self.count) - 1)
+
+    @classmethod
+    def parse(cls, text: str) -> "RateLimit":
+        """
+        Parse a limit written as ``count/period``, e.g. ``30/60`` for 30 per minute.
+
+        Raises:
+            ValueError: If the text is malformed
+        """
+        count, separator, period = text.strip().partition("/")
+        try:
+            return cls(int(count), float(period) if separator else 1.0)
+        except ValueError:
+            raise ValueError(f"Invalid rate limit '{text}', expected e.g. 30/60") from None
+
+
+class Rejection(NamedTuple):
+    """A rejected request: when to retry and whether to tell the user."""
+
+    retry_after: float
+    notify: bool
+
+
+@dataclass
+class RateLimiterStats:
+    """Point-in-time snapshot of rate limiter counters."""
+
+    checked: int
+    rejected: int
+    notices: int
+    evictions: int
+    entries: int
+    memory_bytes: int
+
+
+class GCRATable:
+    """
+    GCRA states of many keys under one limit in a bounded open-addressing table.
+
+    Columns are an ``array('q')`` of keys, an ``array('d')`` of TATs and a
+    ``bytearray`` of flags marking keys already told about a rejection.
+    """
+
+    __slots__ = (
+        "limit", "_interval", "_tolerance", "_keys", "_tats", "_notified", "_mask", "_shift", "_max_probes",
+        "used", "evictions",
+    )
+
+    def __init__(self, limit: RateLimit, capacity: int, max_probes: int = 8):
+        """
+        Allocate the table.
+
+        Args:
+            limit (RateLimit): Limit applied to every key
+            capacity (int): Slots, rounded up to a power of two
+            max_probes (int): Slots inspected per lookup before evicting
+
+        Raises:
+            ValueError: If a size is not positive
+        """
+        if capacity < 1 or max_probes < 1:
+            raise ValueError("Rate limiter table sizes must be positive")
+        self.limit = limit
+        # Read on every check, so kept as plain floats
+        self._interval = limit.interval
+        self._tolerance = limit.tolerance
+        bits = max(1, math.ceil(math.log2(capacity)))
+        size = 1 << bits
+        self._keys = array("q", [_EMPTY]) * size
+        self._tats = array("d", bytes(8 * size))
+        self._notified = bytearray(size)
+        self._mask = size - 1
+        self._shift = 64 - bits
+        self._max_probes = min(max_probes, size)
+        self.used = 0
+        self.evictions = 0
+
+    @property
+    def capacity(self) -> int:
+        """Number of slots."""
+        return self._mask + 1
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes held by the table columns."""
+        return self.capacity * (self._keys.itemsize + self._tats.itemsize + 1)
+
+    def slot(self, key: int, now: float) -> int:
+        """
+        Find the slot of a key, claiming one if the key has none.
+
+        A claimed slot starts with a TAT of 0, a full allowance.
+
+        Args:
+            key (int): Key such as a user id
+            now (float): Current time, identifies idle slots that may be reused
+
+        Returns:
+            int: Index of the key's slot
+        """
+        keys = self._keys
+        index = ((key * _HASH_MULTIPLIER) & _HASH_MASK) >> self._shift
+        if keys[index] == key:
+            return index
+        tats = self._tats
+        mask = self._mask
+        candidate = -1
+        oldest = -1
+        for probe in range(self._max_probes):
+            current = (index + probe) & mask
+            stored = keys[current]
+            if stored == key:
+                return current
+            if stored == _EMPTY:
+                # Keys are never removed, so the key cannot sit past an empty slot
+                if candidate < 0:
+                    candidate = current
+                    self.used += 1
+                break
+            if candidate < 0:
+                if tats[current] <= now:
+                    candidate = current
+                elif oldest < 0 or tats[current] < tats[oldest]:
+                    oldest = current
+        if candidate < 0:
+            candidate = oldest
+            self.evictions += 1
+        keys[candidate] = key
+        tats[candidate] = 0.0
+        self._notified[candidate] = 0
+        return candidate
+
+    def delay(self, slot: int, now: float) -> float:
+        """
+        Get how long the key of a slot must wait before a request conforms.
+
+        Returns:
+            float: 0.0 if a request is allowed now, otherwise seconds to wait
+        """
+        delay = self._tats[slot] - self._tolerance - now
+        return delay if delay > 0.0 else 0.0
+
+    def admit(self, slot: int, now: float) -> None:
+        """Charge an allowed request to the key of a slot."""
+        tat = self._tats[slot]
+        self._tats[slot] = (tat if tat > now else now) + self._interval
+        self._notified[slot] = 0
+
+    def mark_notified(self, slot: int) -> bool:
+        """
+        Mark the key of a slot as told about its rejection.
+
+        Returns:
+            bool: True if it had not been told since its last allowed request
+        """
+        if self._notified[slot]:
+            return False
+        self._notified[slot] = 1
+        return True
+
+
+class RateLimiter:
+    """
+    Per-user limit shared by all commands plus per-command limits.
+
+    A request must conform to both limits and is charged to both only if
+    it does, so a request rejected by one limit does not use up the other.
+    """
+
+    def __init__(
+        self,
+        user_limit: Optional[RateLimit] = None,
+        capacity: int = 65536,
+        notify: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            user_limit (Optional[RateLimit]): Limit of each user across all
+                commands, None for per-command limits only
+            capacity (int): Slots of each table, the users tracked at once per limit
+            notify (bool): Whether a user's first rejected request in a row
+                asks for a cooldown notice
+            clock (Callable[[], float]): Monotonic time source
+
+        Raises:
+            ValueError: If the capacity is not positive
+        """
+        if capacity < 1:
+            raise ValueError("Rate limiter capacity must be positive")
+        self._capacity = capacity
+        self._notify = notify
+        self._clock = clock
+        self._user_table = GCRATable(user_limit, capacity) if user_limit is not None else None
+        self._command_tables: Dict[str, GCRATable] = {}
+        self._checked = 0
+        self._rejected = 0
+        self._notices = 0
+
+    def check(self, user_id: int, command: str, command_limit: Optional[RateLimit] = None) -> Optional[Rejection]:
+        """
+        Decide whether a user may run a command now, charging the request if so.
+
+        Args:
+            user_id (int): User sending the command
+            command (str): Command name (e.g., '/history')
+            command_limit (Optional[RateLimit]): The command's own limit, if any
+
+        Returns:
+            Optional[Rejection]: None if the request is allowed
+        """
+        self._checked += 1
+        user_table = self._user_table
+        if user_table is None and command_limit is None:
+            return None
+        now = self._clock()
+
+        user_slot = command_slot = -1
+        delay = 0.0
+        if user_table is not None:
+            user_slot = user_table.slot(user_id, now)
+            delay = user_table.delay(user_slot, now)
+        command_table = None
+        if command_limit is not None:
+            command_table = self._command_tables.get(command)
+            if command_table is None or (command_table.limit is not command_limit and command_table.limit != command_limit):
+                # New command, or its handler was reloaded with another limit
+                command_table = self._command_tables[command] = GCRATable(command_limit, self._capacity)
+            command_slot = command_table.slot(user_id, now)
+            delay = max(delay, command_table.delay(command_slot, now))
+
+        if delay == 0.0:
+            if user_table is not None:
+                user_table.admit(user_slot, now)
+            if command_table is not None:
+                command_table.admit(command_slot, now)
+            return None
+
+        self._rejected += 1
+        # One notice per rejection streak, tracked in whichever table rejected
+        table, slot = (user_table, user_slot) if user_table is not None else (command_table, command_slot)
+        notify = self._notify and table.mark_notified(slot)
+        if notify:
+            self._notices += 1
+        return Rejection(delay, notify)
+
+    def stats(self) -> RateLimiterStats:
+        """Get a snapshot of the limiter counters."""
+        tables = list(self._command_tables.values())
+        if self._user_table is not None:
+            tables.append(self._user_table)
+        return RateLimiterStats(
+            checked=self._checked,
+            rejected=self._rejected,
+            notices=self._notices,
+            evictions=sum(table.evictions for table in tables),
+            entries=sum(table.used for table in tables),
+            memory_bytes=sum(table.memory_bytes for table in tables),
+        )
@@ -0,0 +1,187 @@
+"""
+In-memory cache of command replies.
+
+Commands whose answer is the same for everyone (or for a chat, a user or a
+set of arguments) for a few seconds declare a ``CachePolicy``. Replies are
+kept in a per-command LRU with a time-to-live, and concurrent misses for
+the same key share a single computation (single-flight), so a burst of
+identical commands runs the handler once.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+GLOBAL_SCOPE = "global"
+CHAT_SCOPE = "chat"
+USER_SCOPE = "user"
+ARGS_SCOPE = "args"
+
+CACHE_SCOPES = (GLOBAL_SCOPE, CHAT_SCOPE, USER_SCOPE, ARGS_SCOPE)
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    How a command's replies may be cached.
+
+    Attributes:
+        ttl (float): Seconds a reply stays valid
+        scope (str): Who shares a reply: ``global`` (everyone), ``chat``,
+            ``user`` or ``args`` (everyone sending the same arguments)
+        max_size (int): Maximum number of replies kept for the command
+    """
+
+    ttl: float
+    scope: str = GLOBAL_SCOPE
+    max_size: int = 128
+
+    def __post_init__(self):
+        if self.ttl <= 0 or self.max_size < 1:
+            raise ValueError("Cache TTL and size must be positive")
+        if self.scope not in CACHE_SCOPES:
+            raise ValueError(f"Unknown cache scope '{self.scope}', expected one of {CACHE_SCOPES}")
+
+    def key(self, update: Any, args: List[str]) -> Hashable:
+        """
+        Build the cache key of an update under this policy.
+
+        Args:
+            update: The update being handled
+            args (List[str]): The command arguments
+
+        Returns:
+            Hashable: Key identifying replies that may be shared
+        """
+        if self.scope == CHAT_SCOPE:
+            chat = getattr(update, "effective_chat", None)
+            return chat.id if chat is not None else None
+        if self.scope == USER_SCOPE:
+            user = getattr(update, "effective_user", None)
+            return user.id if user is not None else None
+        if self.scope == ARGS_SCOPE:
+            return tuple(args)
+        return None
+
+
+@dataclass
+class CacheStats:
+    """Point-in-time snapshot of cache counters."""
+
+    hits: int
+    misses: int
+    coalesced: int
+    evictions: int
+    size: int
+
+
+class ResponseCache:
+    """
+    Per-command LRU caches with TTL and single-flight computation.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize an empty cache.
+
+        Args:
+            clock (Callable[[], float]): Monotonic time source, replaceable in tests
+        """
+        self._clock = clock
+        self._entries: Dict[str, "OrderedDict[Hashable, Tuple[float, str]]"] = {}
+        self._in_flight: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+
+    async def get_or_compute(
+        self,
+        command: str,
+        key: Hashable,
+        policy: CachePolicy,
+        compute: Callable[[], Awaitable[str]],
+    ) -> Tuple[str, bool]:
+        """
+        Return a cached reply or compute it, sharing concurrent computations.
+
+        Args:
+            command (str): Command name, each command has its own LRU
+            key (Hashable): Key from ``CachePolicy.key``
+            policy (CachePolicy): TTL and size limits of the command
+            compute (Callable[[], Awaitable[str]]): Produces the reply on a miss
+
+        Returns:
+            Tuple[str, bool]: The reply and whether it was served without
+            running ``compute`` in this call
+
+        Raises:
+            Exception: Whatever ``compute`` raised; failures are not cached
+        """
+        entries = self._entries.get(command)
+        if entries is None:
+            entries = self._entries[command] = OrderedDict()
+
+        entry = entries.get(key)
+        if entry is not None:
+            if entry[0] > self._clock():
+                entries.move_to_end(key)
+                self._hits += 1
+                return entry[1], True
+            del entries[key]
+
+        flight_key = (command, key)
+        pending = self._in_flight.get(flight_key)
+        if pending is not None:
+            self._coalesced += 1
+            return await asyncio.shield(pending), True
+
+        self._misses += 1
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting when the computation fails
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._in_flight[flight_key] = future
+        try:
+            value = await compute()
+        except BaseException as error:
+            if isinstance(error, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(error)
+            raise
+        finally:
+            del self._in_flight[flight_key]
+
+        entries[key] = (self._clock() + policy.ttl, value)
+        entries.move_to_end(key)
+        while len(entries) > policy.max_size:
+            entries.popitem(last=False)
+            self._evictions += 1
+        future.set_result(value)
+        return value, False
+
+    def invalidate(self, command: Optional[str] = None) -> None:
+        """
+        Drop cached replies.
+
+        Args:
+            command (Optional[str]): Command whose replies to drop, all if None
+        """
+        if command is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(command, None)
+
+    def stats(self) -> CacheStats:
+        """Get a snapshot of the cache counters."""
+        return CacheStats(
+            hits=self._hits,
+            misses=self._misses,
+            coalesced=self._coalesced,
+            evictions=self._evictions,
+            size=sum(len(entries) for entries in self._entries.values()),
+        )
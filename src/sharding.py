@@ -0,0 +1,559 @@
+"""
+Multi-process sharding of update handling by chat.
+
+A single ``TelegramBot`` handles every update on one core. With
+``WORKERS`` above 1, ``ShardSupervisor`` receives updates once (polling
+or webhook) and forwards each one to the worker process that owns its
+chat, chosen by hashing the chat id. Each worker runs a complete bot
+(registry, manager, router, scheduler and outbound queue) fed from a
+``multiprocessing`` queue instead of Telegram. Because a chat always maps
+to the same worker and every worker handles a chat's updates in order,
+per-chat ordering is preserved.
+
+Workers send metrics snapshots back on a shared queue. The supervisor
+merges them for the Prometheus endpoint and restarts workers that exit.
+A worker confirms each update once its router has taken it over, like a
+single bot records its offset. The supervisor keeps forwarded updates
+until they are confirmed: a restarted worker gets the ones its
+predecessor never took, and the saved offset stops below the oldest of
+them, so catch-up redelivers them after a restart of the whole bot. An
+update a worker took just before crashing can be handled twice. Workers are not
+daemon processes, so handlers can start process pools of their own; the
+supervisor stops them itself, terminating and then killing any worker
+that does not finish in time.
+"""
+
+import asyncio
+import dataclasses
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import Application, ApplicationBuilder, TypeHandler
+
+from catch_up import catch_up_from_config
+from config import BotConfig, POLLING_MODE, WEBHOOK_MODE, WORKER_MODE
+from metrics import MetricsRegistry, MetricsServer
+from structured_logging import configure_logging
+from transport import apply_transport
+from webhook_server import WebhookServer
+
+
+logger = logging.getLogger(__name__)
+
+# Update fields whose value carries the chat the update belongs to
+_CHAT_FIELDS = (
+    "message", "edited_message", "channel_post", "edited_channel_post",
+    "my_chat_member", "chat_member", "chat_join_request",
+)
+
+
+def extract_chat_id(data: Dict[str, Any]) -> Optional[int]:
+    """
+    Find the chat an update belongs to without building an ``Update``.
+
+    Args:
+        data (Dict[str, Any]): Update as received from the Bot API
+
+    Returns:
+        Optional[int]: The chat id, the sender's id for chat-less updates
+        such as inline queries, or None
+    """
+    for field in _CHAT_FIELDS:
+        value = data.get(field)
+        if value is not None:
+            return value["chat"]["id"]
+    for field, value in data.items():
+        if not isinstance(value, dict):
+            continue
+        message = value.get("message")
+        if isinstance(message, dict) and "chat" in message:
+            return message["chat"]["id"]
+        sender = value.get("from")
+        if isinstance(sender, dict):
+            return sender["id"]
+    return None
+
+
+def shard_for(chat_id: Optional[int], workers: int) -> int:
+    """
+    Pick the worker owning a chat.
+
+    Args:
+        chat_id (Optional[int]): Chat id, None for updates without a chat
+        workers (int): Number of workers
+
+    Returns:
+        int: Worker index in ``range(workers)``
+    """
+    if chat_id is None:
+        return 0
+    return chat_id % workers
+
+
+class _Worker:
+    """Supervisor-side handle of one worker process."""
+
+    __slots__ = ("index", "process", "updates", "pending", "restart", "started_at", "crashes")
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.updates: Optional[multiprocessing.Queue] = None
+        # Forwarded updates the worker has not confirmed yet, by update id in forwarding order
+        self.pending: Dict[int, Dict[str, Any]] = {}
+        self.restart: Optional[asyncio.TimerHandle] = None
+        self.started_at = 0.0
+        self.crashes = 0
+
+
+class _MergedMetrics:
+    """Registry stand-in that renders the supervisor's merged metrics."""
+
+    def __init__(self, supervisor: "ShardSupervisor"):
+        self._supervisor = supervisor
+
+    def render_prometheus(self) -> str:
+        return self._supervisor.merged_metrics().render_prometheus()
+
+
+class ShardSupervisor:
+    """
+    Receives updates once and shards them across worker processes by chat.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        config: BotConfig,
+        metrics_interval: float = 1.0,
+        monitor_interval: float = 0.5,
+        startup_timeout: float = 60.0,
+    ):
+        """
+        Initialize the supervisor.
+
+        Args:
+            token (str): Telegram bot token
+            config (BotConfig): Runtime configuration; ``workers`` sets the number of shards
+            metrics_interval (float): Seconds between worker metrics snapshots
+            monitor_interval (float): Seconds between worker liveness checks
+            startup_timeout (float): Seconds ``start`` waits for the workers to come up
+
+        Raises:
+            ValueError: If fewer than one worker is configured
+        """
+        if config.workers < 1:
+            raise ValueError("At least one worker is required")
+        self.token = token
+        self.config = config
+        self._metrics_interval = metrics_interval
+        self._monitor_interval = monitor_interval
+        self._startup_timeout = startup_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = [_Worker(index) for index in range(config.workers)]
+        self._events = self._context.Queue()
+        self._snapshots: Dict[int, Dict[str, Any]] = {}
+        self._ready: Dict[int, int] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._events_thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_forwarded: Optional[int] = None
+        self._stopping = False
+
+        self.forwarded = 0
+        self.restarts = 0
+
+        builder = ApplicationBuilder().token(token)
+        if config.base_url:
+            builder.base_url(config.base_url)
+        apply_transport(builder, config.transport)
+        if config.mode != POLLING_MODE:
+            builder.updater(None)
+        self.application: Application = builder.build()
+        self.webhook_server = WebhookServer(self.application, config.webhook) if config.mode == WEBHOOK_MODE else None
+        self.catch_up, self.offset_store = catch_up_from_config(config)
+
+        self.metrics_server: Optional[MetricsServer] = None
+        if config.metrics_port is not None:
+            self.metrics_server = MetricsServer(
+                _MergedMetrics(self), config.metrics_listen, config.metrics_port
+            )
+
+    @property
+    def worker_pids(self) -> List[Optional[int]]:
+        """Process ids of the current workers."""
+        return [worker.process.pid if worker.process is not None else None for worker in self._workers]
+
+    def worker_config(self) -> BotConfig:
+        """
+        Get the configuration each worker runs with.
+
+        Workers receive updates from the supervisor, do not serve metrics
+        themselves and split the global outbound rate between them.
+        """
+        return dataclasses.replace(
+            self.config,
+            mode=WORKER_MODE,
+            webhook=None,
+            metrics_port=None,
+            workers=1,
+            offset_file=None,
+            outbound_global_rate=self.config.outbound_global_rate / self.config.workers,
+            shard_count=self.config.workers,
+        )
+
+    async def start(self) -> None:
+        """
+        Start the workers, then start receiving updates.
+
+        Raises:
+            RuntimeError: If the workers do not come up within the startup timeout
+        """
+        self._loop = asyncio.get_running_loop()
+        for worker in self._workers:
+            self._spawn(worker)
+        self._events_thread = threading.Thread(target=self._read_events, name="shard-events", daemon=True)
+        self._events_thread.start()
+
+        deadline = time.monotonic() + self._startup_timeout
+        try:
+            while len(self._ready) < len(self._workers):
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Only {len(self._ready)} of {len(self._workers)} workers started")
+                await asyncio.sleep(0.05)
+
+            await self.application.initialize()
+            if self.metrics_server is not None:
+                await self.metrics_server.start()
+            if self.offset_store is not None:
+                await self.offset_store.start()
+            if self.webhook_server is not None:
+                await self.webhook_server.start()
+            else:
+                if self.catch_up is not None:
+                    await self.catch_up.start(
+                        self.application.bot, self.application.update_queue, self.application.update_queue.empty
+                    )
+                await self.application.updater.start_polling(
+                    poll_interval=self.config.transport.poll_interval,
+                    timeout=self.config.transport.poll_timeout,
+                )
+        except BaseException:
+            # Workers are not daemons, they would outlive a failed start
+            await self.stop()
+            raise
+        self._tasks = [
+            asyncio.create_task(self._forward_updates()),
+            asyncio.create_task(self._monitor_workers()),
+        ]
+
+    async def stop(self, timeout: float = 10.0, kill_grace: float = 5.0) -> None:
+        """
+        Stop receiving updates and let the workers finish what they have.
+
+        Args:
+            timeout (float): Seconds to wait for workers before terminating them
+            kill_grace (float): Seconds a terminated worker gets before it is killed
+        """
+        self._stopping = True
+        if self.catch_up is not None:
+            await self.catch_up.stop()
+        if self.application.updater is not None and self.application.updater.running:
+            await self.application.updater.stop()
+        if self.webhook_server is not None:
+            await self.webhook_server.stop()
+        # Forward what ingestion already accepted before telling workers to stop
+        while not self.application.update_queue.empty():
+            self.dispatch(self.application.update_queue.get_nowait())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for worker in self._workers:
+            if worker.restart is not None:
+                # Its unconfirmed updates stay below the saved offset for catch-up
+                worker.restart.cancel()
+                worker.restart = None
+
+        for worker in self._workers:
+            if worker.updates is not None:
+                worker.updates.put(None)
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            if worker.process is None:
+                continue
+            await asyncio.to_thread(worker.process.join, max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                logger.warning("Worker %d did not stop in time, terminating it", worker.index)
+                worker.process.terminate()
+                await asyncio.to_thread(worker.process.join, kill_grace)
+            if worker.process.is_alive():
+                logger.warning("Worker %d ignored SIGTERM, killing it", worker.index)
+                worker.process.kill()
+                await asyncio.to_thread(worker.process.join)
+
+        self._events.put(None)
+        if self._events_thread is not None:
+            await asyncio.to_thread(self._events_thread.join)
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        if self.offset_store is not None:
+            # Workers have confirmed everything they took
+            await self.offset_store.stop()
+        await self.application.shutdown()
+
+    def dispatch(self, update: Update) -> int:
+        """
+        Forward one update to the worker owning its chat.
+
+        Args:
+            update (telegram.Update): The received update
+
+        Returns:
+            int: Index of the worker it was sent to
+        """
+        data = update.to_dict()
+        index = shard_for(extract_chat_id(data), len(self._workers))
+        worker = self._workers[index]
+        worker.pending[update.update_id] = data
+        self._last_forwarded = update.update_id
+        if worker.updates is not None:
+            # Otherwise the worker is dead; its replacement gets the update
+            worker.updates.put(data)
+        self.forwarded += 1
+        return index
+
+    def confirm(self, index: int, update_id: int) -> None:
+        """
+        Forget an update its worker has taken over, and advance the offset.
+
+        The offset stops below the oldest update any worker has not
+        confirmed, since updates of different chats finish out of order.
+
+        Args:
+            index (int): Index of the worker
+            update_id (int): Id of the update
+        """
+        self._workers[index].pending.pop(update_id, None)
+        if self.offset_store is None:
+            return
+        waiting = [next(iter(worker.pending)) for worker in self._workers if worker.pending]
+        if waiting:
+            self.offset_store.record(min(waiting) - 1)
+        elif self._last_forwarded is not None:
+            self.offset_store.record(self._last_forwarded)
+
+    def merged_metrics(self) -> MetricsRegistry:
+        """
+        Combine the latest metrics of every worker with the supervisor's own.
+
+        Returns:
+            MetricsRegistry: A fresh registry holding the merged values
+        """
+        merged = MetricsRegistry()
+        for snapshot in list(self._snapshots.values()):
+            merged.merge_snapshot(snapshot)
+        merged.register_gauge("shard_workers", "Worker processes.", lambda: len(self._workers))
+        merged.register_gauge(
+            "shard_workers_alive", "Worker processes currently running.",
+            lambda: sum(1 for w in self._workers if w.process is not None and w.process.is_alive()))
+        merged.register_gauge("shard_forwarded_updates", "Updates forwarded to workers.", lambda: self.forwarded)
+        merged.register_gauge("shard_worker_restarts", "Worker processes restarted after exiting.", lambda: self.restarts)
+        return merged
+
+    def run(self):
+        """Run the supervisor until SIGINT or SIGTERM is received."""
+        logger.info("GServerBot is starting %d workers...", len(self._workers))
+        asyncio.run(self._run_until_stopped())
+
+    async def _run_until_stopped(self):
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Not supported on this platform, rely on KeyboardInterrupt
+        if hasattr(signal, "SIGHUP"):
+            try:
+                loop.add_signal_handler(signal.SIGHUP, self._forward_reload)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        await self.start()
+        try:
+            await stop_event.wait()
+            logger.info("Stopping GServerBot...")
+        finally:
+            await self.stop()
+
+    def _forward_reload(self) -> None:
+        """Pass SIGHUP on to every worker, each reloads its own command handlers."""
+        for pid in self.worker_pids:
+            if pid is not None:
+                try:
+                    os.kill(pid, signal.SIGHUP)
+                except ProcessLookupError:
+                    pass  # Exited, the monitor restarts it with fresh handlers
+
+    async def _forward_updates(self) -> None:
+        update_queue = self.application.update_queue
+        while True:
+            update = await update_queue.get()
+            try:
+                self.dispatch(update)
+            except Exception:
+                logger.exception("Failed to forward update %s", getattr(update, "update_id", update))
+
+    async def _monitor_workers(self) -> None:
+        while True:
+            await asyncio.sleep(self._monitor_interval)
+            for worker in self._workers:
+                if self._stopping or worker.restart is not None or worker.process.is_alive():
+                    continue
+                uptime = time.monotonic() - worker.started_at
+                # Back off when a worker keeps dying right after starting
+                worker.crashes = worker.crashes + 1 if uptime < 30 else 1
+                delay = min(30.0, 0.5 * 2 ** (worker.crashes - 1))
+                logger.error(
+                    "Worker %d exited with code %s, restarting in %.1fs with %d unconfirmed updates",
+                    worker.index, worker.process.exitcode, delay, len(worker.pending),
+                )
+                self._snapshots.pop(worker.index, None)
+                # A queue a worker died reading from may be left locked, never reuse it
+                worker.updates.cancel_join_thread()
+                worker.updates = None
+                # Each worker backs off on its own, others are still restarted on time
+                worker.restart = asyncio.get_running_loop().call_later(delay, self._restart, worker)
+
+    def _restart(self, worker: _Worker) -> None:
+        worker.restart = None
+        if not self._stopping:
+            self._spawn(worker)
+            self.restarts += 1
+
+    def _spawn(self, worker: _Worker) -> None:
+        worker.updates = self._context.Queue()
+        for data in worker.pending.values():
+            worker.updates.put(data)
+        worker.process = self._context.Process(
+            target=_worker_main,
+            args=(worker.index, self.token, self.worker_config(), worker.updates, self._events,
+                  self._metrics_interval, logging.getLogger().getEffectiveLevel()),
+            name=f"gserverbot-worker-{worker.index}",
+            # Daemonic processes cannot start process pools for handlers
+            daemon=False,
+        )
+        worker.process.start()
+        worker.started_at = time.monotonic()
+
+    def _read_events(self) -> None:
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            kind, index, payload = event
+            if kind == "metrics":
+                self._snapshots[index] = payload
+            elif kind == "taken":
+                self._loop.call_soon_threadsafe(self.confirm, index, payload)
+            elif kind == "ready":
+                self._ready[index] = payload
+
+
+def _worker_main(
+    index: int,
+    token: str,
+    config: BotConfig,
+    updates: "multiprocessing.Queue",
+    events: "multiprocessing.Queue",
+    metrics_interval: float,
+    log_level: int,
+) -> None:
+    """Entry point of a worker process, logging at the supervisor's level in the configured format."""
+    log_writer = configure_logging(logging.getLevelName(log_level), config.log_format, static_fields={"worker": index})
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The supervisor decides when to stop
+    try:
+        asyncio.run(_run_worker(index, token, config, updates, events, metrics_interval))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        log_writer.stop()
+
+
+async def _run_worker(
+    index: int,
+    token: str,
+    config: BotConfig,
+    updates: "multiprocessing.Queue",
+    events: "multiprocessing.Queue",
+    metrics_interval: float,
+) -> None:
+    """Run a bot fed from the supervisor's queue until it sends None or SIGTERM arrives."""
+    from bot import OFFSET_TRACKING_GROUP
+    from main import build_bot
+
+    # Alerts are evaluated by the worker handling their chat
+    config = dataclasses.replace(config, shard_index=index)
+    if index != 0:
+        # Every worker has the same commands, one menu update is enough
+        config = dataclasses.replace(config, publish_commands=False)
+    bot = build_bot(token, config)
+
+    async def confirm(update: Update, context) -> None:
+        events.put(("taken", index, update.update_id))
+
+    # Runs once the router has taken the update, where a single bot records its offset
+    bot.application.add_handler(TypeHandler(Update, confirm), group=OFFSET_TRACKING_GROUP)
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, stopped.set)
+    except (NotImplementedError, RuntimeError):
+        pass
+    if hasattr(signal, "SIGHUP"):
+        try:
+            loop.add_signal_handler(signal.SIGHUP, bot._reload_on_signal)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    def feed(data: Dict[str, Any]) -> None:
+        bot.application.update_queue.put_nowait(Update.de_json(data, bot.application.bot))
+
+    def read_updates() -> None:
+        while True:
+            try:
+                data = updates.get()
+            except (EOFError, OSError):
+                break
+            if data is None:
+                break
+            loop.call_soon_threadsafe(feed, data)
+        loop.call_soon_threadsafe(stopped.set)
+
+    await bot.start()
+    threading.Thread(target=read_updates, name="shard-updates", daemon=True).start()
+    logger.info("Worker %d started (pid %d)", index, os.getpid())
+    events.put(("ready", index, os.getpid()))
+
+    async def report_metrics() -> None:
+        while True:
+            events.put(("metrics", index, bot.services.metrics.snapshot()))
+            await asyncio.sleep(metrics_interval)
+
+    reporter = asyncio.create_task(report_metrics())
+    try:
+        await stopped.wait()
+        # Let updates handed to the loop just before stopping reach the scheduler
+        while not bot.application.update_queue.empty():
+            await asyncio.sleep(0.01)
+    finally:
+        reporter.cancel()
+        await asyncio.gather(reporter, return_exceptions=True)
+        await bot.stop()
+        events.put(("metrics", index, bot.services.metrics.snapshot()))
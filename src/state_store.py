@@ -0,0 +1,354 @@
+"""
+Persistent per-chat key/value state backed by SQLite.
+
+Handlers read and write JSON-serializable values scoped to a chat. Reads
+go through a bounded in-memory LRU, writes land in a pending buffer that
+is committed in one transaction per batch, either on a timer or once the
+buffer reaches a size threshold. Only changed keys are written, unlike
+pickle persistence, which rewrites all state on every flush. SQLite runs
+in WAL mode on a dedicated thread, so the event loop never waits on disk.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bot_services import get_services
+
+
+logger = logging.getLogger(__name__)
+
+# Marks a key deleted in the pending buffer, or known to be absent in the cache
+_ABSENT = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_state (
+    chat_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (chat_id, key)
+) WITHOUT ROWID
+"""
+_UPSERT = (
+    "INSERT INTO chat_state (chat_id, key, value) VALUES (?, ?, ?) "
+    "ON CONFLICT (chat_id, key) DO UPDATE SET value = excluded.value"
+)
+_DELETE = "DELETE FROM chat_state WHERE chat_id = ? AND key = ?"
+_SELECT = "SELECT value FROM chat_state WHERE chat_id = ? AND key = ?"
+_SCAN = "SELECT chat_id, value FROM chat_state WHERE key = ?"
+
+
+@dataclass
+class StateStoreStats:
+    """Point-in-time snapshot of state store counters."""
+
+    reads: int
+    cache_hits: int
+    writes: int
+    pending: int
+    cached: int
+    flushes: int
+    rows_flushed: int
+    last_flush_seconds: float
+
+
+class StateStore:
+    """
+    Chat-scoped key/value store with a read-through cache and write-behind batching.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        flush_interval: float = 1.0,
+        batch_size: int = 1000,
+        cache_size: int = 10000,
+    ):
+        """
+        Initialize the store; the database is opened by ``start``.
+
+        Args:
+            path (str): SQLite database file, ``:memory:`` for a throwaway store
+            flush_interval (float): Maximum seconds a write stays buffered
+            batch_size (int): Buffered writes that trigger an early flush;
+                writers wait once four times as many are pending
+            cache_size (int): Values kept in the read cache
+
+        Raises:
+            ValueError: If a limit is not positive
+        """
+        if flush_interval <= 0 or batch_size < 1 or cache_size < 1:
+            raise ValueError("State store limits must be positive")
+        self._path = path
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[int, str], Any]" = OrderedDict()
+        self._pending: Dict[Tuple[int, str], Any] = {}
+        self._flushing: Dict[Tuple[int, str], Any] = {}
+        # One thread owns the connection, which also serializes every query
+        self._thread = ThreadPoolExecutor(1, thread_name_prefix="state-store")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.Task] = None
+
+        self._reads = 0
+        self._cache_hits = 0
+        self._writes = 0
+        self._flushes = 0
+        self._rows_flushed = 0
+        self._last_flush_seconds = 0.0
+
+    async def start(self) -> None:
+        """Open the database and start the periodic flush."""
+        if self._connection is None:
+            self._connection = await self._run(self._open)
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        """Flush every buffered write and close the database."""
+        if self._timer is not None:
+            self._timer.cancel()
+            await asyncio.gather(self._timer, return_exceptions=True)
+            self._timer = None
+        if self._connection is not None:
+            await self.flush()
+            await self._run(self._connection.close)
+            self._connection = None
+        self._thread.shutdown(wait=True)
+
+    async def get(self, chat_id: int, key: str, default: Any = None) -> Any:
+        """
+        Read a value.
+
+        Args:
+            chat_id (int): Chat the value belongs to
+            key (str): Value name
+            default (Any): Returned when the key is not set
+
+        Returns:
+            Any: The stored value or ``default``
+        """
+        self._reads += 1
+        item = (chat_id, key)
+        if item in self._pending:
+            value = self._pending[item]
+        elif item in self._flushing:
+            value = self._flushing[item]
+        elif item in self._cache:
+            self._cache.move_to_end(item)
+            value = self._cache[item]
+        else:
+            writes = self._writes
+            row = await self._run(self._select, item)
+            value = _ABSENT if row is None else json.loads(row)
+            # Only cache what no write can have superseded while the query ran
+            if self._writes == writes:
+                self._remember(item, value)
+            return default if value is _ABSENT else value
+        self._cache_hits += 1
+        return default if value is _ABSENT else value
+
+    async def set(self, chat_id: int, key: str, value: Any) -> None:
+        """
+        Write a value; it is committed by the next flush.
+
+        Args:
+            chat_id (int): Chat the value belongs to
+            key (str): Value name
+            value (Any): JSON-serializable value
+
+        Raises:
+            TypeError: If the value cannot be serialized to JSON
+        """
+        json.dumps(value)
+        await self._buffer((chat_id, key), value)
+
+    async def delete(self, chat_id: int, key: str) -> None:
+        """
+        Remove a value; the removal is committed by the next flush.
+
+        Args:
+            chat_id (int): Chat the value belongs to
+            key (str): Value name
+        """
+        await self._buffer((chat_id, key), _ABSENT)
+
+    async def scan(self, key: str) -> Dict[int, Any]:
+        """
+        Read one key of every chat, such as data loaded once at startup.
+
+        Buffered writes are included, even those made while the query runs.
+
+        Args:
+            key (str): Value name
+
+        Returns:
+            Dict[int, Any]: Values by chat id, for the chats that have the key
+        """
+        await self.flush()
+        rows = await self._run(self._scan, key)
+        values = {chat_id: json.loads(value) for chat_id, value in rows}
+        for buffer in (self._flushing, self._pending):
+            for (chat_id, name), value in buffer.items():
+                if name == key:
+                    if value is _ABSENT:
+                        values.pop(chat_id, None)
+                    else:
+                        values[chat_id] = value
+        return values
+
+    async def flush(self) -> int:
+        """
+        Commit every buffered write in one transaction.
+
+        Returns:
+            int: Number of rows written or deleted
+
+        Raises:
+            sqlite3.Error: If the transaction fails; the writes stay buffered
+        """
+        async with self._flush_lock:
+            if not self._pending or self._connection is None:
+                return 0
+            batch, self._pending = self._pending, {}
+            self._flushing = batch
+            started = time.perf_counter()
+            try:
+                await self._run(self._commit, batch)
+            except BaseException:
+                # Keep writes made during the failed flush, they are newer
+                batch.update(self._pending)
+                self._pending = batch
+                raise
+            finally:
+                self._flushing = {}
+            self._flushes += 1
+            self._rows_flushed += len(batch)
+            self._last_flush_seconds = time.perf_counter() - started
+            for item, value in batch.items():
+                if item in self._cache or len(self._cache) < self._cache_size:
+                    self._remember(item, value)
+            return len(batch)
+
+    def stats(self) -> StateStoreStats:
+        """Get a snapshot of the store counters."""
+        return StateStoreStats(
+            reads=self._reads,
+            cache_hits=self._cache_hits,
+            writes=self._writes,
+            pending=len(self._pending),
+            cached=len(self._cache),
+            flushes=self._flushes,
+            rows_flushed=self._rows_flushed,
+            last_flush_seconds=self._last_flush_seconds,
+        )
+
+    async def _buffer(self, item: Tuple[int, str], value: Any) -> None:
+        self._writes += 1
+        self._pending[item] = value
+        self._cache.pop(item, None)
+        if len(self._pending) >= self._batch_size and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush_logged())
+        if len(self._pending) >= 4 * self._batch_size:
+            # The disk is not keeping up, make the writer wait for it
+            await self.flush()
+
+    def _remember(self, item: Tuple[int, str], value: Any) -> None:
+        self._cache[item] = value
+        self._cache.move_to_end(item)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            await self._flush_logged()
+
+    async def _flush_logged(self) -> None:
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Flushing chat state failed, will retry")
+
+    async def _run(self, function: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._thread, function, *args)
+
+    def _open(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(_SCHEMA)
+        return connection
+
+    def _select(self, item: Tuple[int, str]) -> Optional[str]:
+        row = self._connection.execute(_SELECT, item).fetchone()
+        return row[0] if row is not None else None
+
+    def _scan(self, key: str) -> List[Tuple[int, str]]:
+        return self._connection.execute(_SCAN, (key,)).fetchall()
+
+    def _commit(self, batch: Dict[Tuple[int, str], Any]) -> None:
+        upserts: List[Tuple[int, str, str]] = []
+        deletes: List[Tuple[int, str]] = []
+        for (chat_id, key), value in batch.items():
+            if value is _ABSENT:
+                deletes.append((chat_id, key))
+            else:
+                upserts.append((chat_id, key, json.dumps(value)))
+        with self._connection:
+            self._connection.execute("BEGIN")
+            self._connection.executemany(_UPSERT, upserts)
+            self._connection.executemany(_DELETE, deletes)
+
+
+class ChatState:
+    """The state of one chat, as seen by a command handler."""
+
+    def __init__(self, store: StateStore, chat_id: int):
+        """
+        Initialize the view.
+
+        Args:
+            store (StateStore): Backing store
+            chat_id (int): Chat the view is scoped to
+        """
+        self._store = store
+        self.chat_id = chat_id
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        """Read a value of this chat."""
+        return await self._store.get(self.chat_id, key, default)
+
+    async def set(self, key: str, value: Any) -> None:
+        """Write a value of this chat."""
+        await self._store.set(self.chat_id, key, value)
+
+    async def delete(self, key: str) -> None:
+        """Remove a value of this chat."""
+        await self._store.delete(self.chat_id, key)
+
+
+def get_chat_state(update: Any, context: Any) -> Optional[ChatState]:
+    """
+    Get the state of the chat an update came from.
+
+    Args:
+        update: The update being handled
+        context: The handler context
+
+    Returns:
+        Optional[ChatState]: The chat's state, None without a store or a chat
+    """
+    services = get_services(context)
+    chat = getattr(update, "effective_chat", None)
+    if services is None or services.state_store is None or chat is None:
+        return None
+    return ChatState(services.state_store, chat.id)
@@ -0,0 +1,256 @@
+"""
+Streaming replies for long-running commands.
+
+A handler that declares a ``StreamPolicy`` yields its output piece by
+piece from ``stream``. Instead of one message per piece, the output is
+shown as one message that is edited in place. Edits are merged so a
+message is touched at most once per interval, and edits that would not
+change the text are skipped. Output beyond Telegram's 4096-character
+limit continues in a new message. However fast a handler produces output,
+the Bot API sees at most one flush per interval. A flush that fails with
+a network error or a rejected edit is logged and tried again on the next
+interval, so one failed request does not freeze the reply.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, List, Optional
+
+from telegram import Chat, Message, Update
+from telegram.error import BadRequest, NetworkError, RetryAfter
+from telegram.ext import CallbackContext
+
+from outbound import MAX_MESSAGE_LENGTH, send_reply
+
+
+logger = logging.getLogger(__name__)
+
+# Tries at the final flush, after the output has ended, before its error is raised
+FINAL_FLUSH_ATTEMPTS = 3
+
+
+@dataclass(frozen=True)
+class StreamPolicy:
+    """
+    How a command's streamed output is shown.
+
+    Attributes:
+        min_interval (float): Minimum seconds between flushes in private chats
+        group_interval (float): Minimum seconds between flushes in groups,
+            which Telegram rate limits harder
+        replace (bool): Each yielded piece replaces the output so far (e.g.
+            a progress line) instead of being appended to it
+    """
+
+    min_interval: float = 1.0
+    group_interval: float = 3.0
+    replace: bool = False
+
+    def __post_init__(self):
+        if self.min_interval < 0 or self.group_interval < 0:
+            raise ValueError("Stream flush intervals must not be negative")
+
+
+@dataclass
+class StreamStats:
+    """Counters of one streamed reply."""
+
+    chunks: int = 0
+    flushes: int = 0
+    messages: int = 0
+    edits: int = 0
+    failed_flushes: int = 0
+
+
+def split_pages(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """
+    Split text into message-sized pages, preferably at line breaks.
+
+    A page ends at the last line break within the limit, which is dropped,
+    or at the limit if there is none. Pages only depend on the text before
+    their end, so appending never moves a page boundary that already exists.
+
+    Args:
+        text (str): Text to split
+        limit (int): Maximum page length
+
+    Returns:
+        List[str]: At least one page
+    """
+    pages = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit + 1)
+        if cut > 0:
+            pages.append(text[:cut])
+            text = text[cut + 1:]
+        else:
+            pages.append(text[:limit])
+            text = text[limit:]
+    pages.append(text)
+    return pages
+
+
+class StreamingReply:
+    """
+    Shows streamed output as messages edited in place.
+
+    The first non-blank output is sent as a reply and every later flush
+    edits the messages whose page changed. When the output outgrows a
+    message, the page is finished and the rest goes to a new message.
+    """
+
+    def __init__(
+        self,
+        update: Update,
+        context: CallbackContext,
+        policy: StreamPolicy,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the reply.
+
+        Args:
+            update (telegram.Update): The update being handled
+            context (telegram.ext.CallbackContext): The handler context
+            policy (StreamPolicy): Flush interval and output mode
+            clock (Callable[[], float]): Monotonic time source
+        """
+        self._update = update
+        self._context = context
+        self._policy = policy
+        chat = update.effective_chat
+        private = chat is None or chat.type == Chat.PRIVATE
+        self._interval = policy.min_interval if private else max(policy.min_interval, policy.group_interval)
+        self._clock = clock
+        self._text = ""
+        self._messages: List[Message] = []
+        self._shown: List[str] = []
+        self._next_flush = 0.0
+        self._changed = asyncio.Event()
+        self._finished = asyncio.Event()
+        self.stats = StreamStats()
+
+    @property
+    def text(self) -> str:
+        """The whole output so far."""
+        return self._text
+
+    @property
+    def messages(self) -> List[Message]:
+        """Messages showing the output, in order."""
+        return list(self._messages)
+
+    async def run(self, chunks: AsyncIterator[str]) -> StreamStats:
+        """
+        Consume streamed output until it ends, showing it as it arrives.
+
+        The final output is always flushed, also when the stream raises, so
+        whatever was produced before a failure stays visible.
+
+        Args:
+            chunks (AsyncIterator[str]): Pieces of output
+
+        Returns:
+            StreamStats: Counters of this reply
+        """
+        flusher = asyncio.create_task(self._flush_when_due())
+        try:
+            async for chunk in chunks:
+                self.stats.chunks += 1
+                self._text = chunk if self._policy.replace else self._text + chunk
+                self._changed.set()
+        finally:
+            self._finished.set()
+            self._changed.set()
+            await flusher
+        return self.stats
+
+    async def flush(self) -> None:
+        """Send or edit every message whose page differs from what is shown."""
+        self.stats.flushes += 1
+        for index, page in enumerate(split_pages(self._text)):
+            if index < len(self._shown):
+                if page == self._shown[index] or not page.strip():
+                    continue
+                await self._edit(index, page)
+            elif page.strip():
+                # Telegram rejects blank messages, wait for more output. A page is edited
+                # later, so it must not be merged with another reply
+                self._messages.append(await send_reply(self._update, self._context, page, coalesce=False))
+                self._shown.append(page)
+                self.stats.messages += 1
+            else:
+                break
+
+    async def _edit(self, index: int, page: str) -> None:
+        try:
+            await self._messages[index].edit_text(page)
+        except BadRequest as e:
+            # Telegram compares with its own, whitespace-trimmed copy
+            if "not modified" not in str(e).lower():
+                raise
+        else:
+            self.stats.edits += 1
+        self._shown[index] = page
+
+    async def _flush_when_due(self) -> None:
+        final_failures = 0
+        while True:
+            await self._changed.wait()
+            delay = self._next_flush - self._clock()
+            if delay > 0 and not self._finished.is_set():
+                # Merge everything that arrives until the flush is due
+                try:
+                    await asyncio.wait_for(self._finished.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._changed.clear()
+            try:
+                await self.flush()
+            except RetryAfter as e:
+                logger.warning("Flood control hit while streaming, pausing edits for %ss", e.retry_after)
+                self._next_flush = self._clock() + float(e.retry_after)
+                self._changed.set()
+                if self._finished.is_set():
+                    await asyncio.sleep(float(e.retry_after))
+                continue
+            except NetworkError as e:
+                # Timeouts, dropped connections and rejected edits, BadRequest included
+                self.stats.failed_flushes += 1
+                if self._finished.is_set():
+                    final_failures += 1
+                    if final_failures >= FINAL_FLUSH_ATTEMPTS:
+                        raise
+                logger.warning("Could not update a streamed reply, retrying in %ss: %s", self._interval, e)
+                self._next_flush = self._clock() + self._interval
+                self._changed.set()
+                if self._finished.is_set():
+                    await asyncio.sleep(self._interval)
+                continue
+            self._next_flush = self._clock() + self._interval
+            if self._finished.is_set() and not self._changed.is_set():
+                return
+
+
+async def stream_reply(
+    update: Update,
+    context: CallbackContext,
+    chunks: AsyncIterator[str],
+    policy: Optional[StreamPolicy] = None,
+) -> StreamStats:
+    """
+    Reply to a command with streamed output, edited in place as it grows.
+
+    Args:
+        update (telegram.Update): The update being handled
+        context (telegram.ext.CallbackContext): The handler context
+        chunks (AsyncIterator[str]): Pieces of output
+        policy (Optional[StreamPolicy]): Flush interval and output mode,
+            the defaults if None
+
+    Returns:
+        StreamStats: Counters of the reply
+    """
+    return await StreamingReply(update, context, policy or StreamPolicy()).run(chunks)
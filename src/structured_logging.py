@@ -0,0 +1,148 @@
+"""
+Logging that never blocks the event loop.
+
+The root logger gets a single ``QueueHandler``: logging a record only
+copies it onto an in-memory queue, and a ``QueueListener`` thread formats
+and writes it. A slow terminal, pipe or disk then delays the log output,
+not the bot. The handler adds the ids of the current trace span to each
+record before queueing it, so log lines of an update can be matched with
+its trace.
+
+Records are written as one JSON object per line by default, with the time,
+level, logger, message, trace and span ids, any ``extra`` fields and the
+formatted exception. The ``text`` format writes classic log lines instead.
+"""
+
+import copy
+import datetime
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, TextIO
+
+from tracing import current_span
+
+
+JSON_FORMAT = "json"
+TEXT_FORMAT = "text"
+LOG_FORMATS = (JSON_FORMAT, TEXT_FORMAT)
+
+TEXT_LINE_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Attributes every LogRecord has; the others come from ``extra``
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object.
+    """
+
+    def __init__(self, static_fields: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the formatter.
+
+        Args:
+            static_fields (Optional[Dict[str, Any]]): Fields added to every
+                line, e.g. the worker index
+        """
+        super().__init__()
+        self._static_fields = dict(static_fields or {})
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Render the record with its extra fields and exception."""
+        entry: Dict[str, Any] = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+            .isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(self._static_fields)
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    Queues records for the listener thread, tagged with the current span.
+
+    Unlike ``QueueHandler.prepare`` the record is not formatted here: only
+    its message is merged with its arguments, while they are still the
+    values they were at the call, and a traceback is rendered to text.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Copy the record, resolving what must not be read later from another thread."""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        span = current_span()
+        if span is not None and not hasattr(record, "trace_id"):
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+        return record
+
+
+def configure_logging(
+    level: str = "INFO",
+    log_format: str = JSON_FORMAT,
+    stream: Optional[TextIO] = None,
+    static_fields: Optional[Dict[str, Any]] = None,
+) -> QueueListener:
+    """
+    Route every log record through a queue to a writer thread.
+
+    Handlers already on the root logger are replaced.
+
+    Args:
+        level (str): Root log level name, e.g. ``INFO``
+        log_format (str): ``json`` or ``text``
+        stream (Optional[TextIO]): Where lines are written, stderr if None
+        static_fields (Optional[Dict[str, Any]]): Fields added to every line
+            (JSON), or shown before the level (text)
+
+    Returns:
+        QueueListener: The started writer; ``stop`` it at exit to write out
+        the queued records
+
+    Raises:
+        ValueError: If the level or the format is unknown
+    """
+    if log_format == JSON_FORMAT:
+        formatter: logging.Formatter = JsonFormatter(static_fields)
+    elif log_format == TEXT_FORMAT:
+        prefix = "".join(f"[{key} {value}] " for key, value in (static_fields or {}).items())
+        formatter = logging.Formatter(TEXT_LINE_FORMAT.replace("%(levelname)s", prefix + "%(levelname)s"))
+    else:
+        raise ValueError(f"Unknown log format '{log_format}', expected 'json' or 'text'")
+    numeric_level = logging.getLevelName(level.upper())
+    if not isinstance(numeric_level, int):
+        raise ValueError(f"Unknown log level '{level}'")
+
+    writer = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    writer.setFormatter(formatter)
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    listener = QueueListener(records, writer, respect_handler_level=False)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(ContextQueueHandler(records))
+    root.setLevel(numeric_level)
+    listener.start()
+    return listener
@@ -0,0 +1 @@
+# Offline test doubles for the Telegram Bot API
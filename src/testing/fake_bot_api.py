@@ -0,0 +1,417 @@
+"""
+Offline stand-in for the Telegram Bot API.
+
+The fake serves the small part of the Bot API the bot uses, so the full
+wiring can be exercised in tests and benchmarks without network access.
+Point a bot at it with ``ApplicationBuilder().base_url(fake.base_url)``.
+"""
+
+import asyncio
+import email.policy
+import itertools
+import json
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from email.parser import BytesParser
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs
+
+import httpx
+
+from http_server import HttpRequest, HttpResponse, HttpServer
+
+
+@dataclass
+class SentMessage:
+    """A message the bot sent through the fake API."""
+
+    chat_id: int
+    text: str
+    message_id: int
+    received_at: float
+
+
+@dataclass
+class SentDocument:
+    """A document the bot uploaded through the fake API."""
+
+    chat_id: int
+    filename: str
+    content: bytes
+    caption: str
+    message_id: int
+
+
+@dataclass
+class _UploadedFile:
+    """A file part of a multipart request."""
+
+    filename: str
+    content: bytes
+
+
+def _decode_form_value(name: str, value: str) -> Any:
+    """Decode one form field the way python-telegram-bot encodes it."""
+    if name in ("text", "caption", "url", "secret_token"):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+class FakeBotApi:
+    """
+    In-process fake of the Telegram Bot API.
+
+    Updates injected with :meth:`push_update` are served through
+    ``getUpdates`` long polling or, once ``setWebhook`` was called, POSTed
+    to the registered webhook URL. Outgoing messages are recorded in
+    :attr:`sent_messages`, uploaded documents in :attr:`sent_documents`,
+    edits in :attr:`edited_messages` and the command menu in
+    :attr:`bot_commands`. Messages to chats in :attr:`blocked_chats` fail
+    the way they do for users who blocked the bot.
+    """
+
+    def __init__(
+        self,
+        token: str = "123456:TEST-TOKEN",
+        host: str = "127.0.0.1",
+        port: int = 0,
+        bot_username: str = "gserver_test_bot",
+        response_delay: float = 0.0,
+    ):
+        """
+        Initialize the fake API.
+
+        Args:
+            token (str): Bot token the fake accepts
+            host (str): Interface to listen on
+            port (int): Port to listen on, 0 picks a free port
+            bot_username (str): Username reported by ``getMe``
+            response_delay (float): Seconds every call takes, simulating network latency
+        """
+        self.token = token
+        self.bot_username = bot_username
+        self.response_delay = response_delay
+        self._host = host
+        self._http = HttpServer(self._handle_request, host, port, max_body_size=64 * 1024 * 1024)
+
+        self._pending_updates: List[Dict[str, Any]] = []
+        self._updates_available = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._sent_condition = asyncio.Condition()
+        self._webhook_client: Optional[httpx.AsyncClient] = None
+
+        self.sent_messages: List[SentMessage] = []
+        self.sent_by_chat: Dict[int, List[SentMessage]] = defaultdict(list)
+        self.calls: Counter = Counter()
+        self.webhook_url: Optional[str] = None
+        self.webhook_secret: Optional[str] = None
+        self.bot_commands: List[Dict[str, str]] = []
+        self.edited_messages: List[SentMessage] = []
+        self.sent_documents: List[SentDocument] = []
+        self.blocked_chats: Set[int] = set()
+        # Current text of every sent message, by (chat id, message id)
+        self.message_texts: Dict[Tuple[int, int], str] = {}
+        self._injected_errors: Dict[str, List[HttpResponse]] = defaultdict(list)
+        self._chat_waiters: Dict[int, List[Tuple[int, asyncio.Future]]] = defaultdict(list)
+
+    @property
+    def base_url(self) -> str:
+        """Base URL to configure on the bot (the token is appended by the client)."""
+        return f"http://{self._host}:{self._http.port}/bot"
+
+    @property
+    def bot_user(self) -> Dict[str, Any]:
+        """The bot's own user object as returned by ``getMe``."""
+        return {
+            "id": int(self.token.split(":", 1)[0]),
+            "is_bot": True,
+            "first_name": "GServerBot",
+            "username": self.bot_username,
+            "can_join_groups": True,
+            "can_read_all_group_messages": False,
+            "supports_inline_queries": False,
+        }
+
+    async def start(self) -> None:
+        """Start serving requests."""
+        await self._http.start()
+
+    async def stop(self) -> None:
+        """Stop serving requests."""
+        if self._webhook_client is not None:
+            await self._webhook_client.aclose()
+            self._webhook_client = None
+        await self._http.stop()
+
+    def make_command_update(
+        self, chat_id: int, text: str, user_id: Optional[int] = None, date: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Build an update carrying a text message from a private chat.
+
+        A ``bot_command`` entity is attached when the text starts with ``/``.
+
+        Args:
+            chat_id (int): Chat the message comes from
+            text (str): Message text, e.g. ``'/ping'``
+            user_id (Optional[int]): Sender id, defaults to ``chat_id``
+            date (Optional[int]): Unix timestamp, defaults to now
+
+        Returns:
+            Dict[str, Any]: The update in Bot API JSON form
+        """
+        user = {"id": user_id if user_id is not None else chat_id, "is_bot": False, "first_name": "User"}
+        message: Dict[str, Any] = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()) if date is None else date,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": user,
+            "text": text,
+        }
+        if text.startswith("/"):
+            length = len(text.split(maxsplit=1)[0])
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": length}]
+        return {"update_id": next(self._update_ids), "message": message}
+
+    async def push_update(self, update: Dict[str, Any]) -> float:
+        """
+        Deliver an update to the bot.
+
+        Args:
+            update (Dict[str, Any]): Update in Bot API JSON form
+
+        Returns:
+            float: ``time.perf_counter()`` timestamp taken when the update was handed over
+        """
+        pushed_at = time.perf_counter()
+        if self.webhook_url is None:
+            self._pending_updates.append(update)
+            self._updates_available.set()
+            return pushed_at
+
+        if self._webhook_client is None:
+            self._webhook_client = httpx.AsyncClient(timeout=30)
+        headers = {}
+        if self.webhook_secret:
+            headers["X-Telegram-Bot-Api-Secret-Token"] = self.webhook_secret
+        response = await self._webhook_client.post(self.webhook_url, json=update, headers=headers)
+        response.raise_for_status()
+        return pushed_at
+
+    def inject_error(
+        self,
+        method: str,
+        error_code: int = 429,
+        description: str = "Too Many Requests: retry after 1",
+        retry_after: Optional[int] = 1,
+        times: int = 1,
+    ) -> None:
+        """
+        Make the next calls of a method fail.
+
+        Args:
+            method (str): Bot API method name, e.g. ``'sendMessage'``
+            error_code (int): HTTP status and ``error_code`` to return
+            description (str): Error description
+            retry_after (Optional[int]): ``retry_after`` parameter for 429 responses
+            times (int): Number of consecutive calls to fail
+        """
+        parameters = {"retry_after": retry_after} if error_code == 429 and retry_after else None
+        for _ in range(times):
+            self._injected_errors[method.lower()].append(self._error(error_code, description, parameters))
+
+    async def wait_for_messages(self, count: int, timeout: float = 5.0) -> List[SentMessage]:
+        """
+        Wait until at least ``count`` messages were sent.
+
+        Raises:
+            asyncio.TimeoutError: If fewer messages arrive within ``timeout`` seconds
+        """
+        async with self._sent_condition:
+            await asyncio.wait_for(
+                self._sent_condition.wait_for(lambda: len(self.sent_messages) >= count),
+                timeout,
+            )
+        return list(self.sent_messages)
+
+    async def wait_for_chat_messages(self, chat_id: int, count: int, timeout: float = 5.0) -> List[SentMessage]:
+        """
+        Wait until at least ``count`` messages were sent to one chat.
+
+        Unlike :meth:`wait_for_messages` only waiters of the affected chat are
+        woken, so many concurrent virtual chats stay cheap.
+
+        Raises:
+            asyncio.TimeoutError: If fewer messages arrive within ``timeout`` seconds
+        """
+        messages = self.sent_by_chat[chat_id]
+        if len(messages) < count:
+            future = asyncio.get_running_loop().create_future()
+            waiter = (count, future)
+            self._chat_waiters[chat_id].append(waiter)
+            try:
+                await asyncio.wait_for(future, timeout)
+            finally:
+                waiters = self._chat_waiters.get(chat_id)
+                if waiters and waiter in waiters:
+                    waiters.remove(waiter)
+                if not waiters:
+                    self._chat_waiters.pop(chat_id, None)
+        return list(messages)
+
+    def _record_sent(self, sent: SentMessage) -> None:
+        """Store a sent message and wake waiters of its chat."""
+        self.sent_messages.append(sent)
+        messages = self.sent_by_chat[sent.chat_id]
+        messages.append(sent)
+        for count, future in self._chat_waiters.get(sent.chat_id, ()):
+            if len(messages) >= count and not future.done():
+                future.set_result(None)
+
+    async def _handle_request(self, request: HttpRequest) -> HttpResponse:
+        """Route a Bot API call to the matching method implementation."""
+        prefix = f"/bot{self.token}/"
+        if not request.path.startswith(prefix):
+            return self._error(404, "Not Found")
+        method = request.path[len(prefix):]
+        self.calls[method] += 1
+        if self.response_delay:
+            await asyncio.sleep(self.response_delay)
+
+        injected = self._injected_errors.get(method.lower())
+        if injected:
+            return injected.pop(0)
+
+        params = self._parse_params(request)
+        implementation = getattr(self, f"_api_{method.lower()}", None)
+        if implementation is None:
+            return self._error(404, "Not Found: method not found")
+        return await implementation(params)
+
+    @staticmethod
+    def _parse_params(request: HttpRequest) -> Dict[str, Any]:
+        """Decode call parameters from the query string and body."""
+        raw: Dict[str, List[str]] = dict(request.query)
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("application/json") and request.body:
+            return {**{k: v[0] for k, v in raw.items()}, **request.json()}
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            raw.update(parse_qs(request.body.decode("utf-8"), keep_blank_values=True))
+        params = {name: _decode_form_value(name, values[0]) for name, values in raw.items()}
+        if content_type.startswith("multipart/form-data"):
+            form = BytesParser(policy=email.policy.HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + request.body
+            )
+            for part in form.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                content = part.get_payload(decode=True)
+                if part.get_filename() is not None:
+                    params[name] = _UploadedFile(part.get_filename(), content)
+                else:
+                    params[name] = _decode_form_value(name, content.decode("utf-8"))
+        return params
+
+    @staticmethod
+    def _ok(result: Any) -> HttpResponse:
+        return HttpResponse.json({"ok": True, "result": result})
+
+    @staticmethod
+    def _error(code: int, description: str, parameters: Optional[Dict[str, Any]] = None) -> HttpResponse:
+        payload: Dict[str, Any] = {"ok": False, "error_code": code, "description": description}
+        if parameters:
+            payload["parameters"] = parameters
+        return HttpResponse.json(payload, status=code)
+
+    async def _api_getme(self, params: Dict[str, Any]) -> HttpResponse:
+        return self._ok(self.bot_user)
+
+    async def _api_getupdates(self, params: Dict[str, Any]) -> HttpResponse:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+
+        if offset:
+            self._pending_updates = [u for u in self._pending_updates if u["update_id"] >= offset]
+        if not self._pending_updates and timeout > 0:
+            self._updates_available.clear()
+            try:
+                await asyncio.wait_for(self._updates_available.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._ok(self._pending_updates[:limit])
+
+    async def _api_setwebhook(self, params: Dict[str, Any]) -> HttpResponse:
+        self.webhook_url = params.get("url") or None
+        self.webhook_secret = params.get("secret_token") or None
+        if params.get("drop_pending_updates"):
+            self._pending_updates.clear()
+        return self._ok(True)
+
+    async def _api_deletewebhook(self, params: Dict[str, Any]) -> HttpResponse:
+        self.webhook_url = None
+        self.webhook_secret = None
+        if params.get("drop_pending_updates"):
+            self._pending_updates.clear()
+        return self._ok(True)
+
+    async def _api_setmycommands(self, params: Dict[str, Any]) -> HttpResponse:
+        self.bot_commands = list(params.get("commands") or [])
+        return self._ok(True)
+
+    async def _api_sendmessage(self, params: Dict[str, Any]) -> HttpResponse:
+        chat_id = int(params["chat_id"])
+        if chat_id in self.blocked_chats:
+            return self._error(403, "Forbidden: bot was blocked by the user")
+        text = str(params.get("text", ""))
+        message_id = next(self._message_ids)
+        self.message_texts[(chat_id, message_id)] = text
+        async with self._sent_condition:
+            self._record_sent(SentMessage(chat_id, text, message_id, time.perf_counter()))
+            self._sent_condition.notify_all()
+        return self._ok(self._message(chat_id, message_id, text))
+
+    async def _api_senddocument(self, params: Dict[str, Any]) -> HttpResponse:
+        chat_id = int(params["chat_id"])
+        document = params.get("document")
+        if not isinstance(document, _UploadedFile):
+            return self._error(400, "Bad Request: there is no document in the request")
+        caption = str(params.get("caption", ""))
+        message_id = next(self._message_ids)
+        self.sent_documents.append(SentDocument(chat_id, document.filename, document.content, caption, message_id))
+        message = self._message(chat_id, message_id, "")
+        del message["text"]
+        message["caption"] = caption
+        message["document"] = {
+            "file_id": f"document-{message_id}",
+            "file_unique_id": f"unique-{message_id}",
+            "file_name": document.filename,
+            "file_size": len(document.content),
+        }
+        return self._ok(message)
+
+    async def _api_editmessagetext(self, params: Dict[str, Any]) -> HttpResponse:
+        chat_id = int(params["chat_id"])
+        message_id = int(params["message_id"])
+        text = str(params.get("text", ""))
+        current = self.message_texts.get((chat_id, message_id))
+        if current is None:
+            return self._error(400, "Bad Request: message to edit not found")
+        if current.strip() == text.strip():
+            return self._error(400, "Bad Request: message is not modified")
+        self.message_texts[(chat_id, message_id)] = text
+        self.edited_messages.append(SentMessage(chat_id, text, message_id, time.perf_counter()))
+        return self._ok(self._message(chat_id, message_id, text))
+
+    def _message(self, chat_id: int, message_id: int, text: str) -> Dict[str, Any]:
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": self.bot_user,
+            "text": text,
+        }
@@ -0,0 +1,160 @@
+"""
+Hierarchical timer wheel for large numbers of cancellable timers.
+
+Time advances in fixed ticks. Level 0 has one slot per tick for the next
+``slots`` ticks. Each higher level has slots covering ``slots`` times as
+many ticks as the level below. A timer is placed in the coarsest slot that
+still tells its tick apart. When the wheel turns into a higher-level slot,
+the timers in it are cascaded down to finer slots. Scheduling and
+cancelling are O(1), and advancing costs O(1) per tick plus the timers that
+expire or cascade. A heap would cost O(log n) on every insert, and
+cancelling from it is awkward. Alert debounce timers are mostly cancelled
+before they fire, so O(1) cancellation matters.
+"""
+
+import math
+from typing import Any, List, Optional, Set
+
+
+class Timer:
+    """Handle of a scheduled timer, used to cancel it."""
+
+    __slots__ = ("deadline", "item", "_bucket")
+
+    def __init__(self, deadline: int, item: Any):
+        self.deadline = deadline
+        self.item = item
+        self._bucket: Optional[Set["Timer"]] = None
+
+    @property
+    def active(self) -> bool:
+        """Whether the timer has neither fired nor been cancelled."""
+        return self._bucket is not None
+
+
+class TimerWheel:
+    """
+    Timers with tick resolution, expired by advancing the wheel to the current time.
+    """
+
+    def __init__(self, tick: float, now: float = 0.0, slot_bits: int = 6, levels: int = 4):
+        """
+        Initialize an empty wheel.
+
+        Args:
+            tick (float): Seconds per tick, the timer resolution
+            now (float): Current time, the wheel's origin
+            slot_bits (int): log2 of the slots per level
+            levels (int): Number of levels; timers further away than the
+                wheel spans wait in its last slot and are placed again later
+
+        Raises:
+            ValueError: If the tick is not positive or the wheel has no slots
+        """
+        if tick <= 0 or slot_bits < 1 or levels < 1:
+            raise ValueError("Timer wheel tick and sizes must be positive")
+        self._tick = tick
+        self._origin = now
+        self._bits = slot_bits
+        self._mask = (1 << slot_bits) - 1
+        self._wheels: List[List[Set[Timer]]] = [[set() for _ in range(1 << slot_bits)] for _ in range(levels)]
+        self._ticks = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def tick(self) -> float:
+        """Seconds per tick."""
+        return self._tick
+
+    def schedule(self, when: float, item: Any) -> Timer:
+        """
+        Schedule an item to expire at a point in time.
+
+        The timer fires on the first ``advance`` to or past ``when``,
+        rounded up to a whole tick. Times in the past fire on the next advance.
+
+        Args:
+            when (float): Expiry time, on the clock passed to ``advance``
+            item: Value returned by ``advance`` once the timer expires
+
+        Returns:
+            Timer: Handle for ``cancel``
+        """
+        deadline = max(self._ticks + 1, math.ceil((when - self._origin) / self._tick - 1e-9))
+        timer = Timer(deadline, item)
+        self._place(timer)
+        self._count += 1
+        return timer
+
+    def cancel(self, timer: Timer) -> bool:
+        """
+        Cancel a timer.
+
+        Returns:
+            bool: False if it had already fired or been cancelled
+        """
+        bucket = timer._bucket
+        if bucket is None:
+            return False
+        bucket.discard(timer)
+        timer._bucket = None
+        self._count -= 1
+        return True
+
+    def advance(self, now: float) -> List[Any]:
+        """
+        Turn the wheel to a point in time and collect what expired.
+
+        Args:
+            now (float): Current time
+
+        Returns:
+            List[Any]: Items of the expired timers, in deadline order
+        """
+        target = math.floor((now - self._origin) / self._tick + 1e-9)
+        expired: List[Any] = []
+        while self._ticks < target:
+            if not self._count:
+                # Nothing to cascade or expire on the way
+                self._ticks = target
+                break
+            self._ticks += 1
+            self._cascade()
+            bucket = self._wheels[0][self._ticks & self._mask]
+            if bucket:
+                for timer in sorted(bucket, key=lambda timer: timer.deadline):
+                    timer._bucket = None
+                    expired.append(timer.item)
+                self._count -= len(bucket)
+                bucket.clear()
+        return expired
+
+    def _place(self, timer: Timer) -> None:
+        bits = self._bits
+        for level, wheel in enumerate(self._wheels):
+            shift = bits * level
+            if (timer.deadline >> shift) - (self._ticks >> shift) <= self._mask:
+                bucket = wheel[(timer.deadline >> shift) & self._mask]
+                break
+        else:
+            # Beyond the wheel's span: wait in the top slot visited last
+            shift = bits * (len(self._wheels) - 1)
+            bucket = self._wheels[-1][((self._ticks >> shift) - 1) & self._mask]
+        bucket.add(timer)
+        timer._bucket = bucket
+
+    def _cascade(self) -> None:
+        """Move timers of higher-level slots the wheel just turned into down a level."""
+        bits = self._bits
+        for level in range(1, len(self._wheels)):
+            if (self._ticks >> (bits * (level - 1))) & self._mask:
+                break
+            bucket = self._wheels[level][(self._ticks >> (bits * level)) & self._mask]
+            if bucket:
+                timers = list(bucket)
+                bucket.clear()
+                for timer in timers:
+                    self._place(timer)
@@ -0,0 +1,433 @@
+"""
+Per-update trace spans and their export.
+
+Each traced update gets a trace whose root span covers it from the moment
+the router parses it until its handler returns. Child spans time the
+stages: ``parse`` (command parsing and lookup), ``dispatch`` (rate limits
+and the wait for the chat's scheduler), ``handler`` and one ``send`` per
+outgoing message. The running span is kept in a context variable, so code
+deep inside a handler opens child spans with ``span()`` without being
+handed a trace, and log records carry the ids of the span they were
+logged in.
+
+Updates are sampled when they arrive: a share of them is traced, the rest
+costs one random draw. With a slow threshold every update is timed and
+those slower than the threshold are exported even if not sampled.
+Finished traces go to an exporter: ``OtlpFileExporter`` appends them to a
+file in the OTLP JSON format from a background thread, ``LogSpanExporter``
+logs one line per trace.
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kind and status codes
+_SPAN_KIND_INTERNAL = 1
+_STATUS_ERROR = 2
+
+# Ids need to be unique, not unpredictable, and a syscall per span is measurable
+_random_bits = random.Random(os.urandom(16)).getrandbits
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed stage of a traced update."""
+
+    __slots__ = ("trace", "parent", "name", "start", "end", "attributes", "failed", "_id")
+
+    def __init__(self, trace: "Trace", name: str, start: float, parent: Optional["Span"] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.parent = parent
+        # Formatted only when exported or logged
+        self._id = _random_bits(64)
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.attributes = attributes if attributes is not None else {}
+        self.failed = False
+
+    @property
+    def span_id(self) -> str:
+        """16 hex digits identifying the span."""
+        return f"{self._id:016x}"
+
+    @property
+    def parent_id(self) -> Optional[str]:
+        return self.parent.span_id if self.parent is not None else None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def duration(self) -> float:
+        """Seconds from start to end, 0 while the span is open."""
+        return self.end - self.start if self.end is not None else 0.0
+
+    def child(self, name: str, start: Optional[float] = None, end: Optional[float] = None,
+              **attributes: Any) -> "Span":
+        """
+        Open a span under this one.
+
+        Args:
+            name (str): Stage name
+            start (Optional[float]): Start on the trace's clock, now if None
+            end (Optional[float]): End, for stages timed after the fact
+            **attributes: Span attributes
+
+        Returns:
+            Span: The new span, part of the same trace
+        """
+        span = Span(self.trace, name, self.trace.clock() if start is None else start, self, attributes)
+        span.end = end
+        self.trace.spans.append(span)
+        return span
+
+
+class Trace:
+    """
+    The spans of one update, exported together once it is handled.
+
+    Attributes:
+        spans (List[Span]): Root span first, children in opening order
+        sampled (bool): Whether the update was sampled, rather than timed
+            only to be exported if slow
+        clock (Callable[[], float]): Monotonic time source of the spans
+        wall_offset (float): Unix time minus clock time, to export span
+            times as timestamps
+    """
+
+    __slots__ = ("spans", "sampled", "clock", "wall_offset", "_id")
+
+    def __init__(self, sampled: bool, clock: Callable[[], float], wall_offset: float):
+        self._id = _random_bits(128)
+        self.spans: List[Span] = []
+        self.sampled = sampled
+        self.clock = clock
+        self.wall_offset = wall_offset
+
+    @property
+    def trace_id(self) -> str:
+        return f"{self._id:032x}"
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def stages(self) -> Dict[str, float]:
+        """Seconds spent per stage name, summed over spans of the same name."""
+        stages: Dict[str, float] = {}
+        for span in self.spans:
+            stages[span.name] = stages.get(span.name, 0.0) + span.duration
+        return stages
+
+
+@dataclass
+class TracerStats:
+    """Point-in-time snapshot of tracer counters."""
+
+    started: int
+    exported: int
+    discarded: int
+
+
+class Tracer:
+    """
+    Samples updates and hands their finished traces to an exporter.
+    """
+
+    def __init__(
+        self,
+        exporter=None,
+        sample_rate: float = 1.0,
+        slow_threshold: Optional[float] = None,
+        clock: Callable[[], float] = time.perf_counter,
+        draw: Callable[[], float] = random.random,
+    ):
+        """
+        Initialize the tracer.
+
+        Args:
+            exporter (Optional[OtlpFileExporter | LogSpanExporter]): Receives
+                finished traces, None to only count them
+            sample_rate (float): Share of updates traced, from 0 to 1
+            slow_threshold (Optional[float]): Seconds after which an update
+                is exported even if not sampled, None to export sampled
+                updates only
+            clock (Callable[[], float]): Monotonic time source
+            draw (Callable[[], float]): Random numbers in [0, 1) deciding
+                the sampling
+
+        Raises:
+            ValueError: If the sample rate is outside [0, 1] or the threshold is negative
+        """
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("Trace sample rate must be between 0 and 1")
+        if slow_threshold is not None and slow_threshold < 0:
+            raise ValueError("Slow trace threshold must not be negative")
+        self._exporter = exporter
+        self._sample_rate = sample_rate
+        self._slow_threshold = slow_threshold
+        self._clock = clock
+        self._draw = draw
+        self._wall_offset = time.time() - clock()
+        self._started = 0
+        self._exported = 0
+        self._discarded = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any update can be traced."""
+        return self._sample_rate > 0 or self._slow_threshold is not None
+
+    def clock(self) -> float:
+        return self._clock()
+
+    def begin(self, name: str, start: Optional[float] = None, **attributes: Any) -> Optional[Span]:
+        """
+        Start the trace of an update if it is sampled or may turn out slow.
+
+        Args:
+            name (str): Name of the root span
+            start (Optional[float]): Start on the tracer's clock, now if None
+            **attributes: Root span attributes
+
+        Returns:
+            Optional[Span]: The root span, None if the update is not traced
+        """
+        sampled = self._sample_rate > 0 and self._draw() < self._sample_rate
+        if not sampled and self._slow_threshold is None:
+            return None
+        self._started += 1
+        trace = Trace(sampled, self._clock, self._wall_offset)
+        root = Span(trace, name, self._clock() if start is None else start, None, attributes)
+        trace.spans.append(root)
+        return root
+
+    def end(self, root: Span) -> None:
+        """Close the root span and export the trace if it was sampled or slow."""
+        root.end = self._clock()
+        trace = root.trace
+        if not trace.sampled and root.duration < self._slow_threshold:
+            self._discarded += 1
+            return
+        self._exported += 1
+        if self._exporter is not None:
+            self._exporter.export(trace)
+
+    def close(self) -> None:
+        """Write out the traces still buffered by the exporter."""
+        if self._exporter is not None:
+            self._exporter.close()
+
+    def stats(self) -> TracerStats:
+        """Get a snapshot of the tracer counters."""
+        return TracerStats(started=self._started, exported=self._exported, discarded=self._discarded)
+
+
+def current_span() -> Optional[Span]:
+    """Get the span the running code belongs to, None outside a traced update."""
+    return _current_span.get()
+
+
+def activate(span: Optional[Span]) -> Token:
+    """
+    Make a span the current one for the running task.
+
+    Returns:
+        Token: Passed to ``deactivate`` to restore the previous span
+    """
+    return _current_span.set(span)
+
+
+def deactivate(token: Token) -> None:
+    """Restore the span that was current before ``activate``."""
+    _current_span.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Time a stage as a child of the current span.
+
+    Outside a traced update this does nothing and yields None, so callers
+    need not check whether tracing is on.
+
+    Args:
+        name (str): Stage name
+        **attributes: Span attributes
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, **attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException:
+        child.failed = True
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end = child.trace.clock()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """Encode an attribute value as an OTLP ``AnyValue``."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # 64-bit integers are strings in the protobuf JSON mapping
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def to_otlp(traces: List[Trace], service_name: str = "gserverbot") -> Dict[str, Any]:
+    """
+    Encode traces as an OTLP ``ExportTraceServiceRequest`` in its JSON mapping.
+
+    Args:
+        traces (List[Trace]): Finished traces
+        service_name (str): ``service.name`` resource attribute
+
+    Returns:
+        Dict[str, Any]: The request, ready for ``json.dumps``
+    """
+    spans = []
+    for trace in traces:
+        trace_id = trace.trace_id
+        for span in trace.spans:
+            end = span.end if span.end is not None else span.start
+            encoded = {
+                "traceId": trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": _SPAN_KIND_INTERNAL,
+                "startTimeUnixNano": str(int((span.start + trace.wall_offset) * 1e9)),
+                "endTimeUnixNano": str(int((end + trace.wall_offset) * 1e9)),
+                "attributes": _otlp_attributes(span.attributes),
+            }
+            if span.parent_id is not None:
+                encoded["parentSpanId"] = span.parent_id
+            if span.failed:
+                encoded["status"] = {"code": _STATUS_ERROR}
+            spans.append(encoded)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": service_name, "process.pid": os.getpid()})},
+            "scopeSpans": [{"scope": {"name": service_name}, "spans": spans}],
+        }]
+    }
+
+
+class OtlpFileExporter:
+    """
+    Appends finished traces to a file, one OTLP JSON request per line.
+
+    The format is that of the OpenTelemetry Collector's file exporter, so
+    the file can be replayed into a collector or read by tools that accept
+    OTLP JSON. Encoding and writing happen on a background thread; the
+    event loop only puts traces on a queue. The thread lets traces gather
+    for a flush interval and writes them together, so a busy bot wakes it
+    a few times a second rather than once per update. Worker processes
+    append to the same file, each line being one write.
+    """
+
+    def __init__(self, path: str, service_name: str = "gserverbot", flush_interval: float = 0.5,
+                 max_batch: int = 512):
+        """
+        Open the file and start the writer thread.
+
+        Args:
+            path (str): File to append to, created if missing
+            service_name (str): ``service.name`` resource attribute
+            flush_interval (float): Seconds traces may wait to be written
+            max_batch (int): Traces written per line at most
+        """
+        self.path = path
+        self._service_name = service_name
+        self._flush_interval = flush_interval
+        self._max_batch = max_batch
+        self._queue: "queue.SimpleQueue[Optional[Trace]]" = queue.SimpleQueue()
+        self._closing = threading.Event()
+        self._file = open(path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._write_batches, name="otlp-file-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace) -> None:
+        """Queue a finished trace for writing."""
+        self._queue.put(trace)
+
+    def close(self) -> None:
+        """Write the queued traces and close the file."""
+        if self._thread.is_alive():
+            self._closing.set()
+            self._queue.put(None)
+            self._thread.join()
+        self._file.close()
+
+    def _write_batches(self) -> None:
+        closing = False
+        while not closing:
+            batch = [self._queue.get()]
+            if batch[0] is not None:
+                self._closing.wait(self._flush_interval)
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            traces = [trace for trace in batch if trace is not None]
+            closing = len(traces) < len(batch)
+            for start in range(0, len(traces), self._max_batch):
+                self._write(traces[start:start + self._max_batch])
+
+    def _write(self, traces: List[Trace]) -> None:
+        try:
+            self._file.write(json.dumps(to_otlp(traces, self._service_name), separators=(",", ":")) + "\n")
+            self._file.flush()
+        except (OSError, ValueError):
+            logger.exception("Writing %d traces to %s failed", len(traces), self.path)
+
+
+class LogSpanExporter:
+    """
+    Logs one line per finished trace with the milliseconds spent per stage.
+    """
+
+    def __init__(self, log: Optional[logging.Logger] = None):
+        self._log = log or logger
+
+    def export(self, trace: Trace) -> None:
+        """Log the trace's stage durations as structured fields."""
+        root = trace.root
+        stages = {name: round(seconds * 1000, 3) for name, seconds in trace.stages().items()}
+        self._log.info(
+            "%s %s took %.1f ms", root.name, root.attributes.get("command", ""), root.duration * 1000,
+            extra={"trace_id": trace.trace_id, "span_id": root.span_id, "stages_ms": stages,
+                   "sampled": trace.sampled},
+        )
+
+    def close(self) -> None:
+        pass
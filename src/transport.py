@@ -0,0 +1,245 @@
+"""
+HTTP transport profile for Bot API requests.
+
+Outgoing calls (sendMessage and friends) and the ``getUpdates`` long poll
+get separate connection pools, so a burst of replies can never starve
+update ingestion or the other way round. Pool sizes, timeouts, keep-alive,
+HTTP version and long-poll parameters come from the environment. Every
+pool measures how long requests wait for a free connection, which is the
+first thing to look at when replies queue up under load.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Mapping, Optional, Tuple
+
+import httpx
+from telegram.error import TimedOut
+from telegram.ext import ApplicationBuilder
+from telegram.request import HTTPXRequest
+
+from metrics import Histogram
+
+
+logger = logging.getLogger(__name__)
+
+# Acquire-wait buckets in seconds, waits are usually far below handler latencies
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+def http2_available() -> bool:
+    """Whether the optional ``h2`` package needed for HTTP/2 is installed."""
+    return importlib.util.find_spec("h2") is not None
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """
+    Settings of one HTTP connection pool.
+
+    Attributes:
+        size (int): Maximum concurrent requests and connections
+        connect_timeout (float): Seconds to establish a connection
+        read_timeout (float): Seconds to wait for a response
+        write_timeout (float): Seconds to send a request
+        pool_timeout (float): Seconds to wait for a free connection
+        http_version (str): ``1.1`` or ``2``
+        keepalive_expiry (float): Seconds an idle connection is kept open
+    """
+
+    size: int = 16
+    connect_timeout: float = 5.0
+    read_timeout: float = 5.0
+    write_timeout: float = 5.0
+    pool_timeout: float = 3.0
+    http_version: str = "1.1"
+    keepalive_expiry: float = 60.0
+
+    def __post_init__(self):
+        if self.size < 1:
+            raise ValueError("Connection pool size must be positive")
+        if self.http_version not in ("1.1", "2"):
+            raise ValueError(f"Unknown HTTP version '{self.http_version}', expected '1.1' or '2'")
+
+
+@dataclass(frozen=True)
+class TransportConfig:
+    """
+    HTTP transport profile of the bot.
+
+    Attributes:
+        send (PoolConfig): Pool for every Bot API call except ``getUpdates``
+        updates (PoolConfig): Pool for ``getUpdates``
+        poll_timeout (int): Seconds ``getUpdates`` long-polls before returning empty
+        poll_interval (float): Seconds to pause between ``getUpdates`` calls
+    """
+
+    send: PoolConfig = field(default_factory=PoolConfig)
+    updates: PoolConfig = field(default_factory=lambda: PoolConfig(size=1))
+    poll_timeout: int = 10
+    poll_interval: float = 0.0
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "TransportConfig":
+        """
+        Build the transport profile from environment variables.
+
+        ``TRANSPORT_*`` variables configure the send pool and
+        ``UPDATES_TRANSPORT_*`` ones the ``getUpdates`` pool. HTTP/2 falls
+        back to HTTP/1.1 with a warning when ``h2`` is not installed.
+
+        Args:
+            environ (Optional[Mapping[str, str]]): Variables to read, defaults to ``os.environ``
+
+        Returns:
+            TransportConfig: The loaded profile
+
+        Raises:
+            ValueError: If a value is invalid
+        """
+        env = os.environ if environ is None else environ
+
+        def pool(prefix: str, defaults: PoolConfig) -> PoolConfig:
+            http_version = env.get(f"{prefix}HTTP_VERSION", defaults.http_version).strip()
+            if http_version == "2.0":
+                http_version = "2"
+            if http_version == "2" and not http2_available():
+                logger.warning("%sHTTP_VERSION=2 needs the 'h2' package, using HTTP/1.1", prefix)
+                http_version = "1.1"
+            return PoolConfig(
+                size=int(env.get(f"{prefix}POOL_SIZE", defaults.size)),
+                connect_timeout=float(env.get(f"{prefix}CONNECT_TIMEOUT", defaults.connect_timeout)),
+                read_timeout=float(env.get(f"{prefix}READ_TIMEOUT", defaults.read_timeout)),
+                write_timeout=float(env.get(f"{prefix}WRITE_TIMEOUT", defaults.write_timeout)),
+                pool_timeout=float(env.get(f"{prefix}POOL_TIMEOUT", defaults.pool_timeout)),
+                http_version=http_version,
+                keepalive_expiry=float(env.get(f"{prefix}KEEPALIVE_EXPIRY", defaults.keepalive_expiry)),
+            )
+
+        defaults = cls()
+        return cls(
+            send=pool("TRANSPORT_", defaults.send),
+            updates=pool("UPDATES_TRANSPORT_", defaults.updates),
+            poll_timeout=int(env.get("POLL_TIMEOUT", defaults.poll_timeout)),
+            poll_interval=float(env.get("POLL_INTERVAL", defaults.poll_interval)),
+        )
+
+
+@dataclass
+class PoolStats:
+    """Point-in-time snapshot of a pool's counters."""
+
+    requests: int
+    in_use: int
+    waited: int
+    timeouts: int
+    wait_time_avg: float
+    wait_time_max: float
+
+
+class InstrumentedHTTPXRequest(HTTPXRequest):
+    """
+    ``HTTPXRequest`` that measures how long requests wait for a connection.
+
+    A semaphore sized like the pool admits requests, so the time spent
+    acquiring it is exactly the time a request would have queued inside
+    httpx for a free connection.
+    """
+
+    def __init__(self, config: PoolConfig, name: str = "send"):
+        """
+        Initialize the request object.
+
+        Args:
+            config (PoolConfig): Pool settings
+            name (str): Pool name used in logs and metrics
+        """
+        self._pool_config = config
+        self.name = name
+        super().__init__(
+            connection_pool_size=config.size,
+            connect_timeout=config.connect_timeout,
+            read_timeout=config.read_timeout,
+            write_timeout=config.write_timeout,
+            pool_timeout=config.pool_timeout,
+            http_version=config.http_version,
+        )
+        self._slots = asyncio.Semaphore(config.size)
+        self.wait_times = Histogram(POOL_WAIT_BUCKETS)
+        self._requests = 0
+        self._in_use = 0
+        self._waited = 0
+        self._timeouts = 0
+        self._wait_time_max = 0.0
+
+    def _build_client(self) -> httpx.AsyncClient:
+        self._client_kwargs["limits"] = httpx.Limits(
+            max_connections=self._pool_config.size,
+            max_keepalive_connections=self._pool_config.size,
+            keepalive_expiry=self._pool_config.keepalive_expiry,
+        )
+        return super()._build_client()
+
+    async def do_request(self, *args, **kwargs) -> Tuple[int, bytes]:
+        """Wait for a pool slot, recording the wait, then send the request."""
+        self._requests += 1
+        started = time.perf_counter()
+        if self._slots.locked():
+            self._waited += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self._pool_config.pool_timeout)
+            except asyncio.TimeoutError:
+                self._timeouts += 1
+                raise TimedOut(
+                    f"Pool timeout: all {self._pool_config.size} connections of the "
+                    f"{self.name} pool are occupied"
+                ) from None
+        else:
+            await self._slots.acquire()
+        wait = time.perf_counter() - started
+        self.wait_times.observe(wait)
+        self._wait_time_max = max(self._wait_time_max, wait)
+
+        self._in_use += 1
+        try:
+            return await super().do_request(*args, **kwargs)
+        finally:
+            self._in_use -= 1
+            self._slots.release()
+
+    def stats(self) -> PoolStats:
+        """Get a snapshot of the pool counters."""
+        count = self.wait_times.count
+        return PoolStats(
+            requests=self._requests,
+            in_use=self._in_use,
+            waited=self._waited,
+            timeouts=self._timeouts,
+            wait_time_avg=self.wait_times.sum / count if count else 0.0,
+            wait_time_max=self._wait_time_max,
+        )
+
+
+def apply_transport(
+    builder: ApplicationBuilder, config: TransportConfig
+) -> Tuple[InstrumentedHTTPXRequest, InstrumentedHTTPXRequest]:
+    """
+    Give an application builder separate instrumented send and ``getUpdates`` pools.
+
+    Args:
+        builder (ApplicationBuilder): Builder to configure
+        config (TransportConfig): Transport profile
+
+    Returns:
+        Tuple[InstrumentedHTTPXRequest, InstrumentedHTTPXRequest]: The send
+        and ``getUpdates`` request objects
+    """
+    send = InstrumentedHTTPXRequest(config.send, "send")
+    updates = InstrumentedHTTPXRequest(config.updates, "updates")
+    builder.request(send)
+    builder.get_updates_request(updates)
+    return send, updates
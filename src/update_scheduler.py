@@ -0,0 +1,161 @@
+"""
+Per-chat ordered, cross-chat concurrent scheduling of command handlers.
+
+Every chat gets its own bounded FIFO queue drained by a single worker, so
+updates from one chat are handled in order while different chats run in
+parallel up to a global concurrency limit. A chat's queue and worker are
+dropped as soon as the queue runs empty, which keeps memory proportional
+to the number of chats with pending work rather than all chats ever seen.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# A unit of work scheduled for a chat, e.g. ``lambda: handler.handle(update, context)``
+Job = Callable[[], Awaitable[None]]
+
+
+@dataclass
+class SchedulerStats:
+    """Point-in-time snapshot of scheduler counters."""
+
+    submitted: int
+    rejected: int
+    completed: int
+    failed: int
+    running: int
+    queued: int
+    active_chats: int
+    max_chat_queue_depth: int
+    wait_time_avg: float
+    wait_time_max: float
+
+
+class _ChatQueue:
+    """Pending jobs of one chat with their enqueue timestamps."""
+
+    __slots__ = ("jobs",)
+
+    def __init__(self):
+        self.jobs: deque = deque()
+
+
+class ChatUpdateScheduler:
+    """
+    Scheduler that serializes work per chat and parallelizes across chats.
+    """
+
+    def __init__(self, max_concurrency: int = 64, max_queue_size: int = 100):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_concurrency (int): Maximum number of jobs running at once across all chats
+            max_queue_size (int): Maximum number of pending jobs per chat
+
+        Raises:
+            ValueError: If a limit is not positive
+        """
+        if max_concurrency < 1 or max_queue_size < 1:
+            raise ValueError("Scheduler limits must be positive")
+        self._max_queue_size = max_queue_size
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._chats: Dict[Hashable, _ChatQueue] = {}
+        self._workers: Dict[Hashable, asyncio.Task] = {}
+
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._failed = 0
+        self._running = 0
+        self._queued = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def submit(self, chat_id: Optional[Hashable], job: Job) -> bool:
+        """
+        Schedule a job behind all pending jobs of the same chat.
+
+        Args:
+            chat_id (Optional[Hashable]): Chat the job belongs to; jobs without
+                a chat share one queue
+            job (Job): Coroutine factory to run
+
+        Returns:
+            bool: True if the job was queued, False if the chat's queue is full
+        """
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _ChatQueue()
+        elif len(chat.jobs) >= self._max_queue_size:
+            self._rejected += 1
+            logger.warning("Queue for chat %s is full, dropping update", chat_id)
+            return False
+
+        chat.jobs.append((job, time.monotonic()))
+        self._submitted += 1
+        self._queued += 1
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._drain(chat_id, chat))
+        return True
+
+    def queue_depth(self, chat_id: Optional[Hashable]) -> int:
+        """Get the number of pending jobs for a chat."""
+        chat = self._chats.get(chat_id)
+        return len(chat.jobs) if chat is not None else 0
+
+    def stats(self) -> SchedulerStats:
+        """Get a snapshot of the scheduler counters."""
+        started = self._completed + self._failed + self._running
+        return SchedulerStats(
+            submitted=self._submitted,
+            rejected=self._rejected,
+            completed=self._completed,
+            failed=self._failed,
+            running=self._running,
+            queued=self._queued,
+            active_chats=len(self._chats),
+            max_chat_queue_depth=max((len(c.jobs) for c in self._chats.values()), default=0),
+            wait_time_avg=self._wait_time_total / started if started else 0.0,
+            wait_time_max=self._wait_time_max,
+        )
+
+    async def join(self) -> None:
+        """Wait until every queued job has finished."""
+        while self._workers:
+            await asyncio.gather(*list(self._workers.values()), return_exceptions=True)
+
+    async def _drain(self, chat_id: Optional[Hashable], chat: _ChatQueue) -> None:
+        """Run a chat's jobs one by one until its queue is empty, then evict it."""
+        try:
+            while chat.jobs:
+                job, enqueued_at = chat.jobs[0]
+                async with self._semaphore:
+                    chat.jobs.popleft()
+                    self._queued -= 1
+                    wait_time = time.monotonic() - enqueued_at
+                    self._wait_time_total += wait_time
+                    if wait_time > self._wait_time_max:
+                        self._wait_time_max = wait_time
+
+                    self._running += 1
+                    try:
+                        await job()
+                        self._completed += 1
+                    except Exception:
+                        self._failed += 1
+                        logger.exception("Unhandled error while handling update for chat %s", chat_id)
+                    finally:
+                        self._running -= 1
+        finally:
+            # No await between the emptiness check and eviction, so a
+            # concurrent submit either sees this worker or starts a new one.
+            del self._chats[chat_id]
+            del self._workers[chat_id]
@@ -0,0 +1,119 @@
+"""
+Webhook ingestion mode.
+
+Telegram pushes updates to an embedded HTTP endpoint instead of the bot
+long-polling ``getUpdates``. Accepted updates are fed into the same
+``Application`` update queue that polling uses, so the handler set is
+shared between both modes.
+"""
+
+import hmac
+from dataclasses import dataclass
+from typing import Optional
+
+from telegram import Update
+from telegram.ext import Application
+
+from http_server import HttpRequest, HttpResponse, HttpServer
+
+
+SECRET_TOKEN_HEADER = "x-telegram-bot-api-secret-token"
+
+
+@dataclass(frozen=True)
+class WebhookConfig:
+    """
+    Settings for webhook ingestion.
+
+    Attributes:
+        url (str): Public URL Telegram should deliver updates to
+        listen (str): Interface the embedded server binds to
+        port (int): Port the embedded server binds to
+        path (str): Request path updates are accepted on
+        secret_token (Optional[str]): Value Telegram must send in the
+            ``X-Telegram-Bot-Api-Secret-Token`` header
+        max_connections (int): Simultaneous connections Telegram may open
+        drop_pending_updates (bool): Discard updates queued before startup
+    """
+
+    url: str
+    listen: str = "0.0.0.0"
+    port: int = 8443
+    path: str = "/telegram"
+    secret_token: Optional[str] = None
+    max_connections: int = 40
+    drop_pending_updates: bool = False
+
+
+class WebhookServer:
+    """Embedded HTTP server receiving updates pushed by Telegram."""
+
+    def __init__(self, application: Application, config: WebhookConfig):
+        """
+        Initialize the webhook server.
+
+        Args:
+            application (Application): Application whose update queue receives updates
+            config (WebhookConfig): Webhook settings
+        """
+        self._application = application
+        self._config = config
+        self._http = HttpServer(self._handle_request, config.listen, config.port)
+        self.updates_received = 0
+        self.requests_rejected = 0
+
+    @property
+    def port(self) -> int:
+        """The port the embedded server is bound to."""
+        return self._http.port
+
+    async def start(self) -> None:
+        """Start the embedded server and register the webhook with Telegram."""
+        await self._http.start()
+        await self._application.bot.set_webhook(
+            url=self._config.url,
+            secret_token=self._config.secret_token,
+            max_connections=self._config.max_connections,
+            drop_pending_updates=self._config.drop_pending_updates,
+            allowed_updates=Update.ALL_TYPES,
+        )
+
+    async def stop(self) -> None:
+        """Stop accepting updates."""
+        await self._http.stop()
+
+    async def _handle_request(self, request: HttpRequest) -> HttpResponse:
+        """Validate a pushed update and enqueue it for processing."""
+        if request.path != self._config.path:
+            return HttpResponse.text("Not found", 404)
+        if request.method != "POST":
+            return HttpResponse.text("Method not allowed", 405)
+
+        if self._config.secret_token is not None:
+            received = request.headers.get(SECRET_TOKEN_HEADER, "")
+            if not hmac.compare_digest(received, self._config.secret_token):
+                self.requests_rejected += 1
+                return HttpResponse.text("Invalid secret token", 403)
+
+        try:
+            data = request.json()
+        except ValueError:
+            self.requests_rejected += 1
+            return HttpResponse.text("Invalid JSON", 400)
+
+        if not data:
+            self.requests_rejected += 1
+            return HttpResponse.text("Empty update", 400)
+        # A 500 would make Telegram send the same bad payload again
+        if not isinstance(data, dict) or type(data.get("update_id")) is not int:
+            self.requests_rejected += 1
+            return HttpResponse.text("Invalid update", 400)
+        try:
+            update = Update.de_json(data, self._application.bot)
+        except (TypeError, ValueError, AttributeError):
+            self.requests_rejected += 1
+            return HttpResponse.text("Invalid update", 400)
+
+        await self._application.update_queue.put(update)
+        self.updates_received += 1
+        return HttpResponse(status=200)
@@ -1,10 +1,108 @@
 """
 Pytest configuration file for the GServerBot project.
-This file helps pytest find and import modules correctly.
+This file helps pytest find and import modules correctly, and holds the
+helpers shared by several test modules.
 """
 
 import sys
 import os
+import asyncio
+import datetime
+
+import pytest
+from unittest.mock import Mock
+from telegram import Chat, Message, MessageEntity, Update, User
+from telegram.error import Forbidden
 
 # Add the src directory to the Python path so we can import modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+class FakeClock:
+    """Manually advanced time source."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeMetrics:
+    """Latest host metric values set by the test, counting reads."""
+
+    def __init__(self, **values):
+        self.values = values
+        self.reads = 0
+
+    def latest(self, metric):
+        self.reads += 1
+        return self.values.get(metric)
+
+
+class FakeOutbound:
+    """Outbound queue stand-in recording texts by chat, failing for blocked chats."""
+
+    def __init__(self, blocked=(), delay=0.0):
+        self.blocked = set(blocked)
+        self.delay = delay
+        self.sent = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def enqueue(self, chat_id, text, coalesce=True, **kwargs):
+        self.sent.append((chat_id, text))
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(None)
+        return future
+
+    async def send_text(self, chat_id, text, coalesce=True, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if chat_id in self.blocked:
+            raise Forbidden("Forbidden: bot was blocked by the user")
+        self.sent.append((chat_id, text))
+        return Mock(message_id=len(self.sent))
+
+    def recipients(self, text="news"):
+        """Chat ids the announcement went to, in order."""
+        return [chat_id for chat_id, sent in self.sent if sent == text]
+
+
+async def wait_until(condition, timeout=5.0):
+    """Poll until a condition holds."""
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("Condition not reached in time")
+
+
+def make_update(text: str, update_id: int = 1, command_length: int = None, user_id: int = None) -> Update:
+    """Build an update whose message starts with a bot_command entity."""
+    entities = []
+    if text.startswith('/'):
+        length = command_length or len(text.split()[0])
+        entities = [MessageEntity(MessageEntity.BOT_COMMAND, 0, length)]
+    message = Message(
+        message_id=update_id,
+        date=datetime.datetime.now(datetime.timezone.utc),
+        chat=Chat(1, Chat.PRIVATE),
+        text=text,
+        entities=entities,
+        from_user=User(user_id, 'User', False) if user_id is not None else None,
+    )
+    bot = Mock()
+    bot.username = 'gserver_bot'
+    message.set_bot(bot)
+    return Update(update_id, message=message)
+
+
+@pytest.fixture
+def clock():
+    """A fake clock for the test to move by hand."""
+    return FakeClock()
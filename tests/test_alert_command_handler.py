@@ -0,0 +1,74 @@
+import pytest
+from unittest.mock import AsyncMock, Mock
+from telegram import Chat, Message, Update
+
+from alerts import AlertEngine
+from bot_services import BOT_SERVICES_KEY, BotServices
+from commands.alert import AlertCommandHandler
+from tests.conftest import FakeMetrics
+
+
+class TestAlertCommandHandler:
+    """Test cases for AlertCommandHandler class."""
+
+    @pytest.fixture
+    def engine(self):
+        """An engine over fixed metrics that sends nothing."""
+        return AlertEngine(FakeMetrics(cpu=95.0))
+
+    async def run(self, engine, *args, chat_id=5):
+        """Run /alert in a chat and return the text of the reply."""
+        update = Mock(spec=Update)
+        update.effective_chat = Mock(spec=Chat, id=chat_id)
+        update.message = Mock(spec=Message)
+        update.message.reply_text = AsyncMock()
+        context = Mock()
+        context.args = list(args)
+        context.bot_data = {BOT_SERVICES_KEY: BotServices(alerts=engine)}
+        await AlertCommandHandler().handle(update, context)
+        return update.message.reply_text.call_args[0][0]
+
+    def test_name(self):
+        """Test that the handler answers to /alert."""
+        assert AlertCommandHandler().name() == '/alert'
+
+    @pytest.mark.asyncio
+    async def test_add_list_remove(self, engine):
+        """Test that a chat manages its own alerts."""
+        assert await self.run(engine, "add", "cpu", ">", "90", "for", "5m") == "Added alert #1: cpu > 90% for 5m."
+        assert await self.run(engine, "add", "memory<10%") == "Added alert #2: memory < 10%."
+        await engine.tick()
+
+        listing = await self.run(engine, "list")
+        assert listing.split("\n") == [
+            "Alerts of this chat:",
+            "#1 cpu > 90% for 5m - ok (now 95.0%)",
+            "#2 memory < 10% - ok",
+        ]
+        assert (await self.run(engine, chat_id=6)).startswith("This chat has no alerts.")
+        assert await self.run(engine, "remove", "#1") == "Removed alert #1."
+        assert await self.run(engine, "remove", "1") == "There is no alert #1, see /alert list."
+
+    @pytest.mark.asyncio
+    async def test_firing_on_add(self, engine):
+        """Test that an alert whose condition already holds says so."""
+        await self.run(engine, "add", "cpu", ">", "10")
+        await engine.tick()
+
+        assert await self.run(engine, "add", "cpu", ">=", "10") == "Added alert #2: cpu >= 10%. It is firing now."
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("args, reply", [
+        (("add", "temperature", ">", "5"), "Unknown metric 'temperature'"),
+        (("add", "service", "web", "down"), "Unknown service 'web' (none are configured)"),
+        (("remove", "x"), "Usage:"),
+        (("snooze",), "Usage:"),
+    ])
+    async def test_errors(self, engine, args, reply):
+        """Test that bad rules and arguments are explained."""
+        assert (await self.run(engine, *args)).startswith(reply)
+
+    @pytest.mark.asyncio
+    async def test_not_available(self):
+        """Test that a bot without an alert engine says so."""
+        assert await self.run(None, "list") == "Alerts are not available."
@@ -0,0 +1,196 @@
+import asyncio
+
+import pytest
+
+from alerts import ALERTS_KEY, AlertCondition, AlertEngine, parse_condition
+from sharding import shard_for
+from state_store import StateStore
+from tests.conftest import FakeClock, FakeMetrics, FakeOutbound
+
+
+class TestParseCondition:
+    """Test cases for the parse_condition function."""
+
+    @pytest.mark.parametrize("text, condition", [
+        ("cpu > 90", AlertCondition("cpu", ">", 90.0)),
+        ("CPU>=90% for 5m", AlertCondition("cpu", ">=", 90.0, 300.0)),
+        ("load < 0.5 for 30s", AlertCondition("load", "<", 0.5, 30.0)),
+        ("service web down for 1m", AlertCondition("service:web", ">", 0.5, 60.0)),
+    ])
+    def test_valid(self, text, condition):
+        """Test that metric and service rules are parsed."""
+        assert parse_condition(text) == condition
+
+    @pytest.mark.parametrize("text", ["cpu", "cpu = 5", "temperature > 5", "cpu > 5 for ever", "cpu > 1.2.3"])
+    def test_invalid(self, text):
+        """Test that malformed rules and unknown metrics are rejected."""
+        with pytest.raises(ValueError):
+            parse_condition(text)
+
+    def test_describe(self):
+        """Test that conditions are rendered the way they are written."""
+        assert parse_condition("cpu > 90 for 300s").describe() == "cpu > 90% for 5m"
+        assert parse_condition("service db down").describe() == "service db down"
+
+
+class TestAlertEngine:
+    """Test cases for AlertEngine class."""
+
+    def make_engine(self, metrics, store=None, **kwargs):
+        """Create an engine with a manual clock and a recording outbound queue."""
+        clock = FakeClock()
+        outbound = FakeOutbound()
+        engine = AlertEngine(metrics, store, outbound, interval=5.0, clock=clock, **kwargs)
+        return engine, clock, outbound
+
+    @pytest.mark.asyncio
+    async def test_fires_after_duration_and_resolves(self):
+        """Test that a breach notifies only once it lasted, and its end likewise."""
+        metrics = FakeMetrics(cpu=50.0)
+        engine, clock, outbound = self.make_engine(metrics)
+        await engine.add(1, parse_condition("cpu > 90 for 10s"))
+
+        metrics.values["cpu"] = 95.0
+        await engine.tick()
+        clock.now += 5
+        await engine.tick()
+        assert outbound.sent == []
+        clock.now += 5
+        await engine.tick()
+        assert outbound.sent == [(1, "Alerts firing:\n#1 cpu > 90% for 10s (now 95.0%)")]
+        assert engine.stats().firing == 1
+
+        metrics.values["cpu"] = 10.0
+        for _ in range(3):
+            clock.now += 5
+            await engine.tick()
+        assert outbound.sent[1:] == [(1, "Resolved:\n#1 cpu > 90% for 10s")]
+        assert engine.stats().firing == 0
+
+    @pytest.mark.asyncio
+    async def test_flapping_is_debounced(self):
+        """Test that a breach ending before its duration never notifies."""
+        metrics = FakeMetrics(cpu=50.0)
+        engine, clock, outbound = self.make_engine(metrics)
+        await engine.add(1, parse_condition("cpu > 90 for 10s"))
+
+        for value in (95.0, 50.0) * 10:
+            metrics.values["cpu"] = value
+            await engine.tick()
+            clock.now += 5
+
+        assert outbound.sent == []
+        assert engine.stats().pending_timers == 0
+
+    @pytest.mark.asyncio
+    async def test_shared_evaluation(self):
+        """Test that each metric is read once per tick however many chats subscribe."""
+        metrics = FakeMetrics(cpu=0.0, memory=0.0)
+        engine, clock, outbound = self.make_engine(metrics)
+        for chat_id in range(1000):
+            await engine.add(chat_id, parse_condition(f"cpu > {chat_id % 100}"))
+            await engine.add(chat_id, parse_condition("memory >= 80"))
+
+        metrics.reads = 0
+        metrics.values.update(cpu=49.5, memory=80.0)
+        await engine.tick()
+
+        assert metrics.reads == 2
+        stats = engine.stats()
+        assert (stats.subscriptions, stats.conditions) == (2000, 101)
+        # Chats watching cpu > 0 .. 49, plus everyone's memory alert
+        assert stats.firing == 500 + 1000
+        assert len(outbound.sent) == 1000
+        assert dict(outbound.sent)[7] == "Alerts firing:\n#1 cpu > 7% (now 49.5%)\n#2 memory >= 80% (now 80.0%)"
+
+    @pytest.mark.asyncio
+    async def test_thresholds_crossed_downwards(self):
+        """Test that only the conditions between the old and new value flip."""
+        metrics = FakeMetrics(load=5.0)
+        engine, clock, outbound = self.make_engine(metrics)
+        for chat_id, threshold in enumerate((1, 2, 3, 4)):
+            await engine.add(chat_id, parse_condition(f"load < {threshold}"))
+
+        await engine.tick()
+        metrics.values["load"] = 2.5
+        await engine.tick()
+
+        assert sorted(chat_id for chat_id, _ in outbound.sent) == [2, 3]
+
+    @pytest.mark.asyncio
+    async def test_add_list_remove(self):
+        """Test that alerts are numbered per chat, limited and removable."""
+        engine, clock, outbound = self.make_engine(FakeMetrics(cpu=95.0), max_per_chat=2)
+        first = await engine.add(1, parse_condition("cpu > 90"))
+        await engine.tick()
+        second = await engine.add(1, parse_condition("cpu > 50"))
+
+        assert (first.alert_id, second.alert_id) == (1, 2)
+        # Both hold already, the second started firing when it was added
+        assert [firing for _, firing in engine.alerts(1)] == [True, True]
+        with pytest.raises(ValueError):
+            await engine.add(1, parse_condition("memory > 1"))
+        assert await engine.remove(1, 1)
+        assert not await engine.remove(1, 1)
+        with pytest.raises(ValueError):
+            await engine.add(1, parse_condition("cpu > 50"))
+        assert (await engine.add(1, parse_condition("load > 1"))).alert_id == 3
+        assert engine.stats().firing == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_service(self):
+        """Test that only configured services can be watched."""
+        engine, clock, outbound = self.make_engine(FakeMetrics(), services={"web": ("127.0.0.1", 1)})
+
+        with pytest.raises(ValueError, match="Unknown service 'db' \\(web\\)"):
+            await engine.add(1, parse_condition("service db down"))
+
+    @pytest.mark.asyncio
+    async def test_service_probe(self):
+        """Test that a service is reported down once its port stops accepting connections."""
+        server = await asyncio.start_server(lambda reader, writer: writer.close(), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        engine, clock, outbound = self.make_engine(FakeMetrics(), services={"web": ("127.0.0.1", port)})
+        await engine.add(1, parse_condition("service web down"))
+
+        await engine.tick()
+        assert outbound.sent == []
+        server.close()
+        await server.wait_closed()
+        await engine.tick()
+
+        assert outbound.sent == [(1, "Alerts firing:\n#1 service web down")]
+
+    @pytest.mark.asyncio
+    async def test_persisted_per_shard(self, tmp_path):
+        """Test that subscriptions survive a restart and are loaded by the shard of their chat."""
+        path = str(tmp_path / "state.db")
+        store = StateStore(path)
+        await store.start()
+        engine, clock, outbound = self.make_engine(FakeMetrics(), store)
+        for chat_id in range(10):
+            await engine.add(chat_id, parse_condition("cpu > 90 for 5m"))
+        await engine.add(3, parse_condition("disk > 95"))
+        await engine.remove(3, 1)
+        await store.set(4, ALERTS_KEY, {"next_id": 2, "alerts": [{"id": 1, "metric": "service:gone", "op": ">",
+                                                                   "threshold": 0.5}]})
+        await store.stop()
+
+        store = StateStore(path)
+        await store.start()
+        try:
+            engines = [self.make_engine(FakeMetrics(), store, shard_index=index, shard_count=2)[0] for index in (0, 1)]
+            for engine in engines:
+                await engine.start()
+                await engine.stop()
+        finally:
+            await store.stop()
+
+        for index, engine in enumerate(engines):
+            chats = [chat_id for chat_id in range(10) if shard_for(chat_id, 2) == index and chat_id != 4]
+            assert engine.stats().subscriptions == len(chats)
+        alerts = engines[shard_for(3, 2)].alerts(3)
+        assert [(subscription.alert_id, subscription.condition.describe()) for subscription, _ in alerts] == [
+            (2, "disk > 95%")
+        ]
+        assert (await engines[shard_for(3, 2)].add(3, parse_condition("cpu > 1"))).alert_id == 3
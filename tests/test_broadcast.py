@@ -0,0 +1,187 @@
+import asyncio
+import logging
+
+import pytest
+import pytest_asyncio
+
+from broadcast import BROADCAST_KEY, KNOWN_CHATS_KEY, BroadcastEngine, BroadcastProgress, format_seconds
+from sharding import shard_for
+from state_store import StateStore
+from tests.conftest import FakeOutbound, wait_until
+
+
+class TestBroadcastProgress:
+    """Test cases for BroadcastProgress class."""
+
+    def test_eta(self):
+        """Test that the ETA follows from the remaining chats and the rate."""
+        progress = BroadcastProgress(1, total=100, sent=30, blocked=8, failed=2, rate=2.0, elapsed=20.0, running=True)
+
+        assert progress.eta == 30.0
+        assert progress.describe().split("\n") == [
+            "Broadcast: 40 of 100 chats", "30 sent, 8 blocked, 2 failed", "2.0 chats/s, ETA 30s",
+        ]
+
+    def test_format_seconds(self):
+        """Test that durations are shown in their largest units."""
+        assert [format_seconds(value) for value in (12, 185, 3725)] == ["12s", "3m 05s", "1h 02m"]
+
+
+class TestBroadcastEngine:
+    """Test cases for BroadcastEngine class."""
+
+    @pytest_asyncio.fixture
+    async def store(self, tmp_path):
+        """A started state store in a temporary file."""
+        store = StateStore(str(tmp_path / "state.db"))
+        await store.start()
+        yield store
+        await store.stop()
+
+    async def know(self, engine, chat_ids):
+        """Remember chats as broadcast recipients."""
+        for chat_id in chat_ids:
+            await engine.remember(chat_id)
+
+    @pytest.mark.asyncio
+    async def test_sends_to_every_known_chat(self, store):
+        """Test that each chat gets the text once and blocked chats are forgotten."""
+        outbound = FakeOutbound(blocked={7, 8})
+        engine = BroadcastEngine(outbound, store, concurrency=4)
+        await self.know(engine, range(1, 101))
+        await self.know(engine, range(1, 11))
+
+        assert await engine.begin(1, "news") == 100
+        await wait_until(lambda: not engine.running)
+
+        assert sorted(outbound.recipients()) == [chat_id for chat_id in range(1, 101) if chat_id not in (7, 8)]
+        assert outbound.max_in_flight <= 4
+        progress = engine.progress()
+        assert (progress.sent, progress.blocked, progress.failed, progress.running) == (98, 2, 0, False)
+        assert outbound.sent[0] == (1, "Broadcast: 0 of 100 chats\n0 sent, 0 blocked, 0 failed\n0.0 chats/s, ETA unknown")
+        assert await store.get(1, BROADCAST_KEY) is None
+        assert sorted(await store.scan(KNOWN_CHATS_KEY)) == [chat_id for chat_id in range(1, 101) if chat_id not in (7, 8)]
+
+    @pytest.mark.asyncio
+    async def test_resumes_after_restart(self, store):
+        """Test that a stopped broadcast continues after its cursor."""
+        outbound = FakeOutbound(delay=0.005)
+        engine = BroadcastEngine(outbound, store, concurrency=4, save_interval=0.01)
+        await self.know(engine, range(-50, 150))
+        await engine.begin(-50, "news")
+        await wait_until(lambda: len(outbound.recipients()) >= 60)
+        await engine.stop()
+
+        saved = await store.get(-50, BROADCAST_KEY)
+        first = outbound.recipients()
+        assert saved["cursor"] is not None and saved["sent"] == len(first)
+        assert all(chat_id > saved["cursor"] for chat_id in saved["ahead"])
+
+        resumed = BroadcastEngine(outbound, store, concurrency=4)
+        await resumed.start()
+        await wait_until(lambda: not resumed.running)
+
+        recipients = outbound.recipients()
+        assert set(recipients) == set(range(-50, 150))
+        # Only the sends in flight at the stop are repeated, not those done past the cursor
+        assert len(recipients) - 200 <= 4
+        progress = resumed.progress()
+        assert progress.resumed and progress.total == 200 and progress.sent == len(recipients)
+
+    @pytest.mark.asyncio
+    async def test_resumed_by_the_shard_of_its_chat(self, store):
+        """Test that only the shard handling the starting chat resumes a broadcast."""
+        await store.set(1, KNOWN_CHATS_KEY, True)
+        await store.set(3, BROADCAST_KEY, {"text": "news", "cursor": None, "sent": 0, "blocked": 0, "failed": 0})
+        engines = [BroadcastEngine(FakeOutbound(), store, shard_index=index, shard_count=2) for index in (0, 1)]
+
+        for engine in engines:
+            await engine.start()
+
+        assert [engine.progress() is not None for engine in engines] == [shard_for(3, 2) == index for index in (0, 1)]
+        for engine in engines:
+            await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_one_at_a_time_and_cancel(self, store):
+        """Test that a second broadcast is refused and a cancelled one is not resumed."""
+        engine = BroadcastEngine(FakeOutbound(delay=0.01), store, concurrency=1)
+        with pytest.raises(ValueError, match="No chats"):
+            await engine.begin(1, "news")
+        await self.know(engine, range(100))
+
+        await engine.begin(1, "news")
+        with pytest.raises(ValueError, match="already running"):
+            await engine.begin(1, "other")
+        assert await engine.cancel()
+        assert not await engine.cancel()
+
+        assert engine.progress().cancelled
+        assert await store.get(1, BROADCAST_KEY) is None
+
+
+class TestBroadcastAgainstFakeApi:
+    """Test cases for broadcasts sent through a running bot."""
+
+    @pytest.mark.asyncio
+    async def test_broadcast_command(self):
+        """Test that /broadcast reaches every chat seen, despite flood control and blocked users."""
+        from config import BotConfig
+        from main import build_bot
+        from testing.fake_bot_api import FakeBotApi
+
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        bot = build_bot(fake_api.token, BotConfig(
+            base_url=fake_api.base_url, admin_user_ids=frozenset({1}), outbound_global_rate=1000,
+        ))
+        try:
+            await bot.start()
+            try:
+                for chat_id in range(2, 52):
+                    await fake_api.push_update(fake_api.make_command_update(chat_id, "/ping"))
+                await fake_api.wait_for_messages(50)
+                fake_api.blocked_chats.update({10, 11})
+                fake_api.inject_error("sendMessage", times=1)
+
+                await fake_api.push_update(fake_api.make_command_update(1, "/broadcast Maintenance\ntonight"))
+                await wait_until(lambda: bot.services.broadcasts.progress() is not None
+                                 and not bot.services.broadcasts.running, timeout=15)
+            finally:
+                await bot.stop()
+        finally:
+            await fake_api.stop()
+
+        announced = sorted(message.chat_id for message in fake_api.sent_messages
+                           if message.text == "Maintenance\ntonight")
+        assert announced == [chat_id for chat_id in range(1, 52) if chat_id not in (10, 11)]
+        progress = bot.services.broadcasts.progress()
+        assert (progress.sent, progress.blocked) == (49, 2)
+        assert fake_api.edited_messages[-1].text.startswith("Broadcast finished: 51 of 51 chats")
+
+    @pytest.mark.asyncio
+    async def test_memory_state_is_warned_about(self, tmp_path, caplog):
+        """Test that starting without a state file warns that broadcasts and alerts are lost on restart."""
+        from config import BotConfig
+        from main import build_bot
+        from testing.fake_bot_api import FakeBotApi
+
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        warnings = []
+        try:
+            for state_db_path in (":memory:", str(tmp_path / "state.db")):
+                bot = build_bot(fake_api.token, BotConfig(base_url=fake_api.base_url, state_db_path=state_db_path))
+                caplog.clear()
+                with caplog.at_level(logging.WARNING, logger="bot"):
+                    await bot.start()
+                    await bot.stop()
+                messages = [record.getMessage() for record in caplog.records]
+                warnings.append([message for message in messages if "STATE_DB_PATH" in message])
+        finally:
+            await fake_api.stop()
+
+        assert warnings[0] == [
+            "STATE_DB_PATH is not set, so the state of /alert and /broadcast is kept in memory and lost on restart"
+        ]
+        assert warnings[1] == []
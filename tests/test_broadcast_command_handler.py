@@ -0,0 +1,64 @@
+import pytest
+from unittest.mock import AsyncMock, Mock
+from telegram import Chat, Message, Update, User
+
+from bot_services import BOT_SERVICES_KEY, BotServices
+from broadcast import BroadcastEngine, BroadcastProgress
+from commands.broadcast import BroadcastCommandHandler
+
+
+class TestBroadcastCommandHandler:
+    """Test cases for BroadcastCommandHandler class."""
+
+    @pytest.fixture
+    def engine(self):
+        """A stand-in engine that records what it is asked to do."""
+        engine = Mock(spec=BroadcastEngine)
+        engine.begin = AsyncMock(return_value=3)
+        engine.cancel = AsyncMock(return_value=False)
+        engine.progress.return_value = None
+        return engine
+
+    async def run(self, engine, text, user_id=42):
+        """Send a message to /broadcast and return the texts of the replies."""
+        update = Mock(spec=Update)
+        update.effective_user = Mock(spec=User, id=user_id)
+        update.effective_chat = Mock(spec=Chat, id=5)
+        update.effective_message = Mock(spec=Message, text=text)
+        update.message = Mock(spec=Message)
+        update.message.reply_text = AsyncMock()
+        context = Mock()
+        context.bot_data = {BOT_SERVICES_KEY: BotServices(admin_user_ids=frozenset({42}), broadcasts=engine)}
+        await BroadcastCommandHandler().handle(update, context)
+        return [call[0][0] for call in update.message.reply_text.call_args_list]
+
+    def test_name(self):
+        """Test that the handler answers to /broadcast."""
+        assert BroadcastCommandHandler().name() == '/broadcast'
+
+    @pytest.mark.asyncio
+    async def test_begin_keeps_line_breaks(self, engine):
+        """Test that the whole text after the command is broadcast, the engine reporting progress."""
+        assert await self.run(engine, "/broadcast  Maintenance\n\ntonight at 22:00 ") == []
+
+        engine.begin.assert_awaited_once_with(5, "Maintenance\n\ntonight at 22:00")
+
+    @pytest.mark.asyncio
+    async def test_status_and_cancel(self, engine):
+        """Test that progress is reported, a cancel is confirmed and a missing broadcast is explained."""
+        assert await self.run(engine, "/broadcast status") == ["No broadcast yet."]
+        assert await self.run(engine, "/broadcast cancel") == ["No broadcast is running."]
+
+        engine.cancel.return_value = True
+        assert await self.run(engine, "/broadcast cancel") == ["Broadcast cancelled."]
+
+        engine.progress.return_value = BroadcastProgress(5, 10, 4, 1, 0, rate=1.0, elapsed=5.0, running=True)
+        assert (await self.run(engine, "/broadcast status"))[0].endswith("1.0 chats/s, ETA 5s")
+
+    @pytest.mark.asyncio
+    async def test_errors(self, engine):
+        """Test that usage and refusals of the engine are shown."""
+        engine.begin.side_effect = ValueError("No chats are known yet")
+
+        assert (await self.run(engine, "/broadcast"))[0].startswith("Usage:")
+        assert await self.run(engine, "/broadcast hi") == ["No chats are known yet"]
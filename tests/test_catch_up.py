@@ -0,0 +1,189 @@
+import asyncio
+import time
+
+import pytest
+from telegram import Bot, Update
+
+from bot import TelegramBot
+from catch_up import BacklogCatchUp, OffsetStore, catch_up_from_config
+from command_handlers_manager import CommandHandlersManager
+from command_handlers_registry import CommandHandlersRegistry
+from config import BotConfig, WEBHOOK_MODE
+from testing.fake_bot_api import FakeBotApi
+
+
+def make_updates(fake_api, *messages):
+    """Build updates from ``(chat_id, text, age in seconds)`` triples."""
+    now = int(time.time())
+    return [
+        Update.de_json(fake_api.make_command_update(chat_id, text, date=now - age), None)
+        for chat_id, text, age in messages
+    ]
+
+
+class TestOffsetStore:
+    """Test cases for OffsetStore class."""
+
+    def test_round_trip(self, tmp_path):
+        """Test that the newest recorded update id survives a restart."""
+        path = tmp_path / "offset"
+        store = OffsetStore(str(path))
+        assert store.last_update_id is None
+
+        store.record(7)
+        store.record(5)
+        store.save()
+
+        assert path.read_text() == "7"
+        assert OffsetStore(str(path)).last_update_id == 7
+        assert list(tmp_path.iterdir()) == [path]
+
+    def test_malformed_file_is_ignored(self, tmp_path):
+        """Test that an unreadable offset starts from scratch."""
+        path = tmp_path / "offset"
+        path.write_text("garbage")
+        assert OffsetStore(str(path)).last_update_id is None
+
+    @pytest.mark.asyncio
+    async def test_stop_saves(self, tmp_path):
+        """Test that stopping writes the final offset."""
+        path = tmp_path / "offset"
+        store = OffsetStore(str(path), save_interval=60)
+        await store.start()
+        store.record(3)
+        await store.stop()
+        assert path.read_text() == "3"
+
+
+class TestBacklogCatchUp:
+    """Test cases for BacklogCatchUp class."""
+
+    def test_drops_stale_updates(self):
+        """Test that updates older than the maximum age are dropped."""
+        fake_api = FakeBotApi()
+        updates = make_updates(fake_api, (1, "/ping", 600), (1, "/status", 5), (2, "/ping", 0))
+
+        kept, stale, coalesced = BacklogCatchUp(max_age=60).select(updates)
+
+        assert [u.effective_message.text for u in kept] == ["/status", "/ping"]
+        assert (stale, coalesced) == (1, 0)
+
+    def test_coalesces_identical_commands(self):
+        """Test that a chat's repeated command is kept once, at its latest position."""
+        fake_api = FakeBotApi()
+        updates = make_updates(
+            fake_api, (1, "/ping", 0), (1, "/status", 0), (2, "/ping", 0), (1, "/ping", 0), (1, "hello", 0)
+        )
+
+        kept, stale, coalesced = BacklogCatchUp(coalesce=True).select(updates)
+
+        assert [(u.effective_chat.id, u.effective_message.text) for u in kept] == [
+            (1, "/status"), (2, "/ping"), (1, "/ping"), (1, "hello")
+        ]
+        assert kept[2] is updates[3]
+        assert (stale, coalesced) == (0, 1)
+
+    @pytest.mark.asyncio
+    async def test_drain_skips_processed_updates(self, tmp_path):
+        """Test that draining confirms the backlog and skips updates processed before."""
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        store = OffsetStore(str(tmp_path / "offset"))
+        try:
+            for _ in range(150):
+                await fake_api.push_update(fake_api.make_command_update(1, "/ping"))
+            first_id = fake_api._pending_updates[0]["update_id"]
+            store.record(first_id + 9)
+            async with Bot(fake_api.token, base_url=fake_api.base_url) as bot:
+                pending, _ = await BacklogCatchUp(offset_store=store).drain(bot)
+                remaining = await bot.get_updates(timeout=0)
+        finally:
+            await fake_api.stop()
+
+        assert len(pending) == 140
+        assert pending[0].update_id == first_id + 10
+        assert remaining == ()
+
+    @pytest.mark.asyncio
+    async def test_low_priority_waits_for_idle(self):
+        """Test that a low-priority backlog is only queued while nothing live waits."""
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        for chat_id in (1, 2):
+            await fake_api.push_update(fake_api.make_command_update(chat_id, "/ping"))
+        update_queue = asyncio.Queue()
+        live = asyncio.Queue()
+        live.put_nowait("live update")
+        catch_up = BacklogCatchUp(low_priority=True, idle_check_interval=0.01)
+        try:
+            async with Bot(fake_api.token, base_url=fake_api.base_url) as bot:
+                stats = await catch_up.start(bot, update_queue, live.empty)
+                await asyncio.sleep(0.05)
+                assert update_queue.empty()
+
+                live.get_nowait()
+                await asyncio.sleep(0.05)
+                assert update_queue.qsize() == 2
+                await catch_up.stop()
+        finally:
+            await fake_api.stop()
+
+        assert (stats.fetched, stats.queued) == (2, 2)
+
+    def test_from_config(self, tmp_path):
+        """Test that catch-up only runs when polling with a policy or an offset file."""
+        assert catch_up_from_config(BotConfig()) == (None, None)
+        catch_up, store = catch_up_from_config(BotConfig(catch_up_coalesce=True))
+        assert catch_up is not None and store is None
+        catch_up, store = catch_up_from_config(BotConfig(mode=WEBHOOK_MODE, offset_file=str(tmp_path / "o")))
+        assert catch_up is None and store is not None
+
+    @pytest.mark.asyncio
+    async def test_restart_end_to_end(self, tmp_path):
+        """Test that a restarted bot skips stale and duplicate backlog and never redoes work."""
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        config = BotConfig(
+            base_url=fake_api.base_url,
+            catch_up_max_age=60,
+            catch_up_coalesce=True,
+            offset_file=str(tmp_path / "offset"),
+        )
+        now = int(time.time())
+        backlog = [fake_api.make_command_update(1, "/ping") for _ in range(5)]
+        backlog.append(fake_api.make_command_update(2, "/ping", date=now - 3600))
+        backlog.append(fake_api.make_command_update(3, "/ping"))
+
+        def make_bot():
+            manager = CommandHandlersManager(CommandHandlersRegistry())
+            manager.populate_bot_handlers()
+            return TelegramBot(fake_api.token, manager, config)
+
+        try:
+            for update in backlog:
+                await fake_api.push_update(update)
+            bot = make_bot()
+            await bot.start()
+            try:
+                await fake_api.wait_for_messages(2)
+                await asyncio.sleep(0.2)
+                assert bot.catch_up.stats.stale == 1
+                assert bot.catch_up.stats.coalesced == 4
+            finally:
+                await bot.stop()
+            assert sorted(m.chat_id for m in fake_api.sent_messages) == [1, 3]
+
+            # Telegram redelivers an update the first run handled, plus a new one
+            await fake_api.push_update(backlog[-1])
+            await fake_api.push_update(fake_api.make_command_update(4, "/ping"))
+            bot = make_bot()
+            await bot.start()
+            try:
+                await fake_api.wait_for_messages(3)
+                await asyncio.sleep(0.2)
+            finally:
+                await bot.stop()
+        finally:
+            await fake_api.stop()
+
+        assert sorted(m.chat_id for m in fake_api.sent_messages) == [1, 3, 4]
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import Mock, MagicMock
+from unittest.mock import AsyncMock, Mock, MagicMock
 from src.command_handlers_manager import CommandHandlersManager
 from src.command_handlers_registry import CommandHandlersRegistry
 from src.commands.ping import PingCommandHandler
@@ -18,6 +18,12 @@ class TestCommandHandlersManager:
         """Create a CommandHandlersManager with a mock registry."""
         return CommandHandlersManager(mock_registry)
     
+    @staticmethod
+    def added_handler(mock_registry, name):
+        """Get the handler registered under the given command name."""
+        handlers = [call[0][0] for call in mock_registry.add.call_args_list]
+        return next(handler for handler in handlers if handler.name() == name)
+    
     def test_manager_initialization(self, mock_registry):
         """Test that CommandHandlersManager initializes correctly with a registry."""
         manager = CommandHandlersManager(mock_registry)
@@ -27,10 +33,12 @@ class TestCommandHandlersManager:
         """Test that populate_bot_handlers calls the registry's add method."""
         manager_with_mock.populate_bot_handlers()
         
-        # Verify that add was called once
-        mock_registry.add.assert_called_once()
+        # Verify that add was called once per declared command
+        from command_plugins import load_manifest
+        from command_handlers_manager import DEFAULT_MANIFEST_PATH
+        assert mock_registry.add.call_count == len(load_manifest(DEFAULT_MANIFEST_PATH))
         
-        # Verify that the argument passed to add is a PingCommandHandler
+        # Verify that each call passes a single handler
         call_args = mock_registry.add.call_args
         assert len(call_args[0]) == 1
 
@@ -40,12 +48,32 @@ class TestCommandHandlersManager:
         """
         manager_with_mock.populate_bot_handlers()
 
-        mock_registry.add.assert_called_once()
-        
-        handler_instance = mock_registry.add.call_args[0][0]
+        handler_instance = self.added_handler(mock_registry, '/ping')
         from commands.ping import PingCommandHandler as ActualPingHandler
-        assert isinstance(handler_instance, ActualPingHandler)
         assert handler_instance.name() == '/ping'
+        assert isinstance(handler_instance.load(), ActualPingHandler)
+    
+    def test_populate_bot_handlers_registers_lazy_proxies(self, manager_with_mock, mock_registry):
+        """Test that handlers are registered without being loaded."""
+        manager_with_mock.populate_bot_handlers()
+        
+        handler_instance = mock_registry.add.call_args[0][0]
+        assert not handler_instance.is_loaded
+    
+    def test_populate_bot_handlers_prewarms_commands(self, mock_registry):
+        """Test that pre-warmed commands are loaded during population."""
+        manager = CommandHandlersManager(mock_registry, prewarm=['/ping'])
+        manager.populate_bot_handlers()
+        
+        assert self.added_handler(mock_registry, '/ping').is_loaded
+        assert not self.added_handler(mock_registry, '/stats').is_loaded
+    
+    def test_populate_bot_handlers_prewarm_unknown_command(self, mock_registry):
+        """Test that pre-warming an undeclared command is an error."""
+        manager = CommandHandlersManager(mock_registry, prewarm=['/nope'])
+        
+        with pytest.raises(KeyError, match="/nope"):
+            manager.populate_bot_handlers()
     
     def test_populate_bot_handlers_registry_error_handling(self, manager_with_mock, mock_registry):
         """Test that populate_bot_handlers handles registry errors gracefully."""
@@ -81,3 +109,51 @@ class TestCommandHandlersManager:
         
         assert result == mock_handlers
         mock_registry.get_all_handlers.assert_called_once()
+    
+    def test_get_handler_delegates_to_registry(self, manager_with_mock, mock_registry):
+        """Test that get_handler resolves commands through the registry."""
+        handler = Mock()
+        mock_registry.resolve.return_value = handler
+        
+        assert manager_with_mock.get_handler('/ping') is handler
+        mock_registry.resolve.assert_called_once_with('/ping')
+    
+    def test_bot_commands_lists_declared_commands(self):
+        """Test that the command menu lists every command with its description."""
+        manager = CommandHandlersManager(CommandHandlersRegistry(), use_entry_points=False)
+        manager.populate_bot_handlers()
+        
+        commands = {command.command: command.description for command in manager.bot_commands()}
+        
+        assert commands['ping'] == "Check that the bot is alive"
+        assert len(commands) == len(manager.get_registered_handlers())
+    
+    def test_bot_commands_skips_invalid_names(self, mock_registry):
+        """Test that commands Telegram does not accept are left out of the menu."""
+        valid, invalid = Mock(), Mock()
+        valid.name.return_value, valid.description.return_value = '/ok', ''
+        invalid.name.return_value, invalid.description.return_value = '/Not-Valid', 'x'
+        mock_registry.get_all_handlers.return_value = [invalid, valid]
+        
+        commands = CommandHandlersManager(mock_registry).bot_commands()
+        
+        assert [(command.command, command.description) for command in commands] == [('ok', '/ok')]
+    
+    @pytest.mark.asyncio
+    async def test_publish_commands_makes_one_call(self):
+        """Test that the command menu is replaced with a single setMyCommands call."""
+        manager = CommandHandlersManager(CommandHandlersRegistry(), use_entry_points=False)
+        manager.populate_bot_handlers()
+        bot = Mock(set_my_commands=AsyncMock())
+        
+        count = await manager.publish_commands(bot)
+        
+        bot.set_my_commands.assert_awaited_once()
+        assert len(bot.set_my_commands.call_args[0][0]) == count
+    
+    def test_suggest_commands_delegates_to_registry(self, manager_with_mock, mock_registry):
+        """Test that suggestions come from the registry."""
+        mock_registry.suggest.return_value = ['/ping']
+        
+        assert manager_with_mock.suggest_commands('/pnig') == ['/ping']
+        mock_registry.suggest.assert_called_once_with('/pnig')
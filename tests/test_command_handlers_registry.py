@@ -17,6 +17,17 @@ class MockCommandHandler(ICommandHandler):
         return self._command_name
 
 
+class AliasedCommandHandler(MockCommandHandler):
+    """Mock command handler answering to aliases as well."""
+    
+    def __init__(self, command_name: str, aliases):
+        super().__init__(command_name)
+        self._aliases = tuple(aliases)
+    
+    def aliases(self):
+        return self._aliases
+
+
 class TestCommandHandlersRegistry:
     """Test cases for CommandHandlersRegistry class."""
     
@@ -131,3 +142,81 @@ class TestCommandHandlersRegistry:
         
         registry.remove('/test1')
         assert registry.count() == 1
+    
+    def test_replace_all(self):
+        """Test that replace_all swaps in the new set of handlers."""
+        registry = CommandHandlersRegistry()
+        old = MockCommandHandler('/old')
+        registry.add(old)
+        registry.add(MockCommandHandler('/kept'))
+        kept = MockCommandHandler('/kept')
+        new = MockCommandHandler('/new')
+        
+        registry.replace_all([kept, new])
+        
+        assert registry.count() == 2
+        assert not registry.has_handler('/old')
+        assert registry.get('/kept') is kept
+        assert registry.get('/new') is new
+    
+    def test_replace_all_duplicate_leaves_registry_unchanged(self):
+        """Test that a new set with duplicate names is rejected without changes."""
+        registry = CommandHandlersRegistry()
+        handler = MockCommandHandler('/test')
+        registry.add(handler)
+        
+        with pytest.raises(ValueError, match="already exists"):
+            registry.replace_all([MockCommandHandler('/a'), MockCommandHandler('/a')])
+        
+        assert registry.get_all_handlers() == [handler]
+    
+    def test_resolve_alias_and_prefix(self):
+        """Test that resolve finds handlers by alias and unique prefix."""
+        registry = CommandHandlersRegistry()
+        handler = AliasedCommandHandler('/history', ('/h',))
+        registry.add(handler)
+        registry.add(MockCommandHandler('/ping'))
+        
+        assert registry.resolve('/history') is handler
+        assert registry.resolve('/h') is handler
+        assert registry.resolve('/hist') is handler
+        assert registry.get('/h') is None
+        assert registry.resolve('/nope') is None
+    
+    def test_add_taken_alias(self):
+        """Test that a handler whose alias is taken is not added."""
+        registry = CommandHandlersRegistry()
+        registry.add(AliasedCommandHandler('/history', ('/h',)))
+        
+        with pytest.raises(ValueError, match="already taken"):
+            registry.add(AliasedCommandHandler('/help', ('/h',)))
+        
+        assert not registry.has_handler('/help')
+    
+    def test_remove_drops_alias(self):
+        """Test that removing a handler stops its aliases from resolving."""
+        registry = CommandHandlersRegistry()
+        registry.add(AliasedCommandHandler('/history', ('/h',)))
+        
+        registry.remove('/history')
+        
+        assert registry.resolve('/h') is None
+    
+    def test_replace_all_rebuilds_index(self):
+        """Test that replace_all swaps in the aliases of the new set."""
+        registry = CommandHandlersRegistry()
+        registry.add(AliasedCommandHandler('/history', ('/h',)))
+        handler = AliasedCommandHandler('/help', ('/h',))
+        
+        registry.replace_all([handler])
+        
+        assert registry.resolve('/h') is handler
+    
+    def test_suggest(self):
+        """Test that unknown commands get close registered commands suggested."""
+        registry = CommandHandlersRegistry()
+        registry.add(MockCommandHandler('/ping'))
+        registry.add(MockCommandHandler('/status'))
+        
+        assert registry.suggest('/pnig') == ['/ping']
+        assert registry.suggest('/xyzzy') == []
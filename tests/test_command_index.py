@@ -0,0 +1,100 @@
+import pytest
+
+from command_index import CommandIndex
+
+
+@pytest.fixture
+def index():
+    """Create an index with a few commands sharing prefixes."""
+    return CommandIndex.build([
+        ('/ping', ()),
+        ('/stats', ()),
+        ('/status', ('/st',)),
+        ('/history', ('/h', '/hist')),
+    ])
+
+
+class TestCommandIndex:
+    """Test cases for CommandIndex class."""
+
+    def test_resolves_names_and_aliases(self, index):
+        """Test that names and aliases resolve to the command name."""
+        assert index.resolve('/ping') == '/ping'
+        assert index.resolve('/hist') == '/history'
+        assert index.resolve('/H') == '/history'
+
+    def test_resolves_unique_prefixes(self, index):
+        """Test that a prefix only one command starts with resolves to it."""
+        assert index.resolve('/p') == '/ping'
+        assert index.resolve('/statu') == '/status'
+        assert index.resolve('/histo') == '/history'
+
+    def test_ambiguous_prefix_does_not_resolve(self, index):
+        """Test that a prefix shared by several commands resolves to nothing."""
+        assert index.resolve('/stat') is None
+        assert index.resolve('/') is None
+
+    def test_exact_alias_wins_over_longer_names(self, index):
+        """Test that an alias is not treated as a prefix of longer commands."""
+        assert index.resolve('/st') == '/status'
+
+    def test_unknown_does_not_resolve(self, index):
+        """Test that a token matching no key resolves to nothing."""
+        assert index.resolve('/pong') is None
+
+    def test_taken_name_is_rejected(self, index):
+        """Test that a name or alias cannot be taken twice."""
+        with pytest.raises(ValueError, match="'/h' is already taken"):
+            index.add('/help', ('/h',))
+        assert '/help' not in index
+        assert index.resolve('/he') is None
+
+    def test_remove_restores_prefixes(self, index):
+        """Test that removing a command makes shared prefixes unique again."""
+        index.remove('/stats')
+
+        assert index.resolve('/stat') == '/status'
+        assert index.resolve('/stats') is None
+        assert len(index) == 3
+
+    def test_remove_drops_aliases(self, index):
+        """Test that a removed command's aliases stop resolving."""
+        index.remove('/history')
+
+        assert index.resolve('/h') is None
+        assert '/history' not in index.suggest('/hist')
+
+    def test_remove_unknown_command(self, index):
+        """Test that removing an unknown command raises KeyError."""
+        with pytest.raises(KeyError):
+            index.remove('/nope')
+
+    def test_suggests_typos(self, index):
+        """Test that substitutions, insertions, deletions and swaps are suggested."""
+        assert index.suggest('/pnig') == ['/ping']
+        assert index.suggest('/pin') == ['/ping']
+        assert index.suggest('/pingg') == ['/ping']
+        assert index.suggest('/hsitory') == ['/history']
+
+    def test_suggests_ambiguous_prefix_completions_first(self, index):
+        """Test that commands an ambiguous prefix is shared by come first."""
+        assert index.suggest('/stat') == ['/stats', '/status']
+
+    def test_suggestions_are_bounded(self, index):
+        """Test that nothing further than the maximum distance is suggested."""
+        assert index.suggest('/xyzzy') == []
+        assert index.suggest('/pong', max_distance=0) == []
+        assert index.suggest('/pong', max_distance=1) == ['/ping']
+
+    def test_suggestion_limit(self):
+        """Test that at most the requested number of suggestions is returned."""
+        index = CommandIndex.build((f'/cmd{number}', ()) for number in range(10))
+        assert len(index.suggest('/cmd', limit=3)) == 3
+
+    def test_many_commands(self):
+        """Test resolution and suggestions with thousands of commands."""
+        index = CommandIndex.build((f'/command_{number}', ()) for number in range(5000))
+
+        assert index.resolve('/command_4999') == '/command_4999'
+        assert index.resolve('/command_') is None
+        assert '/command_1234' in index.suggest('/comand_1234')
@@ -0,0 +1,190 @@
+import json
+import sys
+import textwrap
+
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from command_plugins import CommandSpec, LazyCommandHandler, discover_entry_points, load_manifest
+
+
+@pytest.fixture
+def plugin_dir(tmp_path, monkeypatch):
+    """Create an importable package with a synthetic command module."""
+    package = tmp_path / "lazy_test_plugins"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "hello.py").write_text(textwrap.dedent("""
+        from commands.icommand_handler import ICommandHandler
+
+        class HelloCommandHandler(ICommandHandler):
+            calls = []
+
+            async def handle(self, update, context):
+                self.calls.append(update)
+
+            def name(self):
+                return '/hello'
+
+            def cache_policy(self):
+                from response_cache import CachePolicy
+                return CachePolicy(ttl=5)
+
+            async def render(self, update, context):
+                return 'hello'
+
+            def rate_limit(self):
+                from rate_limiter import RateLimit
+                return RateLimit(3, 60)
+
+        class AdminCommandHandler(ICommandHandler):
+            async def handle(self, update, context):
+                pass
+
+            def name(self):
+                return '/secret'
+
+            def admin_only(self):
+                return True
+
+        class NotAHandler:
+            pass
+    """))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield package
+    for module in [m for m in sys.modules if m.startswith("lazy_test_plugins")]:
+        del sys.modules[module]
+
+
+class TestLoadManifest:
+    """Test cases for the load_manifest function."""
+
+    def test_reads_commands(self, tmp_path):
+        """Test that manifest entries become command specs."""
+        manifest = tmp_path / "manifest.json"
+        manifest.write_text(json.dumps({"commands": [
+            {"name": "/a", "module": "pkg.a", "class": "A", "description": "Does A"},
+            {"name": "/b", "module": "pkg.b", "class": "B"},
+        ]}))
+
+        specs = load_manifest(str(manifest))
+
+        assert specs == [
+            CommandSpec("/a", "pkg.a", "A", "Does A"),
+            CommandSpec("/b", "pkg.b", "B", ""),
+        ]
+
+    def test_missing_field(self, tmp_path):
+        """Test that an incomplete entry is reported."""
+        manifest = tmp_path / "manifest.json"
+        manifest.write_text(json.dumps({"commands": [{"name": "/a", "module": "pkg.a"}]}))
+
+        with pytest.raises(ValueError, match="missing 'class'"):
+            load_manifest(str(manifest))
+
+    def test_admin_only(self, tmp_path):
+        """Test that commands can be declared admin-only."""
+        manifest = tmp_path / "manifest.json"
+        manifest.write_text(json.dumps({"commands": [
+            {"name": "/a", "module": "pkg.a", "class": "A", "admin_only": True},
+        ]}))
+
+        assert load_manifest(str(manifest)) == [CommandSpec("/a", "pkg.a", "A", admin_only=True)]
+
+    def test_bundled_manifest_declares_ping(self):
+        """Test that the bundled manifest declares the /ping command."""
+        from command_handlers_manager import DEFAULT_MANIFEST_PATH
+        names = [spec.name for spec in load_manifest(DEFAULT_MANIFEST_PATH)]
+        assert '/ping' in names
+
+
+class TestDiscoverEntryPoints:
+    """Test cases for the discover_entry_points function."""
+
+    def test_entry_point_becomes_spec(self, monkeypatch):
+        """Test that an entry point is turned into a command spec without importing it."""
+        entry_point = Mock(value="some.module:SomeHandler")
+        entry_point.name = "some"
+        monkeypatch.setattr("command_plugins.metadata.entry_points", lambda group: [entry_point])
+
+        assert discover_entry_points() == [CommandSpec("/some", "some.module", "SomeHandler")]
+
+    def test_admin_only_extra(self, monkeypatch):
+        """Test that an entry point is declared admin-only with the admin_only extra."""
+        entry_point = Mock(value="some.module:SomeHandler [admin_only]")
+        entry_point.name = "some"
+        monkeypatch.setattr("command_plugins.metadata.entry_points", lambda group: [entry_point])
+
+        assert discover_entry_points() == [CommandSpec("/some", "some.module", "SomeHandler", admin_only=True)]
+
+
+class TestLazyCommandHandler:
+    """Test cases for LazyCommandHandler class."""
+
+    def test_name_does_not_import(self, plugin_dir):
+        """Test that the command name is known without importing the module."""
+        proxy = LazyCommandHandler(CommandSpec("/hello", "lazy_test_plugins.hello", "HelloCommandHandler"))
+
+        assert proxy.name() == '/hello'
+        assert not proxy.is_loaded
+        assert "lazy_test_plugins.hello" not in sys.modules
+
+    @pytest.mark.asyncio
+    async def test_first_call_loads_and_delegates(self, plugin_dir):
+        """Test that the first call imports the module and forwards the update."""
+        proxy = LazyCommandHandler(CommandSpec("/hello", "lazy_test_plugins.hello", "HelloCommandHandler"))
+        update = Mock()
+
+        await proxy.handle(update, Mock())
+
+        assert proxy.is_loaded
+        assert proxy.load().calls == [update]
+
+    def test_load_is_cached(self, plugin_dir):
+        """Test that the handler is only created once."""
+        proxy = LazyCommandHandler(CommandSpec("/hello", "lazy_test_plugins.hello", "HelloCommandHandler"))
+        assert proxy.load() is proxy.load()
+
+    def test_missing_class(self, plugin_dir):
+        """Test that a wrong class name is an import error."""
+        proxy = LazyCommandHandler(CommandSpec("/hello", "lazy_test_plugins.hello", "Missing"))
+        with pytest.raises(ImportError, match="Missing"):
+            proxy.load()
+
+    def test_not_a_handler(self, plugin_dir):
+        """Test that a class not implementing ICommandHandler is rejected."""
+        proxy = LazyCommandHandler(CommandSpec("/hello", "lazy_test_plugins.hello", "NotAHandler"))
+        with pytest.raises(TypeError):
+            proxy.load()
+
+    def test_name_mismatch(self, plugin_dir):
+        """Test that a handler answering to a different name is rejected."""
+        proxy = LazyCommandHandler(CommandSpec("/other", "lazy_test_plugins.hello", "HelloCommandHandler"))
+        with pytest.raises(ValueError, match="expected '/other'"):
+            proxy.load()
+
+    def test_admin_only_must_be_declared(self, plugin_dir):
+        """Test that the declaration answers without importing, and an undeclared admin-only handler is rejected."""
+        declared = LazyCommandHandler(
+            CommandSpec("/secret", "lazy_test_plugins.hello", "AdminCommandHandler", admin_only=True)
+        )
+        assert declared.admin_only()
+        assert "lazy_test_plugins.hello" not in sys.modules
+        assert declared.load().admin_only()
+
+        undeclared = LazyCommandHandler(CommandSpec("/secret", "lazy_test_plugins.hello", "AdminCommandHandler"))
+        with pytest.raises(ValueError, match="admin_only"):
+            undeclared.load()
+
+    @pytest.mark.asyncio
+    async def test_forwards_cache_policy_and_render(self, plugin_dir):
+        """Test that cacheable handlers stay cacheable behind the proxy."""
+        proxy = LazyCommandHandler(CommandSpec("/hello", "lazy_test_plugins.hello", "HelloCommandHandler"))
+
+        assert proxy.cache_policy().ttl == 5
+        assert await proxy.render(Mock(), Mock()) == 'hello'
+
+    def test_forwards_rate_limit(self, plugin_dir):
+        """Test that a handler's rate limit is seen through the proxy."""
+        proxy = LazyCommandHandler(CommandSpec("/hello", "lazy_test_plugins.hello", "HelloCommandHandler"))
+        assert proxy.rate_limit().count == 3
@@ -0,0 +1,259 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, Mock
+from telegram import MessageEntity
+
+from src.command_router import CommandRouter, parse_command
+from tests.conftest import make_update
+
+
+class TestParseCommand:
+    """Test cases for the parse_command function."""
+
+    def test_plain_command(self):
+        """Test parsing a command without arguments."""
+        assert parse_command(make_update('/ping').message) == ('/ping', [])
+
+    def test_command_with_arguments(self):
+        """Test that arguments are split on whitespace."""
+        assert parse_command(make_update('/history cpu  5m').message) == ('/history', ['cpu', '5m'])
+
+    def test_command_is_lower_cased(self):
+        """Test that the command name is case-insensitive."""
+        assert parse_command(make_update('/PING').message) == ('/ping', [])
+
+    def test_suffix_for_this_bot(self):
+        """Test that a @botname suffix naming this bot is accepted."""
+        assert parse_command(make_update('/ping@GServer_Bot now').message) == ('/ping', ['now'])
+
+    def test_suffix_for_other_bot(self):
+        """Test that commands addressed to another bot are ignored."""
+        assert parse_command(make_update('/ping@other_bot').message) is None
+
+    def test_plain_text_is_not_a_command(self):
+        """Test that messages without a command entity are ignored."""
+        assert parse_command(make_update('hello').message) is None
+
+    def test_command_not_at_start(self):
+        """Test that a command entity must start at offset 0."""
+        message = make_update('hi /ping').message
+        message._unfreeze()
+        message.entities = (MessageEntity(MessageEntity.BOT_COMMAND, 3, 5),)
+        assert parse_command(message) is None
+
+
+class TestCommandRouter:
+    """Test cases for CommandRouter class."""
+
+    @pytest.fixture
+    def ping_handler(self):
+        """Create a stand-in /ping command handler."""
+        handler = Mock()
+        handler.name.return_value = '/ping'
+        handler.stream_policy.return_value = None
+        handler.handle = AsyncMock()
+        return handler
+
+    @pytest.fixture
+    def lookup(self, ping_handler):
+        """Create a lookup that only knows /ping."""
+        handlers = {'/ping': ping_handler}
+        return Mock(side_effect=handlers.get)
+
+    def test_check_update_resolves_handler(self, lookup, ping_handler):
+        """Test that a known command resolves with a single lookup."""
+        router = CommandRouter(lookup)
+
+        result = router.check_update(make_update('/ping a b'))
+
+        assert result == ('/ping', ['a', 'b'], ping_handler, None)
+        lookup.assert_called_once_with('/ping')
+
+    def test_check_update_reports_the_handlers_own_name(self, ping_handler):
+        """Test that an alias or prefix is reported as the command it resolves to."""
+        router = CommandRouter(Mock(return_value=ping_handler))
+
+        result = router.check_update(make_update('/pi'))
+
+        assert result == ('/ping', [], ping_handler, None)
+
+    def test_check_update_ignores_unknown_without_fallback(self, lookup):
+        """Test that unknown commands are left alone when there is no fallback."""
+        router = CommandRouter(lookup)
+        assert router.check_update(make_update('/nope')) is None
+
+    def test_check_update_accepts_unknown_with_fallback(self, lookup):
+        """Test that unknown commands are routed to the fallback when one is set."""
+        router = CommandRouter(lookup, AsyncMock())
+        assert router.check_update(make_update('/nope')) == ('/nope', [], None, None)
+
+    def test_check_update_ignores_non_updates(self, lookup):
+        """Test that objects other than updates are not handled."""
+        router = CommandRouter(lookup)
+        assert router.check_update("not an update") is None
+
+    @pytest.mark.asyncio
+    async def test_handle_update_calls_handler_with_args(self, lookup, ping_handler):
+        """Test that the resolved handler is invoked with the parsed arguments."""
+        router = CommandRouter(lookup)
+        update = make_update('/ping now')
+        context = Mock()
+
+        await router.handle_update(update, Mock(), router.check_update(update), context)
+
+        ping_handler.handle.assert_awaited_once_with(update, context)
+        assert context.args == ['now']
+
+    @pytest.mark.asyncio
+    async def test_handle_update_calls_unknown_fallback(self, lookup):
+        """Test that the fallback receives the unknown command name."""
+        fallback = AsyncMock()
+        router = CommandRouter(lookup, fallback)
+        update = make_update('/nope x')
+        context = Mock()
+
+        await router.handle_update(update, Mock(), router.check_update(update), context)
+
+        fallback.assert_awaited_once_with(update, context, '/nope')
+
+    @pytest.mark.asyncio
+    async def test_handle_update_submits_to_scheduler(self, lookup, ping_handler):
+        """Test that handlers run on the scheduler keyed by chat when one is set."""
+        scheduler = Mock()
+        router = CommandRouter(lookup, scheduler=scheduler)
+        update = make_update('/ping')
+        context = Mock()
+
+        await router.handle_update(update, Mock(), router.check_update(update), context)
+
+        ping_handler.handle.assert_not_awaited()
+        chat_id, job = scheduler.submit.call_args[0]
+        assert chat_id == 1
+        await job()
+        ping_handler.handle.assert_awaited_once_with(update, context)
+
+    @pytest.mark.asyncio
+    async def test_handle_update_records_metrics(self, lookup, ping_handler):
+        """Test that handler calls are counted and timed when metrics are enabled."""
+        from metrics import MetricsRegistry
+        metrics = MetricsRegistry()
+        router = CommandRouter(lookup, metrics=metrics)
+        update = make_update('/ping')
+
+        await router.handle_update(update, Mock(), router.check_update(update), Mock())
+
+        ping_metrics = metrics.command('/ping')
+        assert (ping_metrics.calls, ping_metrics.errors, ping_metrics.latency.count) == (1, 0, 1)
+
+    @pytest.mark.asyncio
+    async def test_handle_update_records_errors(self, lookup, ping_handler):
+        """Test that a failing handler is counted as an error and still raises."""
+        from metrics import MetricsRegistry
+        metrics = MetricsRegistry()
+        ping_handler.handle.side_effect = RuntimeError("boom")
+        router = CommandRouter(lookup, metrics=metrics)
+        update = make_update('/ping')
+
+        with pytest.raises(RuntimeError):
+            await router.handle_update(update, Mock(), router.check_update(update), Mock())
+
+        assert metrics.command('/ping').errors == 1
+
+    @pytest.mark.asyncio
+    async def test_handle_update_serves_cached_reply(self, lookup, ping_handler):
+        """Test that a cacheable handler is rendered once and replayed from the cache."""
+        from metrics import MetricsRegistry
+        from response_cache import CachePolicy, ResponseCache
+        ping_handler.cache_policy = Mock(return_value=CachePolicy(ttl=60))
+        ping_handler.render = AsyncMock(return_value="pong")
+        metrics = MetricsRegistry()
+        from bot_services import BOT_SERVICES_KEY, BotServices
+        outbound = Mock(send_text=AsyncMock())
+        context = Mock(bot_data={BOT_SERVICES_KEY: BotServices(outbound=outbound)})
+        router = CommandRouter(lookup, metrics=metrics, response_cache=ResponseCache())
+
+        for update_id in (1, 2):
+            update = make_update('/ping', update_id)
+            await router.handle_update(update, Mock(), router.check_update(update), context)
+
+        assert [call.args for call in outbound.send_text.await_args_list] == [(1, "pong"), (1, "pong")]
+        ping_handler.render.assert_awaited_once()
+        ping_handler.handle.assert_not_awaited()
+        assert (metrics.command('/ping').cache_hits, metrics.command('/ping').cache_misses) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_handle_update_rejects_over_rate_limit(self, lookup, ping_handler):
+        """Test that calls over the user's limit skip the handler and get one cooldown notice."""
+        from bot_services import BOT_SERVICES_KEY, BotServices
+        from metrics import MetricsRegistry
+        from rate_limiter import RateLimit, RateLimiter
+        ping_handler.rate_limit = Mock(return_value=None)
+        metrics = MetricsRegistry()
+        outbound = Mock(send_text=AsyncMock())
+        context = Mock(bot_data={BOT_SERVICES_KEY: BotServices(outbound=outbound)})
+        router = CommandRouter(lookup, metrics=metrics, rate_limiter=RateLimiter(RateLimit(2, 60)))
+
+        for update_id in range(1, 6):
+            update = make_update('/ping', update_id, user_id=7)
+            await router.handle_update(update, Mock(), router.check_update(update), context)
+        await asyncio.sleep(0)
+
+        assert ping_handler.handle.await_count == 2
+        assert metrics.command('/ping').rate_limited == 3
+        assert outbound.send_text.await_count == 1
+        assert "Too many requests" in outbound.send_text.await_args.args[1]
+
+    @pytest.mark.asyncio
+    async def test_unknown_commands_share_one_limit(self, lookup):
+        """Test that rejected typos are limited and counted under one name, not one each."""
+        from bot_services import BOT_SERVICES_KEY, BotServices
+        from metrics import MetricsRegistry
+        from rate_limiter import RateLimit, RateLimiter
+        metrics = MetricsRegistry()
+        fallback = AsyncMock()
+        context = Mock(bot_data={BOT_SERVICES_KEY: BotServices(outbound=Mock(send_text=AsyncMock()))})
+        router = CommandRouter(lookup, fallback, metrics=metrics, rate_limiter=RateLimiter(RateLimit(2, 60)))
+
+        for update_id in range(1, 6):
+            update = make_update(f'/nope{update_id}', update_id, user_id=7)
+            await router.handle_update(update, Mock(), router.check_update(update), context)
+
+        assert fallback.await_count == 2
+        assert list(metrics.commands()) == ['unknown']
+        assert metrics.command('unknown').rate_limited == 3
+
+
+class TestCommandResolutionEndToEnd:
+    """Test cases for aliases, prefixes and suggestions through a running bot."""
+
+    @pytest.mark.asyncio
+    async def test_prefix_suggestion_and_menu(self):
+        """Test that prefixes run the command, typos get suggestions and the menu is published."""
+        from bot import TelegramBot
+        from command_handlers_manager import CommandHandlersManager
+        from command_handlers_registry import CommandHandlersRegistry
+        from config import BotConfig
+        from testing.fake_bot_api import FakeBotApi
+
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        manager = CommandHandlersManager(CommandHandlersRegistry(), use_entry_points=False)
+        manager.populate_bot_handlers()
+        bot = TelegramBot(fake_api.token, manager, BotConfig(base_url=fake_api.base_url, publish_commands=True))
+        try:
+            await bot.start()
+            try:
+                await fake_api.push_update(fake_api.make_command_update(1, "/pi"))
+                await fake_api.wait_for_chat_messages(1, 1)
+                await fake_api.push_update(fake_api.make_command_update(2, "/pnig"))
+                await fake_api.wait_for_chat_messages(2, 1)
+            finally:
+                await bot.stop()
+        finally:
+            await fake_api.stop()
+
+        assert fake_api.sent_by_chat[1][0].text == "I'm alive."
+        assert fake_api.sent_by_chat[2][0].text == "Unknown command /pnig. Did you mean /ping?"
+        assert {'command': 'ping', 'description': 'Check that the bot is alive'} in fake_api.bot_commands
+        assert bot.services.metrics.snapshot()["commands"]["/ping"][0] == 1
@@ -0,0 +1,173 @@
+import asyncio
+import sys
+import time
+
+import pytest
+
+from config import BotConfig
+from exec_actions import ActionRunner, ExecAction
+from tests.conftest import wait_until
+
+
+def python_action(name: str, script: str) -> ExecAction:
+    """An action running a Python script with the test's interpreter."""
+    return ExecAction(name, (sys.executable, "-c", script))
+
+
+async def collect(runner: ActionRunner, name: str):
+    """Run an action to the end, returning its chunks with the time each arrived."""
+    started = time.monotonic()
+    return [(time.monotonic() - started, chunk) async for chunk in runner.run(name)]
+
+
+def process_gone(pid: int) -> bool:
+    """Check that a process has exited, zombies awaiting their reaper included."""
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            return stat.read().rsplit(")", 1)[1].split()[0] == "Z"
+    except FileNotFoundError:
+        return True
+
+
+class TestExecAction:
+    """Test cases for ExecAction class."""
+
+    def test_parse(self):
+        """Test that command lines are split with shell quoting, and empty ones rejected."""
+        action = ExecAction.parse("restart", "systemctl restart 'my app'")
+
+        assert action.argv == ("systemctl", "restart", "my app")
+        assert action.command == "systemctl restart 'my app'"
+        with pytest.raises(ValueError):
+            ExecAction.parse("empty", "  ")
+
+    def test_config_from_env(self):
+        """Test that actions are separated by semicolons, so commands may contain commas."""
+        config = BotConfig.from_env({
+            "EXEC_ACTIONS": "disk=df -h;ps=ps -eo pid,comm", "EXEC_TIMEOUT": "5", "EXEC_MAX_CONCURRENCY": "2",
+        })
+
+        assert config.exec_actions == (("disk", "df -h"), ("ps", "ps -eo pid,comm"))
+        assert (config.exec_timeout, config.exec_max_concurrency, config.exec_action_concurrency) == (5.0, 2, 1)
+        with pytest.raises(ValueError, match="EXEC_ACTIONS"):
+            BotConfig.from_env({"EXEC_ACTIONS": "df -h"})
+
+
+class TestActionRunner:
+    """Test cases for ActionRunner class."""
+
+    @pytest.mark.asyncio
+    async def test_output_is_streamed(self):
+        """Test that output is yielded as the action writes it, not when it exits."""
+        runner = ActionRunner((python_action(
+            "slow", "import time; print('one', flush=True); time.sleep(0.5); print('two', flush=True)"),))
+
+        chunks = await collect(runner, "slow")
+
+        text = "".join(chunk for _, chunk in chunks)
+        assert text.startswith(f"$ {sys.executable} -c ")
+        assert "one\ntwo\n" in text and "[done in" in chunks[-1][1]
+        first = next(at for at, chunk in chunks[1:] if "one" in chunk)
+        second = next(at for at, chunk in chunks[1:] if "two" in chunk)
+        assert second - first > 0.3
+
+    @pytest.mark.asyncio
+    async def test_failures(self):
+        """Test that stderr is shown with a failed exit code, and a missing program is reported."""
+        runner = ActionRunner((
+            python_action("fail", "import sys; sys.stderr.write('broken\\n'); sys.exit(3)"),
+            ExecAction("missing", ("/nonexistent/program",)),
+        ))
+
+        failed = "".join(chunk for _, chunk in await collect(runner, "fail"))
+        missing = "".join(chunk for _, chunk in await collect(runner, "missing"))
+
+        assert "broken\n" in failed and "[exit code 3 after" in failed
+        assert "Cannot start missing" in missing
+        assert runner.stats().failed == 2
+        with pytest.raises(KeyError):
+            await collect(runner, "unknown")
+
+    @pytest.mark.asyncio
+    async def test_timeout_kills_the_process_group(self, tmp_path):
+        """Test that a timed out action and what it started are killed, also if it ignores SIGTERM."""
+        pid_file = tmp_path / "child.pid"
+        runner = ActionRunner((python_action("hang", "\n".join([
+            "import signal, subprocess, sys, time",
+            "signal.signal(signal.SIGTERM, signal.SIG_IGN)",
+            "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])",
+            f"open({str(pid_file)!r}, 'w').write(str(child.pid))",
+            "print('started', flush=True)",
+            "time.sleep(30)",
+        ])),), timeout=1.0, kill_grace=0.2)
+
+        chunks = await collect(runner, "hang")
+
+        assert chunks[-1][1] == "\n[killed after the 1s timeout]"
+        assert chunks[-1][0] < 3.0
+        child = int(pid_file.read_text())
+        await wait_until(lambda: process_gone(child), timeout=2.0)
+        stats = runner.stats()
+        assert (stats.timeouts, stats.running) == (1, 0)
+
+    @pytest.mark.asyncio
+    async def test_timeout_after_output_is_closed(self):
+        """Test that an action that closes its output and keeps running is still killed at the timeout."""
+        runner = ActionRunner((ExecAction.parse("quiet", "sh -c 'exec >&- 2>&-; sleep 6'"),), timeout=1.0, kill_grace=0.2)
+
+        chunks = await collect(runner, "quiet")
+
+        assert chunks[-1][1] == "\n[killed after the 1s timeout]"
+        assert chunks[-1][0] < 3.0
+        stats = runner.stats()
+        assert (stats.timeouts, stats.running) == (1, 0)
+
+    @pytest.mark.asyncio
+    async def test_output_cap(self):
+        """Test that output past the cap is discarded while the action runs to its end."""
+        runner = ActionRunner((python_action("noisy", "print('é' * 100000)"),), output_limit=1001)
+
+        text = "".join(chunk for _, chunk in await collect(runner, "noisy"))
+
+        shown = text.split("\n", 1)[1]
+        assert shown.startswith("é" * 500 + "�\n[output cut at 1001 bytes]\n")
+        assert "[done in" in text
+        assert runner.stats().truncated == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrency_limits(self):
+        """Test that a second run of a busy action waits for the first, while other actions start."""
+        sleep = "import time; time.sleep(0.3); print('done')"
+        runner = ActionRunner((python_action("a", sleep), python_action("b", sleep)), max_concurrency=2)
+
+        first = asyncio.ensure_future(collect(runner, "a"))
+        await wait_until(lambda: runner.stats().running == 1)
+        second = asyncio.ensure_future(collect(runner, "a"))
+        other = asyncio.ensure_future(collect(runner, "b"))
+        await wait_until(lambda: runner.stats().waiting == 1)
+        assert runner.stats().running == 2
+        results = await asyncio.gather(first, second, other)
+
+        assert results[1][0][1] == "Waiting for a free slot...\n"
+        assert not results[2][0][1].startswith("Waiting")
+        # The queued run started once the first one finished
+        assert results[1][-1][0] > 0.5
+        assert runner.stats().started == 3
+
+    @pytest.mark.asyncio
+    async def test_stop_kills_background_runs(self):
+        """Test that stopping the runner cancels background runs and kills their processes."""
+        runner = ActionRunner((python_action("hang", "import os, time; print(os.getpid(), flush=True); time.sleep(30)"),))
+        chunks = []
+
+        async def consume():
+            async for chunk in runner.run("hang"):
+                chunks.append(chunk)
+
+        task = runner.run_in_background(consume())
+        await wait_until(lambda: len(chunks) >= 2)
+        await runner.stop()
+
+        assert task.cancelled()
+        assert runner.stats().running == 0
+        assert process_gone(int(chunks[1]))
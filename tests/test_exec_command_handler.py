@@ -0,0 +1,96 @@
+import asyncio
+import sys
+
+import pytest
+from unittest.mock import AsyncMock, Mock
+from telegram import Chat, Message, Update, User
+
+from bot_services import BOT_SERVICES_KEY, BotServices
+from commands.exec import ExecCommandHandler
+from config import BotConfig
+from exec_actions import ActionRunner, ExecAction
+from tests.conftest import wait_until
+
+
+class TestExecCommandHandler:
+    """Test cases for ExecCommandHandler class."""
+
+    @pytest.fixture
+    def runner(self):
+        """A stand-in runner with two actions that records what it is asked to run."""
+        runner = Mock(spec=ActionRunner)
+        actions = {
+            "disk": ExecAction.parse("disk", "df -h"),
+            "restart": ExecAction.parse("restart", "systemctl restart web"),
+        }
+        runner.names.return_value = sorted(actions)
+        runner.get.side_effect = actions.get
+        runner.run_in_background.side_effect = lambda job: job.close()
+        return runner
+
+    async def run(self, runner, args, user_id=42):
+        """Send /exec with arguments and return the texts of the replies."""
+        update = Mock(spec=Update)
+        update.effective_user = Mock(spec=User, id=user_id)
+        update.effective_chat = Mock(spec=Chat, id=5, type=Chat.PRIVATE)
+        update.message = Mock(spec=Message)
+        update.message.reply_text = AsyncMock()
+        context = Mock()
+        context.args = args
+        context.bot_data = {BOT_SERVICES_KEY: BotServices(admin_user_ids=frozenset({42}), actions=runner)}
+        await ExecCommandHandler().handle(update, context)
+        return [call[0][0] for call in update.message.reply_text.call_args_list]
+
+    def test_name(self):
+        """Test that the handler answers to /exec."""
+        assert ExecCommandHandler().name() == '/exec'
+
+    @pytest.mark.asyncio
+    async def test_list_and_unknown(self, runner):
+        """Test that the actions are listed with their commands, and unknown names refused."""
+        assert await self.run(runner, []) == [
+            "Actions:\ndisk - df -h\nrestart - systemctl restart web\nRun one with /exec <name>"]
+        assert await self.run(runner, ["rm"]) == ["Unknown action 'rm'. Send /exec to list the actions."]
+
+        runner.names.return_value = []
+        assert await self.run(runner, ["disk"]) == ["No actions are configured."]
+
+    @pytest.mark.asyncio
+    async def test_runs_in_background(self, runner):
+        """Test that the action is streamed from a background task, not from the handler."""
+        assert await self.run(runner, ["disk"]) == []
+
+        runner.run_in_background.assert_called_once()
+        runner.run.assert_called_once_with("disk")
+
+    @pytest.mark.asyncio
+    async def test_ping_answered_while_an_action_runs(self):
+        """Test that a chat's /ping is answered while its /exec action is still running."""
+        from main import build_bot
+        from testing.fake_bot_api import FakeBotApi
+
+        script = "import time; print('checking', flush=True); time.sleep(1.5); print('healthy')"
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        bot = build_bot(fake_api.token, BotConfig(
+            base_url=fake_api.base_url, admin_user_ids=frozenset({1}),
+            exec_actions=(("check", f"{sys.executable} -c \"{script}\""),),
+        ))
+        try:
+            await bot.start()
+            try:
+                await fake_api.push_update(fake_api.make_command_update(1, "/exec check"))
+                await wait_until(lambda: bot.services.actions.stats().running == 1)
+                await fake_api.push_update(fake_api.make_command_update(1, "/ping"))
+                messages = await fake_api.wait_for_messages(2)
+                assert "I'm alive." in [message.text for message in messages]
+                assert bot.services.actions.stats().running == 1
+
+                await wait_until(lambda: any("[done in" in message.text for message in fake_api.edited_messages))
+            finally:
+                await bot.stop()
+        finally:
+            await fake_api.stop()
+
+        final = fake_api.edited_messages[-1].text
+        assert "checking\nhealthy" in final
@@ -0,0 +1,177 @@
+import asyncio
+import pickle
+import threading
+import time
+
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, Mock
+
+from bot_services import BOT_SERVICES_KEY, BotServices
+from command_router import CommandRouter
+from commands.icommand_handler import ICommandHandler
+from executor_offload import CommandRequest, ExecutionPolicy, HandlerExecutor
+from update_scheduler import ChatUpdateScheduler
+from tests.conftest import make_update
+
+
+def square_reply(request):
+    """Module-level function so the process pool can pickle it."""
+    return str(int(request.args[0]) ** 2)
+
+
+class CpuHeavyCommandHandler(ICommandHandler):
+    """Burns CPU for a while in a worker process."""
+
+    async def handle(self, update, context):
+        raise AssertionError("CPU-heavy work must not run on the event loop")
+
+    def name(self):
+        return '/crunch'
+
+    def execution_policy(self):
+        return ExecutionPolicy("process", timeout=10)
+
+    def run_blocking(self, request):
+        deadline = time.perf_counter() + 0.5
+        iterations = 0
+        while time.perf_counter() < deadline:
+            iterations += 1
+        return f"crunched {iterations}"
+
+
+class TestExecutionPolicy:
+    """Test cases for ExecutionPolicy class."""
+
+    def test_rejects_invalid_policy(self):
+        """Test that unknown modes and non-positive limits are rejected."""
+        with pytest.raises(ValueError):
+            ExecutionPolicy("gpu")
+        with pytest.raises(ValueError):
+            ExecutionPolicy("thread", max_concurrency=0)
+        with pytest.raises(ValueError):
+            ExecutionPolicy("thread", timeout=0)
+
+
+class TestCommandRequest:
+    """Test cases for CommandRequest class."""
+
+    def test_from_update_is_picklable(self):
+        """Test that the request summarizes the update and survives pickling."""
+        update = make_update('/report daily now')
+
+        request = CommandRequest.from_update('/report', update, ['daily', 'now'])
+
+        assert pickle.loads(pickle.dumps(request)) == request
+        assert (request.args, request.chat_id, request.text) == (('daily', 'now'), 1, '/report daily now')
+
+
+class TestHandlerExecutor:
+    """Test cases for HandlerExecutor class."""
+
+    @pytest_asyncio.fixture
+    async def executor(self):
+        executor = HandlerExecutor(thread_workers=4, process_workers=1)
+        yield executor
+        await executor.stop()
+
+    @pytest.mark.asyncio
+    async def test_thread_pool_runs_off_loop(self, executor):
+        """Test that thread work runs on a worker thread."""
+        loop_thread = threading.get_ident()
+
+        result = await executor.run(
+            '/t', lambda request: str(threading.get_ident() != loop_thread), CommandRequest('/t'),
+            ExecutionPolicy("thread")
+        )
+
+        assert result == "True"
+
+    @pytest.mark.asyncio
+    async def test_process_pool(self, executor):
+        """Test that process work gets the request and returns the reply."""
+        result = await executor.run('/sq', square_reply, CommandRequest('/sq', ('12',)), ExecutionPolicy("process"))
+        assert result == "144"
+
+    @pytest.mark.asyncio
+    async def test_per_command_concurrency_cap(self, executor):
+        """Test that a command never runs more often at once than its cap."""
+        active, peak = 0, 0
+        lock = threading.Lock()
+
+        def work(request):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+            return "done"
+
+        policy = ExecutionPolicy("thread", max_concurrency=2)
+        await asyncio.gather(*(executor.run('/slow', work, CommandRequest('/slow'), policy) for _ in range(6)))
+
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_timeout_keeps_slot_until_done(self, executor):
+        """Test that a timed-out call still counts as running until the worker finishes."""
+        release = threading.Event()
+        policy = ExecutionPolicy("thread", max_concurrency=1, timeout=0.05)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await executor.run('/hang', lambda request: release.wait(), CommandRequest('/hang'), policy)
+
+        assert executor.running("thread") == 1
+        assert executor.timeouts == 1
+        release.set()
+        await asyncio.sleep(0.05)
+        assert executor.running("thread") == 0
+
+
+class TestRouterOffload:
+    """Test cases for offloaded handlers dispatched by CommandRouter."""
+
+    @pytest.mark.asyncio
+    async def test_ping_latency_stays_flat_during_cpu_heavy_command(self):
+        """Test that /ping keeps answering quickly while a CPU-heavy command runs."""
+        ping_latencies = []
+        ping_handler = Mock()
+        ping_handler.execution_policy = Mock(return_value=None)
+        ping_handler.cache_policy = Mock(return_value=None)
+        ping_handler.stream_policy = Mock(return_value=None)
+
+        handlers = {'/ping': ping_handler, '/crunch': CpuHeavyCommandHandler()}
+        executor = HandlerExecutor(process_workers=1)
+        scheduler = ChatUpdateScheduler()
+        router = CommandRouter(handlers.get, scheduler=scheduler, executor=executor)
+        outbound = Mock(send_text=AsyncMock())
+        context = Mock(bot_data={BOT_SERVICES_KEY: BotServices(outbound=outbound)})
+
+        async def dispatch(text, chat_id, update_id):
+            update = make_update(text, update_id)
+            update.message.chat._unfreeze()
+            update.message.chat.id = chat_id
+            await router.handle_update(update, Mock(), router.check_update(update), context)
+
+        try:
+            # Start the worker process up front, forking is not what is measured here
+            await executor.run('/sq', square_reply, CommandRequest('/sq', ('2',)), ExecutionPolicy("process"))
+            await dispatch('/crunch', 1, 1)
+            for update_id in range(2, 22):
+                started = time.perf_counter()
+                ping_handler.handle = AsyncMock(
+                    side_effect=lambda update, context, started=started:
+                        ping_latencies.append(time.perf_counter() - started)
+                )
+                await dispatch('/ping', 2, update_id)
+                await asyncio.sleep(0.02)
+            await scheduler.join()
+        finally:
+            await executor.stop()
+
+        assert len(ping_latencies) == 20
+        # Running /crunch inline would hold every ping for at least 0.5 s
+        assert max(ping_latencies) < 0.25
+        assert outbound.send_text.await_args_list[0].args[1].startswith("crunched")
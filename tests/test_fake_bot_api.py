@@ -0,0 +1,130 @@
+import asyncio
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from testing.fake_bot_api import FakeBotApi
+
+
+class TestFakeBotApi:
+    """Test cases for the offline FakeBotApi."""
+
+    @pytest_asyncio.fixture
+    async def fake_api(self):
+        """Start a fake Bot API."""
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        yield fake_api
+        await fake_api.stop()
+
+    @pytest_asyncio.fixture
+    async def client(self):
+        """Create an HTTP client."""
+        async with httpx.AsyncClient() as client:
+            yield client
+
+    def url(self, fake_api, method):
+        return f"{fake_api.base_url}{fake_api.token}/{method}"
+
+    @pytest.mark.asyncio
+    async def test_get_me(self, fake_api, client):
+        """Test that getMe describes the bot."""
+        response = await client.post(self.url(fake_api, "getMe"))
+        assert response.json()["result"]["username"] == fake_api.bot_username
+
+    @pytest.mark.asyncio
+    async def test_wrong_token(self, fake_api, client):
+        """Test that calls with another token are not found."""
+        response = await client.post(f"{fake_api.base_url}999:OTHER/getMe")
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_get_updates_confirms_with_offset(self, fake_api, client):
+        """Test that getUpdates drops updates below the offset."""
+        first = fake_api.make_command_update(1, "/ping")
+        second = fake_api.make_command_update(1, "/ping")
+        await fake_api.push_update(first)
+        await fake_api.push_update(second)
+
+        all_updates = (await client.post(self.url(fake_api, "getUpdates"))).json()["result"]
+        remaining = (await client.post(
+            self.url(fake_api, "getUpdates"), data={"offset": str(second["update_id"])}
+        )).json()["result"]
+
+        assert [u["update_id"] for u in all_updates] == [first["update_id"], second["update_id"]]
+        assert [u["update_id"] for u in remaining] == [second["update_id"]]
+
+    @pytest.mark.asyncio
+    async def test_get_updates_long_polls(self, fake_api, client):
+        """Test that getUpdates waits for an update to arrive."""
+        request = asyncio.create_task(client.post(self.url(fake_api, "getUpdates"), data={"timeout": "5"}))
+        await asyncio.sleep(0.05)
+        assert not request.done()
+
+        await fake_api.push_update(fake_api.make_command_update(1, "/ping"))
+        response = await asyncio.wait_for(request, 1)
+
+        assert len(response.json()["result"]) == 1
+
+    @pytest.mark.asyncio
+    async def test_send_message_is_recorded(self, fake_api, client):
+        """Test that sendMessage calls are recorded per chat."""
+        await client.post(self.url(fake_api, "sendMessage"), data={"chat_id": "7", "text": "42"})
+
+        messages = await fake_api.wait_for_chat_messages(7, 1)
+
+        assert messages[0].text == "42"
+        assert fake_api.calls["sendMessage"] == 1
+
+    @pytest.mark.asyncio
+    async def test_wait_for_chat_messages_times_out(self, fake_api):
+        """Test that waiting for a silent chat times out."""
+        with pytest.raises(asyncio.TimeoutError):
+            await fake_api.wait_for_chat_messages(7, 1, timeout=0.05)
+
+    @pytest.mark.asyncio
+    async def test_injected_error(self, fake_api, client):
+        """Test that injected errors are returned once."""
+        fake_api.inject_error("sendMessage", 429, retry_after=3)
+
+        failed = await client.post(self.url(fake_api, "sendMessage"), data={"chat_id": "1", "text": "x"})
+        succeeded = await client.post(self.url(fake_api, "sendMessage"), data={"chat_id": "1", "text": "x"})
+
+        assert failed.status_code == 429
+        assert failed.json()["parameters"] == {"retry_after": 3}
+        assert succeeded.json()["ok"]
+
+    def test_make_command_update_adds_entity(self, fake_api):
+        """Test that command updates carry a bot_command entity."""
+        update = fake_api.make_command_update(3, "/history cpu 5m")
+        entity = update["message"]["entities"][0]
+        assert entity == {"type": "bot_command", "offset": 0, "length": len("/history")}
+
+    @pytest.mark.asyncio
+    async def test_set_my_commands_is_recorded(self, fake_api, client):
+        """Test that setMyCommands replaces the recorded command menu."""
+        commands = '[{"command": "ping", "description": "Check"}]'
+        response = await client.post(self.url(fake_api, "setMyCommands"), data={"commands": commands})
+
+        assert response.json()["result"] is True
+        assert fake_api.bot_commands == [{"command": "ping", "description": "Check"}]
+
+    @pytest.mark.asyncio
+    async def test_edit_message_text(self, fake_api, client):
+        """Test that edits are recorded and unchanged or unknown messages are rejected."""
+        sent = await client.post(self.url(fake_api, "sendMessage"), data={"chat_id": "7", "text": "a"})
+        message_id = str(sent.json()["result"]["message_id"])
+        edit = lambda text, message_id=message_id: client.post(
+            self.url(fake_api, "editMessageText"), data={"chat_id": "7", "message_id": message_id, "text": text}
+        )
+
+        edited = await edit("ab")
+        unchanged = await edit("ab")
+        missing = await edit("x", message_id="999")
+
+        assert edited.json()["result"]["text"] == "ab"
+        assert "not modified" in unchanged.json()["description"]
+        assert missing.status_code == 400
+        assert [m.text for m in fake_api.edited_messages] == ["ab"]
+        assert fake_api.message_texts[(7, int(message_id))] == "ab"
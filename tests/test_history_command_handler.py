@@ -0,0 +1,58 @@
+import pytest
+from unittest.mock import Mock
+
+from bot_services import BOT_SERVICES_KEY, BotServices
+from commands.history import HistoryCommandHandler
+from host_metrics import HostMetricsSampler
+
+
+class TestHistoryCommandHandler:
+    """Test cases for HistoryCommandHandler class."""
+
+    @pytest.fixture
+    def sampler(self):
+        """Create a sampler holding ten CPU samples."""
+        clock = Mock(return_value=100.0)
+        sampler = HostMetricsSampler(interval=1, retention=60, clock=clock)
+        for value in range(1, 11):
+            sampler._buffers["cpu"].append(90.0 + value, float(value))
+        return sampler
+
+    def make_context(self, sampler, *args):
+        context = Mock()
+        context.args = list(args)
+        context.bot_data = {BOT_SERVICES_KEY: BotServices(host_metrics=sampler)}
+        return context
+
+    def test_name_and_cache_policy(self):
+        """Test that /history is cached per arguments."""
+        handler = HistoryCommandHandler()
+        assert handler.name() == '/history'
+        assert handler.cache_policy().scope == "args"
+
+    @pytest.mark.asyncio
+    async def test_render_summary(self, sampler):
+        """Test that aggregates are computed over the requested window."""
+        text = await HistoryCommandHandler().render(Mock(), self.make_context(sampler, "CPU", "5s"))
+
+        assert "cpu over the last 5s, 6 samples" in text
+        assert "min 5.0%, avg 7.5%, max 10.0%" in text
+
+    @pytest.mark.asyncio
+    async def test_window_beyond_retention(self, sampler):
+        """Test that asking for more history than kept is pointed out."""
+        text = await HistoryCommandHandler().render(Mock(), self.make_context(sampler, "cpu", "2h"))
+        assert "history is kept for 60s" in text
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("args", [(), ("cpu",), ("gpu", "5m"), ("cpu", "soon")])
+    async def test_usage(self, sampler, args):
+        """Test that bad arguments get the usage message."""
+        text = await HistoryCommandHandler().render(Mock(), self.make_context(sampler, *args))
+        assert "Usage: /history" in text
+
+    @pytest.mark.asyncio
+    async def test_no_samples(self, sampler):
+        """Test the reply for a metric without samples."""
+        text = await HistoryCommandHandler().render(Mock(), self.make_context(sampler, "disk", "5m"))
+        assert text == "No disk samples in the last 5m."
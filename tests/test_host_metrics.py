@@ -0,0 +1,138 @@
+import random
+
+import pytest
+
+from host_metrics import SKETCH_ACCURACY, HostMetricsSampler, RingBuffer, parse_window, summarize
+
+
+def write_proc(root, cpu_total_busy, cpu_idle, received, sent, available_kb=2048):
+    """Write the /proc files the sampler reads."""
+    (root / "net").mkdir(exist_ok=True)
+    (root / "stat").write_text(f"cpu  {cpu_total_busy} 0 0 {cpu_idle} 0 0 0 0 0 0\ncpu0 1 2 3 4\n")
+    (root / "meminfo").write_text(f"MemTotal:       8192 kB\nMemFree: 1 kB\nMemAvailable:   {available_kb} kB\n")
+    (root / "loadavg").write_text("0.50 0.40 0.30 1/100 12345\n")
+    (root / "net" / "dev").write_text(
+        "Inter-|   Receive\n"
+        " face |bytes    packets\n"
+        f"    lo: 999999 1 0 0 0 0 0 0 999999 1 0 0 0 0 0 0\n"
+        f"  eth0: {received} 1 0 0 0 0 0 0 {sent} 1 0 0 0 0 0 0\n"
+    )
+
+
+class TestParseWindow:
+    """Test cases for the parse_window function."""
+
+    @pytest.mark.parametrize("text, seconds", [("30s", 30), ("5m", 300), ("1h", 3600), ("2d", 172800), ("90", 90)])
+    def test_units(self, text, seconds):
+        """Test that unit suffixes are applied."""
+        assert parse_window(text) == seconds
+
+    @pytest.mark.parametrize("text", ["", "m", "-5m", "abc", "0s", "infh"])
+    def test_invalid(self, text):
+        """Test that malformed or non-positive windows are rejected."""
+        with pytest.raises(ValueError):
+            parse_window(text)
+
+
+class TestRingBuffer:
+    """Test cases for RingBuffer class."""
+
+    def test_overwrites_oldest(self):
+        """Test that a full buffer keeps only the newest samples."""
+        buffer = RingBuffer(3)
+        for second in range(5):
+            buffer.append(second, second * 10)
+
+        assert len(buffer) == 3
+        assert buffer.values_since(0) == [20, 30, 40]
+        assert buffer.latest() == (4, 40)
+
+    def test_values_since(self):
+        """Test that only samples inside the window are returned."""
+        buffer = RingBuffer(10)
+        for second in range(5):
+            buffer.append(second, second)
+
+        assert buffer.values_since(3) == [3, 4]
+        assert RingBuffer(2).values_since(0) == []
+
+    def test_summary_matches_the_samples(self):
+        """Test that block aggregates match the window exactly, percentiles within the sketch accuracy."""
+        generator = random.Random(7)
+        buffer = RingBuffer(100)
+        for second in range(1, 251):
+            buffer.append(second, generator.uniform(0, 100) if second % 7 else 0.0)
+
+        for since in (0, 151, 163, 200, 236, 250):
+            values = buffer.values_since(since)
+            summary, exact = buffer.summary_since(since), summarize(values)
+            assert (summary.samples, summary.latest, summary.minimum, summary.maximum) == (
+                exact.samples, exact.latest, exact.minimum, exact.maximum)
+            assert summary.average == pytest.approx(exact.average)
+            for estimate, value in ((summary.p50, exact.p50), (summary.p95, exact.p95)):
+                assert estimate == pytest.approx(value, rel=SKETCH_ACCURACY, abs=1e-9)
+        assert buffer.summary_since(251) is None
+        assert RingBuffer(2).summary_since(0) is None
+
+
+class TestSummarize:
+    """Test cases for the summarize function."""
+
+    def test_aggregates(self):
+        """Test min, average, max and percentiles."""
+        summary = summarize([float(value) for value in range(1, 101)])
+
+        assert (summary.minimum, summary.maximum, summary.average) == (1, 100, 50.5)
+        assert (summary.p50, summary.p95, summary.latest, summary.samples) == (50, 95, 100, 100)
+        assert summarize([]) is None
+
+
+class TestHostMetricsSampler:
+    """Test cases for HostMetricsSampler class."""
+
+    def test_samples_proc_files(self, tmp_path, clock):
+        """Test that CPU and network rates are computed from consecutive readings."""
+        sampler = HostMetricsSampler(interval=5, retention=60, proc_root=str(tmp_path), clock=clock)
+        write_proc(tmp_path, cpu_total_busy=100, cpu_idle=100, received=1000, sent=500)
+        sampler.sample()
+        clock.now += 5
+        write_proc(tmp_path, cpu_total_busy=175, cpu_idle=125, received=6000, sent=1500)
+        sampler.sample()
+
+        assert sampler.latest("cpu") == pytest.approx(75.0)
+        assert sampler.latest("memory") == pytest.approx(75.0)
+        assert sampler.latest("load") == pytest.approx(0.5)
+        assert sampler.latest("net_rx") == pytest.approx(1000.0)
+        assert sampler.latest("net_tx") == pytest.approx(200.0)
+        assert 0 <= sampler.latest("disk") <= 100
+
+    def test_memory_is_bounded(self, tmp_path, clock):
+        """Test that history never grows beyond the retention."""
+        sampler = HostMetricsSampler(interval=1, retention=10, proc_root=str(tmp_path), clock=clock)
+        write_proc(tmp_path, 1, 1, 1, 1)
+        for _ in range(100):
+            clock.now += 1
+            sampler.sample()
+
+        assert sampler.summary("memory", 1e9).samples == 10
+        assert sampler.retention == 10
+
+    def test_missing_proc_is_skipped(self, tmp_path, clock):
+        """Test that metrics the host cannot provide are left empty."""
+        sampler = HostMetricsSampler(proc_root=str(tmp_path / "missing"), clock=clock)
+        sampler.sample()
+
+        assert sampler.latest("cpu") is None
+        assert sampler.summary("memory", 60) is None
+        assert sampler.latest("disk") is not None
+
+    @pytest.mark.asyncio
+    async def test_start_takes_first_sample(self, tmp_path, clock):
+        """Test that starting samples right away and stopping cancels the task."""
+        write_proc(tmp_path, 1, 1, 1, 1)
+        sampler = HostMetricsSampler(interval=60, proc_root=str(tmp_path), clock=clock)
+
+        await sampler.start()
+        await sampler.stop()
+
+        assert sampler.latest("memory") is not None
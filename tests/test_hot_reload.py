@@ -0,0 +1,133 @@
+import json
+import os
+import sys
+import textwrap
+
+import pytest
+from unittest.mock import Mock
+
+from command_handlers_manager import CommandHandlersManager
+from command_handlers_registry import CommandHandlersRegistry
+
+
+HANDLER_SOURCE = """
+from commands.icommand_handler import ICommandHandler
+
+class {class_name}(ICommandHandler):
+    async def handle(self, update, context):
+        update.replies.append({reply!r})
+
+    def name(self):
+        return {command!r}
+"""
+
+
+class TestHotReload:
+    """Test cases for reloading command handlers with CommandHandlersManager."""
+
+    @pytest.fixture
+    def plugins(self, tmp_path, monkeypatch):
+        """Create an importable package of handlers and a manifest declaring them."""
+        package = tmp_path / "hot_reload_plugins"
+        package.mkdir()
+        (package / "__init__.py").write_text("")
+        monkeypatch.syspath_prepend(str(tmp_path))
+        yield package
+        for module in [m for m in sys.modules if m.startswith("hot_reload_plugins")]:
+            del sys.modules[module]
+
+    def write_handler(self, package, module, command, reply):
+        """Write a handler module and move its modification time forward."""
+        path = package / f"{module}.py"
+        class_name = module.capitalize() + "CommandHandler"
+        path.write_text(textwrap.dedent(HANDLER_SOURCE.format(class_name=class_name, command=command, reply=reply)))
+        # Past any earlier write, so both the staleness check and the bytecode cache notice
+        stamp = os.stat(path).st_mtime + (10 if module in self.written else 0)
+        self.written.add(module)
+        os.utime(path, (stamp, stamp))
+
+    def write_manifest(self, package, commands):
+        """Write a manifest declaring the given (command, module) pairs."""
+        manifest = package / "manifest.json"
+        manifest.write_text(json.dumps({"commands": [
+            {"name": command, "module": f"hot_reload_plugins.{module}", "class": module.capitalize() + "CommandHandler"}
+            for command, module in commands
+        ]}))
+        return str(manifest)
+
+    @pytest.fixture
+    def manager(self, plugins):
+        """Create a populated manager over a real registry with /one and /two."""
+        self.written = set()
+        self.write_handler(plugins, "one", "/one", "one v1")
+        self.write_handler(plugins, "two", "/two", "two v1")
+        manifest = self.write_manifest(plugins, [("/one", "one"), ("/two", "two")])
+        manager = CommandHandlersManager(CommandHandlersRegistry(), manifest, use_entry_points=False)
+        manager.populate_bot_handlers()
+        return manager
+
+    async def reply_of(self, handler):
+        """Run a handler and return what it replied."""
+        update = Mock(replies=[])
+        await handler.handle(update, Mock())
+        return update.replies[0]
+
+    @pytest.mark.asyncio
+    async def test_changed_module_is_reloaded(self, manager, plugins):
+        """Test that a changed handler is swapped in while the old instance keeps working."""
+        old = manager.get_handler('/one')
+        assert await self.reply_of(old) == "one v1"
+        self.write_handler(plugins, "one", "/one", "one v2")
+
+        report = manager.reload_bot_handlers()
+
+        assert report.reloaded == ['/one']
+        assert report.added == [] and report.removed == []
+        new = manager.get_handler('/one')
+        assert new is not old
+        assert await self.reply_of(new) == "one v2"
+        assert await self.reply_of(old) == "one v1"
+
+    @pytest.mark.asyncio
+    async def test_unchanged_handlers_are_kept(self, manager):
+        """Test that handlers whose module did not change keep their proxy."""
+        one = manager.get_handler('/one')
+        await self.reply_of(one)
+        two = manager.get_handler('/two')
+
+        report = manager.reload_bot_handlers()
+
+        assert report.unchanged == 2
+        assert report.reloaded == []
+        assert manager.get_handler('/one') is one
+        assert manager.get_handler('/two') is two
+
+    @pytest.mark.asyncio
+    async def test_manifest_changes_add_and_remove(self, manager, plugins):
+        """Test that commands added to or dropped from the manifest are reported."""
+        self.write_handler(plugins, "three", "/three", "three v1")
+        self.write_manifest(plugins, [("/one", "one"), ("/three", "three")])
+
+        report = manager.reload_bot_handlers()
+
+        assert report.added == ['/three']
+        assert report.removed == ['/two']
+        assert manager.get_handler('/two') is None
+        assert await self.reply_of(manager.get_handler('/three')) == "three v1"
+        assert report.swap_seconds >= 0 and report.build_seconds >= 0
+
+    @pytest.mark.asyncio
+    async def test_import_error_keeps_old_handlers(self, manager, plugins):
+        """Test that a handler that fails to re-import leaves the registry unchanged."""
+        old = manager.get_handler('/one')
+        await self.reply_of(old)
+        self.write_handler(plugins, "one", "/one", "one v2")
+        (plugins / "one.py").write_text((plugins / "one.py").read_text() + "\ndef broken(:\n")
+        stamp = os.stat(plugins / "one.py").st_mtime + 10
+        os.utime(plugins / "one.py", (stamp, stamp))
+
+        with pytest.raises(SyntaxError):
+            manager.reload_bot_handlers()
+
+        assert manager.get_handler('/one') is old
+        assert await self.reply_of(old) == "one v1"
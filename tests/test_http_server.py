@@ -0,0 +1,79 @@
+import asyncio
+import logging
+
+import pytest
+import pytest_asyncio
+
+from http_server import HttpResponse, HttpServer, _BadRequest
+
+
+async def exchange(server: HttpServer, raw: bytes) -> bytes:
+    """Send raw bytes to the server and read until it closes the connection."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    writer.write(raw)
+    await writer.drain()
+    response = await asyncio.wait_for(reader.read(), 5)
+    writer.close()
+    return response
+
+
+class TestHttpServer:
+    """Test cases for HttpServer class."""
+
+    @pytest_asyncio.fixture
+    async def server(self):
+        """Start a server that echoes request bodies, failing on /fail."""
+        async def handle(request):
+            if request.path == "/fail":
+                raise RuntimeError("secret detail")
+            return HttpResponse(body=request.body)
+
+        server = HttpServer(handle)
+        await server.start()
+        yield server
+        await server.stop()
+
+    @pytest.mark.asyncio
+    async def test_chunked_body(self, server):
+        """Test that a chunked body is reassembled."""
+        response = await exchange(server, (
+            b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n"
+            b"3\r\nabc\r\n2;ext=1\r\nde\r\n0\r\n\r\n"
+        ))
+
+        assert response.startswith(b"HTTP/1.1 200") and response.endswith(b"\r\n\r\nabcde")
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("head, body", [
+        (b"Content-Length: abc\r\n", b""),
+        (b"Content-Length: -5\r\n", b""),
+        (b"Transfer-Encoding: chunked\r\n", b"zz\r\nabc\r\n0\r\n\r\n"),
+        (b"Transfer-Encoding: chunked\r\n", b"-3\r\nabc\r\n0\r\n\r\n"),
+    ], ids=["non-numeric length", "negative length", "bad chunk size", "negative chunk size"])
+    async def test_malformed_bodies_get_400(self, server, head, body):
+        """Test that invalid lengths and chunk lines are answered with 400 instead of dropping the connection."""
+        response = await exchange(server, b"POST / HTTP/1.1\r\n" + head + b"\r\n" + body)
+
+        assert response.startswith(b"HTTP/1.1 400")
+
+    @pytest.mark.asyncio
+    async def test_overlong_chunk_line(self):
+        """Test that a chunk-size line longer than the stream limit is a bad request."""
+        reader = asyncio.StreamReader(limit=64)
+        reader.feed_data(b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n" + b"1" * 200 + b"\r\n")
+        reader.feed_eof()
+
+        with pytest.raises(_BadRequest) as error:
+            await HttpServer(None)._read_request(reader)
+        assert error.value.status == 400
+
+    @pytest.mark.asyncio
+    async def test_handler_errors_are_not_disclosed(self, server, caplog):
+        """Test that a failing handler gets a generic 500 and its error is logged."""
+        with caplog.at_level(logging.ERROR):
+            response = await exchange(server, b"GET /fail HTTP/1.1\r\nConnection: close\r\n\r\n")
+
+        assert response.startswith(b"HTTP/1.1 500")
+        assert b"secret detail" not in response
+        assert response.endswith(b"Internal server error")
+        assert "secret detail" in caplog.text
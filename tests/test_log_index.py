@@ -0,0 +1,185 @@
+import os
+import re
+import time
+
+import pytest
+
+from log_index import LogFiles, LogIndex, parse_line_time
+
+
+BASE = time.mktime((2024, 5, 1, 12, 0, 0, 0, 0, -1))
+
+
+def log_lines(count, start=0, step=1.0):
+    """Build timestamped log lines, one per ``step`` seconds from BASE."""
+    lines = []
+    for number in range(start, start + count):
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(BASE + number * step))
+        lines.append(f"{stamp} INFO request {number} handled\n")
+    return "".join(lines)
+
+
+def numbers(page):
+    """Get the request numbers of the lines of a page."""
+    return [int(line.split()[4]) for line in page.lines]
+
+
+class TestParseLineTime:
+    """Test cases for the parse_line_time function."""
+
+    @pytest.mark.parametrize("line", [
+        b"2024-05-01 12:00:00 INFO up",
+        b"2024-05-01T12:00:00.123Z INFO up",
+        b"[2024-05-01 12:00:00] INFO up",
+    ])
+    def test_formats(self, line):
+        """Test that common ISO-like timestamps at the line start are read."""
+        assert parse_line_time(line) == BASE
+
+    @pytest.mark.parametrize("line", [b"", b"INFO 2024-05-01 12:00:00", b"  at Traceback"])
+    def test_no_timestamp(self, line):
+        """Test that lines without a leading timestamp give None."""
+        assert parse_line_time(line) is None
+
+
+class TestLogIndex:
+    """Test cases for the LogIndex class."""
+
+    @pytest.fixture
+    def log_path(self, tmp_path):
+        """Path of a log file with 1000 timestamped lines."""
+        path = tmp_path / "app.log"
+        path.write_text(log_lines(1000))
+        return path
+
+    def test_tail(self, log_path):
+        """Test that the last lines are returned oldest first."""
+        page = LogIndex(str(log_path), checkpoint_bytes=4096).tail(3)
+
+        assert numbers(page) == [997, 998, 999]
+        assert page.end == page.size == os.path.getsize(log_path)
+
+    def test_tail_short_and_empty_files(self, tmp_path):
+        """Test that tailing more lines than exist, or an empty file, works."""
+        path = tmp_path / "short.log"
+        path.write_text("one\ntwo")
+        assert LogIndex(str(path)).tail(10).lines == ["one", "two"]
+        path.write_text("")
+        assert LogIndex(str(path)).tail(10).lines == []
+
+    def test_checkpoints_are_sparse(self, log_path):
+        """Test that one checkpoint is kept per checkpoint interval."""
+        index = LogIndex(str(log_path), checkpoint_bytes=4096)
+        size = index.refresh()
+
+        assert index.checkpoints == -(-size // 4096)
+
+    @pytest.mark.parametrize("checkpoint_bytes", [4096, 1 << 20])
+    def test_seek_time(self, log_path, checkpoint_bytes):
+        """Test that seeking starts at the first line at or after the time."""
+        index = LogIndex(str(log_path), checkpoint_bytes=checkpoint_bytes)
+
+        page = index.seek_time(BASE + 500.5, 2)
+
+        assert numbers(page) == [501, 502]
+        assert numbers(index.seek_time(BASE - 10, 1))[0] == 0
+        assert index.seek_time(BASE + 5000, 1).lines == []
+
+    def test_seek_time_skips_continuation_lines(self, tmp_path):
+        """Test that lines without a timestamp stay with the line before them."""
+        path = tmp_path / "trace.log"
+        path.write_text("".join(
+            log_lines(1, start=number) + "Traceback (most recent call last):\n  File x\n" for number in range(300)
+        ))
+        index = LogIndex(str(path), checkpoint_bytes=1 << 20)
+
+        page = index.seek_time(BASE + 150, 3)
+
+        assert page.lines[0].endswith("request 150 handled")
+        assert page.lines[1:] == ["Traceback (most recent call last):", "  File x"]
+
+    def test_read_from_continues_a_page(self, log_path):
+        """Test that reading from a page's end returns the following lines."""
+        index = LogIndex(str(log_path), checkpoint_bytes=4096)
+        first = index.seek_time(BASE + 10, 5)
+
+        second = index.read_from(first.end, 5)
+
+        assert numbers(second) == [15, 16, 17, 18, 19]
+        # Offsets inside a line move on to the next line
+        assert numbers(index.read_from(first.end + 3, 1))[0] == 16
+
+    def test_grep(self, log_path):
+        """Test that the last matching lines are returned oldest first."""
+        index = LogIndex(str(log_path), checkpoint_bytes=4096)
+
+        page = index.grep(re.compile(rb"request 9\d\d "), 3, 1 << 30)
+
+        assert numbers(page) == [997, 998, 999]
+        assert not page.truncated
+
+    def test_grep_across_blocks_and_budget(self, log_path, monkeypatch):
+        """Test that grep walks back block by block and stops at its byte budget."""
+        monkeypatch.setattr("log_index._GREP_BLOCK", 1000)
+        index = LogIndex(str(log_path))
+
+        page = index.grep(re.compile(rb"request \d*7 "), 50, 1 << 30)
+        assert numbers(page) == list(range(507, 1000, 10))
+
+        page = index.grep(re.compile(rb"request 1 "), 1, 5000)
+        assert page.lines == []
+        assert page.truncated
+
+    def test_growth_is_indexed_incrementally(self, log_path):
+        """Test that appended lines become visible and extend the index."""
+        index = LogIndex(str(log_path), checkpoint_bytes=4096)
+        index.refresh()
+        checkpoints = index.checkpoints
+
+        with open(log_path, "a") as file:
+            file.write(log_lines(1000, start=1000))
+
+        assert numbers(index.tail(1))[0] == 1999
+        assert index.checkpoints > checkpoints
+        assert numbers(index.seek_time(BASE + 1500, 1))[0] == 1500
+        assert index.rotations == 0
+
+    def test_rotation_by_rename(self, log_path):
+        """Test that a file replaced under the same path is indexed from scratch."""
+        index = LogIndex(str(log_path), checkpoint_bytes=4096)
+        index.refresh()
+
+        os.rename(log_path, str(log_path) + ".1")
+        log_path.write_text(log_lines(5, start=5000))
+
+        assert numbers(index.tail(10)) == [5000, 5001, 5002, 5003, 5004]
+        assert index.rotations == 1
+
+    def test_rotation_by_truncation(self, log_path):
+        """Test that a file truncated in place is indexed from scratch."""
+        index = LogIndex(str(log_path), checkpoint_bytes=4096)
+        index.refresh()
+
+        with open(log_path, "w") as file:
+            file.write(log_lines(2, start=7000))
+
+        assert numbers(index.tail(10)) == [7000, 7001]
+        assert index.rotations == 1
+
+    def test_missing_file(self, tmp_path):
+        """Test that a file that never existed raises."""
+        with pytest.raises(FileNotFoundError):
+            LogIndex(str(tmp_path / "nope.log")).tail(1)
+
+
+class TestLogFiles:
+    """Test cases for the LogFiles class."""
+
+    def test_indexes_are_created_once(self, tmp_path):
+        """Test that names map to one shared index and unknown names to None."""
+        files = LogFiles({"app": str(tmp_path / "app.log")})
+
+        assert files.names() == ["app"]
+        assert files.get("app") is files.get("app")
+        assert files.get("other") is None
+        files.close()
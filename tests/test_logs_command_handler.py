@@ -0,0 +1,162 @@
+import time
+
+import pytest
+from unittest.mock import AsyncMock, Mock
+from telegram import Message, Update, User
+
+from bot_services import BOT_SERVICES_KEY, BotServices
+from commands.logs import LogsCommandHandler, parse_time
+from executor_offload import HandlerExecutor
+from log_index import LogFiles
+
+
+BASE = time.mktime((2024, 5, 1, 12, 0, 0, 0, 0, -1))
+
+
+class TestParseTime:
+    """Test cases for the parse_time function."""
+
+    def test_timestamps_and_windows(self):
+        """Test that timestamps, dates and windows before now are accepted."""
+        assert parse_time("2024-05-01T12:00:00") == BASE
+        assert parse_time("2024-05-01") == BASE - 12 * 3600
+        assert parse_time("15m", now=BASE) == BASE - 900
+        assert parse_time("15m ago", now=BASE) == BASE - 900
+
+    def test_invalid(self):
+        """Test that anything else is rejected."""
+        with pytest.raises(ValueError):
+            parse_time("yesterday")
+        with pytest.raises(ValueError):
+            parse_time("2024-05-01 ago")
+
+
+class TestLogsCommandHandler:
+    """Test cases for LogsCommandHandler class."""
+
+    @pytest.fixture
+    def log_files(self, tmp_path):
+        """Configured log files, one with 2000 timestamped lines."""
+        path = tmp_path / "app.log"
+        path.write_text("".join(
+            f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(BASE + number))} INFO line {number}\n"
+            for number in range(2000)
+        ))
+        files = LogFiles({"app": str(path), "gone": str(tmp_path / "missing.log")}, checkpoint_bytes=4096)
+        yield files
+        files.close()
+
+    def make_update(self, user_id=42):
+        """Create a mock update sent by the given user."""
+        update = Mock(spec=Update)
+        update.effective_user = Mock(spec=User, id=user_id)
+        update.effective_chat = None
+        update.effective_message = None
+        update.message = Mock(spec=Message)
+        update.message.reply_text = AsyncMock()
+        return update
+
+    def make_context(self, log_files, args, executor=None):
+        """Create a context carrying bot services with the given log files."""
+        context = Mock()
+        context.args = args
+        context.bot_data = {BOT_SERVICES_KEY: BotServices(
+            admin_user_ids=frozenset({42}), log_files=log_files, executor=executor
+        )}
+        return context
+
+    async def run(self, log_files, *args, executor=None, user_id=42):
+        """Run /logs and return the texts of the replies."""
+        update = self.make_update(user_id)
+        await LogsCommandHandler().handle(update, self.make_context(log_files, list(args), executor))
+        return [call[0][0] for call in update.message.reply_text.call_args_list]
+
+    def test_name(self):
+        """Test that the handler answers to /logs."""
+        assert LogsCommandHandler().name() == '/logs'
+
+    @pytest.mark.asyncio
+    async def test_list(self, log_files):
+        """Test that /logs lists the configured files."""
+        replies = await self.run(log_files)
+
+        assert "app: " in replies[0]
+        assert "gone: " in replies[0] and "(missing)" in replies[0]
+
+    @pytest.mark.asyncio
+    async def test_tail_in_worker_thread(self, log_files):
+        """Test that the tail runs through the executor and ends with a continuation hint."""
+        executor = HandlerExecutor(thread_workers=1)
+        try:
+            replies = await self.run(log_files, "app", "3", executor=executor)
+        finally:
+            await executor.stop()
+
+        lines = replies[0].split("\n")
+        assert lines[1].endswith("line 1997") and lines[3].endswith("line 1999")
+        assert lines[-1] == f"Continue: /logs app from {log_files.get('app').size}"
+
+    @pytest.mark.asyncio
+    async def test_at_and_from(self, log_files):
+        """Test that jumping to a time and continuing from an offset page forward."""
+        first = (await self.run(log_files, "app", "at", "2024-05-01T12:10:00", "2"))[0].split("\n")
+        assert first[1].endswith("line 600") and first[2].endswith("line 601")
+
+        offset = first[-1].rsplit(" ", 1)[1]
+        second = (await self.run(log_files, "app", "from", offset, "1"))[0].split("\n")
+        assert second[1].endswith("line 602")
+
+    @pytest.mark.asyncio
+    async def test_at_time_ago(self, log_files):
+        """Test the '/logs <name> at 15m ago' form shown in the usage text."""
+        with open(log_files.path("app"), "a") as file:
+            for minutes, text in ((30, "older"), (10, "newer")):
+                file.write(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time() - minutes * 60))} {text}\n")
+
+        lines = (await self.run(log_files, "app", "at", "15m", "ago", "1"))[0].split("\n")
+
+        assert lines[1].endswith("newer")
+
+    @pytest.mark.asyncio
+    async def test_grep(self, log_files):
+        """Test that grep returns the last matching lines."""
+        replies = await self.run(log_files, "app", "grep", "line 1?99$", "2")
+
+        lines = replies[0].split("\n")
+        assert lines[1].endswith("line 99") and lines[2].endswith("line 199")
+
+    @pytest.mark.asyncio
+    async def test_long_output_is_split_or_uploaded(self, log_files):
+        """Test that output over the message limit is split, or uploaded once it is long."""
+        with open(log_files.path("app"), "a") as file:
+            file.write(("x" * 399 + "\n") * 100)
+
+        replies = await self.run(log_files, "app", "20")
+        assert len(replies) == 2
+        assert all(len(reply) <= 4096 for reply in replies)
+
+        update = self.make_update()
+        update.message.reply_document = AsyncMock()
+        await LogsCommandHandler().handle(update, self.make_context(log_files, ["app", "100"]))
+        update.message.reply_text.assert_not_called()
+        assert update.message.reply_document.call_args[0][0].filename == "app.log.gz"
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("args, reply", [
+        (("nope",), "Unknown log 'nope'"),
+        (("app", "500"), "Line count must be between 1 and 100"),
+        (("app", "grep", "("), "Invalid pattern"),
+        (("app", "at", "yesterday"), "Invalid time"),
+        (("app", "sideways"), "Invalid arguments"),
+        (("gone",), "Cannot read gone"),
+    ])
+    async def test_errors(self, log_files, args, reply):
+        """Test that bad arguments and unreadable files are explained."""
+        replies = await self.run(log_files, *args)
+
+        assert replies[0].startswith(reply)
+
+    @pytest.mark.asyncio
+    async def test_not_configured(self):
+        """Test that a bot without log files says so."""
+        assert await self.run(LogFiles({}), "app") == ["No log files are configured."]
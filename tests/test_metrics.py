@@ -0,0 +1,148 @@
+import asyncio
+
+import httpx
+import pytest
+
+from metrics import GAUGE_AVG, GAUGE_MAX, EventLoopLagMonitor, Histogram, MetricsRegistry, MetricsServer
+
+
+class TestHistogram:
+    """Test cases for Histogram class."""
+
+    def test_observe_fills_buckets(self):
+        """Test that values land in the bucket whose upper bound covers them."""
+        histogram = Histogram((1.0, 2.0))
+
+        for value in (0.5, 1.0, 1.5, 3.0):
+            histogram.observe(value)
+
+        assert histogram.counts == [2, 1, 1]
+        assert histogram.count == 4
+        assert histogram.sum == 6.0
+
+    def test_quantile_interpolates(self):
+        """Test that quantiles are interpolated inside their bucket."""
+        histogram = Histogram((1.0, 2.0))
+        for _ in range(10):
+            histogram.observe(1.5)
+
+        assert histogram.quantile(0.5) == pytest.approx(1.5)
+        assert Histogram((1.0,)).quantile(0.5) == 0.0
+
+    def test_merge(self):
+        """Test that merging adds counts, sums and totals."""
+        first, second = Histogram((1.0,)), Histogram((1.0,))
+        first.observe(0.5)
+        second.observe(2.0)
+
+        first.merge(second)
+
+        assert (first.counts, first.count, first.sum) == ([1, 1], 2, 2.5)
+        with pytest.raises(ValueError):
+            first.merge(Histogram((2.0,)))
+
+
+class TestMetricsRegistry:
+    """Test cases for MetricsRegistry class."""
+
+    def test_record_command(self):
+        """Test that calls, errors and latency are recorded per command."""
+        registry = MetricsRegistry()
+
+        registry.record_command('/ping', 0.001, failed=False)
+        registry.record_command('/ping', 0.002, failed=True)
+
+        metrics = registry.commands()['/ping']
+        assert (metrics.calls, metrics.errors, metrics.latency.count) == (2, 1, 2)
+
+    def test_render_prometheus(self):
+        """Test the Prometheus text output of counters, histograms and gauges."""
+        registry = MetricsRegistry(latency_buckets=(0.01, 0.1))
+        registry.record_command('/ping', 0.005, failed=False)
+        registry.register_gauge("queued", "Queued things.", lambda: 3)
+
+        text = registry.render_prometheus()
+
+        assert 'gserverbot_command_calls_total{command="/ping"} 1' in text
+        assert 'gserverbot_command_latency_seconds_bucket{command="/ping",le="0.01"} 1' in text
+        assert 'gserverbot_command_latency_seconds_bucket{command="/ping",le="+Inf"} 1' in text
+        assert 'gserverbot_command_latency_seconds_count{command="/ping"} 1' in text
+        assert "# TYPE gserverbot_queued gauge" in text
+        assert "gserverbot_queued 3.0" in text
+
+    def test_registered_histogram(self):
+        """Test that registered histograms are rendered and merged from snapshots."""
+        wait_times = Histogram((0.01, 0.1))
+        wait_times.observe(0.05)
+        worker = MetricsRegistry()
+        worker.register_histogram("pool_wait_seconds", "Pool waits.", wait_times)
+        supervisor = MetricsRegistry()
+
+        supervisor.merge_snapshot(worker.snapshot())
+        supervisor.merge_snapshot(worker.snapshot())
+        text = supervisor.render_prometheus()
+
+        assert "# TYPE gserverbot_pool_wait_seconds histogram" in text
+        assert 'gserverbot_pool_wait_seconds_bucket{le="0.1"} 2' in text
+        assert supervisor.histograms()["pool_wait_seconds"].count == 2
+
+
+    def test_gauges_merge_by_mode(self):
+        """Test that merged gauges add up counts but not averages or latest samples."""
+        supervisor = MetricsRegistry()
+        for queued, wait_avg, flush_last in ((3, 0.1, 0.5), (4, 0.3, 0.2)):
+            worker = MetricsRegistry()
+            worker.register_gauge("queued", "Queued things.", lambda queued=queued: queued)
+            worker.register_gauge("wait_seconds_avg", "Average wait.", lambda wait_avg=wait_avg: wait_avg, GAUGE_AVG)
+            worker.register_gauge("flush_seconds_last", "Latest flush.", lambda flush_last=flush_last: flush_last, GAUGE_MAX)
+            supervisor.merge_snapshot(worker.snapshot())
+
+        gauges = supervisor.gauges()
+
+        assert gauges["queued"] == 7
+        assert gauges["wait_seconds_avg"] == pytest.approx(0.2)
+        assert gauges["flush_seconds_last"] == 0.5
+        with pytest.raises(ValueError):
+            supervisor.register_gauge("queued", "Queued things.", lambda: 0, "median")
+
+class TestEventLoopLagMonitor:
+    """Test cases for EventLoopLagMonitor class."""
+
+    @pytest.mark.asyncio
+    async def test_detects_blocked_loop(self):
+        """Test that blocking the loop shows up as lag."""
+        registry = MetricsRegistry()
+        monitor = EventLoopLagMonitor(registry, interval=0.01)
+        await monitor.start()
+        await asyncio.sleep(0)
+
+        import time
+        time.sleep(0.05)
+        await asyncio.sleep(0.02)
+        await monitor.stop()
+
+        assert registry.loop_lag.count >= 1
+        assert registry.loop_lag.sum >= 0.03
+
+
+class TestMetricsServer:
+    """Test cases for MetricsServer class."""
+
+    @pytest.mark.asyncio
+    async def test_serves_metrics(self):
+        """Test that /metrics returns the registry in the Prometheus format."""
+        registry = MetricsRegistry()
+        registry.record_command('/ping', 0.001, failed=False)
+        server = MetricsServer(registry, port=0)
+        await server.start()
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.get(f"http://127.0.0.1:{server.port}/metrics")
+                missing = await client.get(f"http://127.0.0.1:{server.port}/other")
+        finally:
+            await server.stop()
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'command="/ping"' in response.text
+        assert missing.status_code == 404
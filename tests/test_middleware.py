@@ -0,0 +1,285 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, Mock
+from telegram import Message, Update, User
+
+from bot_services import BOT_SERVICES_KEY, BotServices
+from command_router import CommandRouter
+from config import BotConfig
+from middleware import (
+    ERROR_REPLY, AdminOnlyMiddleware, ErrorReplyMiddleware, Middleware, MiddlewarePipeline,
+)
+from tests.conftest import make_update
+
+
+class Recorder(Middleware):
+    """Records when updates pass through it, and how often it was built into a chain."""
+
+    def __init__(self, label, events):
+        self.label = label
+        self.events = events
+        self.wrapped = []
+
+    async def process(self, call_next, update, context):
+        self.events.append(f"{self.label} in")
+        await call_next(update, context)
+        self.events.append(f"{self.label} out")
+
+    def wrap(self, command, call_next):
+        self.wrapped.append(command)
+        return super().wrap(command, call_next)
+
+
+class Stop(Middleware):
+    """Answers every update itself."""
+
+    async def process(self, call_next, update, context):
+        pass
+
+
+def make_handler(name: str, events=None):
+    """A stand-in command handler that records its calls."""
+    handler = Mock()
+    handler.name.return_value = name
+    handler.stream_policy.return_value = None
+    handler.handle = AsyncMock(side_effect=lambda update, context: events is not None and events.append(name))
+    return handler
+
+
+class TestMiddlewarePipeline:
+    """Test cases for MiddlewarePipeline class."""
+
+    @pytest.mark.asyncio
+    async def test_order_and_scope(self):
+        """Test that layers run in the order added, each only around its commands."""
+        events = []
+        pipeline = MiddlewarePipeline()
+        pipeline.use(Recorder("outer", events))
+        pipeline.use(Recorder("exec only", events), commands=["/exec"])
+        pipeline.use(Recorder("inner", events))
+
+        async def endpoint(update, context):
+            events.append("handler")
+
+        await pipeline.build("/exec", endpoint)(None, None)
+        exec_events, events[:] = list(events), []
+        await pipeline.build("/ping", endpoint)(None, None)
+
+        assert exec_events == [
+            "outer in", "exec only in", "inner in", "handler", "inner out", "exec only out", "outer out",
+        ]
+        assert events == ["outer in", "inner in", "handler", "inner out", "outer out"]
+
+    @pytest.mark.asyncio
+    async def test_short_circuit_and_unused_layers(self):
+        """Test that a layer can end the update, and a command without layers gets the endpoint itself."""
+        events = []
+        pipeline = MiddlewarePipeline()
+        pipeline.use(Recorder("outer", events))
+        pipeline.use(Stop(), commands=["/exec"])
+        pipeline.use(Recorder("inner", events), commands=["/exec"])
+        endpoint = AsyncMock()
+
+        await pipeline.build("/exec", endpoint)(None, None)
+
+        assert events == ["outer in", "outer out"]
+        endpoint.assert_not_awaited()
+        assert MiddlewarePipeline().build("/ping", endpoint) is endpoint
+        scoped = MiddlewarePipeline()
+        scoped.use(Stop(), commands=["/exec"])
+        assert scoped.build("/ping", endpoint) is endpoint
+
+
+class TestBuiltinMiddleware:
+    """Test cases for the middleware shipped with the bot."""
+
+    def make_context(self, admins=frozenset()):
+        """A context whose services list the given admins."""
+        context = Mock()
+        context.bot_data = {BOT_SERVICES_KEY: BotServices(admin_user_ids=admins)}
+        return context
+
+    def make_update(self, user_id=7):
+        """An update whose replies are recorded."""
+        update = Mock(spec=Update)
+        update.effective_user = Mock(spec=User, id=user_id)
+        update.message = Mock(spec=Message)
+        update.message.reply_text = AsyncMock()
+        return update
+
+    @pytest.mark.asyncio
+    async def test_admin_only(self):
+        """Test that only admins reach the handler."""
+        endpoint = AsyncMock()
+        chain = AdminOnlyMiddleware().wrap("/exec", endpoint)
+        refused, allowed = self.make_update(7), self.make_update(42)
+
+        await chain(refused, self.make_context(frozenset({42})))
+        await chain(allowed, self.make_context(frozenset({42})))
+
+        refused.message.reply_text.assert_awaited_once_with("This command is only available to bot admins.")
+        endpoint.assert_awaited_once()
+        assert endpoint.await_args[0][0] is allowed
+
+    @pytest.mark.asyncio
+    async def test_error_reply(self):
+        """Test that a failed command is answered and its error still raised, except for timeouts."""
+        update = self.make_update()
+        chain = ErrorReplyMiddleware().wrap("/status", AsyncMock(side_effect=RuntimeError("boom")))
+
+        with pytest.raises(RuntimeError):
+            await chain(update, self.make_context())
+        update.message.reply_text.assert_awaited_once_with(ERROR_REPLY)
+
+        timed_out = self.make_update()
+        chain = ErrorReplyMiddleware().wrap("/status", AsyncMock(side_effect=asyncio.TimeoutError))
+        with pytest.raises(asyncio.TimeoutError):
+            await chain(timed_out, self.make_context())
+        timed_out.message.reply_text.assert_not_awaited()
+
+
+class TestRouterMiddleware:
+    """Test cases for middleware chains built by the command router."""
+
+    @pytest.mark.asyncio
+    async def test_chains_are_built_once(self):
+        """Test that chains are built at compile time and come with the resolved handler."""
+        events = []
+        recorder = Recorder("layer", events)
+        pipeline = MiddlewarePipeline()
+        pipeline.use(recorder)
+        ping = make_handler("/ping", events)
+        router = CommandRouter({"/ping": ping}.get, middleware=pipeline)
+        router.compile([ping, make_handler("/status")])
+        assert recorder.wrapped == ["/ping", "/status"]
+
+        for _ in range(3):
+            update = make_update("/ping", user_id=7)
+            check_result = router.check_update(update)
+            assert check_result[3] is router._chains[ping]
+            await router.handle_update(update, Mock(), check_result, Mock())
+
+        assert recorder.wrapped == ["/ping", "/status"]
+        assert events == ["layer in", "/ping", "layer out"] * 3
+
+    @pytest.mark.asyncio
+    async def test_reloaded_handlers_get_new_chains(self):
+        """Test that a handler registered after compiling gets its chain on first use, and compile drops old ones."""
+        events = []
+        recorder = Recorder("layer", events)
+        pipeline = MiddlewarePipeline()
+        pipeline.use(recorder)
+        handlers = {"/ping": make_handler("/ping", events)}
+        router = CommandRouter(handlers.get, middleware=pipeline)
+        router.compile(handlers.values())
+        handlers["/ping"] = make_handler("/ping", events)
+
+        update = make_update("/ping", user_id=7)
+        await router.handle_update(update, Mock(), router.check_update(update), Mock())
+        router.compile(handlers.values())
+
+        assert events == ["layer in", "/ping", "layer out"]
+        handlers["/ping"].handle.assert_awaited_once()
+        assert recorder.wrapped == ["/ping", "/ping", "/ping"]
+        assert list(router._chains) == [handlers["/ping"]]
+
+    @pytest.mark.asyncio
+    async def test_bot_middleware(self):
+        """Test that the bot runs its commands through the given middleware and the error reply."""
+        from main import build_bot
+        from testing.fake_bot_api import FakeBotApi
+
+        pipeline = MiddlewarePipeline()
+        pipeline.use(AdminOnlyMiddleware(), commands=["/ping"])
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        bot = build_bot(fake_api.token, BotConfig(
+            base_url=fake_api.base_url, admin_user_ids=frozenset({1}), error_reply=True,
+        ), middleware=pipeline)
+        try:
+            await bot.start()
+            try:
+                await fake_api.push_update(fake_api.make_command_update(1, "/ping"))
+                await fake_api.push_update(fake_api.make_command_update(2, "/ping"))
+                messages = await fake_api.wait_for_messages(2)
+            finally:
+                await bot.stop()
+        finally:
+            await fake_api.stop()
+
+        replies = {message.chat_id: message.text for message in messages}
+        assert replies == {1: "I'm alive.", 2: "This command is only available to bot admins."}
+        assert BotConfig.from_env({"ERROR_REPLY": "true"}).error_reply
+
+    @pytest.mark.asyncio
+    async def test_admin_commands_are_refused_to_others(self):
+        """Test that the bot lets only admins run its admin commands, and everyone else the rest."""
+        from main import build_bot
+        from testing.fake_bot_api import FakeBotApi
+
+        admin_commands = ("/stats", "/reload", "/logs", "/broadcast", "/exec")
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        bot = build_bot(fake_api.token, BotConfig(base_url=fake_api.base_url, admin_user_ids=frozenset({1})))
+        try:
+            await bot.start()
+            try:
+                for command in admin_commands + ("/ping",):
+                    await fake_api.push_update(fake_api.make_command_update(2, command))
+                messages = await fake_api.wait_for_chat_messages(2, len(admin_commands) + 1)
+                await fake_api.push_update(fake_api.make_command_update(1, "/stats"))
+                admin_messages = await fake_api.wait_for_chat_messages(1, 1)
+            finally:
+                await bot.stop()
+        finally:
+            await fake_api.stop()
+
+        refusal = "This command is only available to bot admins."
+        assert [message.text for message in messages] == [refusal] * len(admin_commands) + ["I'm alive."]
+        assert admin_messages[0].text.startswith("Commands")
+
+    @pytest.mark.asyncio
+    async def test_handlers_declare_admin_only(self):
+        """Test that any handler can restrict itself to admins, and the given pipeline is left as it was."""
+        from bot import TelegramBot
+        from command_handlers_manager import CommandHandlersManager
+        from command_handlers_registry import CommandHandlersRegistry
+        from commands.ping import PingCommandHandler
+        from testing.fake_bot_api import FakeBotApi
+
+        class SecretPingCommandHandler(PingCommandHandler):
+            def name(self):
+                return "/secret"
+
+            def admin_only(self):
+                return True
+
+        pipeline = MiddlewarePipeline()
+        pipeline.use(Recorder("layer", []))
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        bots = []
+        for _ in range(2):
+            registry = CommandHandlersRegistry()
+            registry.add(SecretPingCommandHandler())
+            manager = CommandHandlersManager(registry, manifest_path=None, use_entry_points=False)
+            bots.append(TelegramBot(fake_api.token, manager, BotConfig(
+                base_url=fake_api.base_url, admin_user_ids=frozenset({1}), error_reply=True,
+            ), middleware=pipeline))
+        bot = bots[1]
+        try:
+            await bot.start()
+            try:
+                await fake_api.push_update(fake_api.make_command_update(2, "/secret"))
+                await fake_api.push_update(fake_api.make_command_update(1, "/secret"))
+                messages = await fake_api.wait_for_messages(2)
+            finally:
+                await bot.stop()
+        finally:
+            await fake_api.stop()
+
+        replies = {message.chat_id: message.text for message in messages}
+        assert replies == {1: "I'm alive.", 2: "This command is only available to bot admins."}
+        assert len(pipeline) == 1
+        assert len(bot.middleware) == 3
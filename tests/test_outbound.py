@@ -0,0 +1,343 @@
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, Mock
+from telegram import Bot, InputFile
+from telegram.error import BadRequest, RetryAfter, TimedOut
+
+from bot_services import BOT_SERVICES_KEY, BotServices
+from outbound import OutboundQueue, TokenBucket, send_document_reply, send_reply
+from testing.fake_bot_api import FakeBotApi
+
+
+class TestTokenBucket:
+    """Test cases for TokenBucket class."""
+
+    def test_starts_full(self):
+        """Test that a new bucket allows a full burst."""
+        bucket = TokenBucket(rate=1.0, capacity=3, now=0.0)
+        for _ in range(3):
+            assert bucket.delay(0.0) == 0
+            bucket.take(0.0)
+        assert bucket.delay(0.0) == pytest.approx(1.0)
+
+    def test_refills_over_time(self):
+        """Test that tokens come back at the configured rate."""
+        bucket = TokenBucket(rate=2.0, capacity=1, now=0.0)
+        bucket.take(0.0)
+        assert bucket.delay(0.25) == pytest.approx(0.25)
+        assert bucket.delay(0.5) == 0
+
+    def test_is_full(self):
+        """Test that is_full reports a completely refilled bucket."""
+        bucket = TokenBucket(rate=1.0, capacity=2, now=0.0)
+        bucket.take(0.0)
+        assert not bucket.is_full(0.5)
+        assert bucket.is_full(1.0)
+
+
+class _ScriptedBot:
+    """Bot stand-in whose send_message raises scripted errors first."""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, text, time.monotonic()))
+        return Mock(chat_id=chat_id, text=text)
+
+    async def send_document(self, chat_id, document, caption=None, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, document, time.monotonic()))
+        return Mock(chat_id=chat_id, caption=caption)
+
+
+class TestOutboundQueue:
+    """Test cases for OutboundQueue class."""
+
+    @pytest.mark.asyncio
+    async def test_sends_text(self):
+        """Test that a queued text is sent and the future resolves."""
+        bot = _ScriptedBot()
+        queue = OutboundQueue(bot)
+        await queue.start()
+
+        message = await queue.send_text(1, "hello")
+        await queue.stop()
+
+        assert message.text == "hello"
+        assert bot.sent[0][:2] == (1, "hello")
+        assert queue.stats().sent == 1
+
+    @pytest.mark.asyncio
+    async def test_per_chat_rate(self):
+        """Test that one chat is paced by its token bucket."""
+        bot = _ScriptedBot()
+        queue = OutboundQueue(bot, chat_rate=20.0, chat_burst=1)
+        await queue.start()
+
+        await asyncio.gather(*(queue.send_text(1, f"m{i}", coalesce=False) for i in range(4)))
+        await queue.stop()
+
+        times = [sent_at for _, _, sent_at in bot.sent]
+        assert [text for _, text, _ in bot.sent] == ["m0", "m1", "m2", "m3"]
+        assert times[-1] - times[0] >= 3 * 0.05 * 0.9
+
+    @pytest.mark.asyncio
+    async def test_global_rate(self):
+        """Test that sends across chats respect the global rate."""
+        bot = _ScriptedBot()
+        queue = OutboundQueue(bot, global_rate=50.0)
+        await queue.start()
+
+        started = time.monotonic()
+        await asyncio.gather(*(queue.send_text(chat_id, "x") for chat_id in range(1, 101)))
+        elapsed = time.monotonic() - started
+        await queue.stop()
+
+        # 50 tokens of burst, the other 50 paced at 50/s
+        assert elapsed >= 0.9
+        assert len(bot.sent) == 100
+
+    @pytest.mark.asyncio
+    async def test_coalesces_pending_texts(self):
+        """Test that texts waiting on the chat limit are merged into one message."""
+        bot = _ScriptedBot()
+        queue = OutboundQueue(bot, chat_rate=10.0, chat_burst=1)
+        await queue.start()
+
+        await queue.send_text(1, "line 0")
+        results = await asyncio.gather(*(queue.send_text(1, f"line {i}") for i in range(1, 4)))
+        await queue.stop()
+
+        assert [text for _, text, _ in bot.sent] == ["line 0", "line 1\nline 2\nline 3"]
+        assert results[0] is results[2]
+        assert queue.stats().coalesced == 2
+
+    @pytest.mark.asyncio
+    async def test_does_not_coalesce_when_disallowed(self):
+        """Test that texts sent with coalesce=False stay separate."""
+        bot = _ScriptedBot()
+        queue = OutboundQueue(bot, chat_rate=100.0, chat_burst=1)
+        await queue.start()
+
+        await asyncio.gather(*(queue.send_text(1, f"m{i}", coalesce=False) for i in range(3)))
+        await queue.stop()
+
+        assert len(bot.sent) == 3
+
+    @pytest.mark.asyncio
+    async def test_documents_are_paced_and_never_merged(self):
+        """Test that documents share the chat's pacing and are not merged with texts."""
+        bot = _ScriptedBot()
+        queue = OutboundQueue(bot, chat_rate=10.0, chat_burst=1)
+        await queue.start()
+        document = InputFile(b"data", filename="out.txt.gz")
+
+        await queue.send_text(1, "first")
+        results = await asyncio.gather(
+            queue.send_text(1, "before"), queue.send_document(1, document, "caption"), queue.send_text(1, "after")
+        )
+        await queue.stop()
+
+        assert [item for _, item, _ in bot.sent] == ["first", "before", document, "after"]
+        assert results[1].caption == "caption"
+        assert bot.sent[2][2] - bot.sent[1][2] >= 0.09
+
+    @pytest.mark.asyncio
+    async def test_retries_network_errors_with_backoff(self):
+        """Test that transient network errors are retried."""
+        bot = _ScriptedBot(errors=[TimedOut(), TimedOut()])
+        queue = OutboundQueue(bot, backoff_base=0.01)
+        await queue.start()
+
+        await queue.send_text(1, "hello")
+        await queue.stop()
+
+        assert len(bot.sent) == 1
+        assert queue.stats().retries == 2
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_retries(self):
+        """Test that the future fails once retries are exhausted."""
+        bot = _ScriptedBot(errors=[TimedOut()] * 3)
+        queue = OutboundQueue(bot, max_retries=2, backoff_base=0.01)
+        await queue.start()
+
+        with pytest.raises(TimedOut):
+            await queue.send_text(1, "hello")
+        await queue.stop()
+
+        assert queue.stats().failed == 1
+
+    @pytest.mark.asyncio
+    async def test_permanent_errors_fail_immediately(self):
+        """Test that a BadRequest is not retried."""
+        bot = _ScriptedBot(errors=[BadRequest("chat not found")])
+        queue = OutboundQueue(bot)
+        await queue.start()
+
+        with pytest.raises(BadRequest):
+            await queue.send_text(1, "hello")
+        await queue.stop()
+
+        assert queue.stats().retries == 0
+
+    @pytest.mark.asyncio
+    async def test_retry_after_pauses_all_sends(self):
+        """Test that RetryAfter delays the retry and other chats."""
+        bot = _ScriptedBot(errors=[RetryAfter(1)])
+        queue = OutboundQueue(bot)
+        await queue.start()
+
+        started = time.monotonic()
+        first = queue.enqueue(1, "first")
+        await asyncio.sleep(0.05)
+        await asyncio.gather(first, queue.send_text(2, "second"))
+        await queue.stop()
+
+        assert sorted(text for _, text, _ in bot.sent) == ["first", "second"]
+        assert all(sent_at - started >= 0.95 for _, _, sent_at in bot.sent)
+        assert queue.stats().retry_after == 1
+
+
+class TestOutboundQueueAgainstFakeApi:
+    """Test cases for OutboundQueue against the offline fake Bot API."""
+
+    @pytest_asyncio.fixture
+    async def fake_api(self):
+        """Start a fake Bot API."""
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        yield fake_api
+        await fake_api.stop()
+
+    @pytest_asyncio.fixture
+    async def bot(self, fake_api):
+        """Create a real Bot pointed at the fake API."""
+        bot = Bot(fake_api.token, base_url=fake_api.base_url)
+        await bot.initialize()
+        yield bot
+        await bot.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_honours_429_retry_after(self, fake_api, bot):
+        """Test that a 429 response is retried after the requested delay."""
+        fake_api.inject_error("sendMessage", 429, retry_after=1)
+        queue = OutboundQueue(bot)
+        await queue.start()
+
+        started = time.monotonic()
+        message = await queue.send_text(5, "after flood wait")
+        elapsed = time.monotonic() - started
+        await queue.stop()
+
+        assert message.text == "after flood wait"
+        assert elapsed >= 0.95
+        assert fake_api.calls["sendMessage"] == 2
+        assert [m.text for m in fake_api.sent_messages] == ["after flood wait"]
+        assert queue.stats().retry_after == 1
+
+    @pytest.mark.asyncio
+    async def test_burst_with_429s_delivers_everything_in_order(self, fake_api, bot):
+        """Test that a burst survives injected 429s without losing or reordering texts."""
+        fake_api.inject_error("sendMessage", 429, retry_after=1, times=2)
+        queue = OutboundQueue(bot, chat_rate=1000.0, global_rate=1000.0)
+        await queue.start()
+
+        sends = [queue.send_text(chat_id, f"{chat_id}:{i}", coalesce=False)
+                 for i in range(5) for chat_id in (1, 2, 3)]
+        await asyncio.gather(*sends)
+        await queue.stop()
+
+        for chat_id in (1, 2, 3):
+            texts = [m.text for m in fake_api.sent_by_chat[chat_id]]
+            assert texts == [f"{chat_id}:{i}" for i in range(5)]
+        stats = queue.stats()
+        assert stats.sent == 15
+        assert stats.queued == 0
+        assert stats.latency_max >= 0.95
+
+
+class TestSendReply:
+    """Test cases for the send_reply helper."""
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_reply_text(self):
+        """Test that replies go through reply_text when no queue is configured."""
+        update = Mock()
+        update.message.reply_text = AsyncMock()
+
+        await send_reply(update, None, "hi")
+
+        update.message.reply_text.assert_awaited_once_with("hi")
+
+    @pytest.mark.asyncio
+    async def test_uses_outbound_queue(self):
+        """Test that replies go through the outbound queue when configured."""
+        outbound = Mock()
+        outbound.send_text = AsyncMock()
+        context = Mock()
+        context.bot_data = {BOT_SERVICES_KEY: BotServices(outbound=outbound)}
+        update = Mock()
+        update.effective_message.chat.type = "private"
+        update.effective_message.chat_id = 9
+
+        await send_reply(update, context, "hi")
+
+        outbound.send_text.assert_awaited_once_with(9, "hi", coalesce=True)
+        update.message.reply_text.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_quotes_in_groups(self):
+        """Test that replies in groups quote the triggering message."""
+        outbound = Mock()
+        outbound.send_text = AsyncMock()
+        context = Mock()
+        context.bot_data = {BOT_SERVICES_KEY: BotServices(outbound=outbound)}
+        update = Mock()
+        update.effective_message.chat.type = "group"
+        update.effective_message.chat_id = -5
+        update.effective_message.message_id = 77
+
+        await send_reply(update, context, "hi")
+
+        outbound.send_text.assert_awaited_once_with(-5, "hi", coalesce=True, reply_to_message_id=77)
+
+
+class TestSendDocumentReply:
+    """Test cases for the send_document_reply helper."""
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_reply_document(self):
+        """Test that documents go through reply_document when no queue is configured."""
+        update = Mock()
+        update.message.reply_document = AsyncMock()
+        document = InputFile(b"data", filename="out.txt.gz")
+
+        await send_document_reply(update, None, document, "caption")
+
+        update.message.reply_document.assert_awaited_once_with(document, caption="caption")
+
+    @pytest.mark.asyncio
+    async def test_uses_outbound_queue(self):
+        """Test that documents go through the outbound queue and quote in groups."""
+        outbound = Mock()
+        outbound.send_document = AsyncMock()
+        context = Mock()
+        context.bot_data = {BOT_SERVICES_KEY: BotServices(outbound=outbound)}
+        update = Mock()
+        update.effective_message.chat.type = "group"
+        update.effective_message.chat_id = -5
+        update.effective_message.message_id = 77
+        document = InputFile(b"data", filename="out.txt.gz")
+
+        await send_document_reply(update, context, document)
+
+        outbound.send_document.assert_awaited_once_with(-5, document, "", reply_to_message_id=77)
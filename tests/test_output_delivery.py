@@ -0,0 +1,217 @@
+import asyncio
+import gzip
+import hashlib
+import os
+import tracemalloc
+import zlib
+
+import pytest
+from unittest.mock import AsyncMock, Mock
+from telegram import Message, Update
+
+from output_delivery import (
+    DOCUMENT_DELIVERY, MESSAGE_DELIVERY, SPLIT_DELIVERY, DeliveryPolicy, send_output,
+)
+
+
+def make_update():
+    """Create a mock update whose replies are recorded."""
+    update = Mock(spec=Update)
+    update.message = Mock(spec=Message)
+    update.message.reply_text = AsyncMock()
+    update.message.reply_document = AsyncMock()
+    return update
+
+
+def uploaded_text(update):
+    """Decompress the document passed to reply_document."""
+    document = update.message.reply_document.call_args[0][0]
+    return gzip.decompress(document.input_file_content).decode()
+
+
+class TestDeliveryPolicy:
+    """Test cases for DeliveryPolicy class."""
+
+    @pytest.mark.parametrize("kwargs", [{"max_messages": 0}, {"compress_level": 10}, {"max_document_bytes": 1000}])
+    def test_invalid(self, kwargs):
+        """Test that unusable thresholds are rejected."""
+        with pytest.raises(ValueError):
+            DeliveryPolicy(**kwargs)
+
+
+class TestSendOutput:
+    """Test cases for the send_output function."""
+
+    @pytest.mark.asyncio
+    async def test_short_output_is_one_message(self):
+        """Test that output within the limit is sent unchanged."""
+        update = make_update()
+
+        report = await send_output(update, None, "hello")
+
+        update.message.reply_text.assert_awaited_once_with("hello")
+        assert report.strategy == MESSAGE_DELIVERY
+
+    @pytest.mark.asyncio
+    async def test_medium_output_is_split_at_lines(self):
+        """Test that output fitting a few messages is split at line breaks."""
+        update = make_update()
+        text = "".join(f"line {number}\n" for number in range(1000))
+
+        report = await send_output(update, None, text)
+
+        texts = [call[0][0] for call in update.message.reply_text.call_args_list]
+        assert report.strategy == SPLIT_DELIVERY and report.messages == len(texts) == 3
+        assert all(len(page) <= 4096 for page in texts)
+        assert "\n".join(texts) == text
+
+    @pytest.mark.asyncio
+    async def test_long_output_is_a_document(self):
+        """Test that output needing too many messages is uploaded compressed."""
+        update = make_update()
+        text = "".join(f"line {number}\n" for number in range(1000))
+
+        report = await send_output(update, None, text, filename="dump.txt", policy=DeliveryPolicy(max_messages=2))
+
+        update.message.reply_text.assert_not_called()
+        assert report.strategy == DOCUMENT_DELIVERY
+        assert report.characters == len(text) and 0 < report.document_bytes < len(text)
+        assert update.message.reply_document.call_args[0][0].filename == "dump.txt.gz"
+        assert update.message.reply_document.call_args[1]["caption"].startswith("1000 lines")
+        assert uploaded_text(update) == text
+
+    @pytest.mark.asyncio
+    async def test_generators(self):
+        """Test that sync and async generators are delivered in full."""
+        def lines():
+            for number in range(20000):
+                yield f"line {number}\n"
+
+        async def async_lines():
+            for line in lines():
+                yield line
+
+        for output in (lines(), async_lines()):
+            update = make_update()
+            report = await send_output(update, None, output)
+            assert report.strategy == DOCUMENT_DELIVERY
+            assert uploaded_text(update) == "".join(lines())
+
+    @pytest.mark.asyncio
+    async def test_short_generator_is_a_message(self):
+        """Test that a generator ending early is sent as a message."""
+        update = make_update()
+
+        report = await send_output(update, None, iter(["a\n", "b"]))
+
+        update.message.reply_text.assert_awaited_once_with("a\nb")
+        assert report.strategy == MESSAGE_DELIVERY
+
+    @pytest.mark.asyncio
+    async def test_memory_is_bounded_by_the_compressed_size(self):
+        """Test that 100 MB of generated output is never held in memory uncompressed."""
+        block = "".join(f"process {number:>7} running /usr/bin/worker --id={number}\n" for number in range(16384))
+        update = make_update()
+
+        tracemalloc.start()
+        try:
+            report = await send_output(update, None, (block for _ in range(100 * 1024 * 1024 // len(block))))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert report.characters >= 99 * 1024 * 1024
+        # The upload itself is read into memory by python-telegram-bot
+        assert peak < report.document_bytes + 16 * 1024 * 1024
+
+    @pytest.mark.asyncio
+    async def test_truncated_at_document_limit(self):
+        """Test that output past the upload limit is dropped and the generator closed."""
+        closed = []
+
+        def random_lines():
+            try:
+                while True:
+                    yield os.urandom(512).hex() + "\n"
+            finally:
+                closed.append(True)
+
+        update = make_update()
+        report = await send_output(update, None, random_lines(), policy=DeliveryPolicy(max_document_bytes=1 << 20))
+
+        assert report.truncated and closed
+        assert report.document_bytes <= 1 << 20
+        assert uploaded_text(update).endswith(f"[output truncated after {report.characters} characters]\n")
+
+
+    @pytest.mark.asyncio
+    async def test_incompressible_text_stays_within_limit(self):
+        """Test that one large chunk of incompressible multi-byte text does not overshoot the upload limit."""
+        text = "".join(chr(0x4E00 + code % 0x5000) for code in memoryview(os.urandom(2 << 20)).cast("H"))
+        update = make_update()
+
+        report = await send_output(update, None, [text], policy=DeliveryPolicy(max_document_bytes=2 << 20))
+
+        assert report.truncated
+        assert report.document_bytes <= 2 << 20
+        assert uploaded_text(update).startswith(text[:report.characters])
+
+class TestSendOutputAgainstFakeApi:
+    """Test cases for large outputs sent through a running bot."""
+
+    @pytest.mark.asyncio
+    async def test_hundreds_of_megabytes(self):
+        """Test that a 300 MB generated output arrives intact as one compressed document."""
+        from bot import TelegramBot
+        from command_handlers_manager import CommandHandlersManager
+        from command_handlers_registry import CommandHandlersRegistry
+        from commands.icommand_handler import ICommandHandler
+        from config import BotConfig
+        from testing.fake_bot_api import FakeBotApi
+
+        block = "".join(f"process {number:>7} running /usr/bin/worker --id={number}\n" for number in range(16384))
+        blocks = -(-300 * 1024 * 1024 // len(block))
+        reports = []
+
+        class DumpCommandHandler(ICommandHandler):
+            async def handle(self, update, context):
+                reports.append(await send_output(update, context, (block for _ in range(blocks)), "dump.txt"))
+
+            def name(self):
+                return '/dump'
+
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        registry = CommandHandlersRegistry()
+        registry.add(DumpCommandHandler())
+        manager = CommandHandlersManager(registry, manifest_path=None, use_entry_points=False)
+        bot = TelegramBot(fake_api.token, manager, BotConfig(base_url=fake_api.base_url))
+        try:
+            await bot.start()
+            try:
+                await fake_api.push_update(fake_api.make_command_update(5, "/dump"))
+                for _ in range(600):
+                    if fake_api.sent_documents:
+                        break
+                    await asyncio.sleep(0.1)
+            finally:
+                await bot.stop()
+        finally:
+            await fake_api.stop()
+
+        [document] = fake_api.sent_documents
+        assert document.chat_id == 5 and document.filename == "dump.txt.gz"
+        assert reports[0].characters == blocks * len(block) >= 300 * 1024 * 1024
+        assert fake_api.calls["sendMessage"] == 0
+        # Check the upload by streaming it through the decompressor
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        digest, length = hashlib.sha256(), 0
+        for start in range(0, len(document.content), 1 << 20):
+            data = decompressor.decompress(document.content[start:start + (1 << 20)])
+            digest.update(data)
+            length += len(data)
+        expected = hashlib.sha256()
+        for _ in range(blocks):
+            expected.update(block.encode())
+        assert length == blocks * len(block)
+        assert digest.digest() == expected.digest()
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import Mock, MagicMock
+from unittest.mock import AsyncMock, Mock, MagicMock
 from telegram import Update, Message, Chat, User
 from telegram.ext import ContextTypes
 
@@ -19,7 +19,7 @@ class TestPingCommandHandler:
         """Create a mock Update object for testing."""
         update = Mock(spec=Update)
         update.message = Mock(spec=Message)
-        update.message.reply_text = Mock()
+        update.message.reply_text = AsyncMock()
         return update
     
     @pytest.fixture
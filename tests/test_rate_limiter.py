@@ -0,0 +1,99 @@
+import pytest
+
+from rate_limiter import GCRATable, RateLimit, RateLimiter
+from tests.conftest import FakeClock
+
+
+class TestRateLimit:
+    """Test cases for RateLimit class."""
+
+    def test_parse(self):
+        """Test the count/period notation."""
+        assert RateLimit.parse("30/60") == RateLimit(30, 60.0)
+        assert RateLimit.parse("5") == RateLimit(5, 1.0)
+        with pytest.raises(ValueError):
+            RateLimit.parse("fast")
+        with pytest.raises(ValueError):
+            RateLimit(0)
+
+
+class TestGCRATable:
+    """Test cases for GCRATable class."""
+
+    def test_slots_are_stable(self):
+        """Test that a key keeps its slot and distinct keys get distinct slots."""
+        table = GCRATable(RateLimit(1), 64)
+        slots = {user_id: table.slot(user_id, 0.0) for user_id in range(1, 33)}
+        assert len(set(slots.values())) == 32
+        assert all(table.slot(user_id, 0.0) == slot for user_id, slot in slots.items())
+        assert (table.used, table.evictions) == (32, 0)
+
+    def test_memory_is_bounded(self):
+        """Test that many more keys than slots never grow the table."""
+        limit = RateLimit(1, 60.0)
+        table = GCRATable(limit, 1024)
+        memory = table.memory_bytes
+        for user_id in range(100_000):
+            table.admit(table.slot(user_id, 0.0), 0.0)
+        assert table.memory_bytes == memory == 1024 * 17
+        assert table.used == 1024
+        assert table.evictions > 0
+
+    def test_idle_slots_are_reused(self):
+        """Test that slots of users whose allowance refilled are taken over without eviction."""
+        limit = RateLimit(1, 1.0)
+        table = GCRATable(limit, 16)
+        for user_id in range(16):
+            table.admit(table.slot(user_id, 0.0), 0.0)
+        evictions = table.evictions
+        for user_id in range(16, 32):
+            table.admit(table.slot(user_id, 5.0), 5.0)
+        assert table.evictions == evictions
+
+
+class TestRateLimiter:
+    """Test cases for RateLimiter class."""
+
+    def test_user_limit_with_burst_and_refill(self):
+        """Test that a user gets a burst, then one request per interval."""
+        clock = FakeClock()
+        limiter = RateLimiter(RateLimit(3, 3.0), clock=clock)
+
+        assert [limiter.check(1, "/ping") for _ in range(3)] == [None] * 3
+        rejection = limiter.check(1, "/ping")
+        assert rejection.retry_after == pytest.approx(1.0)
+        assert limiter.check(2, "/ping") is None
+
+        clock.now += 1.0
+        assert limiter.check(1, "/ping") is None
+        assert limiter.check(1, "/ping") is not None
+
+    def test_one_notice_per_streak(self):
+        """Test that only the first rejection in a row asks for a notice."""
+        clock = FakeClock()
+        limiter = RateLimiter(RateLimit(1, 10.0), clock=clock)
+        limiter.check(1, "/ping")
+
+        assert [limiter.check(1, "/ping").notify for _ in range(3)] == [True, False, False]
+        clock.now += 10.0
+        assert limiter.check(1, "/ping") is None
+        assert limiter.check(1, "/ping").notify is True
+        assert (limiter.stats().rejected, limiter.stats().notices) == (4, 2)
+
+    def test_command_limit_is_separate(self):
+        """Test that a command limit only applies to its command and rejections charge nothing."""
+        clock = FakeClock()
+        limiter = RateLimiter(RateLimit(3, 60.0), clock=clock)
+        history = RateLimit(1, 60.0)
+
+        assert limiter.check(1, "/history", history) is None
+        assert limiter.check(1, "/history", history) is not None
+        assert limiter.check(1, "/ping") is None
+        assert limiter.check(1, "/ping") is None
+        assert limiter.check(1, "/ping") is not None
+
+    def test_no_limits(self):
+        """Test that a limiter without limits allows everything and allocates nothing."""
+        limiter = RateLimiter()
+        assert all(limiter.check(1, "/ping") is None for _ in range(100))
+        assert limiter.stats().memory_bytes == 0
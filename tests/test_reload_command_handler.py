@@ -0,0 +1,58 @@
+import pytest
+from unittest.mock import AsyncMock, Mock
+from telegram import Message, Update, User
+
+from bot_services import BOT_SERVICES_KEY, BotServices
+from commands.reload import ReloadCommandHandler
+from icommand_handlers_manager import ReloadReport
+from metrics import MetricsRegistry
+
+
+class TestReloadCommandHandler:
+    """Test cases for ReloadCommandHandler class."""
+
+    def make_update(self, user_id):
+        """Create a mock update sent by the given user."""
+        update = Mock(spec=Update)
+        update.effective_user = Mock(spec=User, id=user_id)
+        update.message = Mock(spec=Message)
+        update.message.reply_text = AsyncMock()
+        return update
+
+    def make_context(self, reload_commands, admin_user_ids=(42,)):
+        """Create a context carrying bot services with the given reload callback."""
+        context = Mock()
+        context.bot_data = {BOT_SERVICES_KEY: BotServices(
+            metrics=MetricsRegistry(), admin_user_ids=frozenset(admin_user_ids), reload_commands=reload_commands
+        )}
+        return context
+
+    def test_name(self):
+        """Test that the handler answers to /reload."""
+        assert ReloadCommandHandler().name() == '/reload'
+
+    @pytest.mark.asyncio
+    async def test_admin_reloads(self):
+        """Test that admins trigger a reload and get its report."""
+        report = ReloadReport(added=['/new'], reloaded=['/ping'], unchanged=3, build_seconds=0.012, swap_seconds=2e-6)
+        reload_commands = Mock(return_value=report)
+        update = self.make_update(42)
+
+        await ReloadCommandHandler().handle(update, self.make_context(reload_commands))
+
+        reload_commands.assert_called_once_with()
+        text = update.message.reply_text.call_args[0][0]
+        assert "Added: /new" in text
+        assert "Reloaded: /ping" in text
+        assert "Removed: none" in text
+        assert "swapped in 2.0 us" in text
+
+    @pytest.mark.asyncio
+    async def test_failed_reload_is_reported(self):
+        """Test that a failing reload is reported to the admin and re-raised."""
+        update = self.make_update(42)
+
+        with pytest.raises(SyntaxError):
+            await ReloadCommandHandler().handle(update, self.make_context(Mock(side_effect=SyntaxError("bad"))))
+
+        assert "Reload failed" in update.message.reply_text.call_args[0][0]
@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+from unittest.mock import Mock
+
+from response_cache import CachePolicy, ResponseCache
+from tests.conftest import FakeClock
+
+
+class TestCachePolicy:
+    """Test cases for CachePolicy class."""
+
+    def make_update(self, chat_id, user_id):
+        update = Mock()
+        update.effective_chat.id = chat_id
+        update.effective_user.id = user_id
+        return update
+
+    @pytest.mark.parametrize("scope, expected", [
+        ("global", None),
+        ("chat", 10),
+        ("user", 20),
+        ("args", ("cpu", "5m")),
+    ])
+    def test_key_by_scope(self, scope, expected):
+        """Test that the key only contains what the scope varies by."""
+        policy = CachePolicy(ttl=1, scope=scope)
+        assert policy.key(self.make_update(10, 20), ["cpu", "5m"]) == expected
+
+    def test_rejects_invalid_policy(self):
+        """Test that unknown scopes and non-positive limits are rejected."""
+        with pytest.raises(ValueError):
+            CachePolicy(ttl=1, scope="planet")
+        with pytest.raises(ValueError):
+            CachePolicy(ttl=0)
+
+
+class TestResponseCache:
+    """Test cases for ResponseCache class."""
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock(0.0)
+
+    @pytest.fixture
+    def cache(self, clock):
+        return ResponseCache(clock)
+
+    @staticmethod
+    def counting_compute(value="reply"):
+        """Create a compute function that counts its calls."""
+        calls = []
+
+        async def compute():
+            calls.append(None)
+            return f"{value} {len(calls)}"
+        return compute, calls
+
+    @pytest.mark.asyncio
+    async def test_hit_within_ttl(self, cache, clock):
+        """Test that a second call within the TTL does not recompute."""
+        policy = CachePolicy(ttl=5)
+        compute, calls = self.counting_compute()
+
+        first = await cache.get_or_compute("/status", None, policy, compute)
+        clock.now = 4.9
+        second = await cache.get_or_compute("/status", None, policy, compute)
+
+        assert first == ("reply 1", False)
+        assert second == ("reply 1", True)
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_expires_after_ttl(self, cache, clock):
+        """Test that an expired reply is recomputed."""
+        policy = CachePolicy(ttl=5)
+        compute, calls = self.counting_compute()
+
+        await cache.get_or_compute("/status", None, policy, compute)
+        clock.now = 5.0
+        value, hit = await cache.get_or_compute("/status", None, policy, compute)
+
+        assert (value, hit) == ("reply 2", False)
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self, cache):
+        """Test that the least recently used key is evicted first."""
+        policy = CachePolicy(ttl=60, scope="args", max_size=2)
+        compute, calls = self.counting_compute()
+
+        await cache.get_or_compute("/history", ("a",), policy, compute)
+        await cache.get_or_compute("/history", ("b",), policy, compute)
+        await cache.get_or_compute("/history", ("a",), policy, compute)
+        await cache.get_or_compute("/history", ("c",), policy, compute)
+
+        assert (await cache.get_or_compute("/history", ("a",), policy, compute))[1]
+        assert not (await cache.get_or_compute("/history", ("b",), policy, compute))[1]
+        assert cache.stats().evictions == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_computation(self, cache):
+        """Test that simultaneous misses for one key run the computation once."""
+        policy = CachePolicy(ttl=60)
+        release = asyncio.Event()
+        calls = []
+
+        async def compute():
+            calls.append(None)
+            await release.wait()
+            return "shared"
+
+        requests = [asyncio.create_task(cache.get_or_compute("/status", None, policy, compute)) for _ in range(10)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*requests)
+
+        assert len(calls) == 1
+        assert all(value == "shared" for value, _ in results)
+        stats = cache.stats()
+        assert (stats.misses, stats.coalesced) == (1, 9)
+
+    @pytest.mark.asyncio
+    async def test_failure_is_shared_and_not_cached(self, cache):
+        """Test that waiters see the failure and the next call recomputes."""
+        policy = CachePolicy(ttl=60)
+        release = asyncio.Event()
+
+        async def failing():
+            await release.wait()
+            raise RuntimeError("down")
+
+        leader = asyncio.create_task(cache.get_or_compute("/status", None, policy, failing))
+        follower = asyncio.create_task(cache.get_or_compute("/status", None, policy, failing))
+        await asyncio.sleep(0)
+        release.set()
+
+        for task in (leader, follower):
+            with pytest.raises(RuntimeError):
+                await task
+        compute, calls = self.counting_compute()
+        assert await cache.get_or_compute("/status", None, policy, compute) == ("reply 1", False)
+
+    @pytest.mark.asyncio
+    async def test_invalidate(self, cache):
+        """Test that invalidating a command drops its replies."""
+        policy = CachePolicy(ttl=60)
+        compute, calls = self.counting_compute()
+
+        await cache.get_or_compute("/status", None, policy, compute)
+        cache.invalidate("/status")
+        await cache.get_or_compute("/status", None, policy, compute)
+
+        assert len(calls) == 2
+        assert cache.stats().size == 1
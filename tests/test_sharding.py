@@ -0,0 +1,224 @@
+import asyncio
+import json
+import os
+import signal
+import time
+
+import pytest
+from unittest.mock import Mock
+
+from config import BotConfig, WORKER_MODE
+from sharding import ShardSupervisor, extract_chat_id, shard_for
+from testing.fake_bot_api import FakeBotApi
+
+PROCESS_COMMAND_MODULE = '''
+import os
+
+from commands.icommand_handler import ICommandHandler
+from executor_offload import PROCESS_EXECUTION, ExecutionPolicy
+
+
+class PidCommandHandler(ICommandHandler):
+    async def handle(self, update, context):
+        pass
+
+    def name(self):
+        return "/pid"
+
+    def execution_policy(self):
+        return ExecutionPolicy(PROCESS_EXECUTION, timeout=30)
+
+    def run_blocking(self, request):
+        return f"{os.getppid()} {os.getpid()}"
+'''
+
+
+class TestExtractChatId:
+    """Test cases for the extract_chat_id function."""
+
+    def test_message(self):
+        """Test that message updates use the message chat."""
+        assert extract_chat_id({"update_id": 1, "message": {"chat": {"id": -100}}}) == -100
+
+    def test_callback_query(self):
+        """Test that callback queries use the chat of their message."""
+        data = {"update_id": 1, "callback_query": {"from": {"id": 5}, "message": {"chat": {"id": 9}}}}
+        assert extract_chat_id(data) == 9
+
+    def test_inline_query_uses_sender(self):
+        """Test that chat-less updates fall back to the sender."""
+        assert extract_chat_id({"update_id": 1, "inline_query": {"from": {"id": 5}}}) == 5
+
+    def test_unknown(self):
+        """Test that updates without a chat or sender have no chat id."""
+        assert extract_chat_id({"update_id": 1}) is None
+
+
+class TestShardFor:
+    """Test cases for the shard_for function."""
+
+    def test_stable_and_in_range(self):
+        """Test that a chat always maps to the same worker in range."""
+        for chat_id in (-1001234567890, -5, 0, 7, 123456789):
+            assert shard_for(chat_id, 4) == shard_for(chat_id, 4)
+            assert 0 <= shard_for(chat_id, 4) < 4
+
+    def test_spreads_chats(self):
+        """Test that consecutive chats are spread evenly."""
+        counts = [0, 0, 0]
+        for chat_id in range(300):
+            counts[shard_for(chat_id, 3)] += 1
+        assert counts == [100, 100, 100]
+
+    def test_no_chat_goes_to_first_worker(self):
+        """Test that updates without a chat go to worker 0."""
+        assert shard_for(None, 4) == 0
+
+
+class TestShardSupervisor:
+    """Test cases for ShardSupervisor class."""
+
+    def test_worker_config(self):
+        """Test that workers are fed by the supervisor and share the global rate."""
+        supervisor = ShardSupervisor("123:ABC", BotConfig(workers=3, metrics_port=9100, outbound_global_rate=30))
+
+        config = supervisor.worker_config()
+
+        assert (config.mode, config.metrics_port, config.workers) == (WORKER_MODE, None, 1)
+        assert config.outbound_global_rate == 10
+        assert config.shard_count == 3
+
+    def test_dispatch_preserves_order_per_worker(self):
+        """Test that updates of a chat are queued in order on its worker."""
+        supervisor = ShardSupervisor("123:ABC", BotConfig(workers=2))
+        for worker in supervisor._workers:
+            worker.updates = Mock()
+        fake_api = FakeBotApi()
+
+        for sequence in range(3):
+            for chat_id in (10, 11):
+                update = Mock()
+                update.to_dict.return_value = fake_api.make_command_update(chat_id, f"/ping {sequence}")
+                supervisor.dispatch(update)
+
+        for worker, chat_id in zip(supervisor._workers, (10, 11)):
+            texts = [call.args[0]["message"]["text"] for call in worker.updates.put.call_args_list]
+            chats = {call.args[0]["message"]["chat"]["id"] for call in worker.updates.put.call_args_list}
+            assert texts == ["/ping 0", "/ping 1", "/ping 2"]
+            assert chats == {chat_id}
+        assert supervisor.forwarded == 6
+
+    def test_offset_stops_below_unconfirmed_updates(self, tmp_path):
+        """Test that the saved offset only passes updates every worker has confirmed."""
+        supervisor = ShardSupervisor("123:ABC", BotConfig(workers=2, offset_file=str(tmp_path / "offset")))
+        for worker in supervisor._workers:
+            worker.updates = Mock()
+        fake_api = FakeBotApi()
+        for update_id, chat_id in ((1, 10), (2, 11), (3, 10)):
+            update = Mock(update_id=update_id)
+            update.to_dict.return_value = fake_api.make_command_update(chat_id, "/ping")
+            supervisor.dispatch(update)
+
+        supervisor.confirm(0, 1)
+        supervisor.confirm(0, 3)
+        assert supervisor.offset_store.last_update_id == 1
+        assert list(supervisor._workers[1].pending) == [2]
+
+        supervisor.confirm(1, 2)
+        assert supervisor.offset_store.last_update_id == 3
+        assert not any(worker.pending for worker in supervisor._workers)
+
+    @pytest.mark.asyncio
+    async def test_workers_answer_and_restart(self):
+        """Test end to end that workers reply, report metrics and are restarted after a crash."""
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        config = BotConfig(
+            base_url=fake_api.base_url, workers=2,
+            outbound_global_rate=1e6, outbound_chat_rate=1e6, outbound_group_rate=1e6,
+        )
+        supervisor = ShardSupervisor(fake_api.token, config, metrics_interval=0.1, monitor_interval=0.1)
+        await supervisor.start()
+        try:
+            for chat_id in (1, 2, 3, 4):
+                await fake_api.push_update(fake_api.make_command_update(chat_id, "/ping"))
+            for chat_id in (1, 2, 3, 4):
+                await fake_api.wait_for_chat_messages(chat_id, 1, timeout=30)
+
+            crashed_pid = supervisor.worker_pids[1]
+            os.kill(crashed_pid, signal.SIGKILL)
+            deadline = time.monotonic() + 10
+            while supervisor.restarts == 0 and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            assert supervisor.restarts == 1
+            assert supervisor.worker_pids[1] != crashed_pid
+
+            await fake_api.push_update(fake_api.make_command_update(3, "/ping"))
+            await fake_api.wait_for_chat_messages(3, 2, timeout=30)
+            await asyncio.sleep(0.3)
+            text = supervisor.merged_metrics().render_prometheus()
+        finally:
+            await supervisor.stop()
+            await fake_api.stop()
+
+        assert 'gserverbot_command_calls_total{command="/ping"}' in text
+        assert "gserverbot_shard_worker_restarts 1.0" in text
+
+    @pytest.mark.asyncio
+    async def test_updates_for_a_dead_worker_are_redelivered(self):
+        """Test that updates forwarded while a worker is down reach its replacement, without delaying other restarts."""
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        config = BotConfig(
+            base_url=fake_api.base_url, workers=2,
+            outbound_global_rate=1e6, outbound_chat_rate=1e6, outbound_group_rate=1e6,
+        )
+        supervisor = ShardSupervisor(fake_api.token, config, monitor_interval=0.1)
+        await supervisor.start()
+        try:
+            # Worker 0 has crashed often and backs off for 4s, worker 1 for 0.5s
+            supervisor._workers[0].crashes = 3
+            for pid in supervisor.worker_pids:
+                os.kill(pid, signal.SIGKILL)
+            for chat_id in (1, 2, 3):
+                await fake_api.push_update(fake_api.make_command_update(chat_id, "/ping"))
+            for chat_id in (1, 3):
+                await fake_api.wait_for_chat_messages(chat_id, 1, timeout=30)
+            restarts_before_slow_worker = supervisor.restarts
+            await fake_api.wait_for_chat_messages(2, 1, timeout=30)
+        finally:
+            await supervisor.stop()
+            await fake_api.stop()
+
+        assert restarts_before_slow_worker == 1
+        assert supervisor.restarts == 2
+        assert not any(worker.pending for worker in supervisor._workers)
+
+    @pytest.mark.asyncio
+    async def test_process_policy_commands_run_in_workers(self, tmp_path, monkeypatch):
+        """Test that workers can start process pools for commands with a process execution policy."""
+        (tmp_path / "sharded_pid_command.py").write_text(PROCESS_COMMAND_MODULE)
+        manifest = tmp_path / "manifest.json"
+        manifest.write_text(json.dumps({"commands": [
+            {"name": "/pid", "module": "sharded_pid_command", "class": "PidCommandHandler"},
+        ]}))
+        # Spawned workers start with the supervisor's import path
+        monkeypatch.syspath_prepend(str(tmp_path))
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        config = BotConfig(base_url=fake_api.base_url, workers=2, commands_manifest=str(manifest))
+        supervisor = ShardSupervisor(fake_api.token, config)
+        await supervisor.start()
+        try:
+            for chat_id in (1, 2):
+                await fake_api.push_update(fake_api.make_command_update(chat_id, "/pid"))
+            replies = [(await fake_api.wait_for_chat_messages(chat_id, 1, timeout=30))[0].text for chat_id in (1, 2)]
+            worker_pids = supervisor.worker_pids
+        finally:
+            await supervisor.stop()
+            await fake_api.stop()
+
+        for reply, worker_pid in zip(replies, reversed(worker_pids)):
+            parent, pool_process = map(int, reply.split())
+            assert parent == worker_pid and pool_process != worker_pid
+        assert not any(worker.process.is_alive() for worker in supervisor._workers)
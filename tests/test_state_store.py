@@ -0,0 +1,138 @@
+import sqlite3
+
+import pytest
+import pytest_asyncio
+from unittest.mock import Mock
+
+from bot_services import BOT_SERVICES_KEY, BotServices
+from state_store import StateStore, get_chat_state
+
+
+class TestStateStore:
+    """Test cases for StateStore class."""
+
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        return str(tmp_path / "state.db")
+
+    @pytest_asyncio.fixture
+    async def store(self, db_path):
+        """Start a store that only flushes when asked to."""
+        store = StateStore(db_path, flush_interval=3600, batch_size=100)
+        await store.start()
+        yield store
+        await store.stop()
+
+    def rows(self, db_path):
+        with sqlite3.connect(db_path) as connection:
+            return connection.execute("SELECT chat_id, key, value FROM chat_state ORDER BY chat_id, key").fetchall()
+
+    @pytest.mark.asyncio
+    async def test_uses_wal(self, store, db_path):
+        """Test that the database runs in WAL mode."""
+        with sqlite3.connect(db_path) as connection:
+            assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    @pytest.mark.asyncio
+    async def test_writes_are_buffered_until_flush(self, store, db_path):
+        """Test that writes are readable at once but committed by the flush."""
+        await store.set(1, "greeting", {"text": "hi"})
+
+        assert await store.get(1, "greeting") == {"text": "hi"}
+        assert self.rows(db_path) == []
+        assert await store.flush() == 1
+        assert self.rows(db_path) == [(1, "greeting", '{"text": "hi"}')]
+
+    @pytest.mark.asyncio
+    async def test_batch_size_triggers_flush(self, store, db_path):
+        """Test that reaching the batch size commits without waiting for the timer."""
+        for index in range(100):
+            await store.set(1, f"k{index}", index)
+        await store._flush_task
+
+        assert len(self.rows(db_path)) == 100
+        assert store.stats().flushes == 1
+
+    @pytest.mark.asyncio
+    async def test_only_last_write_per_key_is_committed(self, store, db_path):
+        """Test that repeated writes to a key collapse into one row."""
+        for value in range(10):
+            await store.set(1, "counter", value)
+        await store.flush()
+
+        assert self.rows(db_path) == [(1, "counter", "9")]
+        assert store.stats().rows_flushed == 1
+
+    @pytest.mark.asyncio
+    async def test_delete(self, store, db_path):
+        """Test that deletions are buffered and committed."""
+        await store.set(1, "k", 1)
+        await store.flush()
+        await store.delete(1, "k")
+
+        assert await store.get(1, "k", "gone") == "gone"
+        await store.flush()
+        assert self.rows(db_path) == []
+
+    @pytest.mark.asyncio
+    async def test_scan(self, store):
+        """Test that a key is read across chats, including buffered writes."""
+        await store.set(1, "alerts", [1])
+        await store.set(2, "alerts", [2])
+        await store.set(2, "lang", "en")
+        await store.flush()
+        await store.set(3, "alerts", [3])
+        await store.delete(1, "alerts")
+
+        assert await store.scan("alerts") == {2: [2], 3: [3]}
+
+    @pytest.mark.asyncio
+    async def test_read_through_cache(self, db_path):
+        """Test that a value read from disk is served from the cache afterwards."""
+        writer = StateStore(db_path)
+        await writer.start()
+        await writer.set(7, "lang", "en")
+        await writer.stop()
+
+        reader = StateStore(db_path, cache_size=10)
+        await reader.start()
+        try:
+            assert await reader.get(7, "lang") == "en"
+            assert await reader.get(7, "lang") == "en"
+            assert await reader.get(7, "missing") is None
+            assert await reader.get(7, "missing") is None
+        finally:
+            await reader.stop()
+
+        stats = reader.stats()
+        assert (stats.reads, stats.cache_hits) == (4, 2)
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes(self, db_path):
+        """Test that buffered writes are committed on shutdown."""
+        store = StateStore(db_path, flush_interval=3600)
+        await store.start()
+        await store.set(1, "k", [1, 2])
+        await store.stop()
+
+        assert self.rows(db_path) == [(1, "k", "[1, 2]")]
+
+    @pytest.mark.asyncio
+    async def test_rejects_unserializable_values(self, store):
+        """Test that only JSON-serializable values are accepted."""
+        with pytest.raises(TypeError):
+            await store.set(1, "k", object())
+
+    @pytest.mark.asyncio
+    async def test_chat_state_view(self, store):
+        """Test that handlers get a view scoped to the update's chat."""
+        update = Mock()
+        update.effective_chat.id = 42
+        context = Mock(bot_data={BOT_SERVICES_KEY: BotServices(state_store=store)})
+
+        state = get_chat_state(update, context)
+        await state.set("mode", "quiet")
+
+        assert state.chat_id == 42
+        assert await store.get(42, "mode") == "quiet"
+        assert get_chat_state(update, Mock(bot_data={})) is None
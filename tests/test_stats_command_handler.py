@@ -0,0 +1,48 @@
+import pytest
+from unittest.mock import AsyncMock, Mock
+from telegram import Message, Update, User
+
+from bot_services import BOT_SERVICES_KEY, BotServices
+from commands.stats import StatsCommandHandler
+from metrics import MetricsRegistry
+
+
+class TestStatsCommandHandler:
+    """Test cases for StatsCommandHandler class."""
+
+    @pytest.fixture
+    def metrics(self):
+        """Create a registry with one recorded command and one gauge."""
+        metrics = MetricsRegistry()
+        metrics.record_command('/ping', 0.002, failed=False)
+        metrics.register_gauge("outbound_queued_messages", "Queued texts.", lambda: 4)
+        return metrics
+
+    def make_update(self, user_id):
+        """Create a mock update sent by the given user."""
+        update = Mock(spec=Update)
+        update.effective_user = Mock(spec=User, id=user_id)
+        update.message = Mock(spec=Message)
+        update.message.reply_text = AsyncMock()
+        return update
+
+    def make_context(self, metrics, admin_user_ids):
+        """Create a context carrying bot services without an outbound queue."""
+        context = Mock()
+        context.bot_data = {BOT_SERVICES_KEY: BotServices(metrics=metrics, admin_user_ids=frozenset(admin_user_ids))}
+        return context
+
+    def test_name(self):
+        """Test that the handler answers to /stats."""
+        assert StatsCommandHandler().name() == '/stats'
+
+    @pytest.mark.asyncio
+    async def test_admin_gets_stats(self, metrics):
+        """Test that admins receive latency and gauge figures."""
+        update = self.make_update(42)
+
+        await StatsCommandHandler().handle(update, self.make_context(metrics, {42}))
+
+        text = update.message.reply_text.call_args[0][0]
+        assert "/ping: 1 / 0" in text
+        assert "outbound_queued_messages: 4" in text
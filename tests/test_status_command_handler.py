@@ -0,0 +1,50 @@
+import pytest
+from unittest.mock import Mock
+
+from bot_services import BOT_SERVICES_KEY, BotServices
+from commands.status import StatusCommandHandler, format_value
+
+
+class FakeSampler:
+    """Stand-in sampler returning fixed summaries."""
+
+    def summary(self, metric, window):
+        if metric == "net_tx":
+            return None
+        return Mock(latest=2048.0 if metric == "net_rx" else 12.5, average=10.0)
+
+
+class TestStatusCommandHandler:
+    """Test cases for StatusCommandHandler class."""
+
+    def make_context(self, sampler):
+        context = Mock()
+        context.bot_data = {BOT_SERVICES_KEY: BotServices(host_metrics=sampler)}
+        return context
+
+    def test_name_and_cache_policy(self):
+        """Test that /status is cached globally for a short time."""
+        handler = StatusCommandHandler()
+        assert handler.name() == '/status'
+        assert handler.cache_policy().scope == "global"
+
+    @pytest.mark.asyncio
+    async def test_render_uses_sampler(self):
+        """Test that the reply lists the sampled metrics."""
+        text = await StatusCommandHandler().render(Mock(), self.make_context(FakeSampler()))
+
+        assert "cpu: 12.5% / 10.0%" in text
+        assert "net_rx: 2.0 KB/s" in text
+        assert "net_tx: n/a" in text
+
+    @pytest.mark.asyncio
+    async def test_render_without_sampler(self):
+        """Test the reply when no sampler is running."""
+        text = await StatusCommandHandler().render(Mock(), self.make_context(None))
+        assert "not being collected" in text
+
+    def test_format_value(self):
+        """Test units and byte-rate prefixes."""
+        assert format_value(3.14159, "%") == "3.1%"
+        assert format_value(0.5, "") == "0.50"
+        assert format_value(5 * 1024 * 1024, "B/s") == "5.0 MB/s"
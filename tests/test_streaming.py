@@ -0,0 +1,304 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, Mock
+from telegram import Chat, Message, Update
+from telegram.error import BadRequest, NetworkError
+
+from streaming import FINAL_FLUSH_ATTEMPTS, StreamPolicy, StreamingReply, split_pages, stream_reply
+
+
+def make_update(chat_type=Chat.PRIVATE):
+    """Create an update whose replies are mock messages recording their edits."""
+    update = Mock(spec=Update)
+    update.effective_chat = Mock(type=chat_type)
+    update.message = Mock(spec=Message)
+    update.sent = []
+
+    async def reply_text(text, **kwargs):
+        message = Mock(spec=Message)
+        message.text = text
+        message.edits = []
+
+        async def edit_text(new_text):
+            message.edits.append(new_text)
+            message.text = new_text
+            return message
+
+        message.edit_text = AsyncMock(side_effect=edit_text)
+        update.sent.append(message)
+        return message
+
+    update.message.reply_text = AsyncMock(side_effect=reply_text)
+    return update
+
+
+async def chunks_of(pieces, pause=0.0):
+    """Yield pieces of output, optionally pausing between them."""
+    for piece in pieces:
+        yield piece
+        await asyncio.sleep(pause)
+
+
+class TestSplitPages:
+    """Test cases for the split_pages function."""
+
+    def test_short_text_is_one_page(self):
+        """Test that text within the limit stays whole."""
+        assert split_pages("hello") == ["hello"]
+        assert split_pages("") == [""]
+
+    def test_splits_at_line_breaks(self):
+        """Test that pages end at the last line break within the limit."""
+        assert split_pages("aaa\nbbb\nccc", limit=8) == ["aaa\nbbb", "ccc"]
+
+    def test_hard_cut_without_line_breaks(self):
+        """Test that a line longer than the limit is cut at the limit."""
+        assert split_pages("abcdefgh", limit=3) == ["abc", "def", "gh"]
+
+    def test_appending_keeps_earlier_pages(self):
+        """Test that growing text never moves an existing page boundary."""
+        text = "".join(f"line {number}\n" for number in range(2000))
+        full = split_pages(text)
+        for length in range(5000, len(text), 777):
+            partial = split_pages(text[:length])
+            assert partial[:-1] == full[:len(partial) - 1]
+
+
+class TestStreamingReply:
+    """Test cases for StreamingReply class."""
+
+    @pytest.mark.asyncio
+    async def test_pieces_are_edited_into_one_message(self):
+        """Test that streamed pieces end up in one message edited in place."""
+        update = make_update()
+
+        stats = await stream_reply(update, Mock(bot_data={}), chunks_of(["a", "b", "c"]), StreamPolicy(min_interval=0))
+
+        assert len(update.sent) == 1
+        assert update.sent[0].text == "abc"
+        assert stats.messages == 1
+        assert stats.chunks == 3
+
+    @pytest.mark.asyncio
+    async def test_fast_output_is_merged(self):
+        """Test that API calls stay bounded however fast output is produced."""
+        update = make_update()
+        policy = StreamPolicy(min_interval=0.05)
+
+        started = asyncio.get_running_loop().time()
+        stats = await stream_reply(update, Mock(bot_data={}), chunks_of(["x"] * 300, pause=0.001), policy)
+        elapsed = asyncio.get_running_loop().time() - started
+
+        calls = stats.messages + stats.edits
+        assert update.sent[0].text == "x" * 300
+        assert calls <= elapsed / policy.min_interval + 2
+        assert calls < 50
+
+    @pytest.mark.asyncio
+    async def test_unchanged_output_is_not_edited(self):
+        """Test that flushes without new text make no API call."""
+        update = make_update()
+        reply = StreamingReply(update, Mock(bot_data={}), StreamPolicy(min_interval=0))
+
+        await reply.run(chunks_of(["same"]))
+        await reply.flush()
+
+        assert update.sent[0].edits == []
+        assert reply.stats.edits == 0
+
+    @pytest.mark.asyncio
+    async def test_rollover_at_message_limit(self):
+        """Test that output beyond 4096 characters continues in a new message."""
+        update = make_update()
+        lines = [f"{number:05d}\n" for number in range(1500)]
+
+        stats = await stream_reply(update, Mock(bot_data={}), chunks_of(lines), StreamPolicy(min_interval=0))
+
+        assert stats.messages == 3
+        assert all(len(message.text) <= 4096 for message in update.sent)
+        assert "\n".join(message.text for message in update.sent) == "".join(lines)
+
+    @pytest.mark.asyncio
+    async def test_replace_mode(self):
+        """Test that in replace mode each piece replaces the output."""
+        update = make_update()
+        policy = StreamPolicy(min_interval=0, replace=True)
+
+        await stream_reply(update, Mock(bot_data={}), chunks_of(["10%", "50%", "done"], pause=0.01), policy)
+
+        assert update.sent[0].text == "done"
+
+    @pytest.mark.asyncio
+    async def test_blank_output_waits(self):
+        """Test that nothing is sent until the output has visible text."""
+        update = make_update()
+
+        await stream_reply(update, Mock(bot_data={}), chunks_of(["  ", "\n", "ok"]), StreamPolicy(min_interval=0))
+
+        assert [message.text for message in update.sent] == ["  \nok"]
+
+    @pytest.mark.asyncio
+    async def test_failing_stream_flushes_partial_output(self):
+        """Test that output produced before a failure is shown before the error propagates."""
+        update = make_update()
+
+        async def failing():
+            yield "partial"
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            await stream_reply(update, Mock(bot_data={}), failing(), StreamPolicy(min_interval=10))
+
+        assert update.sent[0].text == "partial"
+
+    @pytest.mark.asyncio
+    async def test_not_modified_is_ignored(self):
+        """Test that Telegram's 'message is not modified' error does not fail the stream."""
+        update = make_update()
+        reply = StreamingReply(update, Mock(bot_data={}), StreamPolicy(min_interval=0))
+        await reply.run(chunks_of(["a"]))
+        update.sent[0].edit_text = AsyncMock(side_effect=BadRequest("Message is not modified"))
+
+        await reply.run(chunks_of(["  "]))
+
+        assert reply.stats.edits == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_edits_are_retried(self):
+        """Test that edits failing with network errors are retried on the next flush while output keeps coming."""
+        update = make_update()
+        reply = StreamingReply(update, Mock(bot_data={}), StreamPolicy(min_interval=0.01))
+        failures = [NetworkError("Connection reset"), BadRequest("Message can't be edited")]
+
+        async def pieces():
+            yield "0"
+            await asyncio.sleep(0.05)
+            message = update.sent[0]
+            edit_text = message.edit_text.side_effect
+
+            async def flaky_edit(text):
+                if failures:
+                    raise failures.pop(0)
+                return await edit_text(text)
+
+            message.edit_text = AsyncMock(side_effect=flaky_edit)
+            for index in range(1, 10):
+                yield f" {index}"
+                await asyncio.sleep(0.02)
+
+        await reply.run(pieces())
+
+        assert update.sent[0].text == "0 1 2 3 4 5 6 7 8 9"
+        assert reply.stats.failed_flushes == 2
+        assert reply.stats.edits > 1
+
+    @pytest.mark.asyncio
+    async def test_final_flush_gives_up(self):
+        """Test that the final flush is tried a few times before its error is raised."""
+        update = make_update()
+        reply = StreamingReply(update, Mock(bot_data={}), StreamPolicy(min_interval=0))
+        await reply.run(chunks_of(["a"]))
+        update.sent[0].edit_text = AsyncMock(side_effect=NetworkError("Connection reset"))
+
+        with pytest.raises(NetworkError):
+            await reply.run(chunks_of(["ab"]))
+
+        assert update.sent[0].edit_text.await_count == FINAL_FLUSH_ATTEMPTS
+
+    def test_groups_flush_less_often(self):
+        """Test that the group interval applies outside private chats."""
+        policy = StreamPolicy(min_interval=1.0, group_interval=3.0)
+        assert StreamingReply(make_update(Chat.GROUP), Mock(), policy)._interval == 3.0
+        assert StreamingReply(make_update(), Mock(), policy)._interval == 1.0
+
+    def test_negative_interval_is_rejected(self):
+        """Test that a negative interval is rejected."""
+        with pytest.raises(ValueError):
+            StreamPolicy(min_interval=-1)
+
+
+class TestStreamingEndToEnd:
+    """Test cases for streamed commands through a running bot."""
+
+    @pytest.mark.asyncio
+    async def test_streamed_command_edits_in_place(self):
+        """Test that a streaming handler's output is edited into place through the Bot API."""
+        from bot import TelegramBot
+        from command_handlers_manager import CommandHandlersManager
+        from command_handlers_registry import CommandHandlersRegistry
+        from commands.icommand_handler import ICommandHandler
+        from config import BotConfig
+        from testing.fake_bot_api import FakeBotApi
+
+        class CountCommandHandler(ICommandHandler):
+            async def handle(self, update, context):
+                raise AssertionError("streaming handlers are not called through handle")
+
+            def name(self):
+                return '/count'
+
+            def stream_policy(self):
+                return StreamPolicy(min_interval=0.05)
+
+            async def stream(self, update, context):
+                for number in range(1500):
+                    yield f"{number}\n"
+                    if number % 50 == 0:
+                        await asyncio.sleep(0.01)
+
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        registry = CommandHandlersRegistry()
+        registry.add(CountCommandHandler())
+        manager = CommandHandlersManager(registry, manifest_path=None, use_entry_points=False)
+        bot = TelegramBot(fake_api.token, manager, BotConfig(base_url=fake_api.base_url))
+        try:
+            await bot.start()
+            try:
+                await fake_api.push_update(fake_api.make_command_update(5, "/count"))
+                await fake_api.wait_for_chat_messages(5, 2)
+                await asyncio.sleep(0.3)
+            finally:
+                await bot.stop()
+        finally:
+            await fake_api.stop()
+
+        texts = [fake_api.message_texts[(5, m.message_id)] for m in fake_api.sent_by_chat[5]]
+        assert "\n".join(texts) == "".join(f"{number}\n" for number in range(1500))
+        assert fake_api.calls["sendMessage"] == 2
+        assert fake_api.calls["editMessageText"] < 30
+
+    @pytest.mark.asyncio
+    async def test_other_replies_are_not_merged_into_the_stream(self):
+        """Test that a text queued for the same chat keeps its own message while the stream is edited."""
+        from telegram import Bot
+        from bot_services import BOT_SERVICES_KEY, BotServices
+        from outbound import OutboundQueue
+        from testing.fake_bot_api import FakeBotApi
+
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        bot = Bot(fake_api.token, base_url=fake_api.base_url)
+        await bot.initialize()
+        queue = OutboundQueue(bot, chat_rate=10.0, chat_burst=1)
+        await queue.start()
+        update = Mock(spec=Update)
+        update.effective_chat = Mock(type=Chat.PRIVATE)
+        update.effective_message.chat.type = Chat.PRIVATE
+        update.effective_message.chat_id = 5
+        context = Mock(bot_data={BOT_SERVICES_KEY: BotServices(outbound=queue)})
+        try:
+            await queue.send_text(5, "earlier")
+            # Waits behind the chat limit together with the stream's first page
+            alert = queue.enqueue(5, "alert")
+            await stream_reply(update, context, chunks_of(["a", "b", "c"], pause=0.15), StreamPolicy(min_interval=0))
+            alert = await alert
+        finally:
+            await queue.stop()
+            await bot.shutdown()
+            await fake_api.stop()
+
+        texts = [fake_api.message_texts[(5, m.message_id)] for m in fake_api.sent_by_chat[5]]
+        assert texts == ["earlier", "alert", "abc"]
+        assert fake_api.message_texts[(5, alert.message_id)] == "alert"
@@ -0,0 +1,108 @@
+import io
+import json
+import logging
+import sys
+import threading
+import time
+
+import pytest
+
+from config import BotConfig
+from structured_logging import JsonFormatter, configure_logging
+from tracing import Tracer, activate, deactivate
+
+
+class SlowStream(io.StringIO):
+    """A stream whose writes block until released, like a stalled pipe."""
+
+    def __init__(self):
+        super().__init__()
+        self.released = threading.Event()
+
+    def write(self, text):
+        self.released.wait(5)
+        return super().write(text)
+
+
+@pytest.fixture
+def root_logger():
+    """Restore the root logger's handlers and level after a test reconfigures it."""
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+class TestJsonFormatter:
+    """Test cases for JsonFormatter class."""
+
+    def test_fields(self):
+        """Test that a record becomes one JSON object with its extra fields and exception."""
+        try:
+            raise ValueError("bad")
+        except ValueError:
+            record = logging.getLogger("bot").makeRecord(
+                "bot", logging.ERROR, __file__, 1, "Update %d failed", (7,), exc_info=sys.exc_info(),
+                extra={"chat_id": 5},
+            )
+
+        entry = json.loads(JsonFormatter({"worker": 2}).format(record))
+
+        assert entry["time"].endswith("Z")
+        assert {key: entry[key] for key in ("level", "logger", "message", "chat_id", "worker")} == {
+            "level": "ERROR", "logger": "bot", "message": "Update 7 failed", "chat_id": 5, "worker": 2,
+        }
+        assert entry["exception"].endswith("ValueError: bad")
+
+
+class TestConfigureLogging:
+    """Test cases for the configure_logging function."""
+
+    def test_records_carry_the_current_span(self, root_logger):
+        """Test that records logged inside a span carry its trace and span ids."""
+        stream = io.StringIO()
+        listener = configure_logging("INFO", stream=stream)
+        root = Tracer().begin("update")
+        token = activate(root)
+        try:
+            logging.getLogger("handler").info("Handling %s", "/ping")
+        finally:
+            deactivate(token)
+        logging.getLogger("handler").debug("Below the level")
+        listener.stop()
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert len(lines) == 1
+        assert lines[0]["message"] == "Handling /ping"
+        assert (lines[0]["trace_id"], lines[0]["span_id"]) == (root.trace_id, root.span_id)
+
+    def test_logging_does_not_wait_for_the_stream(self, root_logger):
+        """Test that a stalled output delays the writer thread, not the caller."""
+        stream = SlowStream()
+        listener = configure_logging("INFO", "text", stream=stream, static_fields={"worker": 1})
+
+        started = time.perf_counter()
+        for index in range(100):
+            logging.getLogger("bot").info("Line %d", index)
+        elapsed = time.perf_counter() - started
+        stream.released.set()
+        listener.stop()
+
+        assert elapsed < 1.0
+        lines = stream.getvalue().splitlines()
+        assert len(lines) == 100
+        assert lines[-1].endswith("[worker 1] INFO bot: Line 99")
+
+    def test_invalid_settings(self, root_logger):
+        """Test that unknown levels and formats are rejected."""
+        with pytest.raises(ValueError):
+            configure_logging("LOUD")
+        with pytest.raises(ValueError):
+            configure_logging("INFO", "xml")
+        with pytest.raises(ValueError, match="LOG_FORMAT"):
+            BotConfig.from_env({"LOG_FORMAT": "xml"})
+        assert (BotConfig.from_env({"LOG_LEVEL": "debug"}).log_level, BotConfig().log_format) == ("DEBUG", "json")
@@ -0,0 +1,90 @@
+import heapq
+import random
+
+import pytest
+
+from timer_wheel import TimerWheel
+
+
+class TestTimerWheel:
+    """Test cases for TimerWheel class."""
+
+    @pytest.mark.parametrize("kwargs", [{"tick": 0}, {"tick": 1, "slot_bits": 0}, {"tick": 1, "levels": 0}])
+    def test_invalid(self, kwargs):
+        """Test that a wheel without ticks or slots is rejected."""
+        with pytest.raises(ValueError):
+            TimerWheel(**kwargs)
+
+    def test_expires_at_deadline(self):
+        """Test that a timer fires on the first advance reaching its time, rounded up to a tick."""
+        wheel = TimerWheel(tick=1.0, now=100.0)
+        wheel.schedule(102.5, "a")
+
+        assert wheel.advance(102.9) == []
+        assert wheel.advance(103.0) == ["a"]
+        assert wheel.advance(200.0) == [] and len(wheel) == 0
+
+    def test_past_times_fire_on_next_tick(self):
+        """Test that a timer in the past fires on the next advance."""
+        wheel = TimerWheel(tick=1.0, now=10.0)
+        wheel.advance(20.0)
+        timer = wheel.schedule(5.0, "late")
+
+        assert timer.active
+        assert wheel.advance(21.0) == ["late"]
+        assert not timer.active
+
+    def test_cancel(self):
+        """Test that a cancelled timer never fires and cannot be cancelled twice."""
+        wheel = TimerWheel(tick=1.0)
+        timer = wheel.schedule(5.0, "a")
+        wheel.schedule(5.0, "b")
+
+        assert wheel.cancel(timer)
+        assert not wheel.cancel(timer)
+        assert len(wheel) == 1
+        assert wheel.advance(10.0) == ["b"]
+
+    def test_far_timers_cascade(self):
+        """Test that timers on every level and past the wheel's span fire on time."""
+        wheel = TimerWheel(tick=1.0, slot_bits=2, levels=2)
+        # Two levels of four slots span 16 ticks
+        for when in (3, 7, 15, 16, 40, 100):
+            wheel.schedule(when, when)
+
+        fired = {}
+        for now in range(1, 101):
+            for item in wheel.advance(now):
+                fired[item] = now
+
+        assert fired == {3: 3, 7: 7, 15: 15, 16: 16, 40: 40, 100: 100}
+
+    def test_matches_a_heap(self):
+        """Test that random schedules, cancels and advances fire like a heap would."""
+        rng = random.Random(7)
+        wheel = TimerWheel(tick=0.5, slot_bits=3, levels=3)
+        heap, cancelled, timers = [], set(), {}
+        now = 0.0
+        for step in range(3000):
+            action = rng.random()
+            if action < 0.5:
+                when = now + rng.choice([rng.uniform(0, 4), rng.uniform(0, 300), rng.uniform(0, 5000)])
+                deadline = max(int(now / 0.5) + 1, -(-when // 0.5))
+                timers[step] = wheel.schedule(when, step)
+                heapq.heappush(heap, (deadline, step))
+            elif action < 0.7 and timers:
+                step_id = rng.choice(list(timers))
+                wheel.cancel(timers.pop(step_id))
+                cancelled.add(step_id)
+            else:
+                now += rng.choice([0.5, 3.0, 40.0, 700.0])
+                expected = []
+                while heap and heap[0][0] <= int(now / 0.5):
+                    _, item = heapq.heappop(heap)
+                    if item not in cancelled:
+                        expected.append(item)
+                fired = wheel.advance(now)
+                assert sorted(fired) == sorted(expected)
+                for item in fired:
+                    timers.pop(item)
+        assert len(wheel) == len(timers)
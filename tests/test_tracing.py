@@ -0,0 +1,218 @@
+import asyncio
+import json
+
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from command_router import CommandRouter
+from config import BotConfig
+from tracing import LogSpanExporter, OtlpFileExporter, Tracer, activate, current_span, deactivate, span, to_otlp
+from tests.conftest import FakeClock, make_update
+
+
+class RecordingExporter:
+    """Keeps the traces it is given."""
+
+    def __init__(self):
+        self.traces = []
+
+    def export(self, trace):
+        self.traces.append(trace)
+
+    def close(self):
+        pass
+
+
+class TestTracer:
+    """Test cases for Tracer class."""
+
+    def test_sampling(self):
+        """Test that only the sampled share of updates is traced."""
+        draws = iter([0.05, 0.5])
+        tracer = Tracer(sample_rate=0.1, draw=lambda: next(draws))
+
+        assert tracer.begin("update") is not None
+        assert tracer.begin("update") is None
+        assert not Tracer(sample_rate=0.0).enabled
+
+    def test_slow_updates_are_exported_unsampled(self):
+        """Test that with a threshold every update is timed but only slow ones are exported."""
+        clock = FakeClock()
+        exporter = RecordingExporter()
+        tracer = Tracer(exporter, sample_rate=0.0, slow_threshold=0.5, clock=clock)
+
+        fast = tracer.begin("update")
+        clock.now += 0.1
+        tracer.end(fast)
+        slow = tracer.begin("update", command="/status")
+        clock.now += 2.0
+        tracer.end(slow)
+
+        assert [trace.root for trace in exporter.traces] == [slow]
+        assert not exporter.traces[0].sampled
+        stats = tracer.stats()
+        assert (stats.started, stats.exported, stats.discarded) == (2, 1, 1)
+
+    def test_invalid_settings(self):
+        """Test that the sample rate must be a share."""
+        with pytest.raises(ValueError):
+            Tracer(sample_rate=1.5)
+        with pytest.raises(ValueError):
+            BotConfig.from_env({"TRACE_SAMPLE_RATE": "-1"})
+
+    def test_config_from_env(self):
+        """Test reading the tracing settings."""
+        config = BotConfig.from_env({
+            "TRACE_SAMPLE_RATE": "0.25", "TRACE_SLOW_SECONDS": "1.5", "TRACE_FILE": "/tmp/traces.jsonl",
+        })
+
+        assert (config.trace_sample_rate, config.trace_slow_seconds, config.trace_file) == (
+            0.25, 1.5, "/tmp/traces.jsonl")
+        assert BotConfig.from_env({}).trace_sample_rate == 0.0
+
+
+class TestSpans:
+    """Test cases for the span context manager."""
+
+    def test_outside_a_trace(self):
+        """Test that spans are no-ops when nothing is traced."""
+        with span("send") as opened:
+            assert opened is None
+            assert current_span() is None
+
+    @pytest.mark.asyncio
+    async def test_nesting_and_failures(self):
+        """Test that spans nest under the current span and record failures."""
+        root = Tracer().begin("update")
+        token = activate(root)
+        try:
+            with span("handler") as handler:
+                assert current_span() is handler
+                with pytest.raises(RuntimeError):
+                    with span("send", chat_id=5):
+                        raise RuntimeError("boom")
+            assert current_span() is root
+        finally:
+            deactivate(token)
+
+        names = [(s.name, s.parent_id, s.failed) for s in root.trace.spans]
+        assert names == [("update", None, False), ("handler", root.span_id, False), ("send", handler.span_id, True)]
+        assert root.trace.spans[2].attributes == {"chat_id": 5}
+
+
+class TestOtlpExport:
+    """Test cases for the OTLP JSON encoding and file exporter."""
+
+    def test_encoding(self):
+        """Test that spans are encoded with ids, timestamps, attributes and status."""
+        clock = FakeClock()
+        root = Tracer(clock=clock).begin("update", update_id=7, command="/ping")
+        clock.now += 0.25
+        child = root.child("handler", end=clock.now)
+        child.failed = True
+        root.end = clock.now
+
+        request = to_otlp([root.trace])
+
+        spans = request["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert [s["name"] for s in spans] == ["update", "handler"]
+        assert spans[0]["traceId"] == root.trace_id and len(root.trace_id) == 32
+        assert "parentSpanId" not in spans[0] and spans[1]["parentSpanId"] == root.span_id
+        assert int(spans[0]["endTimeUnixNano"]) - int(spans[0]["startTimeUnixNano"]) == pytest.approx(250_000_000, abs=1000)
+        assert spans[0]["attributes"] == [
+            {"key": "update_id", "value": {"intValue": "7"}},
+            {"key": "command", "value": {"stringValue": "/ping"}},
+        ]
+        assert spans[1]["status"] == {"code": 2}
+
+    def test_file_exporter(self, tmp_path):
+        """Test that traces are appended as JSON lines and written out on close."""
+        path = tmp_path / "traces.jsonl"
+        exporter = OtlpFileExporter(str(path))
+        tracer = Tracer(exporter)
+        for update_id in range(3):
+            tracer.end(tracer.begin("update", update_id=update_id))
+        tracer.close()
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        spans = [s for line in lines for s in line["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+        assert [s["attributes"][0]["value"]["intValue"] for s in spans] == ["0", "1", "2"]
+
+    def test_log_exporter(self, caplog):
+        """Test that a trace is logged with its stage durations."""
+        clock = FakeClock()
+        root = Tracer(clock=clock).begin("update", command="/ping")
+        root.child("parse", clock.now, clock.now + 0.001)
+        root.end = clock.now + 0.004
+
+        with caplog.at_level("INFO"):
+            LogSpanExporter().export(root.trace)
+
+        record = caplog.records[-1]
+        assert record.getMessage() == "update /ping took 4.0 ms"
+        assert record.trace_id == root.trace_id and record.stages_ms == {"update": 4.0, "parse": 1.0}
+
+
+class TestRouterTracing:
+    """Test cases for traces of updates handled by the command router."""
+
+    @pytest.mark.asyncio
+    async def test_update_stages(self):
+        """Test that a traced update records its parse, dispatch, handler and send stages."""
+        exporter = RecordingExporter()
+
+        async def handle(update, context):
+            with span("send"):
+                await asyncio.sleep(0)
+
+        handler = Mock()
+        handler.name.return_value = '/ping'
+        handler.stream_policy.return_value = None
+        handler.handle = AsyncMock(side_effect=handle)
+        router = CommandRouter({'/ping': handler}.get, tracer=Tracer(exporter))
+        update = make_update('/ping')
+
+        await router.handle_update(update, Mock(), router.check_update(update), Mock())
+
+        trace, = exporter.traces
+        assert [s.name for s in trace.spans] == ["update", "parse", "dispatch", "handler", "send"]
+        assert trace.root.attributes == {"update_id": 1, "command": "/ping"}
+        assert trace.spans[4].parent_id == trace.spans[3].span_id
+        assert all(s.end is not None and s.end >= s.start for s in trace.spans)
+        assert current_span() is None
+
+    @pytest.mark.asyncio
+    async def test_untraced_router(self):
+        """Test that a disabled tracer leaves the router untouched."""
+        router = CommandRouter({}.get, Mock(), tracer=Tracer(sample_rate=0.0))
+        update = make_update('/nope')
+
+        assert router.check_update(update) == ('/nope', [], None, None)
+        assert router._traces == {}
+
+    @pytest.mark.asyncio
+    async def test_bot_writes_traces_to_file(self, tmp_path):
+        """Test that the bot appends the trace of a /ping, including its reply, to the trace file."""
+        from main import build_bot
+        from testing.fake_bot_api import FakeBotApi
+
+        path = tmp_path / "traces.jsonl"
+        fake_api = FakeBotApi()
+        await fake_api.start()
+        bot = build_bot(fake_api.token, BotConfig(
+            base_url=fake_api.base_url, trace_sample_rate=1.0, trace_file=str(path),
+        ))
+        try:
+            await bot.start()
+            try:
+                await fake_api.push_update(fake_api.make_command_update(5, "/ping"))
+                await fake_api.wait_for_messages(1)
+            finally:
+                await bot.stop()
+        finally:
+            await fake_api.stop()
+
+        spans = [s for line in path.read_text().splitlines()
+                 for s in json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+        assert [s["name"] for s in spans] == ["update", "parse", "dispatch", "handler", "send"]
+        assert len({s["traceId"] for s in spans}) == 1
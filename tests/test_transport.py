@@ -0,0 +1,88 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from telegram import Bot
+from telegram.error import TimedOut
+
+from testing.fake_bot_api import FakeBotApi
+from transport import InstrumentedHTTPXRequest, PoolConfig, TransportConfig
+import transport
+
+
+class TestTransportConfig:
+    """Test cases for TransportConfig class."""
+
+    def test_defaults(self):
+        """Test that getUpdates gets its own single-connection pool by default."""
+        config = TransportConfig.from_env({})
+        assert config.send == PoolConfig()
+        assert config.updates.size == 1
+        assert (config.poll_timeout, config.poll_interval) == (10, 0.0)
+
+    def test_from_env(self):
+        """Test that both pools and the long poll are configured from the environment."""
+        config = TransportConfig.from_env({
+            "TRANSPORT_POOL_SIZE": "64",
+            "TRANSPORT_READ_TIMEOUT": "2.5",
+            "TRANSPORT_KEEPALIVE_EXPIRY": "30",
+            "UPDATES_TRANSPORT_POOL_SIZE": "2",
+            "POLL_TIMEOUT": "50",
+            "POLL_INTERVAL": "0.5",
+        })
+        assert (config.send.size, config.send.read_timeout, config.send.keepalive_expiry) == (64, 2.5, 30.0)
+        assert config.updates.size == 2
+        assert (config.poll_timeout, config.poll_interval) == (50, 0.5)
+
+    def test_http2_falls_back_without_h2(self):
+        """Test that HTTP/2 is only used when the h2 package is installed."""
+        with patch.object(transport, "http2_available", return_value=False):
+            assert TransportConfig.from_env({"TRANSPORT_HTTP_VERSION": "2"}).send.http_version == "1.1"
+        with patch.object(transport, "http2_available", return_value=True):
+            assert TransportConfig.from_env({"TRANSPORT_HTTP_VERSION": "2.0"}).send.http_version == "2"
+
+    def test_invalid_pool(self):
+        """Test that invalid pool settings are rejected."""
+        with pytest.raises(ValueError):
+            TransportConfig.from_env({"TRANSPORT_POOL_SIZE": "0"})
+        with pytest.raises(ValueError):
+            PoolConfig(http_version="3")
+
+
+class TestInstrumentedHTTPXRequest:
+    """Test cases for InstrumentedHTTPXRequest class."""
+
+    @pytest.mark.asyncio
+    async def test_records_pool_waits(self):
+        """Test that requests queued behind a busy connection record their wait."""
+        fake_api = FakeBotApi(response_delay=0.05)
+        await fake_api.start()
+        request = InstrumentedHTTPXRequest(PoolConfig(size=1), "send")
+        try:
+            async with Bot(fake_api.token, base_url=fake_api.base_url, request=request) as bot:
+                await asyncio.gather(*(bot.send_message(1, f"message {index}") for index in range(3)))
+        finally:
+            await fake_api.stop()
+
+        stats = request.stats()
+        # getMe on initialization plus three messages, two of which queued
+        assert (stats.requests, stats.waited, stats.in_use) == (4, 2, 0)
+        assert request.wait_times.count == 4
+        assert stats.wait_time_max >= 0.05
+
+    @pytest.mark.asyncio
+    async def test_pool_timeout(self):
+        """Test that a request finding no free connection in time fails with TimedOut."""
+        fake_api = FakeBotApi(response_delay=0.3)
+        await fake_api.start()
+        request = InstrumentedHTTPXRequest(PoolConfig(size=1, pool_timeout=0.05), "send")
+        try:
+            async with Bot(fake_api.token, base_url=fake_api.base_url, request=request) as bot:
+                results = await asyncio.gather(
+                    bot.send_message(1, "first"), bot.send_message(1, "second"), return_exceptions=True
+                )
+        finally:
+            await fake_api.stop()
+
+        assert isinstance(results[1], TimedOut)
+        assert request.stats().timeouts == 1
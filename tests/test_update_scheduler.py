@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+
+from src.update_scheduler import ChatUpdateScheduler
+
+
+class TestChatUpdateScheduler:
+    """Test cases for ChatUpdateScheduler class."""
+
+    def test_invalid_limits(self):
+        """Test that non-positive limits are rejected."""
+        with pytest.raises(ValueError):
+            ChatUpdateScheduler(max_concurrency=0)
+        with pytest.raises(ValueError):
+            ChatUpdateScheduler(max_queue_size=0)
+
+    @pytest.mark.asyncio
+    async def test_jobs_of_one_chat_run_in_order(self):
+        """Test that jobs of the same chat never overlap and keep their order."""
+        scheduler = ChatUpdateScheduler(max_concurrency=8)
+        order = []
+
+        def make_job(index):
+            async def job():
+                order.append(('start', index))
+                await asyncio.sleep(0.001 * (5 - index))
+                order.append(('end', index))
+            return job
+
+        for index in range(5):
+            scheduler.submit(1, make_job(index))
+        await scheduler.join()
+
+        expected = []
+        for index in range(5):
+            expected += [('start', index), ('end', index)]
+        assert order == expected
+
+    @pytest.mark.asyncio
+    async def test_slow_chat_does_not_block_other_chats(self):
+        """Test that a blocked chat does not delay work in another chat."""
+        scheduler = ChatUpdateScheduler(max_concurrency=4)
+        release = asyncio.Event()
+        done = []
+
+        async def slow():
+            await release.wait()
+            done.append('slow')
+
+        async def fast():
+            done.append('fast')
+
+        scheduler.submit(1, slow)
+        scheduler.submit(2, fast)
+        await asyncio.sleep(0.01)
+
+        assert done == ['fast']
+        release.set()
+        await scheduler.join()
+        assert done == ['fast', 'slow']
+
+    @pytest.mark.asyncio
+    async def test_global_concurrency_limit(self):
+        """Test that no more than max_concurrency jobs run at once."""
+        scheduler = ChatUpdateScheduler(max_concurrency=3)
+        running = 0
+        peak = 0
+
+        async def job():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.005)
+            running -= 1
+
+        for chat_id in range(20):
+            scheduler.submit(chat_id, job)
+        await scheduler.join()
+
+        assert peak == 3
+        assert scheduler.stats().completed == 20
+
+    @pytest.mark.asyncio
+    async def test_full_queue_rejects_jobs(self):
+        """Test that a chat's queue is bounded."""
+        scheduler = ChatUpdateScheduler(max_queue_size=2)
+        release = asyncio.Event()
+
+        async def job():
+            await release.wait()
+
+        assert scheduler.submit(1, job)
+        assert scheduler.submit(1, job)
+        assert not scheduler.submit(1, job)
+        assert scheduler.queue_depth(1) == 2
+        assert scheduler.stats().rejected == 1
+
+        release.set()
+        await scheduler.join()
+
+    @pytest.mark.asyncio
+    async def test_idle_chats_are_evicted(self):
+        """Test that chat queues are dropped once they run empty."""
+        scheduler = ChatUpdateScheduler()
+
+        async def job():
+            pass
+
+        for chat_id in range(1000):
+            scheduler.submit(chat_id, job)
+        assert scheduler.stats().active_chats == 1000
+
+        await scheduler.join()
+
+        stats = scheduler.stats()
+        assert stats.active_chats == 0
+        assert stats.queued == 0
+        assert scheduler.queue_depth(0) == 0
+
+    @pytest.mark.asyncio
+    async def test_failing_job_does_not_stop_chat(self):
+        """Test that an exception is counted and later jobs still run."""
+        scheduler = ChatUpdateScheduler()
+        done = []
+
+        async def failing():
+            raise RuntimeError("boom")
+
+        async def ok():
+            done.append(True)
+
+        scheduler.submit(1, failing)
+        scheduler.submit(1, ok)
+        await scheduler.join()
+
+        stats = scheduler.stats()
+        assert done == [True]
+        assert stats.failed == 1
+        assert stats.completed == 1
+
+    @pytest.mark.asyncio
+    async def test_wait_time_stats(self):
+        """Test that queueing delay is reported."""
+        scheduler = ChatUpdateScheduler()
+
+        async def job():
+            await asyncio.sleep(0.01)
+
+        scheduler.submit(1, job)
+        scheduler.submit(1, job)
+        await scheduler.join()
+
+        stats = scheduler.stats()
+        assert stats.wait_time_max >= 0.01
+        assert 0 < stats.wait_time_avg <= stats.wait_time_max
@@ -0,0 +1,227 @@
+import asyncio
+import socket
+
+import httpx
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, Mock
+
+from src.config import BotConfig, WEBHOOK_MODE
+from src.webhook_server import WebhookConfig, WebhookServer
+from bot import TelegramBot
+from command_handlers_manager import CommandHandlersManager
+from command_handlers_registry import CommandHandlersRegistry
+from testing.fake_bot_api import FakeBotApi
+
+
+def _free_port() -> int:
+    """Find a port that is free to bind on localhost."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestWebhookServer:
+    """Test cases for WebhookServer class."""
+
+    @pytest.fixture
+    def mock_application(self):
+        """Create an application stand-in with a real update queue."""
+        application = Mock()
+        application.update_queue = asyncio.Queue()
+        application.bot = Mock()
+        application.bot.set_webhook = AsyncMock(return_value=True)
+        return application
+
+    @pytest_asyncio.fixture
+    async def server(self, mock_application):
+        """Start a webhook server with a secret token on a free port."""
+        port = _free_port()
+        config = WebhookConfig(
+            url=f"http://127.0.0.1:{port}/telegram",
+            listen="127.0.0.1",
+            port=port,
+            secret_token="s3cret",
+        )
+        server = WebhookServer(mock_application, config)
+        await server.start()
+        yield server
+        await server.stop()
+
+    @pytest.mark.asyncio
+    async def test_start_registers_webhook(self, server, mock_application):
+        """Test that starting the server registers the webhook with Telegram."""
+        mock_application.bot.set_webhook.assert_awaited_once()
+        kwargs = mock_application.bot.set_webhook.call_args.kwargs
+        assert kwargs["secret_token"] == "s3cret"
+        assert kwargs["url"].endswith("/telegram")
+
+    @pytest.mark.asyncio
+    async def test_valid_update_is_enqueued(self, server, mock_application):
+        """Test that an update with the right secret reaches the update queue."""
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"http://127.0.0.1:{server.port}/telegram",
+                json={"update_id": 7},
+                headers={"X-Telegram-Bot-Api-Secret-Token": "s3cret"},
+            )
+
+        assert response.status_code == 200
+        update = mock_application.update_queue.get_nowait()
+        assert update.update_id == 7
+        assert server.updates_received == 1
+
+    @pytest.mark.asyncio
+    async def test_wrong_secret_is_rejected(self, server, mock_application):
+        """Test that an update with a wrong secret token is rejected."""
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"http://127.0.0.1:{server.port}/telegram",
+                json={"update_id": 7},
+                headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"},
+            )
+
+        assert response.status_code == 403
+        assert mock_application.update_queue.empty()
+        assert server.requests_rejected == 1
+
+    @pytest.mark.asyncio
+    async def test_missing_secret_is_rejected(self, server, mock_application):
+        """Test that an update without the secret header is rejected."""
+        async with httpx.AsyncClient() as client:
+            response = await client.post(f"http://127.0.0.1:{server.port}/telegram", json={"update_id": 7})
+
+        assert response.status_code == 403
+        assert mock_application.update_queue.empty()
+
+    @pytest.mark.asyncio
+    async def test_invalid_json_is_rejected(self, server, mock_application):
+        """Test that a body that is not JSON is rejected."""
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"http://127.0.0.1:{server.port}/telegram",
+                content=b"not json",
+                headers={"X-Telegram-Bot-Api-Secret-Token": "s3cret"},
+            )
+
+        assert response.status_code == 400
+        assert mock_application.update_queue.empty()
+
+    @pytest.mark.asyncio
+    async def test_malformed_update_is_rejected(self, server, mock_application):
+        """Test that JSON which is not an update is rejected as a bad request, not a server error."""
+        bodies = [[1], {"foo": 1}, "x", {"update_id": "1"}, {"update_id": 1, "message": "x"}]
+        async with httpx.AsyncClient() as client:
+            responses = [
+                await client.post(
+                    f"http://127.0.0.1:{server.port}/telegram",
+                    json=body,
+                    headers={"X-Telegram-Bot-Api-Secret-Token": "s3cret"},
+                )
+                for body in bodies
+            ]
+
+        assert [response.status_code for response in responses] == [400] * len(bodies)
+        assert server.requests_rejected == len(bodies)
+        assert mock_application.update_queue.empty()
+
+    @pytest.mark.asyncio
+    async def test_unknown_path_and_method(self, server):
+        """Test that other paths and methods are not served."""
+        async with httpx.AsyncClient() as client:
+            not_found = await client.post(f"http://127.0.0.1:{server.port}/other", json={})
+            not_allowed = await client.get(f"http://127.0.0.1:{server.port}/telegram")
+
+        assert not_found.status_code == 404
+        assert not_allowed.status_code == 405
+
+
+class TestWebhookConfig:
+    """Test cases for webhook settings loaded by BotConfig."""
+
+    def test_polling_is_default(self):
+        """Test that polling is used when no mode is configured."""
+        config = BotConfig.from_env({})
+        assert config.mode == "polling"
+        assert config.webhook is None
+
+    def test_webhook_mode_from_env(self):
+        """Test that webhook settings are read from the environment."""
+        config = BotConfig.from_env({
+            "BOT_MODE": "webhook",
+            "WEBHOOK_URL": "https://example.com/hook",
+            "WEBHOOK_PORT": "9000",
+            "WEBHOOK_SECRET_TOKEN": "abc",
+        })
+        assert config.mode == WEBHOOK_MODE
+        assert config.webhook.url == "https://example.com/hook"
+        assert config.webhook.port == 9000
+        assert config.webhook.secret_token == "abc"
+
+    def test_webhook_mode_requires_url(self):
+        """Test that webhook mode without a URL is a configuration error."""
+        with pytest.raises(ValueError, match="WEBHOOK_URL"):
+            BotConfig.from_env({"BOT_MODE": "webhook"})
+
+    def test_unknown_mode_is_rejected(self):
+        """Test that an unknown ingestion mode is a configuration error."""
+        with pytest.raises(ValueError, match="Unknown BOT_MODE"):
+            BotConfig.from_env({"BOT_MODE": "carrier-pigeon"})
+
+
+class TestWebhookEndToEnd:
+    """End-to-end tests of the webhook mode against the offline fake Bot API."""
+
+    @pytest.mark.asyncio
+    async def test_ping_over_webhook(self):
+        """Test that a /ping pushed through the webhook gets a reply."""
+        fake_api = FakeBotApi()
+        await fake_api.start()
+
+        port = _free_port()
+        config = BotConfig(
+            mode=WEBHOOK_MODE,
+            base_url=fake_api.base_url,
+            webhook=WebhookConfig(
+                url=f"http://127.0.0.1:{port}/telegram",
+                listen="127.0.0.1",
+                port=port,
+                secret_token="e2e-secret",
+            ),
+        )
+        manager = CommandHandlersManager(CommandHandlersRegistry())
+        manager.populate_bot_handlers()
+        bot = TelegramBot(fake_api.token, manager, config)
+
+        await bot.start()
+        try:
+            assert fake_api.webhook_secret == "e2e-secret"
+            await fake_api.push_update(fake_api.make_command_update(42, "/ping"))
+            messages = await fake_api.wait_for_messages(1)
+        finally:
+            await bot.stop()
+            await fake_api.stop()
+
+        assert messages[0].chat_id == 42
+        assert messages[0].text == "I'm alive."
+
+    @pytest.mark.asyncio
+    async def test_ping_over_polling(self):
+        """Test that polling mode against the fake API replies as well."""
+        fake_api = FakeBotApi()
+        await fake_api.start()
+
+        manager = CommandHandlersManager(CommandHandlersRegistry())
+        manager.populate_bot_handlers()
+        bot = TelegramBot(fake_api.token, manager, BotConfig(base_url=fake_api.base_url))
+
+        await bot.start()
+        try:
+            await fake_api.push_update(fake_api.make_command_update(43, "/ping"))
+            messages = await fake_api.wait_for_messages(1)
+        finally:
+            await bot.stop()
+            await fake_api.stop()
+
+        assert messages[0].chat_id == 43
+        assert messages[0].text == "I'm alive."